@@ -0,0 +1,850 @@
+"""This module implements an indexed registry of accounts, for configurations that contain many accounts.
+
+The entries have the same structure as the sections of a configuration (see dbeurive.imap.config):
+
+    isp_name:
+      net:
+        hostname: ...
+        port: ...
+      imap:
+        path_sep: ...
+      user:
+        login: ...
+        password: ...
+
+The registry is loaded entry by entry: YAML files (one mapping, or several documents) and JSON Lines files (one
+mapping per line) are never loaded as a whole. Each entry is validated once, when it is loaded.
+
+The registry provides the same accessors as Config (get_isps(), get_hostname()...). Thus, it can be given to a Pool or a
+Scanner in place of a Config:
+
+    registry = AccountRegistry.from_file('accounts.yaml')
+    registry.get_by_hostname('imap.mail.com')
+    for server, accounts in registry.group_by_server().items():
+        ...
+
+Accounts can also be stored in an encrypted container: a JSON Lines file where the sections "net" and "imap" are in
+clear text (the index), and where the section "user" of each account is encrypted separately. The credentials of an
+account are decrypted the first time they are needed, and kept in a bounded cache. The sections are encrypted with
+AES-GCM, and authenticated together with the name of the account and its sections "net" and "imap": a section that
+was modified, or moved to another account, is rejected.
+
+    registry.write_encrypted('accounts.enc.jsonl')          # The key comes from the environment variable CYPHER_KEY.
+    registry = AccountRegistry.from_encrypted_file('accounts.enc.jsonl')
+    registry.get_user_password('isp0')                     # Decrypts the credentials of "isp0" only.
+"""
+
+import base64
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Mapping, Tuple, Union, Iterable, Iterator, Callable, Any, TextIO
+from dbeurive.imap.config import Config
+
+# Identification of the encrypted containers (see AccountRegistry.write_encrypted()).
+ENCRYPTED_FORMAT: str = 'dbeurive.imap.accounts.encrypted'
+ENCRYPTED_VERSION: int = 2
+
+# Sizes of the nonce and of the authentication tag of an encrypted section (AES-GCM).
+_NONCE_SIZE: int = 12
+_TAG_SIZE: int = 16
+
+
+class Account:
+    """This class represents the configuration of one account.
+    """
+
+    __slots__ = ('_name', '_hostname', '_port', '_path_sep', '_login', '_password')
+
+    def __init__(self, name: str, hostname: str, port: int, path_sep: str, login: str, password: str):
+        """Create an account.
+
+        Args:
+            name (str): the name of the account (the "ISP name").
+            hostname (str): name of the host that runs the IMAP server.
+            port (int): TCP port of the host that runs the IMAP server.
+            path_sep (str): path separator for mailboxes.
+            login (str): user login.
+            password (str): user password.
+        """
+        self._name: str = name
+        self._hostname: str = hostname
+        self._port: int = port
+        self._path_sep: str = path_sep
+        self._login: str = login
+        self._password: str = password
+
+    def get_name(self) -> str:
+        """Return the name of the account.
+
+        Returns:
+            str: the name of the account (the "ISP name").
+        """
+        return self._name
+
+    def get_hostname(self) -> str:
+        """Return the name of the host that runs the IMAP server.
+
+        Returns:
+            str: the hostname.
+        """
+        return self._hostname
+
+    def get_port(self) -> int:
+        """Return the TCP port of the IMAP server.
+
+        Returns:
+            int: the port number.
+        """
+        return self._port
+
+    def get_path_sep(self) -> str:
+        """Return the path separator for mailboxes.
+
+        Returns:
+            str: the path separator.
+        """
+        return self._path_sep
+
+    def get_login(self) -> str:
+        """Return the user login.
+
+        Returns:
+            str: the user login.
+        """
+        return self._login
+
+    def get_password(self) -> str:
+        """Return the user password.
+
+        Returns:
+            str: the user password.
+        """
+        return self._password
+
+    def get_server(self) -> str:
+        """Return the identifier of the server of the account.
+
+        Returns:
+            str: "hostname:port". The accounts that have the same identifier can share connections (see Pool).
+        """
+        return f'{self._hostname}:{self._port}'
+
+    def to_entry(self) -> Mapping[str, Mapping[str, Union[int, str]]]:
+        """Return the account as a section of a configuration.
+
+        Returns:
+            Mapping[str, Mapping[str, Union[int, str]]]: the section (ex: {"net": {"hostname": ..., "port": ...}, ...}).
+        """
+        return {'net': {'hostname': self._hostname, 'port': self._port},
+                'imap': {'path_sep': self._path_sep},
+                'user': {'login': self._login, 'password': self._password}}
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Account):
+            return NotImplemented
+        return self._name == other._name and self._hostname == other._hostname and self._port == other._port and \
+            self._path_sep == other._path_sep and self.get_login() == other.get_login() and \
+            self.get_password() == other.get_password()
+
+    def __ne__(self, other: Any) -> bool:
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self) -> int:
+        return hash((self._name, self._hostname, self._port))
+
+    def __repr__(self) -> str:
+        return f'Account({self._name!r}, {self._hostname!r}, {self._port}, {self._path_sep!r}, {self._login!r})'
+
+
+class CredentialCache:
+    """This class implements the decryption of the credentials of the accounts, and a bounded cache of the results.
+
+    The cache is shared by the accounts of an encrypted container. When it is full, the credentials that were used
+    least recently are evicted (and decrypted again if they are needed later).
+    """
+
+    def __init__(self, key: bytes, max_size: int = 1024):
+        """Create a cache.
+
+        Args:
+            key (bytes): the cypher key (16, 24 or 32 bytes).
+            max_size (int): the maximum number of decrypted credentials kept in memory.
+        """
+        self._key: bytes = key
+        self._max_size: int = max(1, max_size)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self._decryptions: int = 0
+
+    def get_key(self) -> bytes:
+        """Return the cypher key.
+
+        Returns:
+            bytes: the cypher key.
+        """
+        return self._key
+
+    def get_decryptions(self) -> int:
+        """Return the number of decryptions performed so far.
+
+        Returns:
+            int: the number of decryptions.
+        """
+        return self._decryptions
+
+    def get(self, secret: str, associated_data: bytes) -> Tuple[str, str]:
+        """Return the credentials stored in an encrypted section.
+
+        Args:
+            secret (str): the encrypted section "user" (see encrypt_credentials()).
+            associated_data (bytes): the data authenticated with the section (see get_associated_data()).
+
+        Returns:
+            Tuple[str, str]: the login and the password.
+
+        Raises:
+            Exception: if the section cannot be decrypted (ex: wrong key, or section modified).
+        """
+        index: Tuple[bytes, str] = (associated_data, secret)
+        with self._lock:
+            credentials: Union[None, Tuple[str, str]] = self._entries.get(index)
+            if credentials is not None:
+                self._entries.move_to_end(index)
+                return credentials
+        credentials = decrypt_credentials(secret, self._key, associated_data)
+        with self._lock:
+            self._decryptions += 1
+            self._entries[index] = credentials
+            if len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+        return credentials
+
+    def clear(self) -> None:
+        """Evict all the decrypted credentials.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def get_key(key: Union[None, str, bytes] = None) -> bytes:
+    """Return the key used to encrypt the credentials.
+
+    Args:
+        key (Union[None, str, bytes]): the key. The default value None means "use the value of the environment
+            variable CYPHER_KEY".
+
+    Returns:
+        bytes: the key.
+
+    Raises:
+        Exception: if the key is not given, and the environment variable is not set, or if the key is not valid.
+    """
+    if key is None:
+        if Config.CYPHER_KEY_NAME not in os.environ:
+            raise Exception(f'Cannot get the cypher key: environment variable "{Config.CYPHER_KEY_NAME}" is not set.')
+        key = os.environ[Config.CYPHER_KEY_NAME]
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    if len(key) not in (16, 24, 32):
+        raise Exception(f'Invalid cypher key: the key must be 16, 24 or 32 bytes long (not {len(key)}).')
+    return key
+
+
+def get_associated_data(name: str, hostname: str, port: int, path_sep: str) -> bytes:
+    """Return the data authenticated with the section "user" of an account: its name, and its sections "net" and
+    "imap".
+
+    Args:
+        name (str): the name of the account.
+        hostname (str): name of the host that runs the IMAP server.
+        port (int): TCP port of the host that runs the IMAP server.
+        path_sep (str): path separator for mailboxes.
+
+    Returns:
+        bytes: the associated data.
+    """
+    return json.dumps([name, hostname, port, path_sep], separators=(',', ':')).encode('utf-8')
+
+
+def encrypt_credentials(login: str, password: str, key: bytes, associated_data: bytes) -> str:
+    """Encrypt the section "user" of an account.
+
+    Each section is encrypted with AES-GCM and its own random nonce. The nonce is stored before the cyphered text,
+    and the authentication tag after it.
+
+    Args:
+        login (str): the user login.
+        password (str): the user password.
+        key (bytes): the cypher key.
+        associated_data (bytes): the data authenticated with the section (see get_associated_data()).
+
+    Returns:
+        str: the encrypted section, encoded in base64.
+    """
+    from Crypto.Cipher import AES
+    nonce: bytes = os.urandom(_NONCE_SIZE)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce, mac_len=_TAG_SIZE)
+    cipher.update(associated_data)
+    text: bytes = json.dumps({'login': login, 'password': password}, separators=(',', ':')).encode('utf-8')
+    cyphered, tag = cipher.encrypt_and_digest(text)
+    return base64.b64encode(nonce + cyphered + tag).decode('ascii')
+
+
+def decrypt_credentials(secret: str, key: bytes, associated_data: bytes) -> Tuple[str, str]:
+    """Decrypt the section "user" of an account, and check that neither the section nor the associated data has been
+    modified.
+
+    Args:
+        secret (str): the encrypted section (see encrypt_credentials()).
+        key (bytes): the cypher key.
+        associated_data (bytes): the data authenticated with the section (see get_associated_data()).
+
+    Returns:
+        Tuple[str, str]: the login and the password.
+
+    Raises:
+        Exception: if the section cannot be decrypted, or if the authentication tag does not verify (wrong key,
+            modified section or associated data).
+    """
+    from Crypto.Cipher import AES
+    try:
+        data: bytes = base64.b64decode(secret.encode('ascii'), validate=True)
+        if len(data) < _NONCE_SIZE + _TAG_SIZE:
+            raise ValueError('the section is too short')
+        cipher = AES.new(key, AES.MODE_GCM, nonce=data[:_NONCE_SIZE], mac_len=_TAG_SIZE)
+        cipher.update(associated_data)
+        text: bytes = cipher.decrypt_and_verify(data[_NONCE_SIZE:-_TAG_SIZE], data[-_TAG_SIZE:])
+        user: Any = json.loads(text.decode('utf-8'))
+        return _string(user['login']), _string(user['password'])
+    except (TypeError, ValueError, KeyError) as e:
+        raise Exception(f'Cannot decrypt the credentials (invalid section, wrong key or modified entry): {e}')
+
+
+class EncryptedAccount(Account):
+    """This class represents an account whose credentials are encrypted.
+
+    The credentials are decrypted when they are needed, through a cache shared by the accounts of the container.
+    """
+
+    __slots__ = ('_secret', '_cache')
+
+    def __init__(self, name: str, hostname: str, port: int, path_sep: str, secret: str, cache: CredentialCache):
+        """Create an account.
+
+        Args:
+            name (str): the name of the account (the "ISP name").
+            hostname (str): name of the host that runs the IMAP server.
+            port (int): TCP port of the host that runs the IMAP server.
+            path_sep (str): path separator for mailboxes.
+            secret (str): the encrypted section "user" (see encrypt_credentials()).
+            cache (CredentialCache): the cache used to decrypt the credentials.
+        """
+        super().__init__(name, hostname, port, path_sep, None, None)
+        self._secret: str = secret
+        self._cache: CredentialCache = cache
+
+    def get_secret(self) -> str:
+        """Return the encrypted section "user".
+
+        Returns:
+            str: the encrypted section.
+        """
+        return self._secret
+
+    def get_login(self) -> str:
+        return self._credentials()[0]
+
+    def get_password(self) -> str:
+        return self._credentials()[1]
+
+    def to_entry(self) -> Mapping[str, Mapping[str, Union[int, str]]]:
+        login, password = self._credentials()
+        return {'net': {'hostname': self._hostname, 'port': self._port},
+                'imap': {'path_sep': self._path_sep},
+                'user': {'login': login, 'password': password}}
+
+    def _credentials(self) -> Tuple[str, str]:
+        try:
+            return self._cache.get(self._secret, get_associated_data(self._name, self._hostname, self._port,
+                                                                     self._path_sep))
+        except Exception as e:
+            raise Exception(f'Invalid configuration for ISP "{self._name}[user]": {e}')
+
+    def __eq__(self, other: Any) -> bool:
+        # Unchanged accounts keep their encrypted sections (see AccountRegistry.write_encrypted()): they are compared
+        # without being decrypted.
+        if isinstance(other, EncryptedAccount) and self._secret == other._secret:
+            return self._name == other._name and self._hostname == other._hostname and \
+                self._port == other._port and self._path_sep == other._path_sep
+        return super().__eq__(other)
+
+    def __hash__(self) -> int:
+        return hash((self._name, self._hostname, self._port))
+
+    def __repr__(self) -> str:
+        return f'EncryptedAccount({self._name!r}, {self._hostname!r}, {self._port}, {self._path_sep!r})'
+
+
+def _string(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    # YAML loads "password: 0123" as the integer 83, and "password: 1.50" as a float: the text cannot be recovered.
+    if isinstance(value, (bool, int, float)):
+        raise ValueError(f'not a string ({value!r}), quote the value')
+    raise ValueError('not a string')
+
+
+def _port(value: Any) -> int:
+    if isinstance(value, bool):
+        raise ValueError('not a port number')
+    port: int = int(value)
+    if not 0 < port < 65536:
+        raise ValueError('not a port number')
+    return port
+
+
+class Schema:
+    """This class implements the validation of the entries of a configuration.
+
+    The description of the entries is compiled once into a list of (section, keys, fields) tuples. Then, an entry is
+    validated and converted into an Account in a single pass.
+    """
+
+    # For each section: the fields and their converters. The converters raise ValueError if the value is not valid.
+    DEFINITION: Mapping[str, Mapping[str, Callable[[Any], Any]]] = {
+        'net': {'hostname': _string, 'port': _port},
+        'imap': {'path_sep': _string},
+        'user': {'login': _string, 'password': _string}
+    }
+
+    def __init__(self, definition: Union[None, Mapping[str, Mapping[str, Callable[[Any], Any]]]] = None):
+        """Compile a schema.
+
+        Args:
+            definition (Union[None, Mapping[str, Mapping[str, Callable[[Any], Any]]]]): the description of the
+                entries. The default value None means "use DEFINITION".
+        """
+        definition = __class__.DEFINITION if definition is None else definition
+        self._sections: frozenset = frozenset(definition.keys())
+        self._compiled: List[Tuple[str, frozenset, Tuple[Tuple[str, Callable[[Any], Any]], ...]]] = \
+            [(section, frozenset(fields.keys()), tuple(fields.items())) for section, fields in definition.items()]
+
+    def validate(self, name: Any, entry: Any) -> Account:
+        """Validate an entry and convert it into an account.
+
+        Args:
+            name (Any): the name of the entry.
+            entry (Any): the entry.
+
+        Returns:
+            Account: the account.
+
+        Raises:
+            Exception: if the entry is not valid. The message designates the invalid section or field.
+        """
+        return Account(*self.convert(name, entry))
+
+    def convert(self, name: Any, entry: Any) -> List[Any]:
+        """Validate an entry and convert its values.
+
+        Args:
+            name (Any): the name of the entry.
+            entry (Any): the entry.
+
+        Returns:
+            List[Any]: the name of the entry, followed by the converted values of the fields, in the order of the
+                definition.
+
+        Raises:
+            Exception: if the entry is not valid. The message designates the invalid section or field.
+        """
+        if not isinstance(name, str) or not isinstance(entry, dict) or entry.keys() != self._sections:
+            raise Exception(f'Invalid configuration for ISP "{name}"')
+        values: List[Any] = [name]
+        for section, keys, fields in self._compiled:
+            values_section: Any = entry[section]
+            if not isinstance(values_section, dict) or values_section.keys() != keys:
+                raise Exception(f'Invalid configuration for ISP "{name}[{section}]"')
+            for field, convert in fields:
+                try:
+                    values.append(convert(values_section[field]))
+                except (TypeError, ValueError) as e:
+                    raise Exception(f'Invalid configuration for ISP "{name}[{section}][{field}]": {e}')
+        return values
+
+
+class AccountRegistry:
+    """This class implements an index of accounts.
+
+    Lookups by name are O(1), as well as lookups by hostname and by server (hostname and port).
+    """
+
+    def __init__(self, accounts: Iterable[Account] = ()):
+        """Create a registry.
+
+        Args:
+            accounts (Iterable[Account]): the accounts.
+
+        Raises:
+            Exception: if two accounts have the same name.
+        """
+        self._accounts: Mapping[str, Account] = {}
+        self._by_hostname: Mapping[str, List[Account]] = {}
+        self._by_server: Mapping[str, List[Account]] = {}
+        for account in accounts:
+            self.add(account)
+
+    @staticmethod
+    def from_entries(entries: Iterable[Tuple[Any, Any]], schema: Union[None, Schema] = None) -> 'AccountRegistry':
+        """Create a registry from the entries of a configuration.
+
+        Args:
+            entries (Iterable[Tuple[Any, Any]]): the entries, as pairs (name, section).
+            schema (Union[None, Schema]): the schema used to validate the entries. The default value None means "use
+                the default schema".
+
+        Returns:
+            AccountRegistry: the registry.
+
+        Raises:
+            Exception: if an entry is not valid, or if two entries have the same name.
+        """
+        schema = Schema() if schema is None else schema
+        registry = AccountRegistry()
+        for name, entry in entries:
+            registry.add(schema.validate(name, entry))
+        return registry
+
+    @staticmethod
+    def from_config(config: Any) -> 'AccountRegistry':
+        """Create a registry from a configuration.
+
+        Args:
+            config (Config): the configuration.
+
+        Returns:
+            AccountRegistry: the registry.
+        """
+        return __class__.from_entries(config.get_conf().items())
+
+    @staticmethod
+    def from_file(path: str) -> 'AccountRegistry':
+        """Load a registry from a file.
+
+        Files whose names end with ".jsonl" or ".ndjson" are read as JSON Lines. Other files are read as YAML (which
+        includes JSON).
+
+        Args:
+            path (str): the path to the file.
+
+        Returns:
+            AccountRegistry: the registry.
+
+        Raises:
+            Exception: if the file is not valid.
+        """
+        with open(path, 'r') as fd:
+            if path.endswith(('.jsonl', '.ndjson')):
+                return __class__.from_entries(__class__.iter_json_lines(fd))
+            return __class__.from_entries(__class__.iter_yaml(fd))
+
+    @staticmethod
+    def from_encrypted_file(path: str, key: Union[None, str, bytes] = None,
+                            max_cached: int = 1024) -> 'AccountRegistry':
+        """Load a registry from an encrypted container (see write_encrypted()).
+
+        Only the index (the sections "net" and "imap") is read: the credentials are decrypted when they are needed.
+        The authentication tag of an account is checked when its credentials are decrypted: if the account has been
+        modified, then the accessors of its credentials raise an exception.
+
+        Args:
+            path (str): the path to the container.
+            key (Union[None, str, bytes]): the cypher key. The default value None means "use the value of the
+                environment variable CYPHER_KEY".
+            max_cached (int): the maximum number of decrypted credentials kept in memory.
+
+        Returns:
+            AccountRegistry: the registry.
+
+        Raises:
+            Exception: if the file is not a valid container.
+        """
+        cache = CredentialCache(get_key(key), max_cached)
+        schema = Schema({section: fields for section, fields in Schema.DEFINITION.items() if section != 'user'})
+        registry = AccountRegistry()
+        with open(path, 'r') as fd:
+            try:
+                header: Any = json.loads(fd.readline())
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or header.get('format') != ENCRYPTED_FORMAT:
+                raise Exception(f'Invalid encrypted configuration: "{path}" is not a container')
+            if header.get('version') != ENCRYPTED_VERSION:
+                raise Exception(f'Invalid encrypted configuration: unsupported version {header.get("version")}')
+            for name, entry in __class__.iter_json_lines(fd):
+                secret: Any = entry.get('user') if isinstance(entry, dict) else None
+                if not isinstance(secret, str):
+                    raise Exception(f'Invalid configuration for ISP "{name}[user]"')
+                values: List[Any] = schema.convert(name, {k: v for k, v in entry.items() if k != 'user'})
+                registry.add(EncryptedAccount(*values, secret, cache))
+        return registry
+
+    def write_encrypted(self, path: str, key: Union[None, str, bytes] = None) -> None:
+        """Write the registry into an encrypted container.
+
+        The container is a JSON Lines file, only readable by its owner. The first line identifies the format. Then,
+        each line contains one account, whose section "user" is encrypted:
+
+            {"format": "dbeurive.imap.accounts.encrypted", "version": 2}
+            {"isp0": {"net": {"hostname": "imap.mail.com", "port": 993}, "imap": {"path_sep": "/"}, "user": "..."}}
+
+        The accounts loaded from a container encrypted with the same key keep their encrypted sections: they are not
+        decrypted, and the containers can be compared without decrypting the unchanged accounts (see diff()).
+
+        Args:
+            path (str): the path to the container.
+            key (Union[None, str, bytes]): the cypher key. The default value None means "use the value of the
+                environment variable CYPHER_KEY".
+        """
+        key = get_key(key)
+        fd = os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w')
+        with fd:
+            fd.write(json.dumps({'format': ENCRYPTED_FORMAT, 'version': ENCRYPTED_VERSION}) + '\n')
+            for account in self._accounts.values():
+                if isinstance(account, EncryptedAccount) and account._cache.get_key() == key:
+                    secret: str = account.get_secret()
+                else:
+                    secret = encrypt_credentials(account.get_login(), account.get_password(), key,
+                                                 get_associated_data(account.get_name(), account.get_hostname(),
+                                                                     account.get_port(), account.get_path_sep()))
+                fd.write(json.dumps({account.get_name(): {'net': {'hostname': account.get_hostname(),
+                                                                  'port': account.get_port()},
+                                                          'imap': {'path_sep': account.get_path_sep()},
+                                                          'user': secret}}, separators=(',', ':')) + '\n')
+
+    @staticmethod
+    def iter_yaml(stream: Union[str, TextIO]) -> Iterator[Tuple[Any, Any]]:
+        """Read the entries of a YAML stream, one at a time.
+
+        The stream contains one or several documents. Each document is a mapping of entries. The entries are built
+        one by one from the events of the parser: the memory used does not depend on the size of the documents.
+
+        Args:
+            stream (Union[str, TextIO]): the stream.
+
+        Returns:
+            Iterator[Tuple[Any, Any]]: the entries, as pairs (name, section).
+
+        Raises:
+            Exception: if a document is not a mapping.
+        """
+        import yaml
+        loader = yaml.SafeLoader(stream)
+        try:
+            loader.get_event()
+            while not loader.check_event(yaml.StreamEndEvent):
+                loader.get_event()
+                if loader.check_event(yaml.MappingStartEvent):
+                    loader.get_event()
+                    while not loader.check_event(yaml.MappingEndEvent):
+                        name: Any = loader.construct_object(loader.compose_node(None, None), deep=True)
+                        entry: Any = loader.construct_object(loader.compose_node(None, None), deep=True)
+                        # Release the objects built for this entry.
+                        loader.constructed_objects = {}
+                        yield name, entry
+                    loader.get_event()
+                elif loader.construct_object(loader.compose_node(None, None), deep=True) is not None:
+                    raise Exception('Invalid configuration: a document is not a mapping')
+                loader.get_event()
+                loader.anchors = {}
+        except yaml.YAMLError as e:
+            raise Exception(f'Invalid configuration: {e}')
+        finally:
+            loader.dispose()
+
+    @staticmethod
+    def iter_json_lines(lines: Iterable[str]) -> Iterator[Tuple[Any, Any]]:
+        """Read the entries of a JSON Lines stream, one line at a time.
+
+        Each line is a JSON object that contains one or several entries. Empty lines are ignored.
+
+        Args:
+            lines (Iterable[str]): the lines.
+
+        Returns:
+            Iterator[Tuple[Any, Any]]: the entries, as pairs (name, section).
+
+        Raises:
+            Exception: if a line is not a JSON object.
+        """
+        for number, line in enumerate(lines, 1):
+            if line.strip() == '':
+                continue
+            try:
+                entries: Any = json.loads(line)
+            except ValueError as e:
+                raise Exception(f'Invalid configuration: line {number}: {e}')
+            if not isinstance(entries, dict):
+                raise Exception(f'Invalid configuration: line {number} is not an object')
+            yield from entries.items()
+
+    def add(self, account: Account) -> None:
+        """Add an account.
+
+        Args:
+            account (Account): the account.
+
+        Raises:
+            Exception: if an account with the same name is already registered.
+        """
+        if account.get_name() in self._accounts:
+            raise Exception(f'ISP "{account.get_name()}" is configured twice.')
+        self._accounts[account.get_name()] = account
+        self._by_hostname.setdefault(account.get_hostname(), []).append(account)
+        self._by_server.setdefault(account.get_server(), []).append(account)
+
+    def remove(self, name: str) -> Union[None, Account]:
+        """Remove an account.
+
+        Args:
+            name (str): the name of the account.
+
+        Returns:
+            Account: the removed account.
+            None: no account has this name.
+        """
+        account: Union[None, Account] = self._accounts.pop(name, None)
+        if account is None:
+            return None
+        for index, key in ((self._by_hostname, account.get_hostname()), (self._by_server, account.get_server())):
+            index[key].remove(account)
+            if len(index[key]) == 0:
+                del index[key]
+        return account
+
+    def get(self, name: str) -> Union[None, Account]:
+        """Return an account, given its name.
+
+        Args:
+            name (str): the name of the account.
+
+        Returns:
+            Account: the account.
+            None: no account has this name.
+        """
+        return self._accounts.get(name)
+
+    def get_by_hostname(self, hostname: str) -> List[Account]:
+        """Return the accounts hosted by a given host.
+
+        Args:
+            hostname (str): the hostname.
+
+        Returns:
+            List[Account]: the accounts, in the order they were added.
+        """
+        return list(self._by_hostname.get(hostname, []))
+
+    def get_by_server(self, server: str) -> List[Account]:
+        """Return the accounts hosted by a given server.
+
+        Args:
+            server (str): the server, as "hostname:port" (see Account.get_server()).
+
+        Returns:
+            List[Account]: the accounts, in the order they were added.
+        """
+        return list(self._by_server.get(server, []))
+
+    def group_by_server(self) -> Mapping[str, List[Account]]:
+        """Group the accounts by server.
+
+        The accounts of a group share the connections limit of the pool (see Pool), and can be scanned by the same
+        workers.
+
+        Returns:
+            Mapping[str, List[Account]]: the accounts, indexed by server ("hostname:port").
+        """
+        return {server: list(accounts) for server, accounts in self._by_server.items()}
+
+    def diff(self, other: 'AccountRegistry') -> Tuple[List[str], List[str], List[str]]:
+        """Compare this registry with another one.
+
+        Args:
+            other (AccountRegistry): the other registry (ex: a new version of the configuration).
+
+        Returns:
+            Tuple[List[str], List[str], List[str]]: the names of the accounts added by the other registry, the names
+                of the accounts it removed, and the names of the accounts it modified.
+        """
+        added: List[str] = [name for name in other._accounts if name not in self._accounts]
+        removed: List[str] = [name for name in self._accounts if name not in other._accounts]
+        changed: List[str] = [name for name, account in self._accounts.items()
+                              if name in other._accounts and other._accounts[name] != account]
+        return added, removed, changed
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._accounts
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def __iter__(self) -> Iterator[Account]:
+        return iter(list(self._accounts.values()))
+
+    # The accessors of Config, so that a registry can be used in place of a configuration (see Pool and Scanner). They
+    # raise an exception if the account is not registered.
+
+    def get_isps(self) -> List[str]:
+        """Return the names of the accounts.
+
+        Returns:
+            List[str]: the names of the accounts, in the order they were added.
+        """
+        return list(self._accounts.keys())
+
+    def get_hostname(self, isp_name: str) -> str:
+        return self._account_or_die(isp_name).get_hostname()
+
+    def get_port(self, isp_name: str) -> int:
+        return self._account_or_die(isp_name).get_port()
+
+    def get_path_set(self, isp_name: str) -> str:
+        return self._account_or_die(isp_name).get_path_sep()
+
+    def get_user_login(self, isp_name: str) -> str:
+        return self._account_or_die(isp_name).get_login()
+
+    def get_user_password(self, isp_name: str) -> str:
+        return self._account_or_die(isp_name).get_password()
+
+    def get_conf(self) -> Mapping[str, Mapping[str, Mapping[str, Union[int, str]]]]:
+        """Return the registry as a configuration.
+
+        Returns:
+            Mapping[str, Mapping[str, Mapping[str, Union[int, str]]]]: the configuration (see Config.get_conf()).
+        """
+        return {name: account.to_entry() for name, account in self._accounts.items()}
+
+    def _account_or_die(self, isp_name: str) -> Account:
+        """Return an account, given its name.
+
+        Args:
+            isp_name (str): the name of the account.
+
+        Returns:
+            Account: the account.
+
+        Raises:
+            Exception: if no account has this name.
+        """
+        account: Union[None, Account] = self._accounts.get(isp_name)
+        if account is None:
+            raise Exception(f'ISP "{isp_name}" is not configured.')
+        return account
@@ -0,0 +1,685 @@
+import asyncio
+import re
+import ssl
+import time
+from typing import List, Union, Tuple, Mapping, Callable, Any
+from dbeurive.imap.client import Client
+from dbeurive.imap.connector import Connector
+from dbeurive.imap.id_set import IdSet
+from dbeurive.imap.mailbox import Mailbox
+from dbeurive.imap.tree import MailboxTree
+from dbeurive.imap.idle import IdleEvent
+
+# Patterns used to classify the responses sent by the server. They match the patterns used by imaplib, so that the
+# raw data returned by the methods of AsyncClient can be processed by the same functions as the ones returned by Client.
+_tagged_re = re.compile(br'(?P<tag>[A-Za-z0-9]+) (?P<type>[A-Z]+) ?(?P<data>.*)')
+_untagged_status_re = re.compile(br'\* (?P<data>\d+) (?P<type>[A-Z-]+)( (?P<data2>.*))?')
+_untagged_re = re.compile(br'\* (?P<type>[A-Z-]+)( (?P<data>.*))?')
+_response_code_re = re.compile(br'\[(?P<type>[A-Z-]+)( (?P<data>.*?))?\]')
+_literal_re = re.compile(br'.*{(?P<size>\d+)}$')
+
+RawData = List[Union[bytes, Tuple[bytes, bytes], None]]
+
+
+class AsyncClient:
+    """This class implements an IMAP client built on asyncio streams.
+
+    The class exposes the same methods as the class Client. However, all methods that exchange data with the server
+    are coroutines. Thus, a single event loop can drive many connections at once.
+    """
+
+    # Maximum length of a line. asyncio limits it to 64 KiB by default, which is less than the response to SEARCH for a
+    # mailbox that contains about 13k messages. The limit is the same as the one of the synchronous client.
+    MAX_LINE: int = Connector.MAX_LINE
+
+    def __init__(self, hostname: str, port: int, username: str, password: str, path_sep: str = '/', use_ssl: bool = True):
+        """Create a client.
+
+        Args:
+            hostname (str): name of the host that runs the IMAP server.
+            port (int): TCP port of the host that runs the IMAP server.
+            username (str): client username.
+            password (str): client password.
+            path_sep (str): path separator for mailboxes.
+            use_ssl (bool): flag that indicates whether the connection must be encrypted (TLS) or not.
+        """
+        self._hostname: str = hostname
+        self._port: int = port
+        self._username: str = username
+        self._password: str = password
+        self._path_sep: str = path_sep
+        self._tree: Union[None, MailboxTree] = None
+        self._use_ssl: bool = use_ssl
+        self._reader: Union[None, asyncio.StreamReader] = None
+        self._writer: Union[None, asyncio.StreamWriter] = None
+        self._lock: Union[None, asyncio.Lock] = None
+        self._tag_counter: int = 0
+        self._capabilities: List[str] = []
+        self._last_error: Union[None, str, Exception] = None
+        self._authenticated: bool = False
+        self._selected_mailbox: Union[None, str] = None
+        self._uid_validity: Union[None, int] = None
+        self._uid_next: Union[None, int] = None
+
+    def is_connected(self) -> bool:
+        """Test whether the client is connected to the IMAP server or not.
+
+        Returns:
+            bool: is the client is connected to the IMAP server, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return self._writer is not None
+
+    def is_authenticated(self) -> bool:
+        """Test whether the client is authenticated on the IMAP server or not.
+
+        Returns:
+            bool: is the client is authenticated to the IMAP server, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return self._authenticated
+
+    def get_last_error(self) -> Union[None, str, Exception]:
+        """Return the last error description.
+
+        Returns:
+            Union[str, Exception]: if an error occurred, then the method returns its description.
+            None: if no error occurred, then the method returns the value None.
+        """
+        return self._last_error
+
+    def get_capabilities(self) -> List[str]:
+        """Return the capabilities advertised by the server.
+
+        Returns:
+            List[str]: the capabilities (upper case).
+        """
+        return self._capabilities
+
+    async def connect(self) -> bool:
+        """Connect to the IMAP server.
+
+        Returns:
+            True: the connection is established.
+            False: the connection could not be established.
+        """
+        self._last_error = None
+        context: Union[None, ssl.SSLContext] = ssl.create_default_context() if self._use_ssl else None
+        try:
+            self._reader, self._writer = await asyncio.open_connection(self._hostname, self._port, ssl=context,
+                                                                       limit=self.MAX_LINE)
+            greeting: List[bytes] = await self._read_response()
+            if not greeting[0].startswith(b'* OK') and not greeting[0].startswith(b'* PREAUTH'):
+                self._close()
+                self._last_error = f'Unexpected greeting from the server: {greeting[0]}'
+                return False
+            self._lock = asyncio.Lock()
+            status, data = await self._command('CAPABILITY')
+            if 'OK' == status and len(data.get('CAPABILITY', [])) > 0:
+                self._capabilities = data['CAPABILITY'][-1].decode().upper().split()
+        except (OSError, EOFError, asyncio.IncompleteReadError) as e:
+            self._close()
+            self._last_error = e
+            return False
+        return True
+
+    async def login(self) -> bool:
+        """Log to the IMAP server.
+
+        Returns:
+            True: the client successfully identified himself to the IMAP server.
+            False: the client could not identify himself to the IMAP server.
+        """
+        self._last_error = None
+        try:
+            status, data = await self._command('LOGIN', _quote(self._username), _quote(self._password))
+        except (OSError, EOFError, asyncio.IncompleteReadError) as e:
+            self._last_error = e
+            return False
+        if 'OK' != status:
+            self._last_error = f'Cannot log in: {data["__tagged__"][0]}'
+            return False
+        self._authenticated = True
+        # The server may advertise other capabilities once the client is authenticated.
+        code = _response_code_re.match(data['__tagged__'][0])
+        if code is not None and code.group('type') == b'CAPABILITY':
+            self._capabilities = (code.group('data') or b'').decode().upper().split()
+        elif len(data.get('CAPABILITY', [])) > 0:
+            self._capabilities = data['CAPABILITY'][-1].decode().upper().split()
+        else:
+            try:
+                status, data = await self._command('CAPABILITY')
+            except (OSError, EOFError, asyncio.IncompleteReadError) as e:
+                self._last_error = e
+                return False
+            if 'OK' == status and len(data.get('CAPABILITY', [])) > 0:
+                self._capabilities = data['CAPABILITY'][-1].decode().upper().split()
+        return True
+
+    async def logout(self) -> None:
+        """Log out from the IMAP server and close the connection.
+        """
+        if self._writer is None:
+            return
+        try:
+            await self._command('LOGOUT')
+        except (OSError, EOFError, asyncio.IncompleteReadError):
+            pass
+        self._close()
+
+    async def list_mailboxes(self, directory: str= '""', selectable_only: bool = False,
+                             special_use: Union[None, bool] = None, pattern: str = '*') -> Union[None, List[Mailbox]]:
+        """List the mailboxes within a given directory on the server.
+
+        Args:
+            directory (str): string that identifies the directory.
+                The default value is "".
+            selectable_only (bool): flag that indicates whether the mailboxes that cannot be selected (\\Noselect,
+                \\NonExistent) must be discarded or not.
+            special_use (Union[None, bool]): True to keep only the special-use mailboxes (\\Sent, \\Trash...), False
+                to discard them, None to keep all mailboxes.
+            pattern (str): the mailboxes to list, relative to the directory. "*" matches any sequence of characters,
+                and "%" matches any sequence of characters but the hierarchy delimiter. The default value is "*".
+
+        Returns:
+            List[Mailbox]: upon successful completion, the method returns the list of mailboxes.
+            None: if the method could not interpret the server response, then it returns the value None.
+        """
+        mailboxes: Union[None, List[bytes]] = await self.get_raw_list_mailboxes(directory, pattern)
+        if mailboxes is None:
+            return None
+        result: Union[None, List[Mailbox]] = Client._list(mailboxes)
+        if result is None:
+            return None
+        return Mailbox.filter(result, selectable_only, special_use)
+
+    async def get_raw_list_mailboxes(self, directory: str= '""', pattern: str = '*') -> Union[List[bytes], None]:
+        """Get the list of mailboxes within a given directory as a list of raw identifiers.
+
+        Args:
+            directory (str): string that identifies the directory.
+                The default value is "".
+            pattern (str): the mailboxes to list, relative to the directory. The default value is "*".
+
+        Returns:
+            List[bytes]: upon successful completion, the method returns the list of mailboxes.
+            None: if an error occurred, then it returns the value None.
+        """
+        self._authenticated_or_die()
+        status, data = await self._command('LIST', directory, pattern)
+        if 'OK' != status:
+            return None
+        return data.get('LIST', [None])
+
+    async def get_mailbox_tree(self, refresh: bool = False, pattern: str = '*') -> Union[None, MailboxTree]:
+        """Return the index of the hierarchy of mailboxes.
+
+        The index is built from the output of the "list" command the first time the method is called. Then, it is only
+        updated upon request: the mailboxes that match the given pattern are listed again, and the differences are
+        applied to the index.
+
+        Args:
+            refresh (bool): flag that indicates whether the index must be refreshed or not.
+            pattern (str): the mailboxes to list again, if the index is refreshed (ex: "Archives/*").
+
+        Returns:
+            MailboxTree: the index.
+            None: if the list of mailboxes could not be retrieved, then the method returns the value None.
+        """
+        if self._tree is not None and not refresh:
+            return self._tree
+        mailboxes: Union[None, List[Mailbox]] = await self.list_mailboxes(pattern=pattern if self._tree is not None else '*')
+        if mailboxes is None:
+            return None
+        if self._tree is None:
+            self._tree = MailboxTree(mailboxes, self._path_sep)
+        else:
+            self._tree.refresh(mailboxes, pattern)
+        return self._tree
+
+    async def select_mailbox(self, mailbox: str='INBOX', readonly=False) -> int:
+        """Select a mailbox and returns the number of emails within this mailbox.
+
+        Args:
+            mailbox (str): the name of the mailbox.
+            readonly (bool): specify whether the access to the mailbox is restricted to read only or not.
+                True: the mailbox can only be read.
+                False: the mailbox can be read and written.
+
+        Returns:
+            int: the number of messages within the mailbox.
+
+        Raises:
+            Exception: if the client cannot select the mailbox.
+        """
+        self._authenticated_or_die()
+        status, data = await self._command('EXAMINE' if readonly else 'SELECT', mailbox)
+        if 'OK' != status:
+            self._selected_mailbox = None
+            raise Exception(f'Cannot select the mailbox {mailbox}! Status code is {status}')
+        if len(data.get('EXISTS', [])) == 0:
+            raise Exception(f'Cannot select the mailbox {mailbox}: the number of messages in the mailbox is not returned!')
+        self._selected_mailbox = mailbox
+        self._uid_validity = Client._response_code_value(data.get('UIDVALIDITY', []))
+        self._uid_next = Client._response_code_value(data.get('UIDNEXT', []))
+        return int(data['EXISTS'][-1].decode())
+
+    def get_uid_validity(self) -> Union[None, int]:
+        """Return the UIDVALIDITY value of the currently selected mailbox.
+
+        Returns:
+            int: the UIDVALIDITY value.
+            None: no mailbox is selected, or the server did not return the value.
+        """
+        return self._uid_validity
+
+    def get_uid_next(self) -> Union[None, int]:
+        """Return the predicted next UID of the currently selected mailbox.
+
+        Returns:
+            int: the UIDNEXT value.
+            None: no mailbox is selected, or the server did not return the value.
+        """
+        return self._uid_next
+
+    async def list_emails_ids(self, *criteria, mailbox=None) -> IdSet:
+        """Get the IDs of the emails stored within a mailbox.
+
+        Please note that the mailbox should have been previously selected.
+        However, it is possible to specify a mailbox to select through the use of the parameter "mailbox".
+
+        Args:
+            *criteria (List[Union[str, IdSet]]): criteria used to select the emails.
+                Sets of IDs (IdSet, or lists of integers) are sent as sequence sets.
+            mailbox (Union[None, str]): optional name of a mailbox.
+
+        Returns:
+            IdSet: the IDs of the emails stored within the (previously selected / specified) mailbox.
+
+        Raises:
+            Exception: if the client could not get the list of IDs.
+        """
+        ids = await self.get_raw_emails_ids(*criteria, mailbox=mailbox)
+        if ids is None:
+            raise Exception(f'Cannot get the list of email in the mailbox {self._selected_mailbox}! No list of IDs is returned!')
+        result: Union[None, IdSet] = Client._search(ids)
+        if result is None:
+            raise Exception(f'Cannot get the list of email in the mailbox {self._selected_mailbox}! The list of IDs is not valid!')
+        return result
+
+    async def get_raw_emails_ids(self, *criteria, mailbox=None) -> Union[List[bytes], None]:
+        """Get the IDs of the emails stored within a mailbox, a raw data.
+
+        Args:
+            *criteria (List[Union[str, IdSet]]): criteria used to select the emails.
+                Sets of IDs (IdSet, or lists of integers) are sent as sequence sets.
+            mailbox (Union[None, str]): optional name of a mailbox.
+
+        Returns:
+            List[bytes]: the list of IDs.
+            None: the client could not get the list of IDs.
+
+        Raises:
+            Exception: if no mailbox has been selected.
+        """
+        await self._selected_or_die(mailbox)
+        return await self._raw_search(False, criteria)
+
+    async def list_emails_uids(self, *criteria, mailbox=None) -> IdSet:
+        """Get the UIDs of the emails stored within a mailbox.
+
+        Args:
+            *criteria (List[Union[str, IdSet]]): criteria used to select the emails.
+                Sets of IDs (IdSet, or lists of integers) are sent as sequence sets.
+            mailbox (Union[None, str]): optional name of a mailbox.
+
+        Returns:
+            IdSet: the UIDs of the emails stored within the (previously selected / specified) mailbox.
+
+        Raises:
+            Exception: if the client could not get the list of UIDs.
+        """
+        await self._selected_or_die(mailbox)
+        uids = await self._raw_search(True, criteria)
+        result: Union[None, IdSet] = None if uids is None else Client._search(uids)
+        if result is None:
+            raise Exception(f'Cannot get the list of email in the mailbox {self._selected_mailbox}! The list of UIDs is not valid!')
+        return result
+
+    async def idle(self, callback: Callable[[IdleEvent], Any], timeout: Union[None, float] = None) -> None:
+        """Wait for changes within the selected mailbox, using the command IDLE (RFC 2177), and call a function for
+        each change.
+
+        The command IDLE is automatically re-issued every Client.IDLE_RENEW_INTERVAL seconds. Other commands sent
+        through the client wait for the end of the IDLE session.
+
+        Args:
+            callback (Callable[[IdleEvent], Any]): the function (or the coroutine function) called for each event.
+                If the function returns the value False, then the method stops waiting.
+            timeout (Union[None, float]): the maximum number of seconds to wait for changes.
+                If None, then the method waits until the function returns the value False.
+
+        Raises:
+            Exception: if no mailbox is selected, if the server does not support the command IDLE, or if the server
+                closes the connection.
+        """
+        await self._selected_or_die()
+        if 'IDLE' not in self._capabilities:
+            raise Exception('The server does not support the command IDLE!')
+        deadline: Union[None, float] = None if timeout is None else time.monotonic() + timeout
+        async with self._lock:
+            stop: bool = False
+            while not stop and (deadline is None or time.monotonic() < deadline):
+                tag, responses = await self._idle_start()
+                reading: Union[None, asyncio.Future] = None
+                try:
+                    renew: float = time.monotonic() + Client.IDLE_RENEW_INTERVAL
+                    while True:
+                        for parts in responses:
+                            if not stop and await self._idle_dispatch(callback, parts) is False:
+                                stop = True
+                        responses = []
+                        limit: float = renew if deadline is None else min(renew, deadline)
+                        remaining: float = limit - time.monotonic()
+                        if stop or remaining <= 0:
+                            break
+                        # The pending read is never cancelled, so that no partial response is lost.
+                        if reading is None:
+                            reading = asyncio.ensure_future(self._read_response())
+                        done, _ = await asyncio.wait({reading}, timeout=remaining)
+                        if reading in done:
+                            responses.append(reading.result())
+                            reading = None
+                except BaseException:
+                    # Leave the IDLE state, if the connection is still usable.
+                    try:
+                        if self._writer is not None:
+                            await self._idle_done(tag, reading)
+                    except Exception:
+                        self._close()
+                    raise
+                responses = await self._idle_done(tag, reading)
+                for parts in responses:
+                    if not stop and await self._idle_dispatch(callback, parts) is False:
+                        stop = True
+
+    def get_hostname(self) -> str:
+        """Return the IMAP server hostname.
+
+        Returns:
+            str: the server hostname.
+        """
+        return self._hostname
+
+    def get_port(self) -> int:
+        """Return the IMAP server port.
+
+        Returns:
+            int: the IMAP server port.
+        """
+        return self._port
+
+    def get_username(self) -> str:
+        """Return the client username.
+
+        Returns:
+            str: the client username.
+        """
+        return self._username
+
+    def get_password(self) -> str:
+        """Return the client password.
+
+        Returns:
+            str: the client password.
+        """
+        return self._password
+
+    def get_path_sep(self) -> str:
+        """Return the string used to express mailboxes paths.
+
+        Returns:
+            str: the string used to express mailboxes paths.
+        """
+        return self._path_sep
+
+    async def _command(self, name: str, *args: str) -> Tuple[str, Mapping[str, RawData]]:
+        """Send a command to the server and wait for its completion.
+
+        Commands sent through the same client are serialized.
+
+        Args:
+            name (str): the name of the command.
+            *args (str): the arguments of the command.
+
+        Returns:
+            Tuple[str, Mapping[str, RawData]]: the method returns 2 values.
+                The first value is the status of the command ("OK", "NO" or "BAD").
+                The second value is a dictionary that associates the types of the untagged responses sent by the server
+                with their data (the data is formatted as for imaplib). The text of the tagged response is stored under
+                the key "__tagged__".
+
+        Raises:
+            Exception: if the client is not connected.
+        """
+        if self._writer is None:
+            raise Exception('The client is not connected!')
+        async with self._lock:
+            self._tag_counter += 1
+            tag: bytes = b'A%04d' % self._tag_counter
+            line: bytes = b' '.join([tag, name.encode()] + [a.encode() for a in args])
+            self._writer.write(line + b'\r\n')
+            await self._writer.drain()
+            untagged: Mapping[str, RawData] = {}
+            while True:
+                parts: List[bytes] = await self._read_response()
+                head: bytes = parts[0]
+                if head.startswith(b'* '):
+                    __class__._store_untagged(untagged, parts)
+                    continue
+                if head.startswith(b'+'):
+                    # Continuation requests are not expected for the commands sent by this client.
+                    continue
+                m = _tagged_re.match(head)
+                if m is not None and m.group('tag') == tag:
+                    untagged['__tagged__'] = [m.group('data')]
+                    return m.group('type').decode(), untagged
+
+    async def _read_response(self) -> List[bytes]:
+        """Read a complete response from the server, including the literals.
+
+        Returns:
+            List[bytes]: the parts of the response. The parts are the lines of text (without the trailing CRLF)
+                followed by the literals. For example: [b'* 1 FETCH (BODY[] {5}', b'hello', b')']
+        """
+        parts: List[bytes] = []
+        while True:
+            try:
+                line: bytes = await self._reader.readline()
+            except ValueError:
+                # The line is longer than MAX_LINE: the stream cannot be used anymore.
+                raise EOFError(f'The server sent a line longer than {self.MAX_LINE} bytes')
+            if not line:
+                raise EOFError('The connection has been closed by the server')
+            line = line.rstrip(b'\r\n')
+            parts.append(line)
+            m = _literal_re.match(line)
+            if m is None:
+                return parts
+            parts.append(await self._reader.readexactly(int(m.group('size'))))
+
+    @staticmethod
+    def _store_untagged(untagged: Mapping[str, RawData], parts: List[bytes]) -> None:
+        """Store an untagged response the way imaplib does.
+
+        Args:
+            untagged (Mapping[str, RawData]): the dictionary that stores the untagged responses.
+            parts (List[bytes]): the parts of the untagged response.
+        """
+        head: bytes = parts[0]
+        m = _untagged_status_re.match(head)
+        if m is not None:
+            typ: bytes = m.group('type')
+            data: bytes = m.group('data')
+            if m.group('data2'):
+                data = data + b' ' + m.group('data2')
+        else:
+            m = _untagged_re.match(head)
+            if m is None:
+                return
+            typ = m.group('type')
+            data = m.group('data') or b''
+            code = _response_code_re.match(data)
+            if code is not None:
+                untagged.setdefault(code.group('type').decode(), []).append(code.group('data'))
+
+        # Literals are represented as tuples (line, literal), as imaplib does.
+        values: RawData = untagged.setdefault(typ.decode(), [])
+        if len(parts) == 1:
+            values.append(data)
+            return
+        values.append((data, parts[1]))
+        for i in range(2, len(parts) - 1, 2):
+            values.append((parts[i], parts[i + 1]))
+        values.append(parts[-1])
+
+    async def _idle_start(self) -> Tuple[bytes, List[List[bytes]]]:
+        """Send the command IDLE, and wait for the server to accept it.
+
+        Returns:
+            Tuple[bytes, List[List[bytes]]]: the tag of the command, and the untagged responses received before the
+                server accepted the command.
+
+        Raises:
+            Exception: if the server rejects the command.
+        """
+        self._tag_counter += 1
+        tag: bytes = b'A%04d' % self._tag_counter
+        self._writer.write(tag + b' IDLE\r\n')
+        await self._writer.drain()
+        responses: List[List[bytes]] = []
+        while True:
+            parts: List[bytes] = await self._read_response()
+            if parts[0].startswith(b'+'):
+                return tag, responses
+            if parts[0].startswith(tag + b' '):
+                raise Exception(f'IDLE command error: {parts[0].decode(errors="replace")}')
+            responses.append(parts)
+
+    async def _idle_done(self, tag: bytes, reading: Union[None, asyncio.Future]) -> List[List[bytes]]:
+        """Terminate the command IDLE.
+
+        Args:
+            tag (bytes): the tag of the command IDLE.
+            reading (Union[None, asyncio.Future]): the read in progress, if any.
+
+        Returns:
+            List[List[bytes]]: the untagged responses received before the completion of the command.
+
+        Raises:
+            Exception: if the command did not complete successfully.
+        """
+        self._writer.write(b'DONE\r\n')
+        await self._writer.drain()
+        responses: List[List[bytes]] = []
+        while True:
+            parts: List[bytes] = await (reading if reading is not None else self._read_response())
+            reading = None
+            if parts[0].startswith(tag + b' '):
+                if not parts[0].startswith(tag + b' OK'):
+                    raise Exception(f'IDLE command error: {parts[0].decode(errors="replace")}')
+                return responses
+            responses.append(parts)
+
+    async def _idle_dispatch(self, callback: Callable[[IdleEvent], Any], parts: List[bytes]) -> Any:
+        """Call the function given to idle() for an untagged response, if the response is a change.
+
+        Args:
+            callback (Callable[[IdleEvent], Any]): the function.
+            parts (List[bytes]): the response.
+
+        Returns:
+            Any: the value returned by the function (None if the function has not been called).
+
+        Raises:
+            Exception: if the server closes the connection.
+        """
+        event: Union[None, IdleEvent] = IdleEvent.parse(parts)
+        if event is None or event.get_type() in ('OK', 'NO', 'BAD'):
+            return None
+        if event.get_type() == 'BYE':
+            self._close()
+            raise Exception(f'The server closed the connection: {parts[0].decode(errors="replace")}')
+        result: Any = callback(event)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+    async def _raw_search(self, uid: bool, criteria: Tuple[Union[str, IdSet], ...]) -> Union[List[bytes], None]:
+        """Execute the command SEARCH (or UID SEARCH) within the selected mailbox.
+
+        Args:
+            uid (bool): flag that indicates whether the command UID SEARCH must be used or not.
+            criteria (Tuple[Union[str, IdSet], ...]): criteria used to select the emails.
+
+        Returns:
+            List[bytes]: the list of IDs or UIDs.
+            None: the client could not get the list of IDs or UIDs.
+        """
+        criteria = ('ALL',) if 0 == len(criteria) else criteria
+        result: List[bytes] = []
+        for chunk in Client._expand_criteria(criteria, Client.MAX_SEQUENCE_SET_LENGTH):
+            if uid:
+                status, data = await self._command('UID', 'SEARCH', *chunk)
+            else:
+                status, data = await self._command('SEARCH', *chunk)
+            if 'OK' != status:
+                return None
+            result.extend(data.get('SEARCH', [None]))
+        return result if len(result) > 0 else [b'']
+
+    async def _selected_or_die(self, mailbox: Union[None, str] = None) -> None:
+        """If no mailbox is selected, then raise an exception!
+
+        Args:
+            mailbox (Union[None, str]): optional name of a mailbox to select first.
+
+        Raises:
+            Exception: if the client is not authenticated, or if no mailbox is selected.
+        """
+        self._authenticated_or_die()
+        if mailbox is not None:
+            await self.select_mailbox(mailbox)
+        if self._selected_mailbox is None:
+            raise Exception('In order to get the list of emails in a mailbox, you must select a mailbox first!')
+
+    def _close(self) -> None:
+        """Close the connection.
+        """
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+        self._authenticated = False
+        self._selected_mailbox = None
+
+    def _authenticated_or_die(self):
+        """If the client is not authenticated, then raise en exception!
+
+        Raises:
+            Exception: if the client is not authenticated.
+        """
+        if not self._authenticated:
+            raise Exception('The client is not authenticated!')
+
+
+def _quote(arg: str) -> str:
+    """Quote a string, as imaplib does.
+
+    Args:
+        arg (str): the string to quote.
+
+    Returns:
+        str: the quoted string.
+    """
+    return '"' + arg.replace('\\', '\\\\').replace('"', '\\"') + '"'
@@ -0,0 +1,598 @@
+"""This module implements the interpretation of the data items ENVELOPE and BODYSTRUCTURE (RFC 3501, section 7.4.2).
+
+The values are first parsed by DataParser (see dbeurive.imap.parser), which produces nested lists. The classes of this
+module convert these lists into objects:
+
+    record = client.fetch_by_uid([uid], '(ENVELOPE BODYSTRUCTURE)')[0]
+    envelope = Envelope.parse(record.get_envelope())
+    structure = BodyPart.parse(record.get_item('BODYSTRUCTURE'))
+    for part in structure.walk():
+        print(part.get_section(), part.get_mime_type(), part.get_size(), part.get_filename())
+
+The parts are numbered as specified by RFC 3501, section 6.4.5: the part numbers are the sections to fetch in order to
+get the content of the parts (ex: BODY.PEEK[1.2]).
+"""
+
+import email.header
+import email.utils
+import urllib.parse
+from typing import List, Mapping, Tuple, Union, Iterator, Any
+
+
+def _string(value: Any) -> Union[None, str]:
+    """Convert a value produced by DataParser into a string.
+
+    Args:
+        value (Any): the value (None, str or bytes, for literals).
+
+    Returns:
+        str: the string.
+        None: the value is NIL.
+
+    Raises:
+        ValueError: if the value is a list.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise ValueError('Invalid string')
+
+
+def _number(value: Any) -> Union[None, int]:
+    value = _string(value)
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise ValueError(f'Invalid number "{value}"')
+    return int(value)
+
+
+def _list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise ValueError('Invalid list')
+    return value
+
+
+def _params(value: Any) -> Mapping[str, str]:
+    """Convert a list of parameters ("name" "value" "name" "value"...) into a dictionary.
+
+    Args:
+        value (Any): the list, or None.
+
+    Returns:
+        Mapping[str, str]: the parameters. The names are in lower case.
+
+    Raises:
+        ValueError: if the list is not valid.
+    """
+    values: List[Any] = _list(value)
+    if len(values) % 2 != 0:
+        raise ValueError('Invalid list of parameters')
+    return {_string(values[i]).lower(): _string(values[i + 1]) for i in range(0, len(values), 2)}
+
+
+def decode_words(text: Union[None, str]) -> Union[None, str]:
+    """Decode the encoded words (RFC 2047) found in a header value.
+
+    Args:
+        text (Union[None, str]): the value (ex: "=?UTF-8?Q?R=C3=A9union?=").
+
+    Returns:
+        str: the decoded value (ex: "Réunion"). If the value cannot be decoded, then it is returned as is.
+        None: the given value is None.
+    """
+    if text is None or '=?' not in text:
+        return text
+    try:
+        return str(email.header.make_header(email.header.decode_header(text)))
+    except (LookupError, ValueError, UnicodeDecodeError):
+        return text
+
+
+class Address:
+    """This class represents an address of an envelope.
+    """
+
+    __slots__ = ('_name', '_route', '_mailbox', '_host')
+
+    def __init__(self, name: Union[None, str], route: Union[None, str], mailbox: Union[None, str],
+                 host: Union[None, str]):
+        """Create an address.
+
+        Args:
+            name (Union[None, str]): the personal name (ex: "John Doe").
+            route (Union[None, str]): the source route (obsolete).
+            mailbox (Union[None, str]): the mailbox name (ex: "john").
+            host (Union[None, str]): the host name (ex: "example.com").
+        """
+        self._name: Union[None, str] = name
+        self._route: Union[None, str] = route
+        self._mailbox: Union[None, str] = mailbox
+        self._host: Union[None, str] = host
+
+    @staticmethod
+    def parse(value: Any) -> 'Address':
+        """Create an address from the value sent by the server.
+
+        Args:
+            value (Any): the value (ex: ["John Doe", None, "john", "example.com"]).
+
+        Returns:
+            Address: the address.
+
+        Raises:
+            ValueError: if the value is not valid.
+        """
+        if not isinstance(value, list) or len(value) != 4:
+            raise ValueError('Invalid address')
+        return Address(decode_words(_string(value[0])), _string(value[1]), _string(value[2]), _string(value[3]))
+
+    def get_name(self) -> Union[None, str]:
+        """Return the personal name.
+
+        Returns:
+            str: the personal name, decoded (RFC 2047).
+            None: the address has no personal name.
+        """
+        return self._name
+
+    def get_mailbox(self) -> Union[None, str]:
+        """Return the mailbox name (the part before "@").
+
+        Returns:
+            str: the mailbox name.
+            None: the address marks the end of a group (RFC 3501, section 7.4.2).
+        """
+        return self._mailbox
+
+    def get_host(self) -> Union[None, str]:
+        """Return the host name (the part after "@").
+
+        Returns:
+            str: the host name.
+            None: the address marks the start or the end of a group.
+        """
+        return self._host
+
+    def get_email(self) -> Union[None, str]:
+        """Return the email address.
+
+        Returns:
+            str: the email address (ex: "john@example.com").
+            None: the address marks the start or the end of a group.
+        """
+        if self._mailbox is None or self._host is None:
+            return None
+        return f'{self._mailbox}@{self._host}'
+
+    def __str__(self) -> str:
+        address: Union[None, str] = self.get_email()
+        if address is None:
+            return self._mailbox or ''
+        return email.utils.formataddr((self._name, address)) if self._name else address
+
+    def __repr__(self) -> str:
+        return f'Address({self._name!r}, {self._route!r}, {self._mailbox!r}, {self._host!r})'
+
+
+class Envelope:
+    """This class represents the envelope of a message (the data item ENVELOPE).
+    """
+
+    # The fields of the envelope, in the order they are sent by the server.
+    FIELDS: Tuple[str, ...] = ('date', 'subject', 'from', 'sender', 'reply_to', 'to', 'cc', 'bcc', 'in_reply_to',
+                               'message_id')
+
+    def __init__(self, values: Mapping[str, Any]):
+        """Create an envelope.
+
+        Args:
+            values (Mapping[str, Any]): the values of the fields (see FIELDS). The fields "date", "subject",
+                "in_reply_to" and "message_id" are strings (or None). The other fields are lists of addresses.
+        """
+        self._values: Mapping[str, Any] = values
+
+    @staticmethod
+    def parse(value: Any) -> 'Envelope':
+        """Create an envelope from the value sent by the server.
+
+        Args:
+            value (Any): the value, as returned by FetchRecord.get_envelope().
+
+        Returns:
+            Envelope: the envelope.
+
+        Raises:
+            ValueError: if the value is not valid.
+        """
+        if not isinstance(value, list) or len(value) != len(__class__.FIELDS):
+            raise ValueError('Invalid envelope')
+        values: Mapping[str, Any] = {}
+        for field, item in zip(__class__.FIELDS, value):
+            if field in ('date', 'in_reply_to', 'message_id'):
+                values[field] = _string(item)
+            elif field == 'subject':
+                values[field] = decode_words(_string(item))
+            else:
+                values[field] = [Address.parse(address) for address in _list(item)]
+        return Envelope(values)
+
+    def get_date(self) -> Union[None, str]:
+        """Return the value of the header "Date".
+
+        Returns:
+            str: the date (ex: "Wed, 17 Jul 1996 02:23:25 -0700").
+            None: the message has no date.
+        """
+        return self._values['date']
+
+    def get_subject(self) -> Union[None, str]:
+        """Return the subject of the message.
+
+        Returns:
+            str: the subject, decoded (RFC 2047).
+            None: the message has no subject.
+        """
+        return self._values['subject']
+
+    def get_from(self) -> List[Address]:
+        return self._values['from']
+
+    def get_sender(self) -> List[Address]:
+        return self._values['sender']
+
+    def get_reply_to(self) -> List[Address]:
+        return self._values['reply_to']
+
+    def get_to(self) -> List[Address]:
+        return self._values['to']
+
+    def get_cc(self) -> List[Address]:
+        return self._values['cc']
+
+    def get_bcc(self) -> List[Address]:
+        return self._values['bcc']
+
+    def get_in_reply_to(self) -> Union[None, str]:
+        return self._values['in_reply_to']
+
+    def get_message_id(self) -> Union[None, str]:
+        """Return the value of the header "Message-ID".
+
+        Returns:
+            str: the message ID (ex: "<B27397-0100000@cac.washington.edu>").
+            None: the message has no ID.
+        """
+        return self._values['message_id']
+
+    def to_dict(self) -> Mapping[str, Any]:
+        """Return the envelope as a dictionary (ex: for indexing).
+
+        Returns:
+            Mapping[str, Any]: the fields (see FIELDS). The addresses are converted into strings.
+        """
+        return {field: [str(a) for a in value] if isinstance(value, list) else value
+                for field, value in self._values.items()}
+
+
+class BodyPart:
+    """This class represents a part of the body of a message (the data item BODYSTRUCTURE).
+
+    A part is either a multipart (it contains other parts), or a single part. A single part of type "message/rfc822"
+    contains the envelope and the body of the encapsulated message.
+    """
+
+    def __init__(self, section: str, mime_type: str, mime_subtype: str, params: Mapping[str, str],
+                 parts: Union[None, List['BodyPart']] = None, fields: Union[None, Mapping[str, Any]] = None):
+        """Create a part.
+
+        Args:
+            section (str): the part number (ex: "1.2"). The multipart at the root of a message has no number ("").
+            mime_type (str): the MIME type, in lower case (ex: "text", "multipart").
+            mime_subtype (str): the MIME subtype, in lower case (ex: "plain", "mixed").
+            params (Mapping[str, str]): the parameters of the header "Content-Type" (names in lower case).
+            parts (Union[None, List[BodyPart]]): the parts of a multipart.
+            fields (Union[None, Mapping[str, Any]]): the other fields ("id", "description", "encoding", "size",
+                "lines", "md5", "disposition", "disposition_params", "language", "location", "envelope", "body").
+        """
+        self._section: str = section
+        self._type: str = mime_type
+        self._subtype: str = mime_subtype
+        self._params: Mapping[str, str] = params
+        self._parts: List[BodyPart] = [] if parts is None else parts
+        self._fields: Mapping[str, Any] = {} if fields is None else fields
+
+    @staticmethod
+    def parse(value: Any) -> 'BodyPart':
+        """Create the structure of a message from the value sent by the server.
+
+        Args:
+            value (Any): the value of the data item BODYSTRUCTURE (or BODY).
+
+        Returns:
+            BodyPart: the root part of the message.
+
+        Raises:
+            ValueError: if the value is not valid.
+        """
+        return __class__._parse_body(value, '')
+
+    @staticmethod
+    def _parse_body(value: Any, section: str) -> 'BodyPart':
+        """Parse the body of a message (the message itself, or a message encapsulated into a part).
+
+        Args:
+            value (Any): the value.
+            section (str): the part number of the message ("" for the message itself).
+
+        Returns:
+            BodyPart: the root part of the body.
+        """
+        if not isinstance(value, list) or len(value) == 0:
+            raise ValueError('Invalid body structure')
+        if isinstance(value[0], list):
+            return __class__._parse_part(value, section)
+        # The body of a message that is not a multipart is its first part.
+        return __class__._parse_part(value, f'{section}.1' if section else '1')
+
+    @staticmethod
+    def _parse_part(value: Any, section: str) -> 'BodyPart':
+        """Parse a part.
+
+        Args:
+            value (Any): the value.
+            section (str): the part number.
+
+        Returns:
+            BodyPart: the part.
+        """
+        if not isinstance(value, list) or len(value) == 0:
+            raise ValueError('Invalid body structure')
+        fields: Mapping[str, Any] = {}
+
+        if isinstance(value[0], list):
+            # Multipart: the parts, the subtype, then the extension data (parameters, disposition, language, location).
+            count: int = 0
+            while count < len(value) and isinstance(value[count], list):
+                count += 1
+            if count == len(value):
+                raise ValueError('Invalid multipart: no subtype')
+            parts: List[BodyPart] = [__class__._parse_part(value[i], f'{section}.{i + 1}' if section else str(i + 1))
+                                     for i in range(count)]
+            extension: List[Any] = value[count + 1:]
+            params: Mapping[str, str] = _params(extension[0]) if len(extension) > 0 else {}
+            __class__._parse_extension(extension[1:], fields)
+            return BodyPart(section, 'multipart', _string(value[count]).lower(), params, parts, fields)
+
+        if len(value) < 7:
+            raise ValueError('Invalid part: missing fields')
+        mime_type: str = (_string(value[0]) or '').lower()
+        mime_subtype: str = (_string(value[1]) or '').lower()
+        fields['id'] = _string(value[3])
+        fields['description'] = decode_words(_string(value[4]))
+        fields['encoding'] = (_string(value[5]) or '7bit').lower()
+        fields['size'] = _number(value[6])
+        index: int = 7
+        if mime_type == 'message' and mime_subtype == 'rfc822' and len(value) >= 10:
+            fields['envelope'] = Envelope.parse(value[7])
+            fields['body'] = __class__._parse_body(value[8], section)
+            fields['lines'] = _number(value[9])
+            index = 10
+        elif mime_type == 'text' and len(value) >= 8:
+            fields['lines'] = _number(value[7])
+            index = 8
+        extension = value[index:]
+        if len(extension) > 0:
+            fields['md5'] = _string(extension[0])
+        __class__._parse_extension(extension[1:], fields)
+        return BodyPart(section, mime_type, mime_subtype, _params(value[2]), None, fields)
+
+    @staticmethod
+    def _parse_extension(extension: List[Any], fields: Mapping[str, Any]) -> None:
+        """Parse the extension data common to all parts: disposition, language and location.
+
+        Args:
+            extension (List[Any]): the extension data.
+            fields (Mapping[str, Any]): the fields of the part, to complete.
+        """
+        if len(extension) > 0 and extension[0] is not None:
+            disposition: List[Any] = _list(extension[0])
+            if len(disposition) != 2:
+                raise ValueError('Invalid disposition')
+            fields['disposition'] = _string(disposition[0]).lower()
+            fields['disposition_params'] = _params(disposition[1])
+        if len(extension) > 1 and extension[1] is not None:
+            language: Any = extension[1]
+            fields['language'] = [_string(v) for v in language] if isinstance(language, list) else [_string(language)]
+        if len(extension) > 2:
+            fields['location'] = _string(extension[2])
+
+    def get_section(self) -> str:
+        """Return the part number.
+
+        Returns:
+            str: the part number (ex: "1.2"), to use as the section of BODY.PEEK[<section>]. The multipart at the
+                root of a message has no number ("").
+        """
+        return self._section
+
+    def get_type(self) -> str:
+        return self._type
+
+    def get_subtype(self) -> str:
+        return self._subtype
+
+    def get_mime_type(self) -> str:
+        """Return the MIME type of the part.
+
+        Returns:
+            str: the MIME type (ex: "text/plain").
+        """
+        return f'{self._type}/{self._subtype}'
+
+    def get_params(self) -> Mapping[str, str]:
+        """Return the parameters of the header "Content-Type".
+
+        Returns:
+            Mapping[str, str]: the parameters (ex: {"charset": "utf-8"}). The names are in lower case.
+        """
+        return self._params
+
+    def get_charset(self) -> Union[None, str]:
+        return self._params.get('charset')
+
+    def get_id(self) -> Union[None, str]:
+        return self._fields.get('id')
+
+    def get_description(self) -> Union[None, str]:
+        return self._fields.get('description')
+
+    def get_encoding(self) -> Union[None, str]:
+        """Return the transfer encoding of the part.
+
+        Returns:
+            str: the encoding, in lower case (ex: "base64", "quoted-printable", "7bit").
+            None: the part is a multipart.
+        """
+        return self._fields.get('encoding')
+
+    def get_size(self) -> Union[None, int]:
+        """Return the size of the part, as transferred (that is: encoded).
+
+        Returns:
+            int: the size, in bytes.
+            None: the part is a multipart.
+        """
+        return self._fields.get('size')
+
+    def get_lines(self) -> Union[None, int]:
+        return self._fields.get('lines')
+
+    def get_md5(self) -> Union[None, str]:
+        return self._fields.get('md5')
+
+    def get_disposition(self) -> Union[None, str]:
+        """Return the disposition of the part.
+
+        Returns:
+            str: the disposition, in lower case (ex: "attachment", "inline").
+            None: the server did not send the disposition.
+        """
+        return self._fields.get('disposition')
+
+    def get_disposition_params(self) -> Mapping[str, str]:
+        return self._fields.get('disposition_params', {})
+
+    def get_language(self) -> Union[None, List[str]]:
+        return self._fields.get('language')
+
+    def get_location(self) -> Union[None, str]:
+        return self._fields.get('location')
+
+    def get_filename(self) -> Union[None, str]:
+        """Return the name of the file attached to the part.
+
+        The name is taken from the parameter "filename" of the disposition, or from the parameter "name" of the
+        content type. Encoded names (RFC 2231 and RFC 2047) are decoded.
+
+        Returns:
+            str: the name of the file.
+            None: the part has no file name.
+        """
+        for params, name in ((self.get_disposition_params(), 'filename'), (self._params, 'name')):
+            if f'{name}*' in params and params[f'{name}*'] is not None:
+                # Ex: "utf-8''r%C3%A9sum%C3%A9.pdf" (RFC 2231).
+                value: str = params[f'{name}*']
+                if value.count("'") < 2:
+                    return value
+                charset, _, text = value.split("'", 2)
+                try:
+                    return urllib.parse.unquote(text, encoding=charset or 'us-ascii', errors='replace')
+                except LookupError:
+                    return urllib.parse.unquote(text, errors='replace')
+            if name in params and params[name] is not None:
+                return decode_words(params[name])
+        return None
+
+    def get_envelope(self) -> Union[None, Envelope]:
+        """Return the envelope of the message encapsulated into the part.
+
+        Returns:
+            Envelope: the envelope.
+            None: the part is not of type "message/rfc822".
+        """
+        return self._fields.get('envelope')
+
+    def get_body(self) -> Union[None, 'BodyPart']:
+        """Return the body of the message encapsulated into the part.
+
+        Returns:
+            BodyPart: the root part of the encapsulated message.
+            None: the part is not of type "message/rfc822".
+        """
+        return self._fields.get('body')
+
+    def get_parts(self) -> List['BodyPart']:
+        """Return the parts of a multipart.
+
+        Returns:
+            List[BodyPart]: the parts (empty if the part is not a multipart).
+        """
+        return self._parts
+
+    def is_multipart(self) -> bool:
+        return self._type == 'multipart'
+
+    def is_attachment(self) -> bool:
+        """Test whether the part is an attachment.
+
+        Returns:
+            bool: if the disposition of the part is "attachment", or if the part is not a multipart and has a file
+                name, then the method returns the value True. Otherwise, it returns the value False.
+        """
+        if self.get_disposition() == 'attachment':
+            return True
+        return not self.is_multipart() and self.get_disposition() != 'inline' and self.get_filename() is not None
+
+    def walk(self) -> Iterator['BodyPart']:
+        """Iterate over the part and all the parts it contains (depth first), including the parts of the
+        encapsulated messages.
+
+        Returns:
+            Iterator[BodyPart]: the parts.
+        """
+        yield self
+        for part in self._parts:
+            yield from part.walk()
+        body: Union[None, BodyPart] = self.get_body()
+        if body is not None:
+            yield from body.walk()
+
+    def find(self, section: str) -> Union[None, 'BodyPart']:
+        """Find a part, given its number.
+
+        Args:
+            section (str): the part number (ex: "1.2").
+
+        Returns:
+            BodyPart: the part.
+            None: no part has this number.
+        """
+        for part in self.walk():
+            if part._section == section:
+                return part
+        return None
+
+    def get_attachments(self) -> List['BodyPart']:
+        """Return the attachments.
+
+        Returns:
+            List[BodyPart]: the parts that are attachments (see is_attachment()).
+        """
+        return [part for part in self.walk() if part.is_attachment()]
+
+    def __repr__(self) -> str:
+        return f'BodyPart({self._section!r}, {self.get_mime_type()!r}, size={self.get_size()})'
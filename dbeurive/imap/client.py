@@ -1,12 +1,44 @@
-from typing import List, Union, Tuple
-from imaplib import IMAP4_SSL
-from dbeurive.imap.parser import ListMailbox, ListEmailIds
+import re
+import ssl
+import time
+from typing import List, Union, Tuple, Iterator, Iterable, Callable, Mapping, Set
+from imaplib import IMAP4, IMAP4_SSL
+from dbeurive.imap.connector import Connector, ConnectorSSL
+from dbeurive.imap.parser import ListMailbox, FetchResponse
+from dbeurive.imap.fetch import FetchRecord
+from dbeurive.imap.message import Message
+from dbeurive.imap.id_set import IdSet
+from dbeurive.imap.mailbox import Mailbox, decode_name, encode_name
+from dbeurive.imap.tree import MailboxTree
+from dbeurive.imap.idle import IdleEvent
+from dbeurive.imap.metrics import CommandEvent, CommandTimer, NullTimer, NULL_TIMER
+from dbeurive.imap import sequence_set
 
 class Client:
     """This class implements an IMAP client.
     """
 
-    def __init__(self, hostname: str, port: int, username: str, password: str, path_sep: str = '/'):
+    # Maximum length of a sequence set sent within a single command.
+    # Longer sets of IDs are split, and the command is sent once per chunk.
+    MAX_SEQUENCE_SET_LENGTH: int = sequence_set.MAX_LENGTH
+
+    # Default number of messages fetched by a single command, when fetching messages in batches.
+    FETCH_BATCH_SIZE: int = 500
+
+    # Delay (in seconds) after which the command IDLE is re-issued. Servers may log out clients that have been idle for
+    # more than 30 minutes (RFC 2177).
+    IDLE_RENEW_INTERVAL: float = 28 * 60
+
+    # Maximum number of commands in flight, when a batch of commands (STATUS, SEARCH, FETCH) is pipelined. The window
+    # is bounded so that the responses never fill the socket buffers.
+    PIPELINE_DEPTH: int = 32
+
+    # Pattern of the data of a STATUS response (ex: '"INBOX" (MESSAGES 231 UIDNEXT 44292)').
+    _status_re = re.compile(br'^\s*(?:"((?:[^"\\]|\\.)*)"|([^\s("]+))?\s*\(([^()]*)\)\s*$')
+
+    def __init__(self, hostname: str, port: int, username: str, password: str, path_sep: str = '/', use_ssl: bool = True,
+                 use_compression: bool = False, ssl_context: Union[None, ssl.SSLContext] = None,
+                 name: Union[None, str] = None, callbacks: Iterable[Callable[[CommandEvent], None]] = ()):
         """Create a client.
 
         Args:
@@ -15,16 +47,38 @@ class Client:
             username (str): client username.
             password (str): client password.
             path_sep (str): path separator for mailboxes.
+            use_ssl (bool): flag that indicates whether the connection must be encrypted (TLS) or not.
+            use_compression (bool): flag that indicates whether the data must be compressed (COMPRESS=DEFLATE,
+                RFC 4978) or not, if the server supports it. The compression is activated after login.
+            ssl_context (Union[None, ssl.SSLContext]): the SSL context used for TLS connections. Clients that share a
+                context resume the TLS sessions established with the same server. The default value None means "use
+                the context shared by all the clients" (see dbeurive.imap.connector.get_default_context()).
+            name (Union[None, str]): the name of the client, used to identify the source of the measures (ex: the name
+                of the ISP). The default value None means "use the hostname".
+            callbacks (Iterable[Callable[[CommandEvent], None]]): the functions called with the measures of each
+                command (see add_callback()).
         """
         self._hostname: str = hostname
         self._port: int = port
         self._username: str = username
         self._password: str = password
         self._path_sep: str = path_sep
+        self._tree: Union[None, MailboxTree] = None
+        self._use_ssl: bool = use_ssl
+        self._use_compression: bool = use_compression
+        self._ssl_context: Union[None, ssl.SSLContext] = ssl_context
         self._imap: Union[None, IMAP4_SSL]  = None
         self._last_error: Union[None, str, Exception] = None
         self._authenticated: bool = False
         self._selected_mailbox: Union[None, str] = None
+        self._selected_readonly: bool = False
+        self._uid_validity: Union[None, int] = None
+        self._uid_next: Union[None, int] = None
+        self._highest_modseq: Union[None, int] = None
+        self._enabled: List[str] = []
+        self._name: str = hostname if name is None else name
+        self._callbacks: List[Callable[[CommandEvent], None]] = list(callbacks)
+        self._timer: Union[None, CommandTimer] = None
 
     def is_connected(self) -> bool:
         """Test whether the client is connected to the IMAP server or not.
@@ -53,6 +107,35 @@ class Client:
         """
         return self._last_error
 
+    def get_name(self) -> str:
+        """Return the name of the client.
+
+        Returns:
+            str: the name given to the constructor, or the hostname.
+        """
+        return self._name
+
+    def add_callback(self, callback: Callable[[CommandEvent], None]) -> None:
+        """Register a function called with the measures of each command sent to the server.
+
+        The measures include the time spent waiting for the response, receiving it and interpreting it, and the
+        number of bytes exchanged (see dbeurive.imap.metrics). A dbeurive.imap.metrics.Registry can be used as a
+        callback.
+
+        Args:
+            callback (Callable[[CommandEvent], None]): the function.
+        """
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[CommandEvent], None]) -> None:
+        """Unregister a function registered with add_callback().
+
+        Args:
+            callback (Callable[[CommandEvent], None]): the function.
+        """
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
     def connect(self) -> bool:
         """Connect to the IMAP server.
 
@@ -61,12 +144,19 @@ class Client:
             False: the connection could not be established.
         """
         self._last_error = None
-        try:
-            self._imap = IMAP4_SSL(self._hostname, self._port)
-        except IMAP4_SSL.error as e:
-            self._imap = None
-            self._last_error = e
-            return False
+        with self._measure('CONNECT') as timer:
+            try:
+                if self._use_ssl:
+                    self._imap = ConnectorSSL(self._hostname, self._port, ssl_context=self._ssl_context)
+                else:
+                    self._imap = Connector(self._hostname, self._port)
+            except (IMAP4_SSL.error, OSError) as e:
+                self._imap = None
+                self._last_error = e
+                timer.set_status(CommandEvent.STATUS_ERROR)
+                return False
+            timer.set_connector(self._imap)
+            timer.received()
         return True
 
     def login(self) -> bool:
@@ -78,33 +168,189 @@ class Client:
         """
         self._last_error = None
         try:
-            self._imap.login(self._username, self._password)
+            with self._measure('LOGIN') as timer:
+                self._imap.login(self._username, self._password)
+                timer.received()
+            if self._use_compression:
+                with self._measure('COMPRESS') as timer:
+                    self._imap.compress()
+                    timer.received()
         except IMAP4_SSL.error as e:
             self._last_error = e
             return False
         self._authenticated = True
         return True
 
-    def list_mailboxes(self, directory: str= '""') -> Union[None, List[List[str]]]:
+    def logout(self) -> None:
+        """Log out from the IMAP server and close the connection.
+
+        Errors are ignored: once the method returns, the client is disconnected.
+        """
+        if self._imap is not None:
+            with self._measure('LOGOUT') as timer:
+                try:
+                    self._imap.logout()
+                except (IMAP4_SSL.error, OSError):
+                    timer.set_status(CommandEvent.STATUS_ERROR)
+                timer.received()
+        self._imap = None
+        self._authenticated = False
+        self._selected_mailbox = None
+        self._enabled = []
+
+    def noop(self) -> bool:
+        """Send the command NOOP to the server, in order to check that the connection is still alive.
+
+        Returns:
+            True: the server answered.
+            False: the connection is broken.
+        """
+        self._last_error = None
+        if self._imap is None:
+            return False
+        with self._measure('NOOP') as timer:
+            try:
+                status, _ = self._imap.noop()
+            except (IMAP4_SSL.error, OSError) as e:
+                self._last_error = e
+                timer.set_status(CommandEvent.STATUS_ERROR)
+                return False
+            timer.received()
+            timer.set_status(status)
+        return 'OK' == status
+
+    def is_compressed(self) -> bool:
+        """Test whether the data exchanged with the server is compressed (COMPRESS=DEFLATE) or not.
+
+        Returns:
+            bool: if the data is compressed, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return self._imap is not None and self._imap.is_compressed()
+
+    def get_compression_ratio(self) -> Union[None, float]:
+        """Return the compression ratio of the data exchanged with the server since the connection was opened.
+
+        Returns:
+            float: the number of bytes before compression divided by the number of bytes on the wire (ex: 4.2).
+                The value 1.0 means that the data is not compressed.
+            None: the client is not connected, or no data has been exchanged yet.
+        """
+        if self._imap is None:
+            return None
+        return self._imap.get_compression_ratio()
+
+    def get_capabilities(self) -> Tuple[str, ...]:
+        """Return the capabilities advertised by the server.
+
+        The capabilities are refreshed after authentication: the server may advertise other capabilities once the
+        client is logged in.
+
+        Returns:
+            Tuple[str, ...]: the capabilities, in upper case (ex: ("IMAP4REV1", "CONDSTORE")).
+                If the client is not connected, then the method returns an empty tuple.
+        """
+        if self._imap is None:
+            return ()
+        return tuple(self._imap.capabilities)
+
+    def has_capability(self, capability: str) -> bool:
+        """Test whether the server advertises a given capability.
+
+        Args:
+            capability (str): the name of the capability (ex: "CONDSTORE").
+
+        Returns:
+            bool: if the server advertises the capability, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return capability.upper() in self.get_capabilities()
+
+    def enable(self, *capabilities: str) -> List[str]:
+        """Enable server extensions (RFC 5161), such as CONDSTORE or QRESYNC.
+
+        Only the capabilities advertised by the server are requested.
+
+        Args:
+            *capabilities (str): the names of the extensions to enable.
+
+        Returns:
+            List[str]: the names of the extensions actually enabled by the server.
+
+        Raises:
+            Exception: if the client is not authenticated.
+        """
+        self._authenticated_or_die()
+        self._last_error = None
+        requested: List[str] = [c.upper() for c in capabilities if self.has_capability(c) and not self.is_enabled(c)]
+        if len(requested) > 0 and self.has_capability('ENABLE'):
+            # noinspection PyUnusedLocal
+            status: str = 'NO'
+            with self._measure('ENABLE') as timer:
+                try:
+                    status, _ = self._imap.xatom('ENABLE', *requested)
+                except IMAP4.error as e:
+                    self._last_error = e
+                timer.received()
+                timer.set_status(status)
+            if 'OK' == status:
+                for data in self._imap.response('ENABLED')[1]:
+                    if data is not None:
+                        self._enabled.extend([c for c in data.decode().upper().split() if c not in self._enabled])
+                # QRESYNC implies CONDSTORE (RFC 7162, section 3.2.3).
+                if 'QRESYNC' in self._enabled and 'CONDSTORE' not in self._enabled:
+                    self._enabled.append('CONDSTORE')
+        return [c.upper() for c in capabilities if self.is_enabled(c)]
+
+    def is_enabled(self, capability: str) -> bool:
+        """Test whether an extension has been enabled (see enable()).
+
+        Args:
+            capability (str): the name of the extension.
+
+        Returns:
+            bool: if the extension is enabled, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return capability.upper() in self._enabled
+
+    def list_mailboxes(self, directory: str= '""', selectable_only: bool = False,
+                       special_use: Union[None, bool] = None, pattern: str = '*') -> Union[None, List[Mailbox]]:
         """List the mailboxes within a given directory on the server.
 
         Args:
             directory (str): string that identifies the directory.
                 The default value is "".
+            selectable_only (bool): flag that indicates whether the mailboxes that cannot be selected (\\Noselect,
+                \\NonExistent) must be discarded or not.
+            special_use (Union[None, bool]): True to keep only the special-use mailboxes (\\Sent, \\Trash...), False
+                to discard them, None to keep all mailboxes.
+            pattern (str): the mailboxes to list, relative to the directory. "*" matches any sequence of characters,
+                and "%" matches any sequence of characters but the hierarchy delimiter. The default value is "*".
 
         Returns:
-            List[List[str]]: upon successful completion, the method returns the list of mailboxes.
+            List[Mailbox]: upon successful completion, the method returns the list of mailboxes.
             None: if the method could not interpret the server response, then it returns the value None.
         """
-        mailboxes: List[bytes] = self.get_raw_list_mailboxes(directory)
-        return __class__._list(mailboxes)
+        with self._measure('LIST') as timer:
+            mailboxes: Union[None, List[bytes]] = self.get_raw_list_mailboxes(directory, pattern)
+            timer.received()
+            if mailboxes is None:
+                timer.set_status('NO')
+                return None
+            result: Union[None, List[Mailbox]] = __class__._list(mailboxes)
+            timer.parsed()
+        if result is None:
+            return None
+        return Mailbox.filter(result, selectable_only, special_use)
 
-    def get_raw_list_mailboxes(self, directory: str= '""') -> Union[List[bytes], None]:
+    def get_raw_list_mailboxes(self, directory: str= '""', pattern: str = '*') -> Union[List[bytes], None]:
         """Get the list of mailboxes within a given directory as a list of raw identifiers.
 
         Args:
             directory (str): string that identifies the directory.
                 The default value is "".
+            pattern (str): the mailboxes to list, relative to the directory. The default value is "*".
 
         Returns:
             List[bytes]: upon successful completion, the method returns the list of mailboxes.
@@ -113,11 +359,91 @@ class Client:
         self._authenticated_or_die()
         # noinspection PyUnusedLocal
         status: str
-        status, mailboxes = self._imap.list(directory)
+        with self._measure('LIST') as timer:
+            status, mailboxes = self._imap.list(directory, pattern)
+            timer.received()
+            timer.set_status(status)
         if 'OK' != status:
             return None
         return mailboxes
 
+    def get_mailbox_tree(self, refresh: bool = False, pattern: str = '*') -> Union[None, MailboxTree]:
+        """Return the index of the hierarchy of mailboxes.
+
+        The index is built from the output of the "list" command the first time the method is called. Then, it is only
+        updated upon request: the mailboxes that match the given pattern are listed again, and the differences are
+        applied to the index.
+
+        Args:
+            refresh (bool): flag that indicates whether the index must be refreshed or not.
+            pattern (str): the mailboxes to list again, if the index is refreshed, expressed with decoded names
+                (ex: "Archives/*", "Envoyés/%"). It is encoded in modified UTF-7 before it is sent to the server.
+
+        Returns:
+            MailboxTree: the index.
+            None: if the list of mailboxes could not be retrieved, then the method returns the value None.
+        """
+        if self._tree is not None and not refresh:
+            return self._tree
+        mailboxes: Union[None, List[Mailbox]] = self.list_mailboxes(
+            pattern=encode_name(pattern) if self._tree is not None else '*')
+        if mailboxes is None:
+            return None
+        if self._tree is None:
+            self._tree = MailboxTree(mailboxes, self._path_sep)
+        else:
+            self._tree.refresh(mailboxes, pattern)
+        return self._tree
+
+    def status_all(self, items: Tuple[str, ...] = ('MESSAGES', 'UNSEEN', 'UIDNEXT'),
+                   pattern: str = '*') -> Union[None, Mapping[str, Mapping[str, int]]]:
+        """Get the counters of all the mailboxes, without selecting them.
+
+        If the server supports LIST-STATUS (RFC 5819), then a single command is sent:
+        LIST "" * RETURN (STATUS (MESSAGES UNSEEN UIDNEXT)). Otherwise, the mailboxes are listed, and the commands
+        STATUS are pipelined (see PIPELINE_DEPTH). The selected mailbox, if any, is left unchanged.
+
+        Args:
+            items (Tuple[str, ...]): the status data items (ex: "MESSAGES", "UNSEEN", "UIDNEXT", "UIDVALIDITY").
+            pattern (str): the mailboxes to examine. The default value is "*".
+
+        Returns:
+            Mapping[str, Mapping[str, int]]: the counters, indexed by decoded mailbox name, then by item
+                (ex: {"INBOX": {"MESSAGES": 231, "UNSEEN": 3, "UIDNEXT": 44292}}). The mailboxes that cannot be
+                selected are not included.
+            None: if the method could not interpret the server responses, then it returns the value None.
+        """
+        self._authenticated_or_die()
+        names: str = '(' + ' '.join(items) + ')'
+        # noinspection PyUnusedLocal
+        status: str
+        if self.has_capability('LIST-STATUS'):
+            with self._measure('LIST-STATUS') as timer:
+                status, data = self._imap._simple_command('LIST', '""', pattern, 'RETURN', f'(STATUS {names})')
+                self._imap._untagged_response(status, data, 'LIST')
+                timer.received()
+                timer.set_status(status)
+                if 'OK' != status:
+                    return None
+                result: Union[None, Mapping[str, Mapping[str, int]]] = __class__._status(self._imap.response('STATUS')[1])
+                timer.parsed()
+            return result
+
+        mailboxes: Union[None, List[Mailbox]] = self.list_mailboxes(selectable_only=True, pattern=pattern)
+        if mailboxes is None:
+            return None
+        commands: List[Tuple[str, ...]] = [('STATUS', self._imap._quote(m.get_raw_name()), names) for m in mailboxes]
+        data: List[Union[None, bytes, Tuple[bytes, bytes]]] = []
+        with self._measure('STATUS') as timer:
+            for status, responses in self._imap.pipeline(commands, 'STATUS', self.PIPELINE_DEPTH):
+                # Responses NO (ex: the mailbox has just been deleted) are ignored.
+                if 'OK' == status:
+                    data.extend(responses)
+            timer.received()
+            result = __class__._status(data)
+            timer.parsed()
+        return result
+
     def select_mailbox(self, mailbox: str='INBOX', readonly=False) -> int:
         """Select a mailbox and returns the number of emails within this mailbox.
 
@@ -138,43 +464,115 @@ class Client:
         status: str
         # noinspection PyUnusedLocal
         data: List[bytes]
-        status, data = self._imap.select(mailbox, readonly)
-        if 'OK' != status:
-            raise Exception(f'Cannot select the mailbox {mailbox}! Status code is {status}')
-        if 0 == len(data):
-            raise Exception(f'Cannot select the mailbox {mailbox}: the number of messages in the mailbox is not returned!')
-        self._selected_mailbox = mailbox
-        return int(data[0].decode())
+        with self._measure('EXAMINE' if readonly else 'SELECT') as timer:
+            status, data = self._imap.select(mailbox, readonly)
+            timer.received()
+            timer.set_status(status)
+            if 'OK' != status:
+                self._selected_mailbox = None
+                self._uid_validity = None
+                self._uid_next = None
+                self._highest_modseq = None
+                raise Exception(f'Cannot select the mailbox {mailbox}! Status code is {status}')
+            if 0 == len(data):
+                raise Exception(f'Cannot select the mailbox {mailbox}: the number of messages in the mailbox is not returned!')
+            self._selected_mailbox = mailbox
+            self._selected_readonly = readonly
+            self._uid_validity = __class__._response_code_value(self._imap.response('UIDVALIDITY')[1])
+            self._uid_next = __class__._response_code_value(self._imap.response('UIDNEXT')[1])
+            self._highest_modseq = __class__._response_code_value(self._imap.response('HIGHESTMODSEQ')[1])
+            count: int = int(data[0].decode())
+            timer.parsed()
+        return count
+
+    def get_uid_validity(self) -> Union[None, int]:
+        """Return the UIDVALIDITY value of the currently selected mailbox.
+
+        The UIDs of the messages are valid for as long as the UIDVALIDITY value does not change. Thus, lists of UIDs can
+        be cached and reused between sessions, provided that the UIDVALIDITY value is stored with them.
+
+        Returns:
+            int: the UIDVALIDITY value.
+            None: no mailbox is selected, or the server did not return the value.
+        """
+        return self._uid_validity
+
+    def get_uid_next(self) -> Union[None, int]:
+        """Return the predicted next UID of the currently selected mailbox.
+
+        Returns:
+            int: the UIDNEXT value.
+            None: no mailbox is selected, or the server did not return the value.
+        """
+        return self._uid_next
+
+    def get_highest_modseq(self) -> Union[None, int]:
+        """Return the highest mod-sequence value of the currently selected mailbox (RFC 7162).
 
-    def list_emails_ids(self, *criteria, mailbox=None) -> List[str]:
+        The value changes whenever a message of the mailbox is added, modified or expunged.
+
+        Returns:
+            int: the HIGHESTMODSEQ value.
+            None: no mailbox is selected, or the server does not support persistent mod-sequences for the mailbox.
+        """
+        return self._highest_modseq
+
+    def get_selected_mailbox(self) -> Union[None, str]:
+        """Return the name of the currently selected mailbox.
+
+        Returns:
+            str: the name of the selected mailbox.
+            None: no mailbox is selected.
+        """
+        return self._selected_mailbox
+
+    def is_selected_readonly(self) -> bool:
+        """Test whether the currently selected mailbox has been selected in read only mode.
+
+        Returns:
+            bool: if the mailbox has been selected in read only mode, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return self._selected_readonly
+
+    def list_emails_ids(self, *criteria, mailbox=None) -> IdSet:
         """Get the IDs of the emails stored within a mailbox.
 
         Please note that the mailbox should have been previously selected.
         However, it is possible to specify a mailbox to select through the use of the parameter "mailbox".
 
         Args:
-            *criteria (List[str]): criteria used to select the emails.
+            *criteria (List[Union[str, IdSet]]): criteria used to select the emails.
+                Sets of IDs (IdSet, or lists of integers) are sent as sequence sets.
             mailbox (Union[None, str]): optional name of a mailbox.
 
         Returns:
-            List[str]: the IDs of the emails stored within the (previously selected / specified) mailbox.
+            IdSet: the IDs of the emails stored within the (previously selected / specified) mailbox.
 
         Raises:
             Exception: if the client could not get the list of IDs.
         """
-        ids = self.get_raw_emails_ids(*criteria, mailbox=mailbox)
-        if ids is None:
-            raise Exception(f'Cannot get the list of email in the mailbox {self._selected_mailbox}! No list of IDs is returned!')
-        return self._search(ids)
-        # ListEmailIds.reset()
-        # ListEmailIds.parse(ids[0].decode())
-        # return ListEmailIds.get_tokens_values()
+        self._selected_or_die(mailbox)
+        with self._measure('SEARCH') as timer:
+            ids = self.get_raw_emails_ids(*criteria)
+            timer.received()
+            if ids is None:
+                timer.set_status('NO')
+                raise Exception(f'Cannot get the list of email in the mailbox {self._selected_mailbox}! No list of IDs is returned!')
+            result: Union[None, IdSet] = self._search(ids)
+            timer.parsed()
+        if result is None:
+            raise Exception(f'Cannot get the list of email in the mailbox {self._selected_mailbox}! The list of IDs is not valid!')
+        return result
 
     def get_raw_emails_ids(self, *criteria, mailbox=None) -> Union[List[bytes], None]:
         """Get the IDs of the emails stored within a mailbox, a raw data.
 
         Args:
-            *criteria (List[str]): criteria used to select the emails.
+            *criteria (List[Union[str, IdSet]]): criteria used to select the emails.
+                Sets of IDs (IdSet, or lists of integers) are sent as sequence sets. If a sequence set is too long,
+                and if it is not an operand of NOT or OR (nor within parentheses), then the search is split into
+                several commands and the lists of IDs are concatenated.
             mailbox (Union[None, str]): optional name of a mailbox.
 
         Returns:
@@ -184,18 +582,337 @@ class Client:
         Raises:
             Exception: if no mailbox has been selected.
         """
-        self._authenticated_or_die()
-        if mailbox is not None:
-            self.select_mailbox(mailbox)
-        if self._selected_mailbox is None:
-            raise Exception('In order to get the list of emails in a mailbox, you must select a mailbox first!')
-        criteria = ['ALL'] if 0 == len(criteria) else criteria
-        # noinspection PyUnusedLocal
-        status: str
-        status, ids = self._imap.search(None, *criteria)
-        if 'OK' != status:
-            return None
-        return ids
+        self._selected_or_die(mailbox)
+        return self._raw_search(False, criteria)
+
+    def search_stats(self, *criteria, returns: Tuple[str, ...] = ('MIN', 'MAX', 'COUNT', 'ALL'), uid: bool = False,
+                     mailbox=None) -> Mapping[str, Union[None, int, IdSet]]:
+        """Get statistics about the emails that match a search, without transferring the list of IDs when possible.
+
+        If the server supports ESEARCH (RFC 4731), then the command SEARCH RETURN (...) is used, and the server only
+        sends the requested values. The list of IDs (ALL) is sent as a compact sequence set. Otherwise, the method falls
+        back to a plain SEARCH and computes the values locally.
+
+        Please note that the mailbox should have been previously selected.
+        However, it is possible to specify a mailbox to select through the use of the parameter "mailbox".
+
+        Args:
+            *criteria (List[Union[str, IdSet]]): criteria used to select the emails.
+                Sets of IDs (IdSet, or lists of integers) are sent as sequence sets.
+            returns (Tuple[str, ...]): the values to return: "MIN", "MAX", "COUNT" and/or "ALL".
+            uid (bool): flag that indicates whether the values are UIDs or message sequence numbers.
+            mailbox (Union[None, str]): optional name of a mailbox.
+
+        Returns:
+            Mapping[str, Union[None, int, IdSet]]: the requested values (ex: {"COUNT": 3, "MAX": 42}).
+                "MIN" and "MAX" are None if no email matches the criteria. "ALL" is an IdSet.
+
+        Raises:
+            Exception: if the client could not search the emails.
+        """
+        self._selected_or_die(mailbox)
+        returns = tuple([r.upper() for r in returns])
+        criteria = ('ALL',) if 0 == len(criteria) else criteria
+        if not self.has_capability('ESEARCH'):
+            ids: Union[None, IdSet] = None
+            raw: Union[None, List[bytes]] = self._raw_search(uid, criteria)
+            if raw is not None:
+                ids = __class__._search(raw)
+            if ids is None:
+                raise Exception(f'Cannot search the emails in the mailbox {self._selected_mailbox}!')
+            return __class__._stats(ids, returns)
+
+        option: str = '(' + ' '.join(returns) + ')'
+        result: Mapping[str, Union[None, int, IdSet]] = __class__._stats(IdSet(), returns)
+        prefix: Tuple[str, ...] = ('UID', 'SEARCH', 'RETURN', option) if uid else ('SEARCH', 'RETURN', option)
+        commands: List[Tuple[str, ...]] = [prefix + tuple(chunk)
+                                           for chunk in __class__._expand_criteria(criteria, self.MAX_SEQUENCE_SET_LENGTH)]
+        with self._measure(' '.join(prefix[:-1])) as timer:
+            for status, data in self._imap.pipeline(commands, 'ESEARCH', self.PIPELINE_DEPTH):
+                timer.received()
+                if 'OK' != status:
+                    timer.set_status(status)
+                    raise Exception(f'Cannot search the emails in the mailbox {self._selected_mailbox}! Status code is {status}')
+                stats: Union[None, Mapping[str, Union[None, int, IdSet]]] = __class__._esearch(data, returns)
+                if stats is None:
+                    raise Exception(f'Cannot search the emails in the mailbox {self._selected_mailbox}! The ESEARCH response is not valid!')
+                # The chunks of a split sequence set do not overlap.
+                for key, value in stats.items():
+                    if key == 'COUNT':
+                        result[key] += value
+                    elif key == 'ALL':
+                        result[key] = result[key] | value
+                    elif value is not None:
+                        result[key] = value if result[key] is None else (min if key == 'MIN' else max)(result[key], value)
+                timer.parsed()
+            timer.received()
+        return result
+
+    def list_emails_uids(self, *criteria, mailbox=None) -> IdSet:
+        """Get the UIDs of the emails stored within a mailbox.
+
+        Unlike message sequence numbers, UIDs do not change when messages are expunged.
+
+        Please note that the mailbox should have been previously selected.
+        However, it is possible to specify a mailbox to select through the use of the parameter "mailbox".
+
+        Args:
+            *criteria (List[Union[str, IdSet]]): criteria used to select the emails.
+                Sets of IDs (IdSet, or lists of integers) are sent as sequence sets.
+            mailbox (Union[None, str]): optional name of a mailbox.
+
+        Returns:
+            IdSet: the UIDs of the emails stored within the (previously selected / specified) mailbox.
+
+        Raises:
+            Exception: if the client could not get the list of UIDs.
+        """
+        self._selected_or_die(mailbox)
+        with self._measure('UID SEARCH') as timer:
+            uids = self.get_raw_emails_uids(*criteria)
+            timer.received()
+            if uids is None:
+                timer.set_status('NO')
+                raise Exception(f'Cannot get the list of email in the mailbox {self._selected_mailbox}! No list of UIDs is returned!')
+            result: Union[None, IdSet] = self._search(uids)
+            timer.parsed()
+        if result is None:
+            raise Exception(f'Cannot get the list of email in the mailbox {self._selected_mailbox}! The list of UIDs is not valid!')
+        return result
+
+    def get_raw_emails_uids(self, *criteria, mailbox=None) -> Union[List[bytes], None]:
+        """Get the UIDs of the emails stored within a mailbox, a raw data.
+
+        Args:
+            *criteria (List[Union[str, IdSet]]): criteria used to select the emails.
+            mailbox (Union[None, str]): optional name of a mailbox.
+
+        Returns:
+            List[bytes]: the list of UIDs.
+            None: the client could not get the list of UIDs.
+
+        Raises:
+            Exception: if no mailbox has been selected.
+        """
+        self._selected_or_die(mailbox)
+        return self._raw_search(True, criteria)
+
+    def fetch(self, ids: Union[IdSet, List[int]], items: str = '(FLAGS)') -> List[FetchRecord]:
+        """Fetch data items for a set of messages identified by their sequence numbers.
+
+        Please note that a mailbox must have been previously selected.
+
+        Args:
+            ids (Union[IdSet, List[int]]): the message sequence numbers.
+            items (str): the data items to fetch (ex: "(FLAGS RFC822.SIZE)").
+
+        Returns:
+            List[FetchRecord]: the records, one for each message.
+
+        Raises:
+            Exception: if the client could not fetch the data items.
+        """
+        return list(self._iter_fetch(False, ids, items))
+
+    def fetch_by_uid(self, uids: Union[IdSet, List[int]], items: str = '(FLAGS)') -> List[FetchRecord]:
+        """Fetch data items for a set of messages identified by their UIDs.
+
+        Please note that a mailbox must have been previously selected.
+
+        Args:
+            uids (Union[IdSet, List[int]]): the message UIDs.
+            items (str): the data items to fetch (ex: "(FLAGS RFC822.SIZE)").
+                The UID is always returned (see FetchRecord.get_uid()).
+
+        Returns:
+            List[FetchRecord]: the records, one for each message.
+
+        Raises:
+            Exception: if the client could not fetch the data items.
+        """
+        return list(self._iter_fetch(True, uids, items))
+
+    def iter_fetch(self, ids: Union[IdSet, List[int]], items: str = '(FLAGS)', batch_size: Union[None, int] = None,
+                   uid: bool = False) -> Iterator[FetchRecord]:
+        """Fetch data items for a set of messages, batch by batch.
+
+        The messages are fetched by batches of (at most) "batch_size" messages: one command is sent per batch, and the
+        records are yielded as soon as the response to the command has been parsed. The commands are pipelined: at most
+        PIPELINE_DEPTH batches are in flight, so that the next batches are on their way while the current one is
+        consumed. Thus, the memory used does not depend on the number of messages, but on the size of a batch.
+
+        Please note that a mailbox must have been previously selected. The client must not be used to send other
+        commands while the iteration is in progress.
+
+        Usage:
+
+            for record in client.iter_fetch(client.list_emails_ids(), '(FLAGS RFC822.SIZE BODY.PEEK[HEADER])'):
+                print(record.get_number(), record.get_flags(), record.get_size(), record.get_body('HEADER'))
+
+        Args:
+            ids (Union[IdSet, List[int]]): the message sequence numbers (or the UIDs, if "uid" is True).
+            items (str): the data items to fetch (ex: "(FLAGS RFC822.SIZE INTERNALDATE ENVELOPE BODY.PEEK[1])").
+            batch_size (Union[None, int]): the maximum number of messages fetched by a single command.
+                If None, then the value of FETCH_BATCH_SIZE is used.
+            uid (bool): flag that indicates whether the messages are identified by their UIDs or not.
+
+        Returns:
+            Iterator[FetchRecord]: the records, one for each message.
+
+        Raises:
+            Exception: if the client could not fetch the data items.
+        """
+        batch_size = self.FETCH_BATCH_SIZE if batch_size is None else batch_size
+        ids = ids if isinstance(ids, IdSet) else IdSet(ids)
+        yield from self._iter_fetch(uid, ids, items, batch_size=batch_size)
+
+    def iter_messages(self, uids: Union[IdSet, List[int]], batch_size: Union[None, int] = None) -> Iterator[Message]:
+        """Fetch the envelopes and the structures of a set of messages, and return handles on the messages.
+
+        Only the metadata of the messages is transferred (see Message.ITEMS). The parts of a message are fetched when
+        they are accessed (see Message.get_part()).
+
+        Please note that a mailbox must have been previously selected, and must stay selected while the parts of the
+        messages are accessed. The messages are fetched batch by batch, and the parts can be accessed during the
+        iteration.
+
+        Usage:
+
+            for message in client.iter_messages(client.list_emails_uids()):
+                print(message.get_envelope().get_subject(), [p.get_filename() for p in message.get_attachments()])
+
+        Args:
+            uids (Union[IdSet, List[int]]): the message UIDs.
+            batch_size (Union[None, int]): the maximum number of messages fetched by a single command.
+                If None, then the value of FETCH_BATCH_SIZE is used.
+
+        Returns:
+            Iterator[Message]: the handles, one for each message.
+
+        Raises:
+            Exception: if the client could not fetch the metadata of the messages, or if it is not valid.
+        """
+        self._selected_or_die()
+        mailbox: str = self._selected_mailbox
+        batch_size = self.FETCH_BATCH_SIZE if batch_size is None else batch_size
+        uids = uids if isinstance(uids, IdSet) else IdSet(uids)
+        for batch in uids.iter_batches(batch_size):
+            # The whole batch is read before the handles are yielded: the parts can be loaded during the iteration.
+            records: List[FetchRecord] = list(self._iter_fetch(True, batch, Message.ITEMS))
+            for record in records:
+                yield Message(self, mailbox, record)
+
+    def fetch_changed_since(self, modseq: int, items: str = '(FLAGS)', vanished: bool = False) -> Tuple[List[FetchRecord], IdSet]:
+        """Fetch data items for the messages that changed since a given mod-sequence value (RFC 7162).
+
+        Please note that a mailbox must have been previously selected, and that the extension CONDSTORE (or QRESYNC,
+        if the expunged messages are requested) must have been enabled.
+
+        Args:
+            modseq (int): the mod-sequence value (usually, the HIGHESTMODSEQ value stored during the previous session).
+            items (str): the data items to fetch (ex: "(FLAGS)").
+                The UID and the mod-sequence are always returned (see FetchRecord.get_modseq()).
+            vanished (bool): flag that indicates whether the UIDs of the messages expunged since the given
+                mod-sequence must be returned or not. This requires the extension QRESYNC.
+
+        Returns:
+            Tuple[List[FetchRecord], IdSet]: the records of the changed messages (one for each message), and the UIDs
+                of the expunged messages (empty if the parameter "vanished" is False).
+
+        Raises:
+            Exception: if the client could not fetch the data items.
+        """
+        modifiers: str = f'(CHANGEDSINCE {modseq} VANISHED)' if vanished else f'(CHANGEDSINCE {modseq})'
+        records: List[FetchRecord] = list(self._iter_fetch(True, '1:*', items, modifiers))
+        expunged: IdSet = IdSet()
+        if vanished:
+            for data in self._imap.response('VANISHED')[1]:
+                if data is None:
+                    continue
+                try:
+                    expunged = expunged | __class__._vanished(data)
+                except Exception as e:
+                    raise Exception(f'Cannot interpret the response VANISHED: {e}')
+        return records, expunged
+
+    def iter_idle(self, timeout: Union[None, float] = None) -> Iterator[IdleEvent]:
+        """Wait for changes within the selected mailbox, using the command IDLE (RFC 2177).
+
+        The untagged responses sent by the server (EXISTS, EXPUNGE, FETCH...) are yielded as soon as they are
+        received. The command IDLE is automatically re-issued every IDLE_RENEW_INTERVAL seconds, so that the server
+        does not close the connection. When the iteration stops, the command IDLE is terminated.
+
+        Please note that a mailbox must have been previously selected.
+
+        Usage:
+
+            for event in client.iter_idle(timeout=600):
+                if event.get_type() == IdleEvent.TYPE_EXISTS:
+                    break
+
+        Args:
+            timeout (Union[None, float]): the maximum number of seconds to wait for changes.
+                If None, then the method waits until the iteration is stopped.
+
+        Returns:
+            Iterator[IdleEvent]: the events.
+
+        Raises:
+            Exception: if no mailbox is selected, if the server does not support the command IDLE, or if the server
+                closes the connection.
+        """
+        self._selected_or_die()
+        connector: Connector = self._imap
+        deadline: Union[None, float] = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            try:
+                tag, responses = connector.idle_start()
+            except IMAP4.error as e:
+                raise Exception(f'Cannot wait for changes within the mailbox {self._selected_mailbox}: {e}')
+            try:
+                renew: float = time.monotonic() + self.IDLE_RENEW_INTERVAL
+                while True:
+                    for parts in responses:
+                        event: Union[None, IdleEvent] = self._idle_event(parts)
+                        if event is not None:
+                            yield event
+                    responses = []
+                    limit: float = renew if deadline is None else min(renew, deadline)
+                    remaining: float = limit - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    if connector.wait(remaining):
+                        responses.append(connector.read_response())
+            except GeneratorExit:
+                connector.idle_done(tag)
+                raise
+            for parts in connector.idle_done(tag):
+                event = self._idle_event(parts)
+                if event is not None:
+                    yield event
+
+    def idle(self, callback: Callable[[IdleEvent], Union[None, bool]], timeout: Union[None, float] = None) -> None:
+        """Wait for changes within the selected mailbox, and call a function for each change.
+
+        See iter_idle().
+
+        Args:
+            callback (Callable[[IdleEvent], Union[None, bool]]): the function called for each event.
+                If the function returns the value False, then the method stops waiting.
+            timeout (Union[None, float]): the maximum number of seconds to wait for changes.
+                If None, then the method waits until the function returns the value False.
+
+        Raises:
+            Exception: if no mailbox is selected, if the server does not support the command IDLE, or if the server
+                closes the connection.
+        """
+        events: Iterator[IdleEvent] = self.iter_idle(timeout)
+        try:
+            for event in events:
+                if callback(event) is False:
+                    break
+        finally:
+            events.close()
 
     def get_hostname(self) -> str:
         """Return the IMAP server hostname.
@@ -246,47 +963,510 @@ class Client:
         return self._imap
 
     @staticmethod
-    def _list(mailboxes: Union[List[bytes], List[None]]) -> Union[None, List[List[str]]]:
+    def _list(mailboxes: List[Union[bytes, Tuple[bytes, bytes], None]]) -> Union[None, List[Mailbox]]:
         """Given the raw output of the IMAP "list" function, the method return the mailboxes.
 
         Args:
-            mailboxes (Union[List[bytes], List[None]]): raw output of the IMAP "list" function.
+            mailboxes (List[Union[bytes, Tuple[bytes, bytes], None]]): raw output of the IMAP "list" function.
+                A mailbox name sent as a literal is represented by imaplib as a tuple (line, literal) followed by the
+                (empty) end of the line.
 
         Returns:
-            List[List[str]]: upon successful completion, the method returns the list of mailboxes.
+            List[Mailbox]: upon successful completion, the method returns the list of mailboxes.
             None: if the method could not interpret the given input, then it returns the value None.
         """
 
         if mailboxes == [None]:
             return []
 
-        result: List[List[str]] = []
-        # noinspection PyUnusedLocal
-        mailbox: bytes
+        result: List[Mailbox] = []
+        parser = ListMailbox()
+        literal: bool = False
         for mailbox in mailboxes:
-            ListMailbox.reset()
-            if not ListMailbox.parse(mailbox.decode()):
+            if isinstance(mailbox, tuple):
+                ok: bool = parser.parse(mailbox[0], mailbox[1])
+            elif literal and mailbox == b'':
+                # The end of a line that contains a literal.
+                literal = False
+                continue
+            else:
+                ok = mailbox is not None and parser.parse(mailbox)
+            if not ok:
+                return None
+            literal = isinstance(mailbox, tuple)
+            record: Union[None, Mailbox] = Mailbox.from_tokens(parser.get_tokens())
+            if record is None:
+                return None
+            result.append(record)
+        return result
+
+    @staticmethod
+    def _status(data: List[Union[None, bytes, Tuple[bytes, bytes]]]) -> Union[None, Mapping[str, Mapping[str, int]]]:
+        """Given the data of the STATUS responses stored by imaplib, the method returns the counters of the mailboxes.
+
+        Args:
+            data (List[Union[None, bytes, Tuple[bytes, bytes]]]): the data of the STATUS responses. A mailbox name sent
+                as a literal is represented by imaplib as a tuple (line, literal) followed by the end of the line.
+
+        Returns:
+            Mapping[str, Mapping[str, int]]: the counters, indexed by decoded mailbox name, then by item.
+            None: if the method could not interpret the given input, then it returns the value None.
+        """
+        result: Mapping[str, Mapping[str, int]] = {}
+        name: Union[None, str] = None
+        for item in data:
+            if item is None:
+                continue
+            if isinstance(item, tuple):
+                name = item[1].decode()
+                continue
+            m = __class__._status_re.match(item)
+            if m is None:
+                return None
+            if m.group(1) is not None:
+                name = re.sub(r'\\(.)', r'\1', m.group(1).decode())
+            elif m.group(2) is not None:
+                name = m.group(2).decode()
+            values: List[bytes] = m.group(3).split()
+            if name is None or len(values) % 2 != 0:
                 return None
-            tokens = ListMailbox.get_tokens()
-            result.append([ t[1] for t in tokens if t[0] == ListMailbox.TYPE_PATH ])
+            try:
+                result[decode_name(name)] = {values[i].decode().upper(): int(values[i + 1])
+                                             for i in range(0, len(values), 2)}
+            except ValueError:
+                return None
+            name = None
         return result
 
     @staticmethod
-    def _search(emails_ids: List[bytes]) -> Union[None, List[str]]:
+    def _search(emails_ids: List[bytes]) -> Union[None, IdSet]:
         """Given the raw output of the IMAP "search" function, the method return the IDs of the emails.
 
         Args:
             emails_ids (List[bytes]): the list of emails IDs, as returned by the IMAP "search" function.
+                Please note that the server may split the list over several responses.
 
         Returns:
-            List[str]: the list of IDs.
+            IdSet: the set of IDs.
             None: if the method could not interpret the given input, then it returns the value None.
         """
-        if len(emails_ids) != 1:
+        if len(emails_ids) == 0 or None in emails_ids:
+            return None
+        try:
+            return IdSet.from_bytes(emails_ids[0] if len(emails_ids) == 1 else b' '.join(emails_ids))
+        except (ValueError, OverflowError):
+            # OverflowError: an ID does not fit into the array of the set.
             return None
-        ListEmailIds.reset()
-        ListEmailIds.parse(emails_ids[0].decode())
-        return ListEmailIds.get_tokens_values()
+
+    @staticmethod
+    def _stats(ids: IdSet, returns: Tuple[str, ...]) -> Mapping[str, Union[None, int, IdSet]]:
+        """Compute the values of a search (RFC 4731) from a set of IDs.
+
+        Args:
+            ids (IdSet): the IDs of the emails that match the search.
+            returns (Tuple[str, ...]): the values to compute: "MIN", "MAX", "COUNT" and/or "ALL".
+
+        Returns:
+            Mapping[str, Union[None, int, IdSet]]: the values.
+
+        Raises:
+            Exception: if a value is not supported.
+        """
+        result: Mapping[str, Union[None, int, IdSet]] = {}
+        for key in returns:
+            if key == 'MIN':
+                result[key] = ids.get_min()
+            elif key == 'MAX':
+                result[key] = ids.get_max()
+            elif key == 'COUNT':
+                result[key] = len(ids)
+            elif key == 'ALL':
+                result[key] = ids
+            else:
+                raise Exception(f'Unsupported search return option {key}!')
+        return result
+
+    @staticmethod
+    def _esearch(data: List[Union[None, bytes]],
+                 returns: Tuple[str, ...]) -> Union[None, Mapping[str, Union[None, int, IdSet]]]:
+        """Given the data of the ESEARCH responses stored by imaplib, the method returns the values of the search.
+
+        Args:
+            data (List[Union[None, bytes]]): the data of the ESEARCH responses
+                (ex: '(TAG "A282") UID MIN 2 COUNT 3 ALL 2,10:11').
+            returns (Tuple[str, ...]): the requested values. The values that are missing from the response (ex: MIN
+                if no email matches the search) are set to their value for an empty set of IDs.
+
+        Returns:
+            Mapping[str, Union[None, int, IdSet]]: the values.
+            None: if the method could not interpret the given input, then it returns the value None.
+        """
+        result: Mapping[str, Union[None, int, IdSet]] = __class__._stats(IdSet(), returns)
+        for item in data:
+            if item is None:
+                continue
+            tokens: List[str] = re.sub(r'^\s*\(TAG\s+"[^"]*"\)', '', item.decode()).split()
+            if len(tokens) > 0 and tokens[0].upper() == 'UID':
+                tokens = tokens[1:]
+            if len(tokens) % 2 != 0:
+                return None
+            for i in range(0, len(tokens), 2):
+                key: str = tokens[i].upper()
+                if key not in result:
+                    continue
+                try:
+                    result[key] = sequence_set.decode(tokens[i + 1]) if key == 'ALL' else int(tokens[i + 1])
+                except Exception:
+                    return None
+        return result
+
+    # The search keys followed by one argument, and by two arguments (RFC 3501, section 6.4.4, and extensions).
+    _SEARCH_KEYS_1 = frozenset(['BCC', 'BEFORE', 'BODY', 'CC', 'FROM', 'KEYWORD', 'LARGER', 'ON', 'SENTBEFORE',
+                                'SENTON', 'SENTSINCE', 'SINCE', 'SMALLER', 'SUBJECT', 'TEXT', 'TO', 'UNKEYWORD',
+                                'CHARSET', 'OLDER', 'YOUNGER', 'FILTER', 'X-GM-RAW', 'X-GM-MSGID', 'X-GM-THRID',
+                                'X-GM-LABELS'])
+    _SEARCH_KEYS_2 = frozenset(['HEADER'])
+    _search_token_re = re.compile(r'"(?:[^"\\]|\\.)*"|[()]|[^\s()"]+')
+
+    @staticmethod
+    def _analyze_criteria(criteria: Tuple[Union[str, IdSet], ...]) -> Tuple[Set[int], Set[int]]:
+        """Find the sets of IDs that are top-level conditions of a search, and the negated empty sets.
+
+        A set of IDs is a top-level condition if it is not an operand of NOT or OR, and if it is not within
+        parentheses. The criteria are ANDed: the search can be split into one search per chunk of a top-level set, and
+        the results of the searches are disjoint.
+
+        Args:
+            criteria (Tuple[Union[str, IdSet], ...]): the criteria.
+
+        Returns:
+            Tuple[Set[int], Set[int]]: the method returns 2 values.
+                The first value contains the indexes of the sets of IDs that are top-level conditions.
+                The second value contains the indexes of the criteria "NOT" (and "UID") directly followed by an empty
+                set of IDs. Such a condition is always true.
+                If the criteria cannot be interpreted, then no set is considered as a top-level condition.
+        """
+        # The tokens, and the indexes of the criteria they come from. A set of IDs is a single token.
+        tokens: List[Tuple[Union[str, IdSet], int, bool]] = []
+        for index, criterion in enumerate(criteria):
+            if sequence_set.is_sequence_set(criterion):
+                tokens.append((criterion, index, True))
+                continue
+            words: List[str] = __class__._search_token_re.findall(str(criterion))
+            tokens.extend([(word, index, len(words) == 1) for word in words])
+
+        top: Set[int] = set()
+        negated: Set[int] = set()
+
+        def is_set(position: int) -> bool:
+            return sequence_set.is_sequence_set(tokens[position][0])
+
+        def is_empty_set(position: int) -> bool:
+            return position < len(tokens) and is_set(position) and \
+                sequence_set.encode(tokens[position][0]) == ''
+
+        def key(position: int, nested: bool) -> int:
+            # Consume one search key, and return the position of the next one.
+            token: Union[str, IdSet] = tokens[position][0]
+            if is_set(position):
+                if not nested:
+                    top.add(tokens[position][1])
+                return position + 1
+            word: str = token.upper()
+            if word == '(':
+                position += 1
+                while tokens[position][0] != ')':
+                    position = key(position, True)
+                return position + 1
+            if word == 'NOT':
+                # "NOT <empty set>" and "NOT UID <empty set>" match all the messages.
+                operand: int = position + 1
+                if operand < len(tokens) and tokens[operand][0] != ')' and not is_set(operand) and \
+                        tokens[operand][0].upper() == 'UID' and tokens[operand][2]:
+                    operand += 1
+                if tokens[position][2] and is_empty_set(operand):
+                    negated.update([tokens[p][1] for p in range(position, operand + 1)])
+                    return operand + 1
+                return key(position + 1, True)
+            if word == 'OR':
+                return key(key(position + 1, True), True)
+            if word == 'UID':
+                if not nested and is_set(position + 1):
+                    top.add(tokens[position + 1][1])
+                return position + 2
+            if word == 'MODSEQ':
+                # MODSEQ [<entry-name> <entry-type-req>] <mod-sequence-valzer> (RFC 7162, section 3.1.5).
+                # "valzer" is the name used by the RFC: a mod-sequence value that may be zero.
+                return position + (4 if tokens[position + 1][0].startswith('"') else 2)
+            if word in __class__._SEARCH_KEYS_2:
+                return position + 3
+            if word in __class__._SEARCH_KEYS_1:
+                return position + 2
+            return position + 1
+
+        try:
+            position: int = 0
+            while position < len(tokens):
+                position = key(position, False)
+        except (IndexError, AttributeError):
+            return set(), set()
+        return top, negated
+
+    @staticmethod
+    def _expand_criteria(criteria: Tuple[Union[str, IdSet], ...], max_length: int) -> List[List[str]]:
+        """Convert the sets of IDs found within a list of criteria into sequence sets.
+
+        If a sequence set is too long, and if it is a top-level condition (see _analyze_criteria()), then it is split
+        into chunks, and the method returns one list of criteria per chunk. Only one criterion may be split. The sets
+        of IDs that are operands of NOT or OR, or that are within parentheses, are never split.
+
+        Args:
+            criteria (Tuple[Union[str, IdSet], ...]): the criteria.
+            max_length (int): the maximum length of a sequence set.
+
+        Returns:
+            List[List[str]]: the lists of criteria. If a set of IDs that is a top-level condition is empty, then no
+                email can match the criteria and the method returns an empty list. "NOT <empty set>" is replaced by
+                "ALL".
+
+        Raises:
+            Exception: if more than one criterion must be split, or if an empty set of IDs is an operand of OR, or
+                is within parentheses.
+        """
+        top, negated = __class__._analyze_criteria(criteria)
+        result: List[List[str]] = [[]]
+        split: bool = False
+        for index, criterion in enumerate(criteria):
+            if index in negated:
+                if not sequence_set.is_sequence_set(criterion):
+                    continue
+                criterion = 'ALL'
+            if not sequence_set.is_sequence_set(criterion):
+                for r in result:
+                    r.append(criterion)
+                continue
+            chunks: List[str] = list(sequence_set.chunks(criterion, max_length))
+            if len(chunks) == 0:
+                if index in top:
+                    return []
+                raise Exception('Cannot search an empty set of IDs within OR, NOT or parentheses!')
+            if len(chunks) > 1 and index in top:
+                if split:
+                    raise Exception('Cannot split more than one set of IDs within the same search!')
+                split = True
+                result = [r + [chunk] for r in result for chunk in chunks]
+                continue
+            for r in result:
+                r.append(','.join(chunks))
+        return result
+
+    def _raw_search(self, uid: bool, criteria: Tuple[Union[str, IdSet], ...]) -> Union[List[bytes], None]:
+        """Execute the command SEARCH (or UID SEARCH) within the selected mailbox.
+
+        Args:
+            uid (bool): flag that indicates whether the command UID SEARCH must be used or not.
+            criteria (Tuple[Union[str, IdSet], ...]): criteria used to select the emails.
+
+        Returns:
+            List[bytes]: the list of IDs or UIDs.
+            None: the client could not get the list of IDs or UIDs.
+        """
+        criteria = ('ALL',) if 0 == len(criteria) else criteria
+        prefix: Tuple[str, ...] = ('UID', 'SEARCH') if uid else ('SEARCH',)
+        commands: List[Tuple[str, ...]] = [prefix + tuple(chunk)
+                                           for chunk in __class__._expand_criteria(criteria, self.MAX_SEQUENCE_SET_LENGTH)]
+        result: List[bytes] = []
+        # The commands are pipelined: a search split into N commands costs about one round trip.
+        with self._measure(' '.join(prefix)) as timer:
+            for status, ids in self._imap.pipeline(commands, 'SEARCH', self.PIPELINE_DEPTH):
+                if 'OK' != status:
+                    timer.set_status(status)
+                    return None
+                result.extend(ids)
+            timer.received()
+        return result if len(result) > 0 else [b'']
+
+    def _iter_fetch(self, uid: bool, ids: Union[IdSet, List[int], str], items: str,
+                    modifiers: Union[None, str] = None, batch_size: Union[None, int] = None) -> Iterator[FetchRecord]:
+        """Execute the command FETCH (or UID FETCH) within the selected mailbox.
+
+        Args:
+            uid (bool): flag that indicates whether the command UID FETCH must be used or not.
+            ids (Union[IdSet, List[int], str]): the message sequence numbers or UIDs.
+                A string is sent as is (ex: "1:*").
+            items (str): the data items to fetch.
+            modifiers (Union[None, str]): optional fetch modifiers (ex: "(CHANGEDSINCE 12345)").
+            batch_size (Union[None, int]): if set, the maximum number of messages fetched by a single command.
+                All the commands are sent through the same pipeline.
+
+        Returns:
+            Iterator[FetchRecord]: the records, one for each message. The records are yielded command by command.
+
+        Raises:
+            Exception: if the client could not fetch the data items.
+        """
+        self._selected_or_die()
+        chunks: Iterable[str]
+        if isinstance(ids, str):
+            chunks = [ids]
+        elif batch_size is None:
+            chunks = sequence_set.chunks(ids, self.MAX_SEQUENCE_SET_LENGTH)
+        else:
+            ids = ids if isinstance(ids, IdSet) else IdSet(ids)
+            chunks = (chunk for batch in ids.iter_batches(batch_size)
+                      for chunk in sequence_set.chunks(batch, self.MAX_SEQUENCE_SET_LENGTH))
+        arguments: Tuple[str, ...] = (items,) if modifiers is None else (items, modifiers)
+        prefix: Tuple[str, ...] = ('UID', 'FETCH') if uid else ('FETCH',)
+        # The commands (chunks and batches) are pipelined. Thus, the next ones are already on their way while the
+        # current one is consumed.
+        results: Iterator[Tuple[str, List[Union[None, bytes, Tuple[bytes, bytes]]]]] = \
+            self._imap.pipeline(((prefix + (chunk,) + arguments) for chunk in chunks), 'FETCH', self.PIPELINE_DEPTH)
+        with self._measure(' '.join(prefix)) as timer:
+            try:
+                for status, data in results:
+                    timer.received()
+                    if 'OK' != status:
+                        timer.set_status(status)
+                        raise Exception(f'Cannot fetch the messages from the mailbox {self._selected_mailbox}! Status code is {status}')
+                    for parts in FetchResponse.group(data):
+                        try:
+                            number, values = FetchResponse.parse(parts)
+                        except ValueError as e:
+                            raise Exception(f'Cannot interpret the response to FETCH: {e}')
+                        record: FetchRecord = FetchRecord(number, values)
+                        timer.parsed()
+                        self._suspend(timer)
+                        yield record
+                        self._resume(timer)
+                        # The time spent by the consumer is not part of the command.
+                        timer.skip()
+                    # Release the raw response before the next one is read.
+                    del data
+            finally:
+                # Read the completions of the commands in flight, if the iteration is interrupted.
+                results.close()
+                timer.received()
+
+    @staticmethod
+    def _vanished(data: bytes) -> IdSet:
+        """Extract the UIDs from the data of a VANISHED response (ex: "(EARLIER) 41,43:116").
+
+        Args:
+            data (bytes): the data stored by imaplib for the response VANISHED.
+
+        Returns:
+            IdSet: the UIDs of the expunged messages.
+
+        Raises:
+            Exception: if the data is not valid.
+        """
+        text: str = data.decode().strip()
+        if text.upper().startswith('(EARLIER)'):
+            text = text[len('(EARLIER)'):].strip()
+        return sequence_set.decode(text)
+
+    @staticmethod
+    def _response_code_value(data: List[Union[None, bytes]]) -> Union[None, int]:
+        """Extract the numeric value of a response code (ex: "[UIDVALIDITY 3857529045]") stored by imaplib.
+
+        Args:
+            data (List[Union[None, bytes]]): the values stored by imaplib for the response code.
+
+        Returns:
+            int: the value.
+            None: the server did not send the response code.
+        """
+        if len(data) == 0 or data[-1] is None:
+            return None
+        try:
+            return int(data[-1])
+        except ValueError:
+            return None
+
+    def _idle_event(self, parts: List[bytes]) -> Union[None, IdleEvent]:
+        """Convert an untagged response received while waiting for changes into an event.
+
+        Args:
+            parts (List[bytes]): the response.
+
+        Returns:
+            IdleEvent: the event.
+            None: the response is not a change (ex: "* OK Still here").
+
+        Raises:
+            Exception: if the server closes the connection.
+        """
+        event: Union[None, IdleEvent] = IdleEvent.parse(parts)
+        if event is None or event.get_type() in ('OK', 'NO', 'BAD'):
+            return None
+        if event.get_type() == 'BYE':
+            raise Exception(f'The server closed the connection: {parts[0].decode(errors="replace")}')
+        return event
+
+    def _measure(self, command: str) -> Union[CommandTimer, NullTimer]:
+        """Return a timer that measures a command, if callbacks are registered.
+
+        The commands sent while another command is measured are part of it (ex: list_mailboxes() calls
+        get_raw_list_mailboxes()).
+
+        Args:
+            command (str): the name of the command (ex: "SELECT").
+
+        Returns:
+            Union[CommandTimer, NullTimer]: the timer, to be used as a context manager.
+        """
+        if len(self._callbacks) == 0 or self._timer is not None:
+            return NULL_TIMER
+        timer: CommandTimer = CommandTimer(command, self._name, self._imap, lambda event: self._emit(event, timer))
+        self._timer = timer
+        return timer
+
+    def _suspend(self, timer: Union[CommandTimer, NullTimer]) -> None:
+        """Release the timer of a command run by a generator, before a value is yielded.
+
+        The commands sent while the generator is suspended (or after it is abandoned) are not part of its command.
+
+        Args:
+            timer (Union[CommandTimer, NullTimer]): the timer returned by _measure().
+        """
+        if self._timer is timer:
+            self._timer = None
+
+    def _resume(self, timer: Union[CommandTimer, NullTimer]) -> None:
+        """Take back the timer of a command run by a generator, once the generator is resumed.
+
+        Args:
+            timer (Union[CommandTimer, NullTimer]): the timer returned by _measure().
+        """
+        if self._timer is None and timer is not NULL_TIMER:
+            self._timer = timer
+
+    def _emit(self, event: CommandEvent, timer: CommandTimer) -> None:
+        """Pass the measures of a command to the callbacks.
+
+        Args:
+            event (CommandEvent): the measures.
+            timer (CommandTimer): the timer that measured the command.
+        """
+        if self._timer is timer:
+            self._timer = None
+        for callback in list(self._callbacks):
+            callback(event)
+
+    def _selected_or_die(self, mailbox: Union[None, str] = None) -> None:
+        """If no mailbox is selected, then raise an exception!
+
+        Args:
+            mailbox (Union[None, str]): optional name of a mailbox to select first.
+
+        Raises:
+            Exception: if the client is not authenticated, or if no mailbox is selected.
+        """
+        self._authenticated_or_die()
+        if mailbox is not None:
+            self.select_mailbox(mailbox)
+        if self._selected_mailbox is None:
+            raise Exception('In order to get the list of emails in a mailbox, you must select a mailbox first!')
 
     def _authenticated_or_die(self):
         """If the client is not authenticated, then raise en exception!
@@ -1,7 +1,18 @@
+"""This module implements the configuration of the ISPs.
+
+A configuration is written in YAML. It can be compiled once into a snapshot, that short-lived processes load without
+YAML parsing nor validation:
+
+    python -m dbeurive.imap.config config/isp.yaml config/isp.snapshot
+"""
+
 from typing import List, Mapping, Tuple, Any, Union
-import yaml
+import json
 import os
-from Crypto.Cipher import AES
+import sys
+
+# The modules yaml and Crypto are imported when they are needed: a worker that loads a snapshot of a clear configuration
+# (see Config.get_conf_from_snapshot()) does not pay for them.
 
 # isp_name:
 #   net:
@@ -18,6 +29,10 @@ class Config:
     CYPHER_KEY_NAME = 'CYPHER_KEY'
     CYPHER_IV_NAME = 'CYPHER_IV'
 
+    # Identification of the snapshots (see write_snapshot()).
+    SNAPSHOT_FORMAT = 'dbeurive.imap.config'
+    SNAPSHOT_VERSION = 1
+
     @staticmethod
     def get_conf_from_string(string: str, clear: bool = True) -> '__class__':
         """Create a configuration object from a (YAML formatted) string.
@@ -51,13 +66,49 @@ class Config:
         conf: str = __class__.load_conf(path)
         return __class__.get_conf_from_string(conf, clear)
 
+    @staticmethod
+    def get_conf_from_snapshot(path: str, clear: bool = True) -> '__class__':
+        """Create a configuration object from a snapshot (see write_snapshot()).
+
+        The snapshot has already been validated when it was written. Thus, it is loaded without YAML parsing nor
+        validation: this is the fastest way to load a configuration.
+
+        Args:
+            path (str): path to the snapshot.
+            clear (bool): flag that indicates whether the content of the snapshot is cyphered or not.
+               The default value True means that the content of the file is clear text.
+
+        Returns:
+            Config: a configuration object.
+
+        Raises:
+            Exception: if the file is not a valid snapshot.
+        """
+        with open(path, 'rb') as fd:
+            data: bytes = fd.read()
+        if not clear:
+            data = __class__.decrypt(data)
+        try:
+            snapshot: Mapping[str, Any] = json.loads(data)
+        except ValueError as e:
+            raise Exception(f'Invalid configuration snapshot "{path}": {e}')
+        if not isinstance(snapshot, dict) or snapshot.get('format') != __class__.SNAPSHOT_FORMAT:
+            raise Exception(f'Invalid configuration snapshot "{path}": unknown format.')
+        if snapshot.get('version') != __class__.SNAPSHOT_VERSION:
+            raise Exception(f'Invalid configuration snapshot "{path}": unsupported version {snapshot.get("version")}.')
+        conf: Config = Config.__new__(Config)
+        conf._conf = snapshot['conf']
+        conf._isp_list = snapshot['isps']
+        return conf
+
     def __init__(self, conf: str):
         """Create a configuration object from a given (YAML formatted) string that represents the configuration.
 
         Args:
             conf (str): the configuration (expressed as a YAML structure).
         """
-        self._conf: Mapping[str, Mapping[str, Mapping[str, Union[int, str]]]] = yaml.load(conf)
+        import yaml
+        self._conf: Mapping[str, Mapping[str, Mapping[str, Union[int, str]]]] = yaml.load(conf, Loader=yaml.SafeLoader)
         status, message = __class__.validate_conf(self._conf)
         if not status:
             raise Exception(f'Invalid configuration: {message}')
@@ -69,8 +120,30 @@ class Config:
         Returns:
             str: a YAML formatted string that represents the configuration.
         """
+        import yaml
         return yaml.dump(self._conf)
 
+    def write_snapshot(self, path: str, clear: bool = True) -> None:
+        """Write a snapshot of the configuration, that can be loaded quickly (see get_conf_from_snapshot()).
+
+        The snapshot is meant to be created once from the YAML configuration, and loaded by short-lived processes. It
+        contains the credentials: the file is only readable by its owner.
+
+        Args:
+            path (str): path to the snapshot.
+            clear (bool): flag that indicates whether the snapshot must be cyphered or not (see cypher()).
+               The default value True means that the snapshot is written as clear text.
+        """
+        snapshot: Mapping[str, Any] = {'format': __class__.SNAPSHOT_FORMAT,
+                                       'version': __class__.SNAPSHOT_VERSION,
+                                       'isps': self._isp_list,
+                                       'conf': self._conf}
+        data: str = json.dumps(snapshot, separators=(',', ':'))
+        content: bytes = data.encode() if clear else __class__.cypher(data)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'wb') as f:
+            f.write(content)
+
     def get_conf(self) -> Mapping[str, Mapping[str, Mapping[str, Union[int, str]]]]:
         """Return the configuration as a Map.
 
@@ -162,19 +235,20 @@ class Config:
         * CYPHER_IV: the cypher IV
 
         Args:
-            conf (str): a YAML formatted string that represents the configuration.
+            conf (str): a YAML formatted string that represents the configuration (or a snapshot).
 
         Returns:
-            bytes: the cyphered configuration.
+            bytes: the cyphered configuration (the UTF-8 encoding of the string, cyphered).
         """
         if __class__.CYPHER_KEY_NAME not in os.environ:
             raise Exception(f'Cannot crypt the configuration: environment variable "{__class__.CYPHER_KEY_NAME}" is not set.')
         if __class__.CYPHER_IV_NAME not in os.environ:
             raise Exception(f'Cannot crypt the configuration: environment variable "{__class__.CYPHER_IV_NAME}" is not set.')
-        key: str = os.environ[__class__.CYPHER_KEY_NAME]
+        from Crypto.Cipher import AES
+        key: bytes = __class__._key_to_bytes(os.environ[__class__.CYPHER_KEY_NAME])
         iv: bytes = __class__._iv_to_bytes(os.environ[__class__.CYPHER_IV_NAME])
         cipher = AES.new(key, AES.MODE_CFB, IV=iv)
-        return cipher.encrypt(conf)
+        return cipher.encrypt(conf.encode('utf-8'))
 
     @staticmethod
     def decrypt(conf: bytes) -> str:
@@ -185,15 +259,22 @@ class Config:
 
         Returns:
             str: the decrypted configuration.
+
+        Raises:
+            Exception: if the environment variables are not set, or if the decrypted data is not valid UTF-8.
         """
         if __class__.CYPHER_KEY_NAME not in os.environ:
             raise Exception(f'Cannot decrypt the given configuration: environment variable "{__class__.CYPHER_KEY_NAME}" is not set.')
         if __class__.CYPHER_IV_NAME not in os.environ:
             raise Exception(f'Cannot decrypt the given configuration: environment variable "{__class__.CYPHER_IV_NAME}" is not set.')
-        key: str = os.environ[__class__.CYPHER_KEY_NAME]
+        from Crypto.Cipher import AES
+        key: bytes = __class__._key_to_bytes(os.environ[__class__.CYPHER_KEY_NAME])
         iv: bytes = __class__._iv_to_bytes(os.environ[__class__.CYPHER_IV_NAME])
         cipher = AES.new(key, AES.MODE_CFB, IV=iv)
-        return cipher.decrypt(conf)
+        try:
+            return cipher.decrypt(conf).decode('utf-8')
+        except UnicodeDecodeError:
+            raise Exception('Cannot decrypt the given configuration: invalid key or IV.')
 
     @staticmethod
     def load_conf(path: str) -> str:
@@ -249,10 +330,12 @@ class Config:
             bool: if the given dictionary has a given list of keys, then the method returns the value True.
                 Otherwise, it returns the value False.
         """
-        k: List[str] = list(map(lambda x: x[0], m.items()))
-        k.sort()
-        keys.sort()
-        return k == keys
+        if not isinstance(m, dict) or len(m) != len(keys):
+            return False
+        for key in keys:
+            if key not in m:
+                return False
+        return True
 
     @staticmethod
     def _get_isp_names(conf: Mapping[str, Mapping[str, Mapping[str, Union[int, str]]]]) -> List[str]:
@@ -286,7 +369,7 @@ class Config:
         """Convert a string that represents the cypher key into bytes.
 
         Args:
-            iv (str): the cypher key.
+            key (str): the cypher key.
 
         Returns:
             bytes: the cypher key expressed as a succession of bytes.
@@ -346,3 +429,46 @@ class Config:
 
         return True
 
+    @staticmethod
+    def diff_conf(conf1: Mapping[str, Mapping[str, Mapping[str, Union[int, str]]]], conf2: Mapping[str, Mapping[str, Mapping[str, Union[int, str]]]]) -> Tuple[List[str], List[str], List[str]]:
+        """Compare 2 configurations, ISP by ISP.
+
+        Args:
+            conf1 (Mapping[str, Mapping[str, Mapping[str, Union[int, str]]]]): first configuration (ex: the configuration in use).
+            conf2 (Mapping[str, Mapping[str, Mapping[str, Union[int, str]]]]): second configuration (ex: the new version of the configuration).
+
+        Returns:
+            Tuple[List[str], List[str], List[str]]: the names of the ISPs added by the second configuration, the names
+                of the ISPs it removed, and the names of the ISPs it modified.
+        """
+        added: List[str] = [isp_name for isp_name in conf2 if isp_name not in conf1]
+        removed: List[str] = [isp_name for isp_name in conf1 if isp_name not in conf2]
+        changed: List[str] = [isp_name for isp_name in conf1 if isp_name in conf2 and
+                              not __class__.cmp_conf({isp_name: conf1[isp_name]}, {isp_name: conf2[isp_name]})]
+        return added, removed, changed
+
+
+def main(argv: Union[None, List[str]] = None) -> int:
+    """Command line entry point: compile a configuration file into a snapshot.
+
+    Args:
+        argv (Union[None, List[str]]): the command line arguments.
+
+    Returns:
+        int: the exit status.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description='Compile a configuration file into a snapshot.')
+    parser.add_argument('config', help='path to the configuration file')
+    parser.add_argument('snapshot', help='path to the snapshot to write')
+    parser.add_argument('--encrypted', action='store_true', help='the configuration file is encrypted, and so is '
+                                                                 'the snapshot')
+    args = parser.parse_args(argv)
+    config: Config = Config.get_conf_from_file(args.config, not args.encrypted)
+    config.write_snapshot(args.snapshot, not args.encrypted)
+    print(f'{len(config.get_isps())} ISPs written to {args.snapshot}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,502 @@
+"""This module implements the connectors used by the class Client to exchange data with the IMAP servers.
+
+The connectors are the imaplib classes IMAP4 and IMAP4_SSL, extended with a read buffer managed by the connector itself
+(instead of the file object created by socket.makefile()). Thus, the connector can wait for data with a timeout, without
+putting the connection in an unusable state. This is required by the command IDLE (RFC 2177).
+
+The connectors can also pipeline commands (RFC 3501, section 5.5): several tagged commands are sent before the first
+completion is received, so that a batch of N commands costs about one round trip instead of N.
+
+Last, the connectors can compress the data exchanged with the server (COMPRESS=DEFLATE, RFC 4978). The compression layer
+sits between the socket and the read buffer, so that it is transparent to imaplib.
+
+The TLS connectors share their SSL context, and resume the TLS sessions previously established with the same server,
+so that a reconnection does not cost a full handshake.
+"""
+
+import imaplib
+import re
+import select
+import socket
+import ssl
+import threading
+import time
+import weakref
+import zlib
+from collections import deque
+from typing import List, Tuple, Union, Iterable, Iterator, Mapping, Deque
+from imaplib import IMAP4, IMAP4_SSL, IMAP4_SSL_PORT
+
+
+RawData = List[Union[None, bytes, Tuple[bytes, bytes]]]
+
+# imaplib checks the state of the connection before sending a command. COMPRESS is not part of its table.
+imaplib.Commands.setdefault('COMPRESS', ('AUTH', 'SELECTED'))
+
+# The SSL context used when none is given (see get_default_context()).
+_default_context: Union[None, ssl.SSLContext] = None
+
+# For each SSL context: the last TLS session established with each server ("hostname", port).
+# A session can only be resumed with the context that created it.
+_sessions: Mapping[ssl.SSLContext, Mapping[Tuple[str, int], ssl.SSLSession]] = weakref.WeakKeyDictionary()
+_lock: threading.Lock = threading.Lock()
+
+# The response code CAPABILITY (RFC 3501, section 7.1), that a server may return in the tagged response to LOGIN.
+_capability_code = re.compile(br'^\[CAPABILITY ([^\]]*)\]', re.IGNORECASE)
+
+
+def get_default_context() -> ssl.SSLContext:
+    """Return the SSL context shared by the TLS connectors created without context.
+
+    The context has the same settings as the one created by imaplib: the certificate of the server is not verified.
+    Use ssl.create_default_context() to create a context that verifies it.
+
+    Returns:
+        ssl.SSLContext: the shared context.
+    """
+    global _default_context
+    with _lock:
+        if _default_context is None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            _default_context = context
+        return _default_context
+
+
+class _BufferedConnector:
+    """This class implements the read buffer, the IDLE primitives and the pipelining shared by the connectors.
+
+    It must be mixed with IMAP4 or IMAP4_SSL.
+    """
+
+    # Maximum number of bytes read from the socket at once.
+    READ_SIZE: int = 65536
+
+    # Compression level used when COMPRESS=DEFLATE is active (see compress()).
+    COMPRESSION_LEVEL: int = 6
+
+    # Maximum length of a line. imaplib limits it to 1MB, which is less than the response to SEARCH for a mailbox that
+    # contains about 150k messages.
+    MAX_LINE: int = 64 * 1024 * 1024
+
+    def open(self, *args, **kwargs) -> None:
+        self._buffer = bytearray()
+        self._compressor = None
+        self._decompressor = None
+        # Number of bytes sent and received: [before compression, on the wire].
+        self._sent: List[int] = [0, 0]
+        self._received: List[int] = [0, 0]
+        # Time of the reception of the first data since the last call to reset_first_byte_time().
+        self._first_byte: Union[None, float] = None
+        super().open(*args, **kwargs)
+        # The file object created by imaplib is not used: the data is read directly from the socket.
+        self.file.close()
+
+    def send(self, data: bytes) -> None:
+        self._sent[0] += len(data)
+        if self._compressor is not None:
+            data = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self._sent[1] += len(data)
+        super().send(data)
+
+    def read(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            if not self._fill():
+                break
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def readline(self) -> bytes:
+        start: int = 0
+        while True:
+            end: int = self._buffer.find(b'\n', start)
+            if end >= 0:
+                line = bytes(self._buffer[:end + 1])
+                del self._buffer[:end + 1]
+                return line
+            if len(self._buffer) > self.MAX_LINE:
+                raise self.error(f'got more than {self.MAX_LINE} bytes')
+            start = len(self._buffer)
+            if not self._fill():
+                line = bytes(self._buffer)
+                self._buffer.clear()
+                return line
+
+    def wait(self, timeout: float) -> bool:
+        """Wait for data sent by the server.
+
+        Args:
+            timeout (float): the maximum number of seconds to wait.
+
+        Returns:
+            bool: if data can be read, then the method returns the value True.
+                Otherwise (the timeout expired), it returns the value False.
+        """
+        if len(self._buffer) > 0:
+            return True
+        if isinstance(self.sock, ssl.SSLSocket) and self.sock.pending() > 0:
+            return True
+        readable, _, _ = select.select([self.sock], [], [], max(timeout, 0))
+        return len(readable) > 0
+
+    def read_response(self) -> List[bytes]:
+        """Read a complete response from the server, including the literals.
+
+        Returns:
+            List[bytes]: the parts of the response. The parts are the lines of text (without the trailing CRLF)
+                followed by the literals. For example: [b'* 1 FETCH (BODY[] {5}', b'hello', b')']
+
+        Raises:
+            IMAP4.abort: if the connection has been closed.
+        """
+        parts: List[bytes] = []
+        while True:
+            line: bytes = self.readline()
+            if not line:
+                raise self.abort('socket error: EOF')
+            line = line.rstrip(b'\r\n')
+            parts.append(line)
+            m = imaplib.Literal.match(line)
+            if m is None:
+                return parts
+            parts.append(self.read(int(m.group('size'))))
+
+    def idle_start(self) -> Tuple[bytes, List[List[bytes]]]:
+        """Send the command IDLE, and wait for the server to accept it.
+
+        Returns:
+            Tuple[bytes, List[List[bytes]]]: the tag of the command, and the untagged responses received before the
+                server accepted the command.
+
+        Raises:
+            IMAP4.error: if the server does not support or rejects the command.
+        """
+        if 'IDLE' not in self.capabilities:
+            raise self.error('The server does not support the command IDLE!')
+        tag: bytes = self._new_tag()
+        self.send(tag + b' IDLE\r\n')
+        responses: List[List[bytes]] = []
+        while True:
+            parts: List[bytes] = self.read_response()
+            if parts[0].startswith(b'+'):
+                return tag, responses
+            if parts[0].startswith(tag + b' '):
+                del self.tagged_commands[tag]
+                raise self.error(f'IDLE command error: {parts[0].decode(errors="replace")}')
+            responses.append(parts)
+
+    def idle_done(self, tag: bytes) -> List[List[bytes]]:
+        """Terminate the command IDLE.
+
+        Args:
+            tag (bytes): the tag of the command IDLE.
+
+        Returns:
+            List[List[bytes]]: the untagged responses received before the completion of the command.
+
+        Raises:
+            IMAP4.error: if the command did not complete successfully.
+        """
+        self.send(b'DONE\r\n')
+        responses: List[List[bytes]] = []
+        while True:
+            parts: List[bytes] = self.read_response()
+            if parts[0].startswith(tag + b' '):
+                del self.tagged_commands[tag]
+                if not parts[0].startswith(tag + b' OK'):
+                    raise self.error(f'IDLE command error: {parts[0].decode(errors="replace")}')
+                return responses
+            responses.append(parts)
+
+    def login(self, user: str, password: str) -> Tuple[str, RawData]:
+        """Identify the client, and refresh the capabilities.
+
+        The server may advertise other capabilities once the client is authenticated (ex: COMPRESS=DEFLATE). The
+        capabilities are taken from the response code CAPABILITY of the tagged response, or from an untagged response
+        CAPABILITY. If the server sends neither, then the command CAPABILITY is sent.
+
+        Raises:
+            IMAP4.error: if the server rejects the credentials, or if it does not return the capabilities.
+        """
+        self.untagged_responses.pop('CAPABILITY', None)
+        status, data = super().login(user, password)
+        m = _capability_code.match(data[-1] or b'')
+        untagged: Union[None, RawData] = self.untagged_responses.pop('CAPABILITY', None)
+        if m is not None:
+            self.capabilities = tuple(m.group(1).decode('ascii', 'replace').upper().split())
+        elif untagged is not None and isinstance(untagged[-1], bytes):
+            self.capabilities = tuple(untagged[-1].decode('ascii', 'replace').upper().split())
+        else:
+            self._get_capabilities()
+        return status, data
+
+    def compress(self) -> bool:
+        """Activate the compression of the data exchanged with the server (COMPRESS=DEFLATE, RFC 4978).
+
+        Please note that the compression should be activated after authentication.
+
+        Returns:
+            bool: if the compression is active, then the method returns the value True.
+                Otherwise (the server does not support it), it returns the value False.
+
+        Raises:
+            IMAP4.error: if the server rejects the command.
+        """
+        if self._compressor is not None:
+            return True
+        if 'COMPRESS=DEFLATE' not in self.capabilities:
+            return False
+        status, data = self._simple_command('COMPRESS', 'DEFLATE')
+        if 'OK' != status:
+            raise self.error(f'COMPRESS command error: {status} {data}')
+        # Raw deflate streams, without zlib header (RFC 4978, section 4).
+        self._compressor = zlib.compressobj(self.COMPRESSION_LEVEL, zlib.DEFLATED, -15)
+        self._decompressor = zlib.decompressobj(-15)
+        # The server starts compressing right after the completion of the command. Thus, the data that follows the
+        # completion in the buffer (if any) is compressed.
+        if len(self._buffer) > 0:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            self._received[0] -= len(data)
+            self._received[1] -= len(data)
+            self._receive(data)
+        return True
+
+    def is_compressed(self) -> bool:
+        """Test whether the compression is active or not.
+
+        Returns:
+            bool: if the compression is active, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return self._compressor is not None
+
+    def get_compression_ratio(self) -> Union[None, float]:
+        """Return the compression ratio of the data exchanged with the server, since the connection was opened.
+
+        Returns:
+            float: the number of bytes before compression divided by the number of bytes on the wire (ex: 4.2).
+                The value 1.0 means that the data is not compressed.
+            None: no data has been exchanged yet.
+        """
+        wire: int = self._sent[1] + self._received[1]
+        if wire == 0:
+            return None
+        return (self._sent[0] + self._received[0]) / wire
+
+    def get_transfer_stats(self) -> Mapping[str, int]:
+        """Return the number of bytes exchanged with the server, since the connection was opened.
+
+        Returns:
+            Mapping[str, int]: the number of bytes sent and received, before compression ("sent", "received") and on
+                the wire ("sent_wire", "received_wire").
+        """
+        return {'sent': self._sent[0], 'sent_wire': self._sent[1],
+                'received': self._received[0], 'received_wire': self._received[1]}
+
+    def reset_first_byte_time(self) -> None:
+        """Forget the time of the reception of the first data (see get_first_byte_time()).
+        """
+        self._first_byte = None
+
+    def get_first_byte_time(self) -> Union[None, float]:
+        """Return the time of the reception of the first data since the connection was opened, or since the last call
+        to reset_first_byte_time().
+
+        Returns:
+            float: the time, as returned by time.perf_counter().
+            None: no data has been received.
+        """
+        return self._first_byte
+
+    def pipeline(self, commands: Iterable[Tuple[str, ...]], name: str, depth: int) -> Iterator[Tuple[str, RawData]]:
+        """Send commands without waiting for the completion of the previous ones.
+
+        At most "depth" commands are in flight at any time. The completions are matched by tag. The untagged
+        responses of type "name" received before the completion of a command are assigned to this command (the server
+        processes the commands in order). The other untagged responses (EXISTS, VANISHED...) are stored as imaplib
+        does, so that they can be retrieved with response().
+
+        If the iteration is interrupted, the completions of the commands in flight are read and discarded, so that the
+        connection can be used again.
+
+        Args:
+            commands (Iterable[Tuple[str, ...]]): the commands, as lists of words (ex: ("UID", "SEARCH", "1:100")).
+            name (str): the type of the untagged responses returned for each command (ex: "FETCH").
+            depth (int): the maximum number of commands in flight.
+
+        Returns:
+            Iterator[Tuple[str, RawData]]: for each command, in order, the status ("OK", "NO" or "BAD") and the data,
+                as imaplib returns them. If the status is "OK", then the data is the list of untagged responses of type
+                "name" ([None] if there is none). Otherwise, it is the text of the completion.
+
+        Raises:
+            ValueError: if the depth is lower than 1.
+            IMAP4.abort: if the server closes the connection.
+        """
+        if depth < 1:
+            raise ValueError(f'Invalid pipeline depth {depth}!')
+        commands = iter(commands)
+        pending: Deque[bytes] = deque()
+        completed: Mapping[bytes, Tuple[str, RawData]] = {}
+        responses: RawData = []
+        exhausted: bool = False
+        try:
+            while True:
+                while not exhausted and len(pending) < depth:
+                    command: Union[None, Tuple[str, ...]] = next(commands, None)
+                    if command is None:
+                        exhausted = True
+                        break
+                    tag: bytes = self._new_tag()
+                    self.send(tag + b' ' + ' '.join(command).encode(self._encoding) + b'\r\n')
+                    pending.append(tag)
+                if len(pending) == 0:
+                    return
+                while pending[0] not in completed:
+                    responses = self._pipeline_read(pending, completed, name, responses)
+                yield completed.pop(pending.popleft())
+        except GeneratorExit:
+            while len(pending) > 0:
+                while pending[0] not in completed:
+                    responses = self._pipeline_read(pending, completed, name, responses)
+                completed.pop(pending.popleft())
+            raise
+
+    def _pipeline_read(self, pending: Deque[bytes], completed: Mapping[bytes, Tuple[str, RawData]], name: str,
+                       responses: RawData) -> RawData:
+        """Read one response sent for the commands in flight.
+
+        Args:
+            pending (Deque[bytes]): the tags of the commands in flight.
+            completed (Mapping[bytes, Tuple[str, RawData]]): the results of the completed commands, indexed by tag.
+                If the response is a completion, then the result of the command is added.
+            name (str): the type of the untagged responses returned for each command.
+            responses (RawData): the untagged responses of type "name" received since the last completion.
+
+        Returns:
+            RawData: the untagged responses of type "name" that are not assigned to any command yet.
+
+        Raises:
+            IMAP4.abort: if the server closes the connection, or sends an unexpected response.
+        """
+        parts: List[bytes] = self.read_response()
+        m = self.tagre.match(parts[0])
+        if m is not None and m.group('tag') in pending:
+            tag: bytes = m.group('tag')
+            del self.tagged_commands[tag]
+            status: str = m.group('type').decode()
+            if 'OK' == status:
+                completed[tag] = (status, responses if len(responses) > 0 else [None])
+            else:
+                completed[tag] = (status, [m.group('data')])
+            return []
+        m = imaplib.Untagged_status.match(parts[0])
+        if m is not None:
+            data: bytes = m.group('data') if m.group('data2') is None else m.group('data') + b' ' + m.group('data2')
+        else:
+            m = imaplib.Untagged_response.match(parts[0])
+            if m is None:
+                raise self.abort(f'unexpected response: {parts[0]!r}')
+            data = m.group('data') or b''
+        response_type: str = m.group('type').decode()
+        if response_type == 'BYE':
+            raise self.abort(data.decode(errors='replace'))
+        if response_type in ('OK', 'NO', 'BAD'):
+            code = imaplib.Response_code.match(data)
+            if code is not None:
+                self._append_untagged(code.group('type').decode(), code.group('data'))
+        # Same representation as imaplib: [(line, literal), ..., last line].
+        lines: List[bytes] = [data] + parts[2::2]
+        elements: RawData = [(lines[i], literal) for i, literal in enumerate(parts[1::2])] + [lines[-1]]
+        if response_type == name:
+            responses.extend(elements)
+        else:
+            for element in elements:
+                self._append_untagged(response_type, element)
+        return responses
+
+    def _fill(self) -> bool:
+        """Read data from the socket into the buffer.
+
+        Returns:
+            bool: if data has been read, then the method returns the value True.
+                Otherwise (the connection has been closed), it returns the value False.
+        """
+        data: bytes = self.sock.recv(self.READ_SIZE)
+        if not data:
+            return False
+        self._receive(data)
+        return True
+
+    def _receive(self, data: bytes) -> None:
+        """Add data received from the socket to the buffer, after decompression if the compression is active.
+
+        Args:
+            data (bytes): the data received from the socket.
+        """
+        if self._first_byte is None:
+            self._first_byte = time.perf_counter()
+        self._received[1] += len(data)
+        if self._decompressor is not None:
+            data = self._decompressor.decompress(data)
+        self._received[0] += len(data)
+        self._buffer.extend(data)
+
+
+class Connector(_BufferedConnector, IMAP4):
+    """This class implements a connector over a plain text connection.
+    """
+
+
+class ConnectorSSL(_BufferedConnector, IMAP4_SSL):
+    """This class implements a connector over a TLS connection.
+
+    The TLS session established with a server is kept (for the SSL context in use), and it is offered again to the
+    server the next time a connector opens a connection to it (session resumption).
+    """
+
+    def __init__(self, host: str = '', port: int = IMAP4_SSL_PORT, ssl_context: Union[None, ssl.SSLContext] = None,
+                 timeout: Union[None, float] = None):
+        """Open a TLS connection to a server.
+
+        Args:
+            host (str): the name of the host.
+            port (int): the TCP port.
+            ssl_context (Union[None, ssl.SSLContext]): the SSL context. The default value None means "use the shared
+                context returned by get_default_context()".
+            timeout (Union[None, float]): the timeout of the connection attempt, in seconds.
+        """
+        # IMAP4_SSL only accepts a timeout from Python 3.9: the timeout is applied by _create_socket().
+        self._connect_timeout: Union[None, float] = timeout
+        IMAP4_SSL.__init__(self, host, port, ssl_context=ssl_context if ssl_context is not None else get_default_context())
+
+    def is_session_reused(self) -> bool:
+        """Test whether the TLS session has been resumed (no full handshake) or not.
+
+        Returns:
+            bool: if the TLS session has been resumed, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return self.sock.session_reused
+
+    def _create_socket(self, timeout: Union[None, float] = None) -> ssl.SSLSocket:
+        # Python < 3.9 calls this method without timeout. From Python 3.9, the timeout is None (see __init__()).
+        if self._connect_timeout is not None and not self._connect_timeout:
+            raise ValueError('Non-blocking socket (timeout=0) is not supported')
+        address: Tuple[Union[None, str], int] = (self.host or None, self.port)
+        sock = socket.create_connection(address) if self._connect_timeout is None else \
+            socket.create_connection(address, self._connect_timeout)
+        with _lock:
+            session: Union[None, ssl.SSLSession] = _sessions.get(self.ssl_context, {}).get((self.host, self.port))
+        return self.ssl_context.wrap_socket(sock, server_hostname=self.host, session=session)
+
+    def _connect(self) -> None:
+        super()._connect()
+        # With TLS 1.3, the session tickets are sent after the handshake: they have been received with the greeting.
+        session: Union[None, ssl.SSLSession] = self.sock.session
+        if session is not None:
+            with _lock:
+                _sessions.setdefault(self.ssl_context, {})[(self.host, self.port)] = session
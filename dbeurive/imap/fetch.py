@@ -0,0 +1,119 @@
+from typing import List, Mapping, Union, Any
+
+
+class FetchRecord:
+    """This class represents the data items returned by the "fetch" command for one message.
+    """
+
+    def __init__(self, number: int, items: Mapping[str, Any]):
+        """Create a record.
+
+        Args:
+            number (int): the message sequence number.
+            items (Mapping[str, Any]): the data items, as returned by FetchResponse.parse().
+        """
+        self._number: int = number
+        self._items: Mapping[str, Any] = items
+
+    def get_number(self) -> int:
+        """Return the message sequence number.
+
+        Returns:
+            int: the message sequence number.
+        """
+        return self._number
+
+    def get_uid(self) -> Union[None, int]:
+        """Return the message UID.
+
+        Returns:
+            int: the message UID.
+            None: the UID has not been fetched.
+        """
+        uid: Union[None, str] = self._items.get('UID')
+        return None if uid is None else int(uid)
+
+    def get_items(self) -> Mapping[str, Any]:
+        """Return all the data items.
+
+        Returns:
+            Mapping[str, Any]: the data items. The names of the data items are in upper case.
+        """
+        return self._items
+
+    def get_item(self, name: str) -> Any:
+        """Return a data item.
+
+        Args:
+            name (str): the name of the data item (ex: "FLAGS", "BODY[HEADER]").
+
+        Returns:
+            Any: the value of the data item, or None if the item has not been fetched.
+        """
+        return self._items.get(name.upper())
+
+    def get_flags(self) -> Union[None, List[str]]:
+        """Return the flags of the message.
+
+        Returns:
+            List[str]: the flags (ex: ["\\Seen", "\\Answered"]).
+            None: the flags have not been fetched.
+        """
+        return self._items.get('FLAGS')
+
+    def get_modseq(self) -> Union[None, int]:
+        """Return the mod-sequence value of the message (RFC 7162).
+
+        Returns:
+            int: the mod-sequence value.
+            None: the mod-sequence value has not been fetched.
+        """
+        modseq: Union[None, List[str]] = self._items.get('MODSEQ')
+        if not modseq:
+            return None
+        return int(modseq[0])
+
+    def get_size(self) -> Union[None, int]:
+        """Return the size of the message.
+
+        Returns:
+            int: the size of the message (RFC822.SIZE), in bytes.
+            None: the size has not been fetched.
+        """
+        size: Union[None, str] = self._items.get('RFC822.SIZE')
+        return None if size is None else int(size)
+
+    def get_internal_date(self) -> Union[None, str]:
+        """Return the internal date of the message.
+
+        Returns:
+            str: the internal date (ex: "17-Jul-1996 02:44:25 -0700").
+            None: the internal date has not been fetched.
+        """
+        return self._items.get('INTERNALDATE')
+
+    def get_envelope(self) -> Union[None, List[Any]]:
+        """Return the envelope of the message, as a raw list of values.
+
+        Returns:
+            List[Any]: the envelope.
+            None: the envelope has not been fetched.
+        """
+        return self._items.get('ENVELOPE')
+
+    def get_body(self, section: str = '') -> Union[None, bytes]:
+        """Return a section of the message body.
+
+        Please note that the data items BODY.PEEK[<section>] are returned by the server as BODY[<section>].
+
+        Args:
+            section (str): the section specification (ex: "", "HEADER", "1.2").
+
+        Returns:
+            bytes: the content of the section.
+            None: the section has not been fetched.
+        """
+        value: Any = self._items.get(f'BODY[{section.upper()}]')
+        if isinstance(value, str):
+            return value.encode()
+        return value
@@ -0,0 +1,250 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Union, Tuple
+
+# Use an unsigned integer type that can hold any 32 bits message sequence number or UID.
+_TYPECODE: str = 'I' if array('I').itemsize >= 4 else 'L'
+
+# Size of the chunks of raw data converted at once while parsing the response of the "search" command.
+_CHUNK_SIZE: int = 65536
+
+
+class IdSet:
+    """This class implements a compact set of message IDs (sequence numbers or UIDs).
+
+    The IDs are stored as a sorted array of unsigned 32 bits integers, without duplicates. Thus, a set of 500k IDs
+    uses about 2 MB, instead of one Python object per ID.
+
+    The class supports iteration (in ascending order), membership tests, set algebra (|, &, -) and the rendering of
+    the set as an IMAP sequence set (ex: "1:500,502,510:9000").
+    """
+
+    __slots__ = ('_ids',)
+
+    def __init__(self, ids: Iterable[int] = ()):
+        """Create a set of IDs.
+
+        Args:
+            ids (Iterable[int]): the IDs. The IDs do not need to be sorted, and may contain duplicates.
+        """
+        self._ids: array = __class__._normalize(array(_TYPECODE, ids))
+
+    @staticmethod
+    def from_bytes(data: bytes) -> 'IdSet':
+        """Create a set of IDs from the raw data returned by the IMAP "search" command.
+
+        The data is converted chunk by chunk, so no intermediate list of strings is created for the whole response.
+
+        Args:
+            data (bytes): the raw data. For example: b'1 2 3'.
+
+        Returns:
+            IdSet: the set of IDs.
+        """
+        ids = array(_TYPECODE)
+        length: int = len(data)
+        start: int = 0
+        while start < length:
+            end: int = start + _CHUNK_SIZE
+            if end < length:
+                end = data.find(b' ', end)
+                if end == -1:
+                    end = length
+            ids.extend(map(int, data[start:end].split()))
+            start = end
+        return __class__._from_array(__class__._normalize(ids))
+
+    @staticmethod
+    def _from_array(ids: array) -> 'IdSet':
+        """Create a set of IDs from an array that is already sorted and that contains no duplicates.
+
+        Args:
+            ids (array): the array.
+
+        Returns:
+            IdSet: the set of IDs.
+        """
+        result = IdSet.__new__(IdSet)
+        result._ids = ids
+        return result
+
+    @staticmethod
+    def _normalize(ids: array) -> array:
+        """Sort an array and remove the duplicates, if needed.
+
+        Args:
+            ids (array): the array.
+
+        Returns:
+            array: the sorted array, without duplicates.
+        """
+        previous: int = -1
+        for i in ids:
+            if i <= previous:
+                return array(_TYPECODE, sorted(set(ids)))
+            previous = i
+        return ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __contains__(self, value: int) -> bool:
+        i: int = bisect_left(self._ids, value)
+        return i < len(self._ids) and self._ids[i] == value
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, IdSet):
+            return NotImplemented
+        return self._ids == other._ids
+
+    def __repr__(self) -> str:
+        return f'IdSet({self.to_sequence_set()!r})'
+
+    def __or__(self, other: 'IdSet') -> 'IdSet':
+        return self.union(other)
+
+    def __and__(self, other: 'IdSet') -> 'IdSet':
+        return self.intersection(other)
+
+    def __sub__(self, other: 'IdSet') -> 'IdSet':
+        return self.difference(other)
+
+    def get_min(self) -> Union[None, int]:
+        """Return the lowest ID.
+
+        Returns:
+            int: the lowest ID.
+            None: the set is empty.
+        """
+        return self._ids[0] if len(self._ids) > 0 else None
+
+    def get_max(self) -> Union[None, int]:
+        """Return the highest ID.
+
+        Returns:
+            int: the highest ID.
+            None: the set is empty.
+        """
+        return self._ids[-1] if len(self._ids) > 0 else None
+
+    def union(self, other: 'IdSet') -> 'IdSet':
+        """Return the IDs that are in this set or in another one.
+
+        Args:
+            other (IdSet): the other set.
+
+        Returns:
+            IdSet: the union of the 2 sets.
+        """
+        a: array = self._ids
+        b: array = other._ids
+        result = array(_TYPECODE)
+        i, j = 0, 0
+        while i < len(a) and j < len(b):
+            if a[i] < b[j]:
+                result.append(a[i])
+                i += 1
+            elif a[i] > b[j]:
+                result.append(b[j])
+                j += 1
+            else:
+                result.append(a[i])
+                i += 1
+                j += 1
+        result.extend(a[i:])
+        result.extend(b[j:])
+        return __class__._from_array(result)
+
+    def intersection(self, other: 'IdSet') -> 'IdSet':
+        """Return the IDs that are in this set and in another one.
+
+        Args:
+            other (IdSet): the other set.
+
+        Returns:
+            IdSet: the intersection of the 2 sets.
+        """
+        a: array = self._ids
+        b: array = other._ids
+        result = array(_TYPECODE)
+        i, j = 0, 0
+        while i < len(a) and j < len(b):
+            if a[i] < b[j]:
+                i += 1
+            elif a[i] > b[j]:
+                j += 1
+            else:
+                result.append(a[i])
+                i += 1
+                j += 1
+        return __class__._from_array(result)
+
+    def difference(self, other: 'IdSet') -> 'IdSet':
+        """Return the IDs that are in this set, but not in another one.
+
+        Args:
+            other (IdSet): the other set.
+
+        Returns:
+            IdSet: the difference between the 2 sets.
+        """
+        a: array = self._ids
+        b: array = other._ids
+        result = array(_TYPECODE)
+        i, j = 0, 0
+        while i < len(a) and j < len(b):
+            if a[i] < b[j]:
+                result.append(a[i])
+                i += 1
+            elif a[i] > b[j]:
+                j += 1
+            else:
+                i += 1
+                j += 1
+        result.extend(a[i:])
+        return __class__._from_array(result)
+
+    def iter_ranges(self) -> Iterator[Tuple[int, int]]:
+        """Iterate over the ranges of consecutive IDs.
+
+        For example, the set {1, 2, 3, 5, 7, 8} contains the ranges (1, 3), (5, 5) and (7, 8).
+
+        Returns:
+            Iterator[Tuple[int, int]]: the ranges (lowest ID, highest ID), in ascending order.
+        """
+        ids: array = self._ids
+        length: int = len(ids)
+        i: int = 0
+        while i < length:
+            j: int = i
+            while j + 1 < length and ids[j + 1] == ids[j] + 1:
+                j += 1
+            yield ids[i], ids[j]
+            i = j + 1
+
+    def iter_batches(self, size: int) -> Iterator['IdSet']:
+        """Split the set into consecutive batches of IDs.
+
+        Args:
+            size (int): the maximum number of IDs per batch.
+
+        Returns:
+            Iterator[IdSet]: the batches, in ascending order.
+        """
+        if size < 1:
+            raise ValueError(f'Invalid batch size {size}!')
+        for start in range(0, len(self._ids), size):
+            yield __class__._from_array(self._ids[start:start + size])
+
+    def to_sequence_set(self) -> str:
+        """Render the set as an IMAP sequence set.
+
+        Consecutive IDs are merged into ranges. For example, the set {1, 2, 3, 5, 7, 8} is rendered as "1:3,5,7:8".
+
+        Returns:
+            str: the sequence set. If the set is empty, then the method returns an empty string.
+        """
+        return ','.join([str(low) if low == high else f'{low}:{high}' for low, high in self.iter_ranges()])
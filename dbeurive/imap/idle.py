@@ -0,0 +1,123 @@
+import re
+from typing import List, Union
+from dbeurive.imap.parser import FetchResponse
+from dbeurive.imap.fetch import FetchRecord
+from dbeurive.imap.id_set import IdSet
+from dbeurive.imap import sequence_set
+
+_numbered_re = re.compile(br'\* (?P<number>\d+) (?P<type>[A-Za-z-]+)(?: (?P<data>.*))?$', re.S)
+_named_re = re.compile(br'\* (?P<type>[A-Za-z-]+)(?: (?P<data>.*))?$', re.S)
+
+
+class IdleEvent:
+    """This class represents an untagged response sent by the server while the client is waiting for changes (IDLE).
+
+    For example:
+
+        * 23 EXISTS                 => type EXISTS, number 23 (the number of messages in the mailbox)
+        * 5 EXPUNGE                 => type EXPUNGE, number 5 (the sequence number of the expunged message)
+        * 4 FETCH (FLAGS (\\Seen))   => type FETCH, number 4, record (the new data items of the message)
+        * VANISHED 41,43:116        => type VANISHED, UIDs 41, 43 to 116 (QRESYNC only)
+    """
+
+    TYPE_EXISTS = 'EXISTS'
+    TYPE_EXPUNGE = 'EXPUNGE'
+    TYPE_FETCH = 'FETCH'
+    TYPE_RECENT = 'RECENT'
+    TYPE_VANISHED = 'VANISHED'
+
+    def __init__(self, event_type: str, parts: List[bytes], number: Union[None, int] = None,
+                 record: Union[None, FetchRecord] = None, uids: Union[None, IdSet] = None):
+        """Create an event.
+
+        Args:
+            event_type (str): the type of the response, in upper case (ex: "EXISTS").
+            parts (List[bytes]): the raw response (lines of text and literals).
+            number (Union[None, int]): the number that precedes the type of the response, if any.
+            record (Union[None, FetchRecord]): the data items (for a FETCH response).
+            uids (Union[None, IdSet]): the UIDs (for a VANISHED response).
+        """
+        self._type: str = event_type
+        self._parts: List[bytes] = parts
+        self._number: Union[None, int] = number
+        self._record: Union[None, FetchRecord] = record
+        self._uids: Union[None, IdSet] = uids
+
+    def get_type(self) -> str:
+        """Return the type of the response.
+
+        Returns:
+            str: the type of the response, in upper case (TYPE_EXISTS, TYPE_EXPUNGE, TYPE_FETCH...).
+        """
+        return self._type
+
+    def get_number(self) -> Union[None, int]:
+        """Return the number carried by the response.
+
+        Returns:
+            int: the number of messages (EXISTS, RECENT) or the message sequence number (EXPUNGE, FETCH).
+            None: the response does not carry a number.
+        """
+        return self._number
+
+    def get_record(self) -> Union[None, FetchRecord]:
+        """Return the data items of a FETCH response.
+
+        Returns:
+            FetchRecord: the data items.
+            None: the response is not a FETCH response.
+        """
+        return self._record
+
+    def get_uids(self) -> Union[None, IdSet]:
+        """Return the UIDs of a VANISHED response.
+
+        Returns:
+            IdSet: the UIDs of the expunged messages.
+            None: the response is not a VANISHED response.
+        """
+        return self._uids
+
+    def get_raw(self) -> List[bytes]:
+        """Return the raw response.
+
+        Returns:
+            List[bytes]: the lines of text (without the trailing CRLF) and the literals.
+        """
+        return self._parts
+
+    @staticmethod
+    def parse(parts: List[bytes]) -> Union[None, 'IdleEvent']:
+        """Parse an untagged response.
+
+        Args:
+            parts (List[bytes]): the response (lines of text and literals).
+
+        Returns:
+            IdleEvent: the event.
+            None: the response is not an untagged response.
+
+        Raises:
+            Exception: if the response is not valid.
+        """
+        m = _numbered_re.match(parts[0])
+        if m is not None:
+            number = int(m.group('number'))
+            event_type: str = m.group('type').decode().upper()
+            if event_type != __class__.TYPE_FETCH:
+                return IdleEvent(event_type, parts, number)
+            try:
+                _, items = FetchResponse.parse([m.group('number') + b' ' + (m.group('data') or b'')] + parts[1:])
+            except ValueError as e:
+                raise Exception(f'Cannot interpret the response to FETCH: {e}')
+            return IdleEvent(event_type, parts, number, record=FetchRecord(number, items))
+        m = _named_re.match(parts[0])
+        if m is None:
+            return None
+        event_type = m.group('type').decode().upper()
+        if event_type != __class__.TYPE_VANISHED:
+            return IdleEvent(event_type, parts)
+        data: bytes = m.group('data') or b''
+        if data.upper().startswith(b'(EARLIER)'):
+            data = data[len(b'(EARLIER)'):]
+        return IdleEvent(event_type, parts, uids=sequence_set.decode(data.strip()))
@@ -0,0 +1,258 @@
+"""This module implements the records that represent the mailboxes returned by the "list" command.
+
+The names of the mailboxes are encoded by the servers using a modified version of UTF-7 (RFC 3501, section 5.1.3).
+For example: "Envoy&AOk-s" is the encoded form of "Envoyés".
+"""
+
+import base64
+from typing import List, Tuple, FrozenSet, Union
+from dbeurive.imap.parser import ListMailbox
+
+
+def decode_name(name: str) -> str:
+    """Decode a mailbox name encoded in modified UTF-7.
+
+    Args:
+        name (str): the encoded name (ex: "Envoy&AOk-s").
+
+    Returns:
+        str: the decoded name (ex: "Envoyés"). If the name is not a valid modified UTF-7 string, then the function
+            returns the name unchanged.
+    """
+    if '&' not in name:
+        return name
+    result: List[str] = []
+    length: int = len(name)
+    i: int = 0
+    while i < length:
+        start: int = name.find('&', i)
+        if start == -1:
+            result.append(name[i:])
+            break
+        result.append(name[i:start])
+        end: int = name.find('-', start)
+        if end == -1:
+            return name
+        if end == start + 1:
+            result.append('&')
+        else:
+            encoded: str = name[start + 1:end].replace(',', '/')
+            try:
+                result.append(base64.b64decode(encoded + '=' * (-len(encoded) % 4), validate=True).decode('utf-16-be'))
+            except ValueError:
+                return name
+        i = end + 1
+    return ''.join(result)
+
+
+def encode_name(name: str) -> str:
+    """Encode a mailbox name in modified UTF-7.
+
+    Args:
+        name (str): the name (ex: "Envoyés").
+
+    Returns:
+        str: the encoded name (ex: "Envoy&AOk-s").
+    """
+    result: List[str] = []
+    pending: List[str] = []
+
+    def flush() -> None:
+        if len(pending) > 0:
+            encoded: str = base64.b64encode(''.join(pending).encode('utf-16-be')).decode().rstrip('=')
+            result.append('&' + encoded.replace('/', ',') + '-')
+            del pending[:]
+
+    for c in name:
+        if 0x20 <= ord(c) <= 0x7e:
+            flush()
+            result.append('&-' if c == '&' else c)
+        else:
+            pending.append(c)
+    flush()
+    return ''.join(result)
+
+
+class Mailbox:
+    """This class represents a mailbox returned by the "list" command.
+
+    A mailbox carries its name (as sent by the server, and decoded), its hierarchy delimiter and its attributes
+    (ex: "\\Noselect", "\\HasNoChildren", "\\Sent"). The attributes make it possible to discard the mailboxes that
+    cannot be selected, or to find the special-use mailboxes (RFC 6154), before sending any command.
+    """
+
+    __slots__ = ('_raw_name', '_name', '_delimiter', '_flags', '_keys')
+
+    FLAG_NOSELECT = '\\Noselect'
+    FLAG_NONEXISTENT = '\\NonExistent'
+    FLAG_NOINFERIORS = '\\Noinferiors'
+    FLAG_HAS_CHILDREN = '\\HasChildren'
+    FLAG_HAS_NO_CHILDREN = '\\HasNoChildren'
+    FLAG_MARKED = '\\Marked'
+    FLAG_UNMARKED = '\\Unmarked'
+
+    # Special-use attributes (RFC 6154).
+    SPECIAL_USE_FLAGS: Tuple[str, ...] = ('\\All', '\\Archive', '\\Drafts', '\\Flagged', '\\Junk', '\\Sent', '\\Trash')
+    _special_use_keys: FrozenSet[str] = frozenset([f.lower() for f in SPECIAL_USE_FLAGS])
+
+    def __init__(self, raw_name: str, delimiter: Union[None, str] = None, flags: Tuple[str, ...] = ()):
+        """Create a mailbox.
+
+        Args:
+            raw_name (str): the name of the mailbox, as sent by the server (modified UTF-7).
+            delimiter (Union[None, str]): the hierarchy delimiter. None if the server does not use any hierarchy.
+            flags (Tuple[str, ...]): the attributes of the mailbox.
+        """
+        self._raw_name: str = raw_name
+        self._name: str = decode_name(raw_name)
+        self._delimiter: Union[None, str] = delimiter
+        self._flags: Tuple[str, ...] = tuple(flags)
+        # Attributes are case-insensitive.
+        self._keys: FrozenSet[str] = frozenset([f.lower() for f in self._flags])
+
+    @staticmethod
+    def from_tokens(tokens: List[Tuple[int, Union[None, str]]]) -> Union[None, 'Mailbox']:
+        """Create a mailbox from the tokens produced by the parser ListMailbox.
+
+        Args:
+            tokens (List[Tuple[int, Union[None, str]]]): the tokens.
+
+        Returns:
+            Mailbox: the mailbox.
+            None: the tokens do not describe a mailbox.
+        """
+        flags: List[str] = [t[1] for t in tokens if t[0] == ListMailbox.TYPE_CME]
+        others: List[Tuple[int, Union[None, str]]] = [t for t in tokens if t[0] != ListMailbox.TYPE_CME]
+        if len(others) != 2 or others[1][0] != ListMailbox.TYPE_PATH:
+            return None
+        return Mailbox(others[1][1], others[0][1], tuple(flags))
+
+    @staticmethod
+    def filter(mailboxes: List['Mailbox'], selectable_only: bool = False,
+               special_use: Union[None, bool] = None) -> List['Mailbox']:
+        """Filter a list of mailboxes.
+
+        Args:
+            mailboxes (List[Mailbox]): the mailboxes.
+            selectable_only (bool): flag that indicates whether the mailboxes that cannot be selected must be
+                discarded or not.
+            special_use (Union[None, bool]): True to keep only the special-use mailboxes, False to discard them,
+                None to keep all mailboxes.
+
+        Returns:
+            List[Mailbox]: the mailboxes that match the conditions, in the original order.
+        """
+        return [m for m in mailboxes
+                if (not selectable_only or m.is_selectable())
+                and (special_use is None or m.is_special_use() == special_use)]
+
+    def get_name(self) -> str:
+        """Return the decoded name of the mailbox.
+
+        Returns:
+            str: the decoded name (ex: "Envoyés").
+        """
+        return self._name
+
+    def get_raw_name(self) -> str:
+        """Return the name of the mailbox, as sent by the server.
+
+        This is the name that must be used within the commands (ex: select_mailbox()).
+
+        Returns:
+            str: the raw name (ex: "Envoy&AOk-s").
+        """
+        return self._raw_name
+
+    def get_delimiter(self) -> Union[None, str]:
+        """Return the hierarchy delimiter.
+
+        Returns:
+            str: the delimiter (ex: "/").
+            None: the server does not use any hierarchy.
+        """
+        return self._delimiter
+
+    def get_flags(self) -> Tuple[str, ...]:
+        """Return the attributes of the mailbox.
+
+        Returns:
+            Tuple[str, ...]: the attributes, as sent by the server (ex: ("\\HasNoChildren", "\\Sent")).
+        """
+        return self._flags
+
+    def has_flag(self, flag: str) -> bool:
+        """Test whether the mailbox has a given attribute. The comparison is case-insensitive.
+
+        Args:
+            flag (str): the attribute (ex: "\\Noselect").
+
+        Returns:
+            bool: if the mailbox has the attribute, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return flag.lower() in self._keys
+
+    def is_selectable(self) -> bool:
+        """Test whether the mailbox can be selected or not.
+
+        Returns:
+            bool: if the mailbox can be selected, then the method returns the value True.
+                Otherwise (\\Noselect or \\NonExistent), it returns the value False.
+        """
+        return not (self.has_flag(__class__.FLAG_NOSELECT) or self.has_flag(__class__.FLAG_NONEXISTENT))
+
+    def get_special_use(self) -> Union[None, str]:
+        """Return the special use of the mailbox (RFC 6154).
+
+        Returns:
+            str: the special-use attribute (ex: "\\Sent").
+            None: the mailbox has no special use.
+        """
+        for flag in self._flags:
+            if flag.lower() in __class__._special_use_keys:
+                return flag
+        return None
+
+    def is_special_use(self) -> bool:
+        """Test whether the mailbox has a special use (RFC 6154) or not.
+
+        Returns:
+            bool: if the mailbox has a special use, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return not self._keys.isdisjoint(__class__._special_use_keys)
+
+    def has_children(self) -> Union[None, bool]:
+        """Test whether the mailbox has child mailboxes.
+
+        Returns:
+            bool: the value True if the mailbox has children, False if it has not.
+            None: the server did not tell.
+        """
+        if self.has_flag(__class__.FLAG_HAS_CHILDREN):
+            return True
+        if self.has_flag(__class__.FLAG_HAS_NO_CHILDREN) or self.has_flag(__class__.FLAG_NOINFERIORS):
+            return False
+        return None
+
+    def get_path(self) -> List[str]:
+        """Return the path of the mailbox within the hierarchy (decoded names).
+
+        Returns:
+            List[str]: the names of the levels of the hierarchy (ex: ["Archives", "2023"] for "Archives/2023").
+        """
+        if self._delimiter is None or self._delimiter == '':
+            return [self._name]
+        return [decode_name(n) for n in self._raw_name.split(self._delimiter)]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Mailbox):
+            return NotImplemented
+        return (self._raw_name, self._delimiter, self._keys) == (other._raw_name, other._delimiter, other._keys)
+
+    def __hash__(self) -> int:
+        return hash((self._raw_name, self._delimiter))
+
+    def __repr__(self) -> str:
+        return f'Mailbox({self._raw_name!r}, {self._delimiter!r}, {self._flags!r})'
@@ -0,0 +1,212 @@
+"""This module implements a handle on a message, whose parts are loaded when they are accessed.
+
+The handles are created by Client.iter_messages(), which fetches the envelopes and the structures of the messages
+only (a few hundred bytes per message). The content of a part is fetched (with BODY.PEEK[<section>]) the first time it
+is requested:
+
+    for message in client.iter_messages(client.list_emails_uids()):
+        print(message.get_envelope().get_subject())
+        for part in message.get_attachments():
+            print(part.get_filename(), part.get_size())
+        text = message.get_text()   # Fetches the text part only.
+"""
+
+import base64
+import binascii
+import quopri
+from typing import List, Mapping, Union, Iterable, Any
+from dbeurive.imap.bodystructure import Envelope, BodyPart
+from dbeurive.imap.fetch import FetchRecord
+
+
+class Message:
+    """This class represents a message of a mailbox, identified by its UID.
+    """
+
+    # The data items fetched for each message by Client.iter_messages().
+    ITEMS: str = '(UID FLAGS RFC822.SIZE INTERNALDATE ENVELOPE BODYSTRUCTURE)'
+
+    def __init__(self, client: Any, mailbox: str, record: FetchRecord):
+        """Create a handle.
+
+        Args:
+            client (Client): the client used to fetch the parts of the message.
+            mailbox (str): the name of the mailbox that contains the message.
+            record (FetchRecord): the record returned by the server for the data items ITEMS.
+
+        Raises:
+            Exception: if the record does not contain the UID, the envelope and the structure of the message, or if
+                they are not valid.
+        """
+        if record.get_uid() is None or record.get_envelope() is None or record.get_item('BODYSTRUCTURE') is None:
+            raise Exception(f'Cannot create a handle for message {record.get_number()}: missing data items!')
+        try:
+            self._envelope: Envelope = Envelope.parse(record.get_envelope())
+            self._structure: BodyPart = BodyPart.parse(record.get_item('BODYSTRUCTURE'))
+        except ValueError as e:
+            raise Exception(f'Cannot interpret the structure of message {record.get_uid()}: {e}')
+        self._client: Any = client
+        self._mailbox: str = mailbox
+        self._record: FetchRecord = record
+        # The content of the loaded sections.
+        self._sections: Mapping[str, bytes] = {}
+
+    def get_uid(self) -> int:
+        return self._record.get_uid()
+
+    def get_mailbox(self) -> str:
+        return self._mailbox
+
+    def get_flags(self) -> Union[None, List[str]]:
+        return self._record.get_flags()
+
+    def get_size(self) -> Union[None, int]:
+        """Return the size of the message.
+
+        Returns:
+            int: the size of the whole message (RFC822.SIZE), in bytes.
+            None: the size has not been fetched.
+        """
+        return self._record.get_size()
+
+    def get_internal_date(self) -> Union[None, str]:
+        return self._record.get_internal_date()
+
+    def get_envelope(self) -> Envelope:
+        """Return the envelope of the message.
+
+        Returns:
+            Envelope: the envelope.
+        """
+        return self._envelope
+
+    def get_structure(self) -> BodyPart:
+        """Return the structure of the message.
+
+        Returns:
+            BodyPart: the root part of the message.
+        """
+        return self._structure
+
+    def get_attachments(self) -> List[BodyPart]:
+        """Return the metadata of the attachments. The attachments are not loaded.
+
+        Returns:
+            List[BodyPart]: the attachments (see BodyPart.is_attachment()).
+        """
+        return self._structure.get_attachments()
+
+    def get_loaded_sections(self) -> List[str]:
+        """Return the sections loaded so far.
+
+        Returns:
+            List[str]: the sections (ex: ["1", "HEADER"]).
+        """
+        return list(self._sections.keys())
+
+    def load(self, sections: Iterable[str]) -> None:
+        """Load several sections with a single command.
+
+        The sections already loaded are not loaded again.
+
+        Args:
+            sections (Iterable[str]): the sections (ex: ["1", "2.1", "HEADER"]).
+
+        Raises:
+            Exception: if the mailbox of the message is no longer selected, or if the sections cannot be fetched.
+        """
+        missing: List[str] = [s.upper() for s in sections if s.upper() not in self._sections]
+        if len(missing) == 0:
+            return
+        if self._client.get_selected_mailbox() != self._mailbox:
+            raise Exception(f'Cannot load message {self.get_uid()}: the mailbox {self._mailbox} is no longer selected!')
+        items: str = '(' + ' '.join([f'BODY.PEEK[{s}]' for s in missing]) + ')'
+        records: List[FetchRecord] = [r for r in self._client.fetch_by_uid([self.get_uid()], items)
+                                      if r.get_uid() == self.get_uid()]
+        if len(records) == 0:
+            raise Exception(f'Cannot load message {self.get_uid()}: the message does not exist anymore!')
+        for section in missing:
+            content: Union[None, bytes] = records[0].get_body(section)
+            if content is None:
+                raise Exception(f'Cannot load the section {section} of message {self.get_uid()}!')
+            self._sections[section] = content
+
+    def get_part(self, section: str) -> bytes:
+        """Return the content of a section, as transferred (that is: encoded). The section is loaded if needed.
+
+        Args:
+            section (str): the section (ex: "1.2", "HEADER", "" for the whole message).
+
+        Returns:
+            bytes: the content of the section.
+
+        Raises:
+            Exception: if the section cannot be loaded.
+        """
+        self.load([section])
+        return self._sections[section.upper()]
+
+    def get_decoded_part(self, section: str) -> bytes:
+        """Return the content of a part, decoded according to its transfer encoding (base64 or quoted-printable).
+
+        Args:
+            section (str): the part number (ex: "1.2").
+
+        Returns:
+            bytes: the decoded content.
+
+        Raises:
+            Exception: if the part does not exist, or if it cannot be loaded or decoded.
+        """
+        part: Union[None, BodyPart] = self._structure.find(section)
+        if part is None or part.is_multipart():
+            raise Exception(f'Message {self.get_uid()} has no single part {section}!')
+        content: bytes = self.get_part(section)
+        encoding: Union[None, str] = part.get_encoding()
+        try:
+            if encoding == 'base64':
+                return base64.b64decode(content)
+            if encoding == 'quoted-printable':
+                return quopri.decodestring(content)
+        except (binascii.Error, ValueError) as e:
+            raise Exception(f'Cannot decode the part {section} of message {self.get_uid()}: {e}')
+        return content
+
+    def get_text(self, subtype: str = 'plain') -> Union[None, str]:
+        """Return the text of the message. Only the first text part of the given subtype, that is not an attachment,
+        is loaded.
+
+        Args:
+            subtype (str): the subtype of the text part ("plain" or "html").
+
+        Returns:
+            str: the text, decoded.
+            None: the message has no such part.
+
+        Raises:
+            Exception: if the part cannot be loaded.
+        """
+        for part in self._structure.walk():
+            if part.get_type() == 'text' and part.get_subtype() == subtype and not part.is_attachment():
+                content: bytes = self.get_decoded_part(part.get_section())
+                try:
+                    return content.decode(part.get_charset() or 'us-ascii', 'replace')
+                except LookupError:
+                    return content.decode('utf-8', 'replace')
+        return None
+
+    def get_header(self) -> bytes:
+        """Return the header of the message. The header is loaded if needed.
+
+        Returns:
+            bytes: the header.
+        """
+        return self.get_part('HEADER')
+
+    def release(self) -> None:
+        """Forget the loaded sections.
+        """
+        self._sections = {}
+
+    def __repr__(self) -> str:
+        return f'Message({self._mailbox!r}, {self.get_uid()})'
@@ -0,0 +1,483 @@
+"""This module implements the instrumentation of the commands sent by the clients.
+
+For each command, the client measures the time spent in each phase, and the amount of data exchanged with the server.
+The measures are passed to the callbacks registered on the client (see Client.add_callback()) as a CommandEvent:
+
+* wait: the time between the beginning of the command and the reception of the first byte of the response.
+* transfer: the time spent receiving the rest of the response.
+* parse: the time spent interpreting the response.
+* sent, received: the number of bytes sent and received on the wire.
+* response_size: the size of the response, before decompression (see COMPRESS=DEFLATE).
+
+The class Registry aggregates the events into histograms, per source (ISP) and per command:
+
+    registry = Registry()
+    client = Client(hostname, port, username, password, name='mail.com', callbacks=[registry])
+    ...
+    print(json.dumps(registry.dump('mail.com'), indent=2))
+"""
+
+import math
+import threading
+import time
+from typing import List, Mapping, Union, Tuple, Callable, Any
+
+
+class CommandEvent:
+    """This class represents the measures of one command.
+    """
+
+    STATUS_ERROR = 'ERROR'
+
+    def __init__(self, command: str, source: str, status: str, wait: float, transfer: float, parse: float,
+                 sent: int, received: int, response_size: int):
+        """Create an event.
+
+        Args:
+            command (str): the name of the command (ex: "SELECT").
+            source (str): the name of the client that sent the command (ex: the name of the ISP).
+            status (str): the status of the command ("OK", "NO", "BAD"), or STATUS_ERROR if an exception was raised.
+            wait (float): the time spent waiting for the first byte of the response, in seconds.
+            transfer (float): the time spent receiving the rest of the response, in seconds.
+            parse (float): the time spent interpreting the response, in seconds.
+            sent (int): the number of bytes sent on the wire.
+            received (int): the number of bytes received on the wire.
+            response_size (int): the size of the response, before decompression.
+        """
+        self._command: str = command
+        self._source: str = source
+        self._status: str = status
+        self._wait: float = wait
+        self._transfer: float = transfer
+        self._parse: float = parse
+        self._sent: int = sent
+        self._received: int = received
+        self._response_size: int = response_size
+
+    def get_command(self) -> str:
+        """Return the name of the command.
+
+        Returns:
+            str: the name of the command (ex: "SELECT").
+        """
+        return self._command
+
+    def get_source(self) -> str:
+        """Return the name of the client that sent the command.
+
+        Returns:
+            str: the name of the client (see Client.get_name()).
+        """
+        return self._source
+
+    def get_status(self) -> str:
+        """Return the status of the command.
+
+        Returns:
+            str: "OK", "NO", "BAD", or STATUS_ERROR if an exception was raised.
+        """
+        return self._status
+
+    def get_wait(self) -> float:
+        """Return the time spent waiting for the first byte of the response.
+
+        Returns:
+            float: the time, in seconds.
+        """
+        return self._wait
+
+    def get_transfer(self) -> float:
+        """Return the time spent receiving the response, after its first byte.
+
+        Returns:
+            float: the time, in seconds.
+        """
+        return self._transfer
+
+    def get_parse(self) -> float:
+        """Return the time spent interpreting the response.
+
+        Returns:
+            float: the time, in seconds.
+        """
+        return self._parse
+
+    def get_duration(self) -> float:
+        """Return the total time spent by the command.
+
+        Returns:
+            float: the sum of the times spent in each phase, in seconds.
+        """
+        return self._wait + self._transfer + self._parse
+
+    def get_sent(self) -> int:
+        """Return the number of bytes sent on the wire.
+
+        Returns:
+            int: the number of bytes.
+        """
+        return self._sent
+
+    def get_received(self) -> int:
+        """Return the number of bytes received on the wire.
+
+        Returns:
+            int: the number of bytes.
+        """
+        return self._received
+
+    def get_response_size(self) -> int:
+        """Return the size of the response, before decompression.
+
+        Returns:
+            int: the number of bytes.
+        """
+        return self._response_size
+
+    def get_values(self) -> Mapping[str, Union[int, float]]:
+        """Return the measures.
+
+        Returns:
+            Mapping[str, Union[int, float]]: the measures, indexed by metric (see Registry.METRICS).
+        """
+        return {'duration': self.get_duration(), 'wait': self._wait, 'transfer': self._transfer, 'parse': self._parse,
+                'sent': self._sent, 'received': self._received, 'response_size': self._response_size}
+
+    def __repr__(self) -> str:
+        return f'CommandEvent({self._source} {self._command} {self._status} wait={self._wait:.6f} ' \
+               f'transfer={self._transfer:.6f} parse={self._parse:.6f} sent={self._sent} received={self._received})'
+
+
+class CommandTimer:
+    """This class measures a command, and passes the measures to a function when the command completes.
+
+    The time is split into phases: the code that runs the command calls received() at the end of a network phase,
+    parsed() at the end of a parsing phase, and skip() to ignore the time spent since the end of the last phase (ex:
+    the time spent by the consumer of a generator).
+
+    Usage:
+
+        with CommandTimer('SELECT', 'mail.com', connector, callback) as timer:
+            status, data = connector.select('INBOX')
+            timer.received()
+            count = int(data[0])
+            timer.parsed()
+            timer.set_status(status)
+    """
+
+    def __init__(self, command: str, source: str, connector: Any, callback: Callable[[CommandEvent], None]):
+        """Create a timer and start it.
+
+        Args:
+            command (str): the name of the command.
+            source (str): the name of the client.
+            connector (Any): the connector used to send the command (see dbeurive.imap.connector), or None if the
+                connection is not opened yet (see set_connector()).
+            callback (Callable[[CommandEvent], None]): the function called when the command completes.
+        """
+        self._command: str = command
+        self._source: str = source
+        self._callback: Callable[[CommandEvent], None] = callback
+        self._status: str = 'OK'
+        self._network: float = 0.0
+        self._parse: float = 0.0
+        self._connector: Any = connector
+        self._stats: Mapping[str, int] = {}
+        if connector is not None:
+            self._stats = connector.get_transfer_stats()
+            connector.reset_first_byte_time()
+        self._start: float = time.perf_counter()
+        self._mark: float = self._start
+
+    def set_connector(self, connector: Any) -> None:
+        """Set the connector opened by the command (see Client.connect()).
+
+        All the data exchanged by the connector since it was opened (ex: the greeting of the server) is counted.
+
+        Args:
+            connector (Any): the connector.
+        """
+        self._connector = connector
+        self._stats = {}
+
+    def set_status(self, status: str) -> None:
+        """Set the status of the command.
+
+        Args:
+            status (str): the status ("OK", "NO" or "BAD").
+        """
+        self._status = status
+
+    def received(self) -> None:
+        """Mark the end of a network phase.
+        """
+        now: float = time.perf_counter()
+        self._network += now - self._mark
+        self._mark = now
+
+    def parsed(self) -> None:
+        """Mark the end of a parsing phase.
+        """
+        now: float = time.perf_counter()
+        self._parse += now - self._mark
+        self._mark = now
+
+    def skip(self) -> None:
+        """Ignore the time spent since the end of the last phase.
+        """
+        self._mark = time.perf_counter()
+
+    def __enter__(self) -> 'CommandTimer':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        # A command rejected by the server keeps its status, even if the rejection is reported by an exception.
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit) and self._status == 'OK':
+            self._status = CommandEvent.STATUS_ERROR
+        self._callback(self._event())
+        return False
+
+    def _event(self) -> CommandEvent:
+        """Create the event that represents the measures.
+
+        Returns:
+            CommandEvent: the event.
+        """
+        wait: float = self._network
+        sent: int = 0
+        received: int = 0
+        response_size: int = 0
+        if self._connector is not None:
+            first: Union[None, float] = self._connector.get_first_byte_time()
+            if first is not None:
+                wait = min(max(first - self._start, 0.0), self._network)
+            stats: Mapping[str, int] = self._connector.get_transfer_stats()
+            sent = stats['sent_wire'] - self._stats.get('sent_wire', 0)
+            received = stats['received_wire'] - self._stats.get('received_wire', 0)
+            response_size = stats['received'] - self._stats.get('received', 0)
+        return CommandEvent(self._command, self._source, self._status, wait, self._network - wait, self._parse,
+                            sent, received, response_size)
+
+
+class NullTimer:
+    """This class implements a timer that does not measure anything.
+
+    It is used when no callback is registered, so that the instrumented code does not need to test it.
+    """
+
+    def set_connector(self, connector: Any) -> None:
+        pass
+
+    def set_status(self, status: str) -> None:
+        pass
+
+    def received(self) -> None:
+        pass
+
+    def parsed(self) -> None:
+        pass
+
+    def skip(self) -> None:
+        pass
+
+    def __enter__(self) -> 'NullTimer':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        return False
+
+
+NULL_TIMER: NullTimer = NullTimer()
+
+
+class Histogram:
+    """This class implements a histogram with logarithmic buckets.
+
+    The bucket of a value v > 0 is floor(log(v) / log(GROWTH)). Thus, the percentiles are computed with a relative
+    error lower than GROWTH - 1, whatever the range of the values, and the memory used only depends on this range.
+    """
+
+    GROWTH: float = 1.05
+
+    _log_growth: float = math.log(GROWTH)
+
+    def __init__(self):
+        """Create an empty histogram.
+        """
+        self._buckets: Mapping[int, int] = {}
+        self._zeros: int = 0
+        self._count: int = 0
+        self._sum: float = 0
+        self._min: Union[None, float] = None
+        self._max: Union[None, float] = None
+
+    def record(self, value: Union[int, float]) -> None:
+        """Add a value to the histogram.
+
+        Args:
+            value (Union[int, float]): the value. Negative values are counted as 0.
+        """
+        self._count += 1
+        if value <= 0:
+            value = 0
+            self._zeros += 1
+        else:
+            bucket: int = math.floor(math.log(value) / __class__._log_growth)
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self._sum += value
+        self._min = value if self._min is None else min(self._min, value)
+        self._max = value if self._max is None else max(self._max, value)
+
+    def get_count(self) -> int:
+        """Return the number of values.
+
+        Returns:
+            int: the number of values.
+        """
+        return self._count
+
+    def get_sum(self) -> float:
+        """Return the sum of the values.
+
+        Returns:
+            float: the sum of the values.
+        """
+        return self._sum
+
+    def get_percentile(self, percentile: float) -> Union[None, float]:
+        """Return an approximation of a percentile.
+
+        Args:
+            percentile (float): the percentile, between 0 and 100 (ex: 99).
+
+        Returns:
+            float: the approximation of the percentile.
+            None: the histogram is empty.
+        """
+        if self._count == 0:
+            return None
+        rank: int = max(1, math.ceil(self._count * percentile / 100))
+        if rank <= self._zeros:
+            return 0
+        if rank >= self._count:
+            return self._max
+        seen: int = self._zeros
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                # The middle of the bucket, within the range of the recorded values.
+                value: float = __class__.GROWTH ** (bucket + 0.5)
+                return min(max(value, self._min), self._max)
+        return self._max
+
+    def summarize(self) -> Mapping[str, Union[None, int, float]]:
+        """Return a summary of the histogram.
+
+        Returns:
+            Mapping[str, Union[None, int, float]]: the number of values ("count"), their sum, mean, minimum and maximum,
+                and the percentiles 50, 90 and 99 ("p50", "p90", "p99").
+        """
+        return {'count': self._count,
+                'sum': self._sum,
+                'mean': self._sum / self._count if self._count > 0 else None,
+                'min': self._min,
+                'max': self._max,
+                'p50': self.get_percentile(50),
+                'p90': self.get_percentile(90),
+                'p99': self.get_percentile(99)}
+
+
+class Registry:
+    """This class aggregates the events produced by the clients into histograms, per source and per command.
+
+    A registry is a callback: it can be registered on several clients, including clients used by distinct threads.
+    """
+
+    # The measures recorded for each command (see CommandEvent.get_values()).
+    METRICS: Tuple[str, ...] = ('duration', 'wait', 'transfer', 'parse', 'sent', 'received', 'response_size')
+
+    def __init__(self):
+        """Create an empty registry.
+        """
+        self._lock: threading.Lock = threading.Lock()
+        # For each source, for each command: the histograms (indexed by metric) and the numbers of events by status.
+        self._histograms: Mapping[str, Mapping[str, Mapping[str, Histogram]]] = {}
+        self._statuses: Mapping[str, Mapping[str, Mapping[str, int]]] = {}
+
+    def __call__(self, event: CommandEvent) -> None:
+        self.record(event)
+
+    def record(self, event: CommandEvent) -> None:
+        """Add an event to the registry.
+
+        Args:
+            event (CommandEvent): the event.
+        """
+        values: Mapping[str, Union[int, float]] = event.get_values()
+        with self._lock:
+            commands: Mapping[str, Mapping[str, Histogram]] = self._histograms.setdefault(event.get_source(), {})
+            histograms: Union[None, Mapping[str, Histogram]] = commands.get(event.get_command())
+            if histograms is None:
+                histograms = {metric: Histogram() for metric in __class__.METRICS}
+                commands[event.get_command()] = histograms
+            for metric in __class__.METRICS:
+                histograms[metric].record(values[metric])
+            statuses: Mapping[str, int] = self._statuses.setdefault(event.get_source(), {})\
+                .setdefault(event.get_command(), {})
+            statuses[event.get_status()] = statuses.get(event.get_status(), 0) + 1
+
+    def get_sources(self) -> List[str]:
+        """Return the names of the sources that produced events.
+
+        Returns:
+            List[str]: the names of the sources.
+        """
+        with self._lock:
+            return list(self._histograms.keys())
+
+    def get_histogram(self, source: str, command: str, metric: str) -> Union[None, Histogram]:
+        """Return a histogram.
+
+        Args:
+            source (str): the name of the source.
+            command (str): the name of the command (ex: "SELECT").
+            metric (str): the name of the metric (see METRICS).
+
+        Returns:
+            Histogram: the histogram.
+            None: no event has been recorded for this source and this command.
+        """
+        with self._lock:
+            histograms: Union[None, Mapping[str, Histogram]] = self._histograms.get(source, {}).get(command)
+            return None if histograms is None else histograms.get(metric)
+
+    def dump(self, source: Union[None, str] = None) -> Mapping[str, Any]:
+        """Return the summaries of the histograms.
+
+        Args:
+            source (Union[None, str]): the name of a source. None means "all the sources".
+
+        Returns:
+            Mapping[str, Any]: if a source is given, then the summaries indexed by command, then by metric. For
+                example: {"SELECT": {"statuses": {"OK": 12}, "wait": {"count": 12, "p50": 0.021, ...}, ...}}.
+                Otherwise, the summaries of all the sources, indexed by source.
+        """
+        with self._lock:
+            if source is not None:
+                return self._dump(source)
+            return {name: self._dump(name) for name in self._histograms}
+
+    def reset(self) -> None:
+        """Remove all the events.
+        """
+        with self._lock:
+            self._histograms = {}
+            self._statuses = {}
+
+    def _dump(self, source: str) -> Mapping[str, Any]:
+        result: Mapping[str, Any] = {}
+        for command, histograms in self._histograms.get(source, {}).items():
+            result[command] = {'statuses': dict(self._statuses[source][command])}
+            for metric, histogram in histograms.items():
+                result[command][metric] = histogram.summarize()
+        return result
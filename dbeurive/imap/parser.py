@@ -1,24 +1,33 @@
 # -*- coding: utf-8 -*-
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Mapping, Any
 import re
+from dbeurive.imap.id_set import IdSet
 
 
 
 class ListEmailIds:
+    """This class converts the result of the "search" command into a list of tokens.
+
+    It is kept for compatibility: the client uses IdSet.from_bytes() (see Client._search()), which this class wraps.
+    Please note that the IDs are sorted, and that duplicates are removed.
+    """
 
     TYPE_ID = 0
     _tokens: List[Tuple[int, str]] = []
 
     @staticmethod
     def parse(text: str) -> bool:
-        text = text.strip()
-        __class__._tokens = list(map(lambda x: (__class__.TYPE_ID, x), re.split('\s+', text)))
+        try:
+            ids: IdSet = IdSet.from_bytes(text.encode('ascii'))
+        except (ValueError, OverflowError, UnicodeEncodeError):
+            __class__._tokens = []
+            return False
+        __class__._tokens = [(__class__.TYPE_ID, str(i)) for i in ids]
         return True
 
     @staticmethod
     def reset() -> None:
         __class__._tokens = []
-        pass
 
     @staticmethod
     def get_tokens() -> List[Tuple[int, str]]:
@@ -26,207 +35,316 @@ class ListEmailIds:
 
     @staticmethod
     def get_tokens_values() -> List[str]:
-        return list(map(lambda x: x[1], __class__._tokens))
+        return [token[1] for token in __class__._tokens]
+
 
 class ListMailbox:
     """This class implements the parser that process the result of the "list" command.
 
-    The parser takes a line of text as input and produces a list of tokens.
+    The parser takes a line of raw data as input and produces a list of tokens.
 
     A token is a tuple that contains 2 values:
 
-    * the first value is the type of the token. It can be: TYPE_CME or TYPE_PATH.
+    * the first value is the type of the token. It can be: TYPE_CME, TYPE_PATH or TYPE_NIL.
     * the second value is the value of the token.
-      Examples: "\\HasNoChildren", "INBOX" or "/".
+      Examples: "\\HasNoChildren", "INBOX" or "/" (None for TYPE_NIL).
+
+    The line is scanned once, from left to right, by a single regular expression. The tokens are stored within the
+    parser instance: distinct instances can be used concurrently.
+
+    Usage:
+
+        parser = ListMailbox()
+        if parser.parse(b'(\\HasNoChildren) "/" "INBOX"'):
+            print(parser.get_tokens())
+
+        tokens = ListMailbox.tokenize(b'(\\HasNoChildren) "/" "INBOX"')
     """
 
-    _TYPE_UNKNOWN   = -1
-    _TYPE_CME_LIST  = 0
-    _TYPE_EMPTY_CME = 1
     TYPE_CME        = 2
     TYPE_PATH       = 3
+    TYPE_NIL        = 4
+
+    # Each match consumes one token and the spaces that follow it.
+    _token_re = re.compile(br'''
+        (?:
+            \((?P<cme>[^()]*)\)                 # list of flags: (\HasNoChildren \Sent)
+          | "(?P<quoted>(?:\\.|[^"\\])*)"       # quoted string: "My \"Mailbox\""
+          | \{(?P<literal>\d+)\}$               # literal specification: {12}
+          | (?P<atom>[^\s()"{\\%*]+)            # atom: INBOX, /, NIL
+        )
+        [ ]*
+    ''', re.X)
+    _cme_re = re.compile(br'\\[^\s()"\\%*{]+')
+    _escape_re = re.compile(br'\\(.)')
+
+    def __init__(self):
+        """Create a parser.
+        """
+        self._tokens: List[Tuple[int, Union[None, str]]] = []
 
-    _backslash = re.escape('\\')
-    _empty_cme_re = re.compile(f'[(][)]')
-    _cme_re = re.compile(f'[(](((%s[a-zA-Z]+)\s+)*(%s[a-zA-Z]+))[)]' %(_backslash, _backslash))
-    _path_re1 = re.compile(f'(?<!%s)"(((?<=%s)"|[^"])+)(?<!%s)"' % (_backslash, _backslash, _backslash))
-    _path_re2 = re.compile(f'((\/|\|)|([a-z_]+))', re.I)
-    _tokens: List[Tuple[int, str]] = []
-
-    @staticmethod
-    def parse(text: str) -> bool:
-        """Parse a given text.
+    def parse(self, data: bytes, literal: Union[None, bytes] = None) -> bool:
+        """Parse a line of raw data returned by the "list" command.
 
         Args:
-            text (str): the text to parse.
+            data (bytes): the line to parse (ex: b'(\\HasNoChildren) "/" "INBOX"').
+            literal (Union[None, bytes]): the literal that follows the line, if the line ends with the specification
+                of a literal (ex: b'(\\HasNoChildren) "/" {5}'). The literal is the name of the mailbox.
 
         Returns:
             bool: upon successful completion, the method returns the value True.
                 Otherwise, it returns the value False.
         """
-
-        while len(text) > 0:
-            token_type, value = __class__._get_token(text)
-            if __class__._TYPE_UNKNOWN == token_type:
+        tokens: List[Tuple[int, Union[None, str]]] = []
+        self._tokens = tokens
+        match = __class__._token_re.match
+        length: int = len(data)
+        pos: int = 0
+        while pos < length and data[pos] == 0x20:
+            pos += 1
+        while pos < length:
+            m = match(data, pos)
+            if m is None:
                 return False
-
-            token = value[0]
-            total_len = value[1]
-
-            text = text[total_len:]
-            text = str.strip(text)
-
-            if __class__._TYPE_EMPTY_CME == token_type:
-              continue
-
-            if __class__.TYPE_PATH == token_type:
-                __class__._tokens.append((token_type, token))
-                continue
-
-            assert __class__._TYPE_CME_LIST == token_type
-
-            for cme in re.split('\s+', token):
-                __class__._tokens.append((__class__.TYPE_CME, cme))
-
+            pos = m.end()
+            kind: str = m.lastgroup
+            value: bytes = m.group(kind)
+            if kind == 'cme':
+                for cme in value.split():
+                    if __class__._cme_re.fullmatch(cme) is None:
+                        return False
+                    tokens.append((__class__.TYPE_CME, cme.decode()))
+            elif kind == 'quoted':
+                if b'\\' in value:
+                    value = __class__._escape_re.sub(br'\1', value)
+                tokens.append((__class__.TYPE_PATH, value.decode(errors='replace')))
+            elif kind == 'literal':
+                if literal is None or len(literal) != int(value):
+                    return False
+                tokens.append((__class__.TYPE_PATH, literal.decode(errors='replace')))
+            elif value.upper() == b'NIL':
+                tokens.append((__class__.TYPE_NIL, None))
+            else:
+                tokens.append((__class__.TYPE_PATH, value.decode(errors='replace')))
         return True
 
     @staticmethod
-    def reset() -> None:
-        """Reset the parser internal states.
-        """
-        __class__._tokens = []
+    def tokenize(data: bytes, literal: Union[None, bytes] = None) -> Union[None, List[Tuple[int, Union[None, str]]]]:
+        """Parse a line of raw data returned by the "list" command, and return the tokens.
 
-    @staticmethod
-    def get_tokens() -> List[Tuple[int, str]]:
-
-        """Return the tokens extracted while parsing the given text.
+        Args:
+            data (bytes): the line to parse.
+            literal (Union[None, bytes]): the literal that follows the line, if any.
 
         Returns:
-            List[Tuple[int, str]]: the list of tokens.
+            List[Tuple[int, Union[None, str]]]: upon successful completion, the method returns the list of tokens.
+            None: if the line is not valid, then the method returns the value None.
         """
+        parser = ListMailbox()
+        return parser.get_tokens() if parser.parse(data, literal) else None
 
-        return __class__._tokens
+    def get_tokens(self) -> List[Tuple[int, Union[None, str]]]:
+        """Return the tokens extracted while parsing the given data.
 
-    @staticmethod
-    def get_tokens_values() -> List[str]:
+        Returns:
+            List[Tuple[int, Union[None, str]]]: the list of tokens.
+        """
+        return self._tokens
+
+    def get_tokens_values(self) -> List[Union[None, str]]:
         """Return the values of the tokens.
 
         Returns:
-            List[str]: the tokens' values.
+            List[Union[None, str]]: the tokens' values.
         """
-        return list(map(lambda x: x[1], __class__._tokens))
+        return [token[1] for token in self._tokens]
 
-    @staticmethod
-    def _get_token(text: str) -> Tuple[int, Union[Tuple[str, int], None]]:
-        """Search for the first token in a given text.
 
-        Args:
-            text (str): text in which to search for tokens.
+class DataParser:
+    """This class implements a parser for the data items sent by the server (RFC 3501, section 4).
 
-        Returns:
-            Tuple[str, int]: Upon successful completion the method returns a token.
-            None: if an error occurs, the method returns the value None.
-        """
-        r = __class__._get_empty_cme(text)
-        if r is not None:
-            return __class__._TYPE_EMPTY_CME, r
+    The parser processes a response made of several parts: lines of text and literals.
+    For example, the response:
+
+        * 12 FETCH (UID 5 BODY[] {5}
+        hello)
 
-        r = __class__._get_cme_list(text)
-        if r is not None:
-            return __class__._TYPE_CME_LIST, r
+    is made of 3 parts: b'12 (UID 5 BODY[] {5}', b'hello' and b')'. Every part, but the last one, that is a line of
+    text ends with the specification of the literal that follows it.
 
-        r = __class__._get_path1(text)
-        if r is not None:
-            return __class__.TYPE_PATH, r
+    The parser produces the following values:
 
-        r = __class__._get_path2(text)
-        if r is not None:
-            return __class__.TYPE_PATH, r
+    * parenthesized lists are converted into lists.
+    * NIL is converted into None.
+    * quoted strings are converted into strings (str).
+    * literals are converted into bytes.
+    * other atoms are converted into strings (str). Section specifications are kept within the atoms.
+      For example: "BODY[HEADER.FIELDS (FROM TO)]<0>".
+    """
 
-        return __class__._TYPE_UNKNOWN, None
+    _literal_re = re.compile(br'{(\d+)}$')
 
-    @staticmethod
-    def _get_empty_cme(text: str) -> Union[None, Tuple[str, int]]:
-        """Try to extract an empty list of CME from a given text.
+    def __init__(self, parts: List[bytes]):
+        """Create a parser.
 
         Args:
-            text (str): input text.
+            parts (List[bytes]): the parts of the response.
+        """
+        self._parts: List[bytes] = parts
+        self._part: int = 0
+        self._text: bytes = parts[0] if len(parts) > 0 else b''
+        self._pos: int = 0
+
+    def at_end(self) -> bool:
+        """Test whether all the data has been parsed.
 
         Returns:
-            Tuple[str, int]: if the given text starts with an empty CME, then the method returns a tuple that contains 2
-            values:
-                * the first value is the value of the token (in this case, this is an empty string).
-                * the second value is the total length of the string that contains the tokens.
-            None: if the given text does not start with an empty CME, then the method returns the value None.
+            bool: if all the data has been parsed, then the method returns the value True.
+                Otherwise, it returns the value False.
         """
-        r: re.Match = __class__._empty_cme_re.match(text)
-        if r is None:
-            return None
-        else:
-            return '', r.end(0)
+        self._skip_spaces()
+        return self._pos >= len(self._text) and self._part >= len(self._parts) - 1
 
-    @staticmethod
-    def _get_cme_list(text: str) -> Union[None, Tuple[str, int]]:
-        """Try to extract a list of CMEs. For example: (\\Drafts \\NoInferiors)
-
-        Args:
-            text (str): input text.
+    def read_value(self) -> Any:
+        """Read the next value.
 
         Returns:
-            Tuple[str, int]: if the given text starts with a list of CME, then the method returns a tuple that contains 2
-            values:
-                * the first value is the value of the token (the string that represents the list of CME).
-                * the second value is the total length of the string that contains the tokens.
-            None: if the given text does not start with a list of CME, then the method returns the value None.
+            Any: the value.
+
+        Raises:
+            ValueError: if the data is not valid.
         """
-        r: re.Match = __class__._cme_re.match(text)
-        if r is None:
-            return None
-        else:
-            return r.group(1), r.end(0)
+        self._skip_spaces()
+        text: bytes = self._text
+        if self._pos >= len(text):
+            raise ValueError('Unexpected end of data')
+        c: int = text[self._pos]
+        if c == 0x28:  # (
+            self._pos += 1
+            values: List[Any] = []
+            while True:
+                self._skip_spaces()
+                if self._pos < len(self._text) and self._text[self._pos] == 0x29:  # )
+                    self._pos += 1
+                    return values
+                values.append(self.read_value())
+        if c == 0x22:  # "
+            return self._read_quoted()
+        if c == 0x7b:  # {
+            return self._read_literal()
+        return self._read_atom()
+
+    def _skip_spaces(self) -> None:
+        while self._pos < len(self._text) and self._text[self._pos] in b' \t\r\n':
+            self._pos += 1
+
+    def _read_quoted(self) -> str:
+        text: bytes = self._text
+        pos: int = self._pos + 1
+        chunks: List[bytes] = []
+        start: int = pos
+        while pos < len(text):
+            c: int = text[pos]
+            if c == 0x5c:  # backslash
+                chunks.append(text[start:pos])
+                start = pos + 1
+                pos += 2
+                continue
+            if c == 0x22:
+                chunks.append(text[start:pos])
+                self._pos = pos + 1
+                return b''.join(chunks).decode('utf-8', 'replace')
+            pos += 1
+        raise ValueError('Unterminated quoted string')
+
+    def _read_literal(self) -> bytes:
+        m = __class__._literal_re.match(self._text, self._pos)
+        if m is None or m.end() != len(self._text) or self._part + 2 >= len(self._parts):
+            raise ValueError('Invalid literal')
+        literal: bytes = self._parts[self._part + 1]
+        if len(literal) != int(m.group(1)):
+            raise ValueError('Invalid literal length')
+        self._part += 2
+        self._text = self._parts[self._part]
+        self._pos = 0
+        return literal
+
+    def _read_atom(self) -> Union[None, str]:
+        text: bytes = self._text
+        pos: int = self._pos
+        depth: int = 0
+        while pos < len(text):
+            c: int = text[pos]
+            if c == 0x5b:  # [
+                depth += 1
+            elif c == 0x5d:  # ]
+                depth -= 1
+            elif depth == 0 and c in b' ()':
+                break
+            pos += 1
+        if pos == self._pos:
+            raise ValueError(f'Unexpected character "{chr(text[pos])}"')
+        atom: str = text[self._pos:pos].decode('utf-8', 'replace')
+        self._pos = pos
+        return None if atom.upper() == 'NIL' else atom
+
+
+class FetchResponse:
+    """This class implements the parser that processes the responses to the "fetch" command.
+
+    A response such as b'12 (UID 5 FLAGS (\\Seen) RFC822.SIZE 1024)' is converted into the message sequence number
+    (12) and a dictionary that associates the names of the data items (in upper case) with their values:
+    {'UID': '5', 'FLAGS': ['\\Seen'], 'RFC822.SIZE': '1024'}.
+    """
 
     @staticmethod
-    def _get_path1(text: str) -> Union[None, Tuple[str, int]]:
-        """Try to extract a path surrounded by "". For example: "INBOX"
+    def parse(parts: List[bytes]) -> Tuple[int, Mapping[str, Any]]:
+        """Parse the response to the "fetch" command for one message.
 
         Args:
-            text (str): input text.
+            parts (List[bytes]): the parts (lines of text and literals) of the response.
 
         Returns:
-            Tuple[str, int]: if the given text starts with a path surrounded by "", then the method returns a tuple that contains 2
-            values:
-                * the first value is the value of the token (the string that represents the path).
-                * the second value is the total length of the string that contains the tokens.
-            None: if the given text does not start with a path surrounded by "", then the method returns the value None.
+            Tuple[int, Mapping[str, Any]]: the method returns the message sequence number and the data items.
+
+        Raises:
+            ValueError: if the response is not valid.
         """
-        r: re.Match = __class__._path_re1.match(text)
-        if r is None:
-            return None
-        else:
-            return r.group(1), r.end(0)
+        parser = DataParser(parts)
+        number = parser.read_value()
+        items = parser.read_value()
+        if not isinstance(number, str) or not number.isdigit() or not isinstance(items, list) or len(items) % 2 != 0:
+            raise ValueError('Invalid FETCH response')
+        result: Mapping[str, Any] = {}
+        for i in range(0, len(items), 2):
+            if not isinstance(items[i], str):
+                raise ValueError('Invalid FETCH data item name')
+            result[items[i].upper()] = items[i + 1]
+        return int(number), result
 
     @staticmethod
-    def _get_path2(text: str) -> Union[None, Tuple[str, int]]:
-        """Try to extract a path (without surrounding ""). For example: INBOX
+    def group(data: List[Union[bytes, Tuple[bytes, bytes]]]) -> List[List[bytes]]:
+        """Group the raw data returned by imaplib for the "fetch" command by message.
+
+        imaplib represents a response that contains literals as a series of tuples (line, literal) followed by the
+        last line of the response. For example: [(b'1 (BODY[] {5}', b'hello'), b')', b'2 (FLAGS ())']
 
         Args:
-            text (str): input text.
+            data (List[Union[bytes, Tuple[bytes, bytes]]]): the raw data.
 
         Returns:
-            Tuple[str, int]: if the given text starts with a path (without surrounding ""), then the method returns a tuple that contains 2
-            values:
-                * the first value is the value of the token (the string that represents the path).
-                * the second value is the total length of the string that contains the tokens.
-            None: if the given text does not start with a path (without surrounding ""), then the method returns the value None.
+            List[List[bytes]]: for each message, the list of parts of the response.
+                For example: [[b'1 (BODY[] {5}', b'hello', b')'], [b'2 (FLAGS ())']]
         """
-        r: re.Match = __class__._path_re2.match(text)
-        if r is None:
-            return None
-        else:
-            if r.group(2) is None:
-                return r.group(3), r.end(0)
-            else:
-                return r.group(2), r.end(0)
-
-
-
+        result: List[List[bytes]] = []
+        current: List[bytes] = []
+        for element in data:
+            if element is None:
+                continue
+            if isinstance(element, tuple):
+                current.extend(element)
+                continue
+            current.append(element)
+            result.append(current)
+            current = []
+        return result
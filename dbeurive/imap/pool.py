@@ -0,0 +1,459 @@
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Mapping, Union, Tuple, Iterator, Iterable, Callable, Set
+from dbeurive.imap.client import Client
+from dbeurive.imap.metrics import CommandEvent
+from dbeurive.imap.config import Config
+from dbeurive.imap.accounts import AccountRegistry
+
+
+class Pool:
+    """This class implements a pool of authenticated clients.
+
+    The clients are created from a configuration and are identified by the names of the ISPs (see Config.get_isps()).
+
+    * The number of connections opened to a given server (hostname and port) is limited.
+    * Before a client is handed out, the pool checks that its connection is still alive.
+    * Clients that stay unused for too long are disconnected.
+    * The pool remembers the mailbox selected by each client. Thus, if a client already selected the requested mailbox,
+      then the mailbox is not selected again.
+    * The configuration can be replaced while the pool is used (see reload()). Only the clients of the ISPs that were
+      modified or removed are disconnected.
+
+    Usage:
+
+        pool = Pool(config)
+        with pool.connection('mail.com', 'INBOX') as client:
+            ids = client.list_emails_ids()
+        pool.close()
+    """
+
+    def __init__(self, config: Config, max_connections: int = 4, idle_timeout: float = 300.0, use_ssl: bool = True,
+                 use_compression: bool = False, ssl_context: Union[None, ssl.SSLContext] = None,
+                 callbacks: Iterable[Callable[[CommandEvent], None]] = ()):
+        """Create a pool.
+
+        Args:
+            config (Config): the configuration, or an AccountRegistry (see dbeurive.imap.accounts).
+            max_connections (int): maximum number of connections opened to the same server.
+            idle_timeout (float): number of seconds after which an unused connection is closed.
+            use_ssl (bool): flag that indicates whether the connections must be encrypted (TLS) or not.
+            use_compression (bool): flag that indicates whether the data must be compressed (COMPRESS=DEFLATE) or not,
+                if the servers support it.
+            ssl_context (Union[None, ssl.SSLContext]): the SSL context shared by the clients. The TLS sessions are
+                resumed when a client reconnects to a server.
+            callbacks (Iterable[Callable[[CommandEvent], None]]): the functions called with the measures of each
+                command sent by the clients (see Client.add_callback()). The clients are named after the ISPs.
+        """
+        self._config: Config = config
+        self._max_connections: int = max_connections
+        self._idle_timeout: float = idle_timeout
+        self._use_ssl: bool = use_ssl
+        self._use_compression: bool = use_compression
+        self._ssl_context: Union[None, ssl.SSLContext] = ssl_context
+        self._callbacks: List[Callable[[CommandEvent], None]] = list(callbacks)
+        self._condition: threading.Condition = threading.Condition()
+        # For each ISP: the list of unused clients, associated with the time they were released.
+        self._idle: Mapping[str, List[Tuple[Client, float]]] = {}
+        # For each server: the number of opened connections (used or not).
+        self._opened: Mapping[str, int] = {}
+        # For each client handed out: the name of the ISP and the server.
+        self._in_use: Mapping[int, Tuple[str, str]] = {}
+        # The clients handed out whose configuration was modified or removed since: they are disconnected when they
+        # are returned to the pool.
+        self._stale: Set[int] = set()
+        # For each ISP modified by reload(): the number of modifications.
+        self._generations: Mapping[str, int] = {}
+        self._closed: bool = False
+
+    def acquire(self, isp_name: str, mailbox: Union[None, str] = None, readonly: bool = False,
+                timeout: Union[None, float] = None) -> Client:
+        """Get an authenticated client for a given ISP.
+
+        Please note that the client must be returned to the pool (see release()).
+
+        Args:
+            isp_name (str): the name of the ISP.
+            mailbox (Union[None, str]): optional name of a mailbox to select.
+            readonly (bool): specify whether the access to the mailbox is restricted to read only or not.
+            timeout (Union[None, float]): maximum number of seconds to wait for a connection to become available.
+                The default value None means "wait forever".
+
+        Returns:
+            Client: an authenticated client.
+
+        Raises:
+            Exception: if no client is available within the given delay, or if the client cannot be authenticated.
+        """
+        deadline: Union[None, float] = None if timeout is None else time.monotonic() + timeout
+        client: Union[None, Client] = None
+        # The clients disconnected by the pool are logged out outside of the critical section.
+        dropped: List[Client] = []
+
+        try:
+            with self._condition:
+                server: str = self._server(isp_name)
+                generation: int = self._generations.get(isp_name, 0)
+                while client is None:
+                    if self._closed:
+                        raise Exception('The pool is closed!')
+                    dropped.extend(self._evict_idle())
+                    client = self._take_idle(isp_name, mailbox, readonly)
+                    if client is not None:
+                        break
+                    if self._opened.get(server, 0) >= self._max_connections:
+                        victim: Union[None, Client] = self._drop_idle_for_server(server)
+                        if victim is not None:
+                            dropped.append(victim)
+                    if self._opened.get(server, 0) < self._max_connections:
+                        # Reserve the connection, and open it outside of the critical section.
+                        self._opened[server] = self._opened.get(server, 0) + 1
+                        break
+                    remaining: Union[None, float] = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise Exception(f'No connection available for ISP "{isp_name}" ({server})!')
+                    self._condition.wait(remaining)
+        finally:
+            for victim in dropped:
+                victim.logout()
+
+        if client is None:
+            try:
+                client = self._open(isp_name)
+            except Exception:
+                with self._condition:
+                    self._opened[server] -= 1
+                    self._condition.notify_all()
+                raise
+        elif not client.noop():
+            # The connection is dead: replace it.
+            client.logout()
+            try:
+                client = self._open(isp_name)
+            except Exception:
+                with self._condition:
+                    self._opened[server] -= 1
+                    self._condition.notify_all()
+                raise
+
+        with self._condition:
+            self._in_use[id(client)] = (isp_name, server)
+            if self._generations.get(isp_name, 0) != generation:
+                # The configuration of the ISP was modified while the client was opened.
+                self._stale.add(id(client))
+
+        if mailbox is not None and (client.get_selected_mailbox() != mailbox or client.is_selected_readonly() != readonly):
+            try:
+                client.select_mailbox(mailbox, readonly)
+            except Exception:
+                self.release(client)
+                raise
+        return client
+
+    def release(self, client: Client, discard: bool = False) -> None:
+        """Return a client to the pool.
+
+        Args:
+            client (Client): the client to return.
+            discard (bool): flag that indicates whether the client must be disconnected or not.
+                This flag should be set if an error occurred while using the client.
+        """
+        with self._condition:
+            owner: Union[None, Tuple[str, str]] = self._in_use.pop(id(client), None)
+            if owner is None:
+                raise Exception('The client does not belong to the pool!')
+            isp_name, server = owner
+            if id(client) in self._stale:
+                self._stale.discard(id(client))
+                discard = True
+            if discard or self._closed or not client.is_authenticated():
+                self._opened[server] -= 1
+            else:
+                self._idle.setdefault(isp_name, []).append((client, time.monotonic()))
+            self._condition.notify_all()
+        if discard or self._closed:
+            client.logout()
+
+    @contextmanager
+    def connection(self, isp_name: str, mailbox: Union[None, str] = None, readonly: bool = False,
+                   timeout: Union[None, float] = None) -> Iterator[Client]:
+        """Get an authenticated client for a given ISP, and return it to the pool once it is no longer used.
+
+        If an exception is raised while the client is used, then the client is disconnected.
+
+        Args:
+            isp_name (str): the name of the ISP.
+            mailbox (Union[None, str]): optional name of a mailbox to select.
+            readonly (bool): specify whether the access to the mailbox is restricted to read only or not.
+            timeout (Union[None, float]): maximum number of seconds to wait for a connection to become available.
+
+        Returns:
+            Iterator[Client]: an authenticated client.
+        """
+        client: Client = self.acquire(isp_name, mailbox, readonly, timeout)
+        try:
+            yield client
+        except BaseException:
+            self.release(client, discard=True)
+            raise
+        self.release(client)
+
+    def warm_up(self, count: int = 1, isp_names: Union[None, List[str]] = None, workers: int = 8) -> Mapping[str, int]:
+        """Open and authenticate clients in parallel, so that they are ready when they are requested.
+
+        This method should be called at process start. The limit on the number of connections per server is respected.
+        Errors are ignored: the connections that cannot be opened are opened again (or the errors are reported) when
+        clients are requested.
+
+        Args:
+            count (int): the number of unused clients to prepare for each ISP.
+            isp_names (Union[None, List[str]]): the names of the ISPs. The default value None means "all the ISPs of
+                the configuration".
+            workers (int): the maximum number of connections opened at the same time.
+
+        Returns:
+            Mapping[str, int]: for each ISP, the number of unused clients once the method returns.
+
+        Raises:
+            Exception: if the pool is closed.
+        """
+        isp_names = self._config.get_isps() if isp_names is None else isp_names
+        jobs: List[Tuple[str, str, int]] = []
+        with self._condition:
+            if self._closed:
+                raise Exception('The pool is closed!')
+            for isp_name in isp_names:
+                server: str = self._server(isp_name)
+                for _ in range(count - len(self._idle.get(isp_name, []))):
+                    if self._opened.get(server, 0) >= self._max_connections:
+                        break
+                    # Reserve the connection, and open it outside of the critical section. The server and the
+                    # generation are recorded, since the configuration may be reloaded in the meantime.
+                    self._opened[server] = self._opened.get(server, 0) + 1
+                    jobs.append((isp_name, server, self._generations.get(isp_name, 0)))
+
+        def open_client(job: Tuple[str, str, int]) -> None:
+            name, server, generation = job
+            client: Union[None, Client] = None
+            try:
+                client = self._open(name)
+            except Exception:
+                pass
+            with self._condition:
+                # The client is not kept if the ISP was modified or removed while it was opened.
+                keep: bool = client is not None and not self._closed and \
+                    self._generations.get(name, 0) == generation
+                if keep:
+                    self._idle.setdefault(name, []).append((client, time.monotonic()))
+                else:
+                    self._opened[server] -= 1
+                self._condition.notify_all()
+            if client is not None and not keep:
+                client.logout()
+
+        if len(jobs) > 0:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as executor:
+                list(executor.map(open_client, jobs))
+        return {isp_name: self.count_idle(isp_name) for isp_name in isp_names}
+
+    def reload(self, config: Config) -> Tuple[List[str], List[str], List[str]]:
+        """Replace the configuration, and apply the differences only.
+
+        * The clients of the ISPs that are not modified stay connected.
+        * The unused clients of the ISPs that are modified (server, path separator or credentials) or removed are
+          disconnected. The clients in use are disconnected when they are returned to the pool.
+        * The clients of the new ISPs are opened when they are requested.
+
+        Args:
+            config (Config): the new configuration, or an AccountRegistry (see dbeurive.imap.accounts).
+
+        Returns:
+            Tuple[List[str], List[str], List[str]]: the names of the ISPs added, removed and modified.
+        """
+        old: Config = self._config
+        if isinstance(old, AccountRegistry) and isinstance(config, AccountRegistry):
+            # The encrypted credentials of the unchanged accounts are not decrypted.
+            added, removed, changed = old.diff(config)
+        else:
+            added, removed, changed = Config.diff_conf(old.get_conf(), config.get_conf())
+
+        with self._condition:
+            clients: List[Client] = []
+            for isp_name in removed + changed:
+                idle: List[Tuple[Client, float]] = self._idle.pop(isp_name, [])
+                if len(idle) > 0:
+                    self._opened[self._server(isp_name)] -= len(idle)
+                    clients.extend([c for c, _ in idle])
+                self._generations[isp_name] = self._generations.get(isp_name, 0) + 1
+            stale: Set[str] = set(removed + changed)
+            self._stale.update([key for key, (isp_name, _) in self._in_use.items() if isp_name in stale])
+            self._config = config
+            self._condition.notify_all()
+        for client in clients:
+            client.logout()
+        return added, removed, changed
+
+    def evict_idle(self) -> int:
+        """Disconnect the clients that stay unused for too long.
+
+        Returns:
+            int: the number of disconnected clients.
+        """
+        with self._condition:
+            expired: List[Client] = self._evict_idle()
+        for client in expired:
+            client.logout()
+        return len(expired)
+
+    def close(self) -> None:
+        """Disconnect all unused clients and close the pool.
+
+        Clients currently in use are disconnected when they are returned to the pool.
+        """
+        with self._condition:
+            self._closed = True
+            clients: List[Client] = [c for idle in self._idle.values() for c, _ in idle]
+            for isp_name, idle in self._idle.items():
+                self._opened[self._server(isp_name)] -= len(idle)
+            self._idle = {}
+            self._condition.notify_all()
+        for client in clients:
+            client.logout()
+
+    def count_connections(self, isp_name: Union[None, str] = None) -> int:
+        """Return the number of opened connections.
+
+        Args:
+            isp_name (Union[None, str]): optional name of an ISP. If specified, then the method returns the number of
+                connections opened to the server of this ISP.
+
+        Returns:
+            int: the number of opened connections.
+        """
+        with self._condition:
+            if isp_name is None:
+                return sum(self._opened.values())
+            return self._opened.get(self._server(isp_name), 0)
+
+    def count_idle(self, isp_name: Union[None, str] = None) -> int:
+        """Return the number of unused clients.
+
+        Args:
+            isp_name (Union[None, str]): optional name of an ISP.
+
+        Returns:
+            int: the number of unused clients.
+        """
+        with self._condition:
+            if isp_name is None:
+                return sum([len(idle) for idle in self._idle.values()])
+            return len(self._idle.get(isp_name, []))
+
+    def _server(self, isp_name: str) -> str:
+        """Return the identifier of the server used by a given ISP.
+
+        Args:
+            isp_name (str): the name of the ISP.
+
+        Returns:
+            str: the identifier of the server ("hostname:port").
+        """
+        return f'{self._config.get_hostname(isp_name)}:{self._config.get_port(isp_name)}'
+
+    def _open(self, isp_name: str) -> Client:
+        """Create a new client, connect it to the server and authenticate it.
+
+        Args:
+            isp_name (str): the name of the ISP.
+
+        Returns:
+            Client: the authenticated client.
+
+        Raises:
+            Exception: if the client cannot be connected or authenticated.
+        """
+        client = Client(self._config.get_hostname(isp_name),
+                        self._config.get_port(isp_name),
+                        self._config.get_user_login(isp_name),
+                        self._config.get_user_password(isp_name),
+                        self._config.get_path_set(isp_name),
+                        use_ssl=self._use_ssl,
+                        use_compression=self._use_compression,
+                        ssl_context=self._ssl_context,
+                        name=isp_name,
+                        callbacks=self._callbacks)
+        if not client.connect():
+            raise Exception(f'Cannot connect to the server of ISP "{isp_name}": {client.get_last_error()}')
+        if not client.login():
+            client.logout()
+            raise Exception(f'Cannot log to the server of ISP "{isp_name}": {client.get_last_error()}')
+        return client
+
+    def _take_idle(self, isp_name: str, mailbox: Union[None, str], readonly: bool) -> Union[None, Client]:
+        """Take an unused client for a given ISP, if any.
+
+        Clients that already selected the requested mailbox are preferred.
+        Must be called while holding the lock.
+
+        Args:
+            isp_name (str): the name of the ISP.
+            mailbox (Union[None, str]): the mailbox to select, if any.
+            readonly (bool): specify whether the access to the mailbox is restricted to read only or not.
+
+        Returns:
+            Client: an unused client.
+            None: no unused client is available.
+        """
+        idle: List[Tuple[Client, float]] = self._idle.get(isp_name, [])
+        if len(idle) == 0:
+            return None
+        index: int = len(idle) - 1
+        if mailbox is not None:
+            for i in range(len(idle) - 1, -1, -1):
+                c: Client = idle[i][0]
+                if c.get_selected_mailbox() == mailbox and c.is_selected_readonly() == readonly:
+                    index = i
+                    break
+        return idle.pop(index)[0]
+
+    def _drop_idle_for_server(self, server: str) -> Union[None, Client]:
+        """Remove an unused client connected to a given server from the pool, in order to free a connection slot.
+
+        Must be called while holding the lock. The caller must log the client out, once the lock is released.
+
+        Args:
+            server (str): the identifier of the server.
+
+        Returns:
+            Client: the removed client.
+            None: no unused client is connected to the server.
+        """
+        for isp_name, idle in self._idle.items():
+            if len(idle) > 0 and self._server(isp_name) == server:
+                client, _ = idle.pop(0)
+                self._opened[server] -= 1
+                return client
+        return None
+
+    def _evict_idle(self) -> List[Client]:
+        """Remove the clients that stay unused for too long from the pool.
+
+        Must be called while holding the lock. The caller must log the clients out, once the lock is released: a slow
+        server must not block the other threads.
+
+        Returns:
+            List[Client]: the removed clients.
+        """
+        limit: float = time.monotonic() - self._idle_timeout
+        expired: List[Client] = []
+        for isp_name, idle in self._idle.items():
+            clients: List[Client] = [c for c, t in idle if t < limit]
+            if len(clients) == 0:
+                continue
+            idle[:] = [(c, t) for c, t in idle if t >= limit]
+            self._opened[self._server(isp_name)] -= len(clients)
+            expired.extend(clients)
+        return expired
@@ -0,0 +1,133 @@
+"""This module implements the reloading of the configuration of a pool, when the configuration file is modified.
+
+The file is polled: when its modification time (or its size) changes, the file is loaded again, and the differences are
+applied to the pool (see Pool.reload()). The clients of the unchanged ISPs keep their connections.
+
+    pool = Pool(Config.get_conf_from_file('isp.yaml'))
+    watcher = ConfigWatcher('isp.yaml', pool, interval=5.0)
+    watcher.start()
+    ...
+    watcher.stop()
+    pool.close()
+"""
+
+import os
+import threading
+from typing import List, Tuple, Union, Callable
+from dbeurive.imap.config import Config
+from dbeurive.imap.pool import Pool
+
+
+class ConfigWatcher:
+    """This class watches a configuration file, and reloads the configuration of a pool when the file is modified.
+    """
+
+    def __init__(self, path: str, pool: Pool, loader: Union[None, Callable[[str], Config]] = None,
+                 interval: float = 5.0, callback: Union[None, Callable[[List[str], List[str], List[str]], None]] = None):
+        """Create a watcher.
+
+        The configuration of the pool is supposed to be the current content of the file.
+
+        Args:
+            path (str): the path to the configuration file.
+            pool (Pool): the pool.
+            loader (Union[None, Callable[[str], Config]]): the function that loads the file. It may return an
+                AccountRegistry (ex: AccountRegistry.from_file). The default value None means "use
+                Config.get_conf_from_file".
+            interval (float): the number of seconds between two checks (see start()).
+            callback (Union[None, Callable[[List[str], List[str], List[str]], None]]): optional function called with
+                the names of the ISPs added, removed and modified, each time the configuration is reloaded.
+        """
+        self._path: str = path
+        self._pool: Pool = pool
+        self._loader: Callable[[str], Config] = Config.get_conf_from_file if loader is None else loader
+        self._interval: float = interval
+        self._callback: Union[None, Callable[[List[str], List[str], List[str]], None]] = callback
+        self._signature: Union[None, Tuple[int, int]] = self._stat()
+        self._last_error: Union[None, Exception] = None
+        self._reloads: int = 0
+        self._stop: threading.Event = threading.Event()
+        self._thread: Union[None, threading.Thread] = None
+
+    def get_last_error(self) -> Union[None, Exception]:
+        """Return the error raised by the last reload, if any.
+
+        Returns:
+            None: the last reload was successful (or no reload happened).
+            Exception: the error that prevented the last reload. The pool keeps the previous configuration.
+        """
+        return self._last_error
+
+    def get_reloads(self) -> int:
+        """Return the number of reloads.
+
+        Returns:
+            int: the number of times the configuration was successfully reloaded.
+        """
+        return self._reloads
+
+    def check(self) -> bool:
+        """Check whether the file was modified, and if so, reload the configuration.
+
+        If the file cannot be loaded (ex: it is being written, or it is not valid), then the pool keeps its
+        configuration, and the error is available through get_last_error(). The file is loaded again once it is
+        modified.
+
+        Returns:
+            bool: if the configuration was reloaded, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        signature: Union[None, Tuple[int, int]] = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            config: Config = self._loader(self._path)
+        except Exception as e:
+            self._last_error = e
+            return False
+        self._last_error = None
+        added, removed, changed = self._pool.reload(config)
+        self._reloads += 1
+        if self._callback is not None:
+            self._callback(added, removed, changed)
+        return True
+
+    def start(self) -> None:
+        """Check the file periodically, in a background thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'ConfigWatcher({self._path})', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Raised by the callback: keep watching.
+                self._last_error = e
+
+    def _stat(self) -> Union[None, Tuple[int, int]]:
+        """Return the signature of the file.
+
+        Returns:
+            None: the file does not exist.
+            Tuple[int, int]: the modification time (in nanoseconds) and the size of the file.
+        """
+        try:
+            stat: os.stat_result = os.stat(self._path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
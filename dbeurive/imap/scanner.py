@@ -0,0 +1,300 @@
+"""This module implements a scanner that processes all the ISPs of a configuration in parallel.
+
+It can be used as a command line tool:
+
+    python -m dbeurive.imap.scanner --workers 16 --mailbox INBOX /path/to/isp.yaml
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import List, Mapping, Union, Iterator, Sequence, Deque, Callable, Set
+from dbeurive.imap.config import Config
+from dbeurive.imap.pool import Pool
+from dbeurive.imap.id_set import IdSet
+from dbeurive.imap.mailbox import Mailbox
+from dbeurive.imap.metrics import Registry
+
+
+class ScanResult:
+    """This class represents the result of one job executed by the scanner.
+
+    A job is either the listing of the mailboxes of an ISP, or the search of the emails within one mailbox.
+    """
+
+    TYPE_LIST = 'list'
+    TYPE_SEARCH = 'search'
+
+    def __init__(self, isp_name: str, job_type: str, mailbox: Union[None, str] = None):
+        """Create a result.
+
+        Args:
+            isp_name (str): the name of the ISP.
+            job_type (str): the type of the job (TYPE_LIST or TYPE_SEARCH).
+            mailbox (Union[None, str]): the name of the mailbox (for a search).
+        """
+        self._isp_name: str = isp_name
+        self._type: str = job_type
+        self._mailbox: Union[None, str] = mailbox
+        self._mailboxes: Union[None, List[Mailbox]] = None
+        self._emails_ids: Union[None, IdSet] = None
+        self._error: Union[None, str, Exception] = None
+        self._duration: float = 0.0
+
+    def get_isp_name(self) -> str:
+        """Return the name of the ISP.
+
+        Returns:
+            str: the name of the ISP.
+        """
+        return self._isp_name
+
+    def get_type(self) -> str:
+        """Return the type of the job.
+
+        Returns:
+            str: the type of the job (TYPE_LIST or TYPE_SEARCH).
+        """
+        return self._type
+
+    def get_mailbox(self) -> Union[None, str]:
+        """Return the name of the mailbox that has been searched.
+
+        Returns:
+            str: the name of the mailbox.
+            None: the job is not a search.
+        """
+        return self._mailbox
+
+    def get_mailboxes(self) -> Union[None, List[Mailbox]]:
+        """Return the list of mailboxes (for a listing).
+
+        Returns:
+            List[Mailbox]: the list of selectable mailboxes, as returned by Client.list_mailboxes().
+            None: the job is not a listing, or it failed.
+        """
+        return self._mailboxes
+
+    def get_emails_ids(self) -> Union[None, IdSet]:
+        """Return the IDs of the emails (for a search).
+
+        Returns:
+            IdSet: the IDs of the emails, as returned by Client.list_emails_ids().
+            None: the job is not a search, or it failed.
+        """
+        return self._emails_ids
+
+    def get_error(self) -> Union[None, str, Exception]:
+        """Return the error that occurred while executing the job.
+
+        Returns:
+            Union[str, Exception]: the error.
+            None: the job was successful.
+        """
+        return self._error
+
+    def is_success(self) -> bool:
+        """Test whether the job was successful or not.
+
+        Returns:
+            bool: if the job was successful, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return self._error is None
+
+    def get_duration(self) -> float:
+        """Return the time spent executing the job.
+
+        Returns:
+            float: the number of seconds spent executing the job.
+        """
+        return self._duration
+
+
+class Scanner:
+    """This class implements a scanner that lists the mailboxes and searches the emails of all the ISPs of a
+    configuration, in parallel.
+
+    Jobs that target different ISPs run concurrently. Thus, the total duration of a scan tracks the slowest server
+    rather than the sum of all servers latencies. The results are streamed as soon as they are available.
+
+    Usage:
+
+        scanner = Scanner(config, workers=16)
+        for result in scanner.scan():
+            print(result.get_isp_name(), result.get_mailbox(), result.get_emails_ids())
+    """
+
+    def __init__(self, config: Config, workers: int = 8, max_per_isp: int = 1,
+                 mailboxes: Union[None, Sequence[str]] = ('INBOX',), criteria: Sequence[str] = ('ALL',),
+                 isp_names: Union[None, Sequence[str]] = None, pool: Union[None, Pool] = None, use_ssl: bool = True):
+        """Create a scanner.
+
+        Args:
+            config (Config): the configuration, or an AccountRegistry (see dbeurive.imap.accounts).
+            workers (int): the number of worker threads.
+            max_per_isp (int): the maximum number of jobs executed at the same time for a given ISP.
+            mailboxes (Union[None, Sequence[str]]): the names of the mailboxes to search.
+                If None, then the mailboxes are listed, and all listed mailboxes that can be selected are searched.
+            criteria (Sequence[str]): the search criteria.
+            isp_names (Union[None, Sequence[str]]): the names of the ISPs to scan.
+                If None, then all configured ISPs are scanned.
+            pool (Union[None, Pool]): the pool of clients to use. If None, then the scanner creates its own pool.
+            use_ssl (bool): flag that indicates whether the connections must be encrypted (TLS) or not.
+                This flag is ignored if a pool is given.
+        """
+        self._config: Config = config
+        self._workers: int = workers
+        self._max_per_isp: int = max_per_isp
+        self._mailboxes: Union[None, Sequence[str]] = mailboxes
+        self._criteria: Sequence[str] = criteria
+        self._isp_names: List[str] = list(isp_names if isp_names is not None else config.get_isps())
+        self._own_pool: bool = pool is None
+        self._pool: Pool = pool if pool is not None else Pool(config, max_connections=max_per_isp, use_ssl=use_ssl)
+
+    def scan(self) -> Iterator[ScanResult]:
+        """Scan all the ISPs.
+
+        Returns:
+            Iterator[ScanResult]: the results, in the order they become available.
+        """
+        queues: Mapping[str, Deque[Callable[[], ScanResult]]] = {}
+        for isp_name in self._isp_names:
+            queues[isp_name] = deque()
+            if self._mailboxes is None:
+                queues[isp_name].append(self._list_job(isp_name))
+            else:
+                for mailbox in self._mailboxes:
+                    queues[isp_name].append(self._search_job(isp_name, mailbox))
+
+        running: Mapping[str, int] = {isp_name: 0 for isp_name in self._isp_names}
+        futures: Mapping[Future, str] = {}
+        executor = ThreadPoolExecutor(max_workers=self._workers)
+        try:
+            while True:
+                # Submit as many jobs as allowed by the per-ISP limits.
+                for isp_name, queue in queues.items():
+                    while len(queue) > 0 and running[isp_name] < self._max_per_isp:
+                        futures[executor.submit(queue.popleft())] = isp_name
+                        running[isp_name] += 1
+                if len(futures) == 0:
+                    break
+                done: Set[Future]
+                done, _ = wait(list(futures.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    isp_name: str = futures.pop(future)
+                    running[isp_name] -= 1
+                    result: ScanResult = future.result()
+                    if result.get_type() == ScanResult.TYPE_LIST and result.is_success():
+                        for mailbox in result.get_mailboxes():
+                            queues[isp_name].append(self._search_job(isp_name, mailbox.get_raw_name()))
+                    yield result
+        finally:
+            executor.shutdown(wait=True)
+            if self._own_pool:
+                self._pool.close()
+
+    def _list_job(self, isp_name: str) -> Callable[[], ScanResult]:
+        """Create a job that lists the mailboxes of an ISP.
+
+        Args:
+            isp_name (str): the name of the ISP.
+
+        Returns:
+            Callable[[], ScanResult]: the job.
+        """
+        def job() -> ScanResult:
+            result = ScanResult(isp_name, ScanResult.TYPE_LIST)
+            start: float = time.monotonic()
+            try:
+                with self._pool.connection(isp_name) as client:
+                    mailboxes = client.list_mailboxes(selectable_only=True)
+                if mailboxes is None:
+                    result._error = 'Cannot interpret the list of mailboxes'
+                else:
+                    result._mailboxes = mailboxes
+            except Exception as e:
+                result._error = e
+            result._duration = time.monotonic() - start
+            return result
+        return job
+
+    def _search_job(self, isp_name: str, mailbox: str) -> Callable[[], ScanResult]:
+        """Create a job that searches the emails within a mailbox.
+
+        Args:
+            isp_name (str): the name of the ISP.
+            mailbox (str): the name of the mailbox.
+
+        Returns:
+            Callable[[], ScanResult]: the job.
+        """
+        def job() -> ScanResult:
+            result = ScanResult(isp_name, ScanResult.TYPE_SEARCH, mailbox)
+            start: float = time.monotonic()
+            try:
+                with self._pool.connection(isp_name, mailbox, readonly=True) as client:
+                    result._emails_ids = client.list_emails_ids(*self._criteria)
+            except Exception as e:
+                result._error = e
+            result._duration = time.monotonic() - start
+            return result
+        return job
+
+
+def main(argv: Union[None, List[str]] = None) -> int:
+    """Command line entry point.
+
+    Args:
+        argv (Union[None, List[str]]): the command line arguments.
+
+    Returns:
+        int: the exit status (0 if all jobs were successful, 1 otherwise).
+    """
+    parser = argparse.ArgumentParser(description='Scan all the ISPs of a configuration in parallel.')
+    parser.add_argument('config', help='path to the configuration file')
+    parser.add_argument('--encrypted', action='store_true', help='the configuration file is encrypted')
+    parser.add_argument('--workers', type=int, default=8, help='number of worker threads')
+    parser.add_argument('--max-per-isp', type=int, default=1, help='maximum number of concurrent jobs per ISP')
+    parser.add_argument('--mailbox', action='append', help='mailbox to search (may be repeated); '
+                                                           'all mailboxes are searched if omitted')
+    parser.add_argument('--isp', action='append', help='ISP to scan (may be repeated); '
+                                                       'all ISPs are scanned if omitted')
+    parser.add_argument('--criteria', default='ALL', help='search criteria')
+    parser.add_argument('--no-ssl', action='store_true', help='do not encrypt the connections')
+    parser.add_argument('--metrics', help='path to a JSON file where the measures of the commands, per ISP, are written')
+    args = parser.parse_args(argv)
+
+    config: Config = Config.get_conf_from_file(args.config, not args.encrypted)
+    registry = Registry()
+    pool = Pool(config, max_connections=args.max_per_isp, use_ssl=not args.no_ssl,
+                callbacks=[registry] if args.metrics is not None else ())
+    scanner = Scanner(config,
+                      workers=args.workers,
+                      max_per_isp=args.max_per_isp,
+                      mailboxes=args.mailbox,
+                      criteria=args.criteria.split(),
+                      isp_names=args.isp,
+                      pool=pool)
+    status: int = 0
+    for result in scanner.scan():
+        if not result.is_success():
+            status = 1
+            print(f'{result.get_isp_name()}\t{result.get_mailbox() or ""}\tERROR\t{result.get_error()}')
+        elif result.get_type() == ScanResult.TYPE_LIST:
+            print(f'{result.get_isp_name()}\t\tLIST\t{len(result.get_mailboxes())}\t{result.get_duration():.3f}s')
+        else:
+            print(f'{result.get_isp_name()}\t{result.get_mailbox()}\tSEARCH\t{len(result.get_emails_ids())}\t{result.get_duration():.3f}s')
+        sys.stdout.flush()
+    pool.close()
+    if args.metrics is not None:
+        with open(args.metrics, 'w') as fd:
+            json.dump(registry.dump(), fd, indent=2)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""This module implements the encoding and the decoding of IMAP sequence sets (RFC 3501, section 9).
+
+A sequence set is a compact representation of a set of message sequence numbers or UIDs.
+For example: "1:500,502,510:9000".
+"""
+
+import re
+from array import array
+from typing import Iterable, Iterator, List, Union
+from dbeurive.imap.id_set import IdSet, _TYPECODE
+
+# Default maximum length of a sequence set sent within a command.
+# Servers should accept command lines of at least 8000 octets (RFC 7162, section 4). The limit leaves room for the
+# rest of the command.
+MAX_LENGTH: int = 4000
+
+_sequence_set_re = re.compile(r'^(\d+|\*)(:(\d+|\*))?(,(\d+|\*)(:(\d+|\*))?)*$')
+
+
+def encode(ids: Iterable[int]) -> str:
+    """Encode a set of IDs as a sequence set.
+
+    Args:
+        ids (Iterable[int]): the IDs. They do not need to be sorted.
+
+    Returns:
+        str: the sequence set (ex: "1:500,502,510:9000"). If there is no ID, then the function returns an empty string.
+    """
+    return _id_set(ids).to_sequence_set()
+
+
+def decode(text: Union[str, bytes], largest: Union[None, int] = None) -> IdSet:
+    """Decode a sequence set.
+
+    Args:
+        text (Union[str, bytes]): the sequence set (ex: "1:500,502,510:9000").
+        largest (Union[None, int]): the value of "*" (the largest ID in use).
+
+    Returns:
+        IdSet: the set of IDs.
+
+    Raises:
+        Exception: if the given text is not a valid sequence set, or if it contains "*" while the largest ID is not
+            specified.
+    """
+    if isinstance(text, bytes):
+        text = text.decode()
+    if len(text) == 0:
+        return IdSet()
+    if _sequence_set_re.match(text) is None:
+        raise Exception(f'Invalid sequence set "{text}"!')
+    ids = array(_TYPECODE)
+    for part in text.split(','):
+        bounds: List[int] = [_value(b, largest) for b in part.split(':')]
+        ids.extend(range(min(bounds), max(bounds) + 1))
+    return IdSet(ids)
+
+
+def chunks(ids: Iterable[int], max_length: int = MAX_LENGTH) -> Iterator[str]:
+    """Encode a set of IDs as a series of sequence sets which lengths do not exceed a given limit.
+
+    Args:
+        ids (Iterable[int]): the IDs.
+        max_length (int): the maximum length of a sequence set.
+
+    Returns:
+        Iterator[str]: the sequence sets.
+    """
+    parts: List[str] = []
+    length: int = 0
+    for low, high in _id_set(ids).iter_ranges():
+        part: str = str(low) if low == high else f'{low}:{high}'
+        if len(parts) > 0 and length + 1 + len(part) > max_length:
+            yield ','.join(parts)
+            parts, length = [], 0
+        length += len(part) + (1 if len(parts) > 0 else 0)
+        parts.append(part)
+    if len(parts) > 0:
+        yield ','.join(parts)
+
+
+def is_sequence_set(value: object) -> bool:
+    """Test whether a value represents a set of IDs that must be encoded as a sequence set.
+
+    Args:
+        value (object): the value.
+
+    Returns:
+        bool: if the value is an IdSet, or an iterable of integers (other than a string), then the function returns
+            the value True. Otherwise, it returns the value False.
+    """
+    if isinstance(value, IdSet):
+        return True
+    if isinstance(value, (str, bytes)):
+        return False
+    return isinstance(value, (list, tuple, set, frozenset, range, array))
+
+
+def _id_set(ids: Iterable[int]) -> IdSet:
+    return ids if isinstance(ids, IdSet) else IdSet(ids)
+
+
+def _value(bound: str, largest: Union[None, int]) -> int:
+    if bound != '*':
+        return int(bound)
+    if largest is None:
+        raise Exception('Cannot decode the sequence set: the value of "*" is unknown!')
+    return largest
@@ -0,0 +1,370 @@
+"""This module implements the incremental synchronization of mailboxes.
+
+The state of each mailbox (UIDVALIDITY, UIDNEXT, HIGHESTMODSEQ and the UIDs of the messages) is kept in a local SQLite
+database, per account and per mailbox. On each run, only the changes since the previous run are requested from the
+server:
+
+- if the server supports QRESYNC (RFC 7162), the new, modified and expunged messages are returned by a single command
+  "UID FETCH 1:* (FLAGS) (CHANGEDSINCE <modseq> VANISHED)".
+- if the server only supports CONDSTORE, the new and modified messages are returned by the command
+  "UID FETCH 1:* (FLAGS) (CHANGEDSINCE <modseq>)".
+- otherwise, the new messages are returned by the command "UID SEARCH UID <uidnext>:*".
+
+Without QRESYNC, the expunged messages are detected by comparing the number of messages in the mailbox with the number
+of known UIDs. The full list of UIDs is downloaded only if these numbers differ.
+
+Usage:
+
+    store = StateStore('/path/to/state.sqlite')
+    synchronizer = Synchronizer(client, store, 'isp1')
+    result = synchronizer.sync('INBOX')
+    print(result.get_new_uids(), result.get_changed_uids(), result.get_vanished_uids())
+"""
+
+import sqlite3
+import threading
+from typing import List, Union
+from dbeurive.imap.client import Client
+from dbeurive.imap.fetch import FetchRecord
+from dbeurive.imap.id_set import IdSet
+from dbeurive.imap import sequence_set
+
+
+class MailboxState:
+    """This class represents the synchronization state of a mailbox.
+    """
+
+    def __init__(self, uid_validity: Union[None, int], uid_next: Union[None, int], highest_modseq: Union[None, int],
+                 uids: IdSet):
+        """Create a state.
+
+        Args:
+            uid_validity (Union[None, int]): the UIDVALIDITY value.
+            uid_next (Union[None, int]): the UIDNEXT value.
+            highest_modseq (Union[None, int]): the HIGHESTMODSEQ value (None if the server does not support CONDSTORE).
+            uids (IdSet): the UIDs of the messages within the mailbox.
+        """
+        self._uid_validity: Union[None, int] = uid_validity
+        self._uid_next: Union[None, int] = uid_next
+        self._highest_modseq: Union[None, int] = highest_modseq
+        self._uids: IdSet = uids
+
+    def get_uid_validity(self) -> Union[None, int]:
+        """Return the UIDVALIDITY value.
+
+        Returns:
+            int: the UIDVALIDITY value.
+            None: the server did not return the value.
+        """
+        return self._uid_validity
+
+    def get_uid_next(self) -> Union[None, int]:
+        """Return the UIDNEXT value.
+
+        Returns:
+            int: the UIDNEXT value.
+            None: the server did not return the value.
+        """
+        return self._uid_next
+
+    def get_highest_modseq(self) -> Union[None, int]:
+        """Return the HIGHESTMODSEQ value.
+
+        Returns:
+            int: the HIGHESTMODSEQ value.
+            None: the server does not support CONDSTORE.
+        """
+        return self._highest_modseq
+
+    def get_uids(self) -> IdSet:
+        """Return the UIDs of the messages within the mailbox.
+
+        Returns:
+            IdSet: the UIDs.
+        """
+        return self._uids
+
+
+class StateStore:
+    """This class implements a local store of mailboxes states, backed by a SQLite database.
+
+    The UIDs are stored as sequence sets, which are compact for mailboxes which messages are rarely expunged.
+    The store can be shared by several threads.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        """Open (or create) a store.
+
+        Args:
+            path (str): path to the SQLite database. The default value (":memory:") creates a transient store.
+        """
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS mailbox_state ('
+                             'account TEXT NOT NULL, '
+                             'mailbox TEXT NOT NULL, '
+                             'uid_validity INTEGER, '
+                             'uid_next INTEGER, '
+                             'highest_modseq INTEGER, '
+                             'uids TEXT NOT NULL, '
+                             'PRIMARY KEY (account, mailbox))')
+
+    def load(self, account: str, mailbox: str) -> Union[None, MailboxState]:
+        """Load the state of a mailbox.
+
+        Args:
+            account (str): the name of the account (ex: the name of the ISP).
+            mailbox (str): the name of the mailbox.
+
+        Returns:
+            MailboxState: the state of the mailbox.
+            None: the mailbox has never been synchronized.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT uid_validity, uid_next, highest_modseq, uids FROM mailbox_state '
+                                   'WHERE account = ? AND mailbox = ?', (account, mailbox)).fetchone()
+        if row is None:
+            return None
+        return MailboxState(row[0], row[1], row[2], sequence_set.decode(row[3]))
+
+    def save(self, account: str, mailbox: str, state: MailboxState) -> None:
+        """Save the state of a mailbox.
+
+        Args:
+            account (str): the name of the account.
+            mailbox (str): the name of the mailbox.
+            state (MailboxState): the state of the mailbox.
+        """
+        with self._lock, self._db:
+            # HIGHESTMODSEQ is an unsigned 63 bits value: it fits within a SQLite INTEGER.
+            self._db.execute('INSERT OR REPLACE INTO mailbox_state '
+                             '(account, mailbox, uid_validity, uid_next, highest_modseq, uids) '
+                             'VALUES (?, ?, ?, ?, ?, ?)',
+                             (account, mailbox, state.get_uid_validity(), state.get_uid_next(),
+                              state.get_highest_modseq(), state.get_uids().to_sequence_set()))
+
+    def delete(self, account: str, mailbox: Union[None, str] = None) -> None:
+        """Delete the state of a mailbox, or of all the mailboxes of an account.
+
+        Args:
+            account (str): the name of the account.
+            mailbox (Union[None, str]): the name of the mailbox. If None, then the states of all the mailboxes of the
+                account are deleted.
+        """
+        with self._lock, self._db:
+            if mailbox is None:
+                self._db.execute('DELETE FROM mailbox_state WHERE account = ?', (account,))
+            else:
+                self._db.execute('DELETE FROM mailbox_state WHERE account = ? AND mailbox = ?', (account, mailbox))
+
+    def close(self) -> None:
+        """Close the database.
+        """
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> 'StateStore':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class SyncResult:
+    """This class represents the result of the synchronization of a mailbox.
+    """
+
+    # The mailbox was synchronized from scratch (first run, or UIDVALIDITY changed).
+    METHOD_FULL = 'full'
+    # The changes were requested through QRESYNC.
+    METHOD_QRESYNC = 'qresync'
+    # The changes were requested through CONDSTORE.
+    METHOD_CONDSTORE = 'condstore'
+    # The new messages were requested through "UID SEARCH UID <uidnext>:*".
+    METHOD_UID_SEARCH = 'uid_search'
+
+    def __init__(self, mailbox: str, method: str, state: MailboxState, new_uids: IdSet, changed_uids: IdSet,
+                 vanished_uids: IdSet):
+        """Create a result.
+
+        Args:
+            mailbox (str): the name of the mailbox.
+            method (str): the synchronization method (METHOD_FULL, METHOD_QRESYNC...).
+            state (MailboxState): the new state of the mailbox.
+            new_uids (IdSet): the UIDs of the messages added since the previous synchronization.
+            changed_uids (IdSet): the UIDs of the messages which flags changed since the previous synchronization.
+            vanished_uids (IdSet): the UIDs of the messages expunged since the previous synchronization.
+        """
+        self._mailbox: str = mailbox
+        self._method: str = method
+        self._state: MailboxState = state
+        self._new_uids: IdSet = new_uids
+        self._changed_uids: IdSet = changed_uids
+        self._vanished_uids: IdSet = vanished_uids
+
+    def get_mailbox(self) -> str:
+        """Return the name of the mailbox.
+
+        Returns:
+            str: the name of the mailbox.
+        """
+        return self._mailbox
+
+    def get_method(self) -> str:
+        """Return the method used to synchronize the mailbox.
+
+        Returns:
+            str: the method (METHOD_FULL, METHOD_QRESYNC, METHOD_CONDSTORE or METHOD_UID_SEARCH).
+        """
+        return self._method
+
+    def is_full(self) -> bool:
+        """Test whether the mailbox has been synchronized from scratch or not.
+
+        If so, all the UIDs are reported as new, and any data previously cached for the mailbox must be discarded.
+
+        Returns:
+            bool: if the mailbox has been synchronized from scratch, then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        return self._method == __class__.METHOD_FULL
+
+    def get_state(self) -> MailboxState:
+        """Return the new state of the mailbox.
+
+        Returns:
+            MailboxState: the state.
+        """
+        return self._state
+
+    def get_uids(self) -> IdSet:
+        """Return the UIDs of all the messages within the mailbox.
+
+        Returns:
+            IdSet: the UIDs.
+        """
+        return self._state.get_uids()
+
+    def get_new_uids(self) -> IdSet:
+        """Return the UIDs of the messages added since the previous synchronization.
+
+        Returns:
+            IdSet: the UIDs.
+        """
+        return self._new_uids
+
+    def get_changed_uids(self) -> IdSet:
+        """Return the UIDs of the messages which flags changed since the previous synchronization.
+
+        Please note that the changes of flags can only be detected if the server supports CONDSTORE.
+
+        Returns:
+            IdSet: the UIDs.
+        """
+        return self._changed_uids
+
+    def get_vanished_uids(self) -> IdSet:
+        """Return the UIDs of the messages expunged since the previous synchronization.
+
+        Returns:
+            IdSet: the UIDs.
+        """
+        return self._vanished_uids
+
+
+class Synchronizer:
+    """This class synchronizes the mailboxes of an account incrementally.
+    """
+
+    def __init__(self, client: Client, store: StateStore, account: str):
+        """Create a synchronizer.
+
+        Args:
+            client (Client): an authenticated client.
+            store (StateStore): the store that keeps the states of the mailboxes.
+            account (str): the name of the account (ex: the name of the ISP), used as a key within the store.
+        """
+        self._client: Client = client
+        self._store: StateStore = store
+        self._account: str = account
+
+    def sync(self, mailbox: str = 'INBOX') -> SyncResult:
+        """Synchronize a mailbox.
+
+        The mailbox is selected in read only mode. Once the changes have been retrieved, the new state of the mailbox
+        is saved within the store.
+
+        Args:
+            mailbox (str): the name of the mailbox.
+
+        Returns:
+            SyncResult: the changes since the previous synchronization.
+
+        Raises:
+            Exception: if the mailbox cannot be synchronized.
+        """
+        client: Client = self._client
+        client.enable('QRESYNC', 'CONDSTORE')
+        exists: int = client.select_mailbox(mailbox, readonly=True)
+        uid_validity: Union[None, int] = client.get_uid_validity()
+        uid_next: Union[None, int] = client.get_uid_next()
+        highest_modseq: Union[None, int] = client.get_highest_modseq() if client.is_enabled('CONDSTORE') else None
+        previous: Union[None, MailboxState] = self._store.load(self._account, mailbox)
+        empty = IdSet()
+
+        if previous is None or uid_validity is None or previous.get_uid_validity() != uid_validity:
+            uids: IdSet = client.list_emails_uids()
+            result = SyncResult(mailbox, SyncResult.METHOD_FULL,
+                                MailboxState(uid_validity, uid_next, highest_modseq, uids), uids, empty, empty)
+            self._store.save(self._account, mailbox, result.get_state())
+            return result
+
+        known: IdSet = previous.get_uids()
+        vanished: Union[None, IdSet] = None
+        if highest_modseq is not None and previous.get_highest_modseq() is not None:
+            qresync: bool = client.is_enabled('QRESYNC')
+            method: str = SyncResult.METHOD_QRESYNC if qresync else SyncResult.METHOD_CONDSTORE
+            if highest_modseq == previous.get_highest_modseq():
+                touched: IdSet = empty
+                if qresync:
+                    vanished = empty
+            else:
+                records: List[FetchRecord]
+                records, expunged = client.fetch_changed_since(previous.get_highest_modseq(), vanished=qresync)
+                touched = IdSet([r.get_uid() for r in records])
+                if qresync:
+                    vanished = expunged & known
+            new: IdSet = touched - known
+            changed: IdSet = touched & known
+        else:
+            method = SyncResult.METHOD_UID_SEARCH
+            changed = empty
+            first: int = previous.get_uid_next() or (known.get_max() or 0) + 1
+            if uid_next is not None and uid_next == previous.get_uid_next():
+                new = empty
+            else:
+                # "n:*" always matches the message with the highest UID, even if this UID is lower than n.
+                new = IdSet([uid for uid in client.list_emails_uids('UID', f'{first}:*') if uid >= first]) - known
+
+        if vanished is None:
+            vanished = self._expunged(known | new, exists)
+        uids = (known - vanished) | new
+        result = SyncResult(mailbox, method, MailboxState(uid_validity, uid_next, highest_modseq, uids),
+                            new, changed, vanished)
+        self._store.save(self._account, mailbox, result.get_state())
+        return result
+
+    def _expunged(self, known: IdSet, exists: int) -> IdSet:
+        """Find the UIDs of the expunged messages, without QRESYNC.
+
+        Args:
+            known (IdSet): the UIDs of all the messages known to be in the mailbox (including the new ones).
+            exists (int): the number of messages within the mailbox, as returned by the server.
+
+        Returns:
+            IdSet: the UIDs of the expunged messages.
+        """
+        if len(known) == exists:
+            return IdSet()
+        return known - self._client.list_emails_uids()
@@ -0,0 +1,310 @@
+"""This module implements an index of the hierarchy of mailboxes of an account.
+
+The "list" command returns a flat list of mailboxes. The class MailboxTree builds the hierarchy once, and then answers
+the usual questions (does a mailbox exist? what are its children? which mailboxes match a pattern?) without scanning
+the whole list again:
+
+    tree = MailboxTree(client.list_mailboxes(), client.get_path_sep())
+    tree.get('Archives/2023')
+    tree.get_children('Archives')
+    tree.match('Archives/%')
+
+The index is keyed by the decoded names of the mailboxes (see Mailbox.get_name()).
+"""
+
+import re
+from typing import List, Tuple, Union, Iterator, Iterable, Mapping, Pattern
+from dbeurive.imap.mailbox import Mailbox, decode_name
+
+
+class _Node:
+    """This class represents a node of the tree.
+
+    A node that has not been returned by the server, but that is the parent of a mailbox that has, is "implied": its
+    mailbox is flagged \\NonExistent (see RFC 5258, section 3).
+    """
+
+    __slots__ = ('mailbox', 'parent', 'children', 'implied')
+
+    def __init__(self, mailbox: Mailbox, parent: Union[None, '_Node'], implied: bool):
+        self.mailbox: Mailbox = mailbox
+        self.parent: Union[None, _Node] = parent
+        self.children: Mapping[str, _Node] = {}
+        self.implied: bool = implied
+
+
+class MailboxTree:
+    """This class implements an in-memory index of the hierarchy of mailboxes.
+
+    Lookups by name are O(1). Children are kept in the order of the server response. The tree is built from the output
+    of the "list" command, and can be refreshed incrementally (see add(), remove() and refresh()).
+    """
+
+    def __init__(self, mailboxes: Iterable[Mailbox] = (), path_sep: str = '/'):
+        """Create a tree.
+
+        Args:
+            mailboxes (Iterable[Mailbox]): the mailboxes returned by the "list" command.
+            path_sep (str): the hierarchy delimiter used when the server does not report any (NIL).
+        """
+        self._path_sep: str = path_sep
+        self._delimiter: Union[None, str] = None
+        self._nodes: Mapping[str, _Node] = {}
+        self._roots: Mapping[str, _Node] = {}
+        self._patterns: Mapping[Tuple[str, str], Pattern] = {}
+        self._count: int = 0
+        for mailbox in mailboxes:
+            self.add(mailbox)
+
+    def get_delimiter(self) -> str:
+        """Return the hierarchy delimiter used to interpret the names given to the methods of the tree.
+
+        Returns:
+            str: the delimiter reported by the server, or the path separator given to the constructor if the server
+                did not report any.
+        """
+        return self._path_sep if self._delimiter is None else self._delimiter
+
+    def add(self, mailbox: Mailbox) -> None:
+        """Add a mailbox to the tree, or replace the mailbox that has the same name.
+
+        The missing parents are created as implied mailboxes (flagged \\NonExistent).
+
+        Args:
+            mailbox (Mailbox): the mailbox to add.
+        """
+        name: str = mailbox.get_name()
+        if self._delimiter is None and mailbox.get_delimiter():
+            self._delimiter = mailbox.get_delimiter()
+        node: Union[None, _Node] = self._nodes.get(name)
+        if node is not None:
+            if node.implied:
+                self._count += 1
+            node.mailbox = mailbox
+            node.implied = False
+            return
+        self._count += 1
+        parent: Union[None, _Node] = self._parent_node(mailbox)
+        node = _Node(mailbox, parent, False)
+        self._nodes[name] = node
+        (self._roots if parent is None else parent.children)[name] = node
+
+    def remove(self, name: str) -> bool:
+        """Remove a mailbox from the tree.
+
+        If the mailbox has children, then it is kept as an implied mailbox (flagged \\NonExistent), so that its
+        children are still reachable. The implied parents that are left without any child are removed.
+
+        Args:
+            name (str): the decoded name of the mailbox.
+
+        Returns:
+            bool: if the mailbox was in the tree (and not implied), then the method returns the value True.
+                Otherwise, it returns the value False.
+        """
+        node: Union[None, _Node] = self._nodes.get(name)
+        if node is None or node.implied:
+            return False
+        self._count -= 1
+        if len(node.children) > 0:
+            node.mailbox = __class__._implied(node.mailbox.get_raw_name(), node.mailbox.get_delimiter())
+            node.implied = True
+            return True
+        while node is not None and len(node.children) == 0:
+            name = node.mailbox.get_name()
+            del self._nodes[name]
+            del (self._roots if node.parent is None else node.parent.children)[name]
+            node = node.parent
+            if node is not None and not node.implied:
+                break
+        return True
+
+    def refresh(self, mailboxes: Iterable[Mailbox], pattern: str = '*') -> Tuple[List[Mailbox], List[Mailbox]]:
+        """Apply the result of a new "list" command to the tree.
+
+        Only the differences are applied. The mailboxes that match the pattern, but that are not in the given list, are
+        removed. Thus, the pattern must be the one that was given to the "list" command.
+
+        Args:
+            mailboxes (Iterable[Mailbox]): the mailboxes returned by the "list" command.
+            pattern (str): the pattern given to the "list" command.
+
+        Returns:
+            Tuple[List[Mailbox], List[Mailbox]]: the mailboxes that have been added or modified, and the mailboxes
+                that have been removed.
+        """
+        changed: List[Mailbox] = []
+        names: List[str] = []
+        for mailbox in mailboxes:
+            names.append(mailbox.get_name())
+            if self.get(mailbox.get_name()) != mailbox:
+                self.add(mailbox)
+                changed.append(mailbox)
+        listed = frozenset(names)
+        removed: List[Mailbox] = [m for m in self.match(pattern) if m.get_name() not in listed]
+        for mailbox in removed:
+            self.remove(mailbox.get_name())
+        return changed, removed
+
+    def get(self, name: str) -> Union[None, Mailbox]:
+        """Return a mailbox, given its name.
+
+        Args:
+            name (str): the decoded name of the mailbox (ex: "Archives/Envoyés").
+
+        Returns:
+            Mailbox: the mailbox.
+            None: the tree does not contain the mailbox, or the mailbox is implied.
+        """
+        node: Union[None, _Node] = self._nodes.get(name)
+        if node is None or node.implied:
+            return None
+        return node.mailbox
+
+    def get_parent(self, name: str) -> Union[None, Mailbox]:
+        """Return the parent of a mailbox.
+
+        Args:
+            name (str): the decoded name of the mailbox.
+
+        Returns:
+            Mailbox: the parent. It may be an implied mailbox (flagged \\NonExistent).
+            None: the mailbox is not in the tree, or it is at the top of the hierarchy.
+        """
+        node: Union[None, _Node] = self._nodes.get(name)
+        if node is None or node.parent is None:
+            return None
+        return node.parent.mailbox
+
+    def get_children(self, name: Union[None, str] = None) -> List[Mailbox]:
+        """Return the children of a mailbox.
+
+        Args:
+            name (Union[None, str]): the decoded name of the mailbox. None to get the mailboxes at the top of the
+                hierarchy.
+
+        Returns:
+            List[Mailbox]: the children, including the implied ones (flagged \\NonExistent). If the mailbox is not in
+                the tree, then the method returns an empty list.
+        """
+        if name is None:
+            return [n.mailbox for n in self._roots.values()]
+        node: Union[None, _Node] = self._nodes.get(name)
+        if node is None:
+            return []
+        return [n.mailbox for n in node.children.values()]
+
+    def iter_subtree(self, name: Union[None, str] = None, include_implied: bool = False) -> Iterator[Mailbox]:
+        """Iterate over a mailbox and all its descendants, depth first.
+
+        Args:
+            name (Union[None, str]): the decoded name of the mailbox. None to iterate over the whole tree.
+            include_implied (bool): flag that indicates whether the implied mailboxes must be returned or not.
+
+        Returns:
+            Iterator[Mailbox]: the mailboxes. If the mailbox is not in the tree, then nothing is returned.
+        """
+        if name is None:
+            stack: List[_Node] = list(reversed(list(self._roots.values())))
+        else:
+            node: Union[None, _Node] = self._nodes.get(name)
+            stack = [] if node is None else [node]
+        while len(stack) > 0:
+            node = stack.pop()
+            if include_implied or not node.implied:
+                yield node.mailbox
+            stack.extend(reversed(list(node.children.values())))
+
+    def match(self, pattern: str) -> List[Mailbox]:
+        """Return the mailboxes whose names match a pattern.
+
+        The pattern follows the rules of the "list" command (RFC 3501, section 6.3.8): "*" matches any sequence of
+        characters, and "%" matches any sequence of characters but the hierarchy delimiter. Only the subtree designated
+        by the part of the pattern that precedes the first wildcard is examined.
+
+        Args:
+            pattern (str): the pattern, expressed with decoded names (ex: "Archives/%").
+
+        Returns:
+            List[Mailbox]: the mailboxes that match the pattern, in depth-first order. Implied mailboxes are not
+                returned.
+        """
+        delimiter: str = self.get_delimiter()
+        position: int = min([i for i in (pattern.find('*'), pattern.find('%')) if i >= 0], default=-1)
+        if position == -1:
+            mailbox: Union[None, Mailbox] = self.get(pattern)
+            return [] if mailbox is None else [mailbox]
+        end: int = pattern.rfind(delimiter, 0, position) if delimiter else -1
+        base: str = pattern[:end] if end > 0 else ''
+        if base != '' and base not in self._nodes:
+            return []
+        regex: Pattern = self._compile(pattern, delimiter)
+        return [m for m in self.iter_subtree(base if base != '' else None) if regex.match(m.get_name())]
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Mailbox]:
+        return self.iter_subtree()
+
+    def _parent_node(self, mailbox: Mailbox) -> Union[None, _Node]:
+        """Return the node of the parent of a mailbox. The missing parents are created.
+
+        Args:
+            mailbox (Mailbox): the mailbox.
+
+        Returns:
+            _Node: the node of the parent.
+            None: the mailbox is at the top of the hierarchy.
+        """
+        delimiter: Union[None, str] = mailbox.get_delimiter() or self._path_sep
+        raw_name: str = mailbox.get_raw_name()
+        position: int = raw_name.rfind(delimiter) if delimiter else -1
+        if position <= 0:
+            return None
+        parent_raw_name: str = raw_name[:position]
+        node: Union[None, _Node] = self._nodes.get(decode_name(parent_raw_name))
+        if node is not None:
+            return node
+        implied: Mailbox = __class__._implied(parent_raw_name, mailbox.get_delimiter())
+        parent: Union[None, _Node] = self._parent_node(implied)
+        node = _Node(implied, parent, True)
+        self._nodes[implied.get_name()] = node
+        (self._roots if parent is None else parent.children)[implied.get_name()] = node
+        return node
+
+    def _compile(self, pattern: str, delimiter: str) -> Pattern:
+        """Compile a pattern of the "list" command into a regular expression. The expressions are cached.
+
+        Args:
+            pattern (str): the pattern.
+            delimiter (str): the hierarchy delimiter.
+
+        Returns:
+            Pattern: the regular expression.
+        """
+        key: Tuple[str, str] = (delimiter, pattern)
+        regex: Union[None, Pattern] = self._patterns.get(key)
+        if regex is None:
+            percent: str = '[^%s]*' % re.escape(delimiter) if delimiter else '.*'
+            parts: List[str] = [percent if c == '%' else '.*' if c == '*' else re.escape(c)
+                                for c in re.split(r'([*%])', pattern)]
+            regex = re.compile(''.join(parts) + r'\Z', re.DOTALL)
+            self._patterns[key] = regex
+        return regex
+
+    @staticmethod
+    def _implied(raw_name: str, delimiter: Union[None, str]) -> Mailbox:
+        """Create an implied mailbox.
+
+        Args:
+            raw_name (str): the name of the mailbox, as sent by the server.
+            delimiter (Union[None, str]): the hierarchy delimiter.
+
+        Returns:
+            Mailbox: the mailbox, flagged \\NonExistent.
+        """
+        return Mailbox(raw_name, delimiter, (Mailbox.FLAG_NONEXISTENT, Mailbox.FLAG_HAS_CHILDREN))
@@ -0,0 +1,218 @@
+import unittest
+import os
+import sys
+import io
+import base64
+import json
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.accounts import Account, AccountRegistry, EncryptedAccount, Schema
+from dbeurive.imap.config import Config
+from dbeurive.imap.pool import Pool
+from dbeurive.imap.id_set import IdSet
+from fake_server import FakeImapServer, FakeMailbox, FakeMessage
+
+
+def entry(hostname='imap.isp.com', port=993, login='user', password='secret'):
+    return {'net': {'hostname': hostname, 'port': port}, 'imap': {'path_sep': '/'},
+            'user': {'login': login, 'password': password}}
+
+
+YAML = """
+isp0: &isp
+  net: {hostname: imap.a.com, port: 993}
+  imap: {path_sep: /}
+  user: {login: u0, password: "1234"}
+isp1:
+  net: {hostname: imap.a.com, port: 143}
+  imap: {path_sep: .}
+  user: {login: u1, password: p1}
+---
+isp2:
+  net: {hostname: imap.b.com, port: "993"}
+  imap: {path_sep: /}
+  user: {login: u2, password: p2}
+---
+"""
+
+
+class TestAccountRegistry(unittest.TestCase):
+
+    def test_yaml(self):
+        registry = AccountRegistry.from_entries(AccountRegistry.iter_yaml(io.StringIO(YAML)))
+        self.assertEqual(['isp0', 'isp1', 'isp2'], registry.get_isps())
+        self.assertEqual('1234', registry.get_user_password('isp0'))
+        self.assertEqual(993, registry.get_port('isp2'))
+        self.assertEqual('.', registry.get_path_set('isp1'))
+        self.assertEqual(['isp0', 'isp1'], [a.get_name() for a in registry.get_by_hostname('imap.a.com')])
+        self.assertEqual(['isp0'], [a.get_name() for a in registry.get_by_server('imap.a.com:993')])
+        self.assertEqual({'imap.a.com:993': ['isp0'], 'imap.a.com:143': ['isp1'], 'imap.b.com:993': ['isp2']},
+                         {s: [a.get_name() for a in accounts] for s, accounts in registry.group_by_server().items()})
+        with self.assertRaises(Exception):
+            registry.get_hostname('isp3')
+
+    def test_unquoted_number(self):
+        # YAML reads these values as numbers or booleans: the original text is lost.
+        for password in ('1234', '0123', '1.50', 'true'):
+            text = YAML.replace('"1234"', password)
+            with self.assertRaisesRegex(Exception, r'isp0\[user\]\[password\].*quote the value'):
+                AccountRegistry.from_entries(AccountRegistry.iter_yaml(io.StringIO(text)))
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'accounts.jsonl')
+            with open(path, 'w') as fd:
+                fd.write('{"isp0": {"net": {"hostname": "h0", "port": 993}, "imap": {"path_sep": "/"}, '
+                         '"user": {"login": "u0", "password": "p0"}}}\n\n'
+                         '{"isp1": {"net": {"hostname": "h1", "port": 993}, "imap": {"path_sep": "/"}, '
+                         '"user": {"login": "u1", "password": "p1"}}}\n')
+            self.assertEqual(['isp0', 'isp1'], AccountRegistry.from_file(path).get_isps())
+            path = os.path.join(directory, 'accounts.yaml')
+            with open(path, 'w') as fd:
+                fd.write(YAML)
+            self.assertEqual(3, len(AccountRegistry.from_file(path)))
+        config = Config.get_conf_from_string(YAML.split('---')[0])
+        self.assertEqual(['isp0', 'isp1'], AccountRegistry.from_config(config).get_isps())
+
+    def test_validation(self):
+        invalid = [('isp', None),
+                   ('isp', {'net': {'hostname': 'h', 'port': 993}}),
+                   ('isp', dict(entry(), extra={})),
+                   ('isp', entry(port='x')),
+                   ('isp', entry(port=0)),
+                   ('isp', entry(hostname=None)),
+                   ('isp', entry(password=['a'])),
+                   (1, entry())]
+        for name, value in invalid:
+            with self.assertRaises(Exception):
+                Schema().validate(name, value)
+        with self.assertRaises(Exception):
+            AccountRegistry.from_entries([('isp', entry()), ('isp', entry())])
+        with self.assertRaises(Exception):
+            list(AccountRegistry.iter_yaml('- a\n- b\n'))
+        with self.assertRaises(Exception):
+            list(AccountRegistry.iter_json_lines(['[1]']))
+        account = Schema().validate('isp', entry())
+        self.assertEqual(Account('isp', 'imap.isp.com', 993, '/', 'user', 'secret'), account)
+        self.assertEqual(entry(), account.to_entry())
+
+    def test_update(self):
+        registry = AccountRegistry([Account('a', 'h', 993, '/', 'u', 'p'), Account('b', 'h', 993, '/', 'u', 'p')])
+        other = AccountRegistry([Account('b', 'h', 993, '/', 'u', 'p2'), Account('c', 'h', 993, '/', 'u', 'p')])
+        self.assertEqual((['c'], ['a'], ['b']), registry.diff(other))
+        self.assertEqual('a', registry.remove('a').get_name())
+        self.assertIsNone(registry.remove('a'))
+        self.assertNotIn('a', registry)
+        self.assertEqual(['b'], [a.get_name() for a in registry.get_by_hostname('h')])
+        registry.remove('b')
+        self.assertEqual({}, registry.group_by_server())
+
+    def test_scale(self):
+        entries = (('isp%d' % i, entry(hostname='imap%d.com' % (i % 100), login='user%d' % i)) for i in range(50000))
+        registry = AccountRegistry.from_entries(entries)
+        self.assertEqual(50000, len(registry))
+        self.assertEqual(500, len(registry.get_by_server('imap7.com:993')))
+        self.assertEqual('user49999', registry.get_user_login('isp49999'))
+
+    def test_pool(self):
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX', [FakeMessage(1)])]) as server:
+            registry = AccountRegistry([Account('isp0', server.host, server.port, '/', 'user', 'password')])
+            pool = Pool(registry, use_ssl=False)
+            with pool.connection('isp0', 'INBOX') as client:
+                self.assertEqual(IdSet([1]), client.list_emails_ids())
+            pool.close()
+
+
+class TestEncryptedContainer(unittest.TestCase):
+
+    KEY = '0123456789abcdef'
+
+    def test_lazy_decryption(self):
+        registry = AccountRegistry([Account('isp%d' % i, 'h', 993, '/', 'user%d' % i, 'password%d' % i)
+                                    for i in range(5)])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'accounts.enc.jsonl')
+            registry.write_encrypted(path, self.KEY)
+            self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+            with open(path) as fd:
+                text = fd.read()
+            self.assertNotIn('password1', text)
+            self.assertIn('"hostname":"h"', text)
+
+            loaded = AccountRegistry.from_encrypted_file(path, self.KEY, max_cached=2)
+            cache = loaded.get('isp0')._cache
+            self.assertEqual(registry.get_isps(), loaded.get_isps())
+            self.assertEqual(993, loaded.get_port('isp3'))
+            self.assertEqual(0, cache.get_decryptions())
+            self.assertEqual('password1', loaded.get_user_password('isp1'))
+            self.assertEqual('user1', loaded.get_user_login('isp1'))
+            self.assertEqual(1, cache.get_decryptions())
+            loaded.get_user_password('isp2')
+            loaded.get_user_password('isp3')
+            self.assertEqual(2, len(cache))
+            # "isp1" was evicted.
+            loaded.get_user_password('isp1')
+            self.assertEqual(4, cache.get_decryptions())
+            self.assertEqual(registry.get_conf(), loaded.get_conf())
+
+            with self.assertRaises(Exception):
+                AccountRegistry.from_encrypted_file(path, 'fedcba9876543210').get_user_password('isp0')
+            with self.assertRaises(Exception):
+                AccountRegistry.from_encrypted_file(path, 'short')
+
+    def test_tampering(self):
+        registry = AccountRegistry([Account('a', 'h', 993, '/', 'u', 'pa'), Account('b', 'h', 993, '/', 'u', 'pb')])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'accounts.enc.jsonl')
+            registry.write_encrypted(path, self.KEY)
+            with open(path) as fd:
+                header, a, b = [json.loads(line) for line in fd]
+
+            def check(entries, name):
+                with open(path, 'w') as fd:
+                    fd.write('\n'.join(json.dumps(e) for e in [header] + entries) + '\n')
+                loaded = AccountRegistry.from_encrypted_file(path, self.KEY)
+                with self.assertRaisesRegex(Exception, f'ISP "{name}\\[user\\]"'):
+                    loaded.get_user_password(name)
+                return loaded
+
+            # The index is authenticated with the credentials.
+            check([dict(a, a=dict(a['a'], net={'hostname': 'evil', 'port': 993})), b], 'a')
+            check([a, {'b': dict(b['b'], imap={'path_sep': '.'})}], 'b')
+            # The credentials cannot be moved to another account.
+            loaded = check([a, {'b': dict(b['b'], user=a['a']['user'])}], 'b')
+            self.assertEqual('pa', loaded.get_user_password('a'))
+            # The cyphered text cannot be modified.
+            secret = base64.b64decode(a['a']['user'])
+            secret = secret[:14] + bytes([secret[14] ^ 1]) + secret[15:]
+            check([{'a': dict(a['a'], user=base64.b64encode(secret).decode())}, b], 'a')
+
+    def test_diff(self):
+        registry = AccountRegistry([Account('a', 'h', 993, '/', 'u', 'p'), Account('b', 'h', 993, '/', 'u', 'p')])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'accounts.enc.jsonl')
+            registry.write_encrypted(path, self.KEY)
+            old = AccountRegistry.from_encrypted_file(path, self.KEY)
+            new = AccountRegistry.from_encrypted_file(path, self.KEY)
+            new.remove('b')
+            new.add(Account('c', 'h', 993, '/', 'u', 'p'))
+            new.write_encrypted(path, self.KEY)
+            new = AccountRegistry.from_encrypted_file(path, self.KEY)
+            self.assertIsInstance(new.get('a'), EncryptedAccount)
+            self.assertEqual((['c'], ['b'], []), old.diff(new))
+            # The unchanged account kept its encrypted section: it was not decrypted.
+            self.assertEqual(0, old.get('a')._cache.get_decryptions())
+            self.assertEqual(0, new.get('a')._cache.get_decryptions())
+            self.assertEqual(registry.get('a'), new.get('a'))
+
+            with open(path, 'w') as fd:
+                fd.write('{"isp0": {}}\n')
+            with self.assertRaises(Exception):
+                AccountRegistry.from_encrypted_file(path, self.KEY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.async_client import AsyncClient
+from dbeurive.imap.id_set import IdSet
+from dbeurive.imap.mailbox import Mailbox
+from fake_server import FakeImapServer, FakeMailbox, FakeMessage
+
+
+class TestAsyncClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeImapServer(mailboxes=[
+            FakeMailbox('INBOX', [FakeMessage(1), FakeMessage(2), FakeMessage(3)]),
+            FakeMailbox('Sent', [FakeMessage(10)], uid_validity=5)
+        ], auth_capabilities=('IMAP4rev1', 'ESEARCH')).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _client(self, password: str = 'password') -> AsyncClient:
+        return AsyncClient(self.server.host, self.server.port, 'user', password, use_ssl=False)
+
+    def test_session(self):
+        async def session():
+            client = self._client()
+            self.assertTrue(await client.connect())
+            self.assertTrue(client.is_connected())
+            self.assertEqual(['IMAP4REV1'], client.get_capabilities())
+            self.assertTrue(await client.login())
+            self.assertTrue(client.is_authenticated())
+            self.assertIn('ESEARCH', client.get_capabilities())
+            self.assertEqual([Mailbox('INBOX', '/', ('\\HasNoChildren',)), Mailbox('Sent', '/', ('\\HasNoChildren',))],
+                             await client.list_mailboxes())
+            self.assertEqual(3, await client.select_mailbox())
+            self.assertEqual(IdSet([1, 2, 3]), await client.list_emails_ids())
+            self.assertEqual(IdSet([1]), await client.list_emails_ids(mailbox='Sent'))
+            self.assertEqual(IdSet([10]), await client.list_emails_uids())
+            self.assertEqual(5, client.get_uid_validity())
+            self.assertEqual(11, client.get_uid_next())
+            await client.logout()
+            self.assertFalse(client.is_connected())
+
+        asyncio.run(session())
+
+    def test_login_failure(self):
+        async def session():
+            client = self._client('wrong')
+            self.assertTrue(await client.connect())
+            self.assertFalse(await client.login())
+            self.assertIsNotNone(client.get_last_error())
+            with self.assertRaises(Exception):
+                await client.list_mailboxes()
+            await client.logout()
+
+        asyncio.run(session())
+
+    def test_connect_failure(self):
+        async def session():
+            client = AsyncClient('127.0.0.1', 1, 'user', 'password', use_ssl=False)
+            self.assertFalse(await client.connect())
+            self.assertIsNotNone(client.get_last_error())
+
+        asyncio.run(session())
+
+    def test_many_connections(self):
+        async def session(client: AsyncClient) -> IdSet:
+            await client.connect()
+            await client.login()
+            ids = await client.list_emails_ids(mailbox='INBOX')
+            await client.logout()
+            return ids
+
+        async def sessions():
+            return await asyncio.gather(*[session(self._client()) for _ in range(50)])
+
+        results = asyncio.run(sessions())
+        self.assertEqual(50, len(results))
+        for ids in results:
+            self.assertEqual(IdSet([1, 2, 3]), ids)
+
+    def test_long_lines(self):
+        # The response to SEARCH is longer than the default limit of asyncio (64 KiB).
+        messages = [FakeMessage(uid) for uid in range(1, 20001)]
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX', messages)]) as server:
+            async def session():
+                client = AsyncClient(server.host, server.port, 'user', 'password', use_ssl=False)
+                self.assertTrue(await client.connect())
+                self.assertTrue(await client.login())
+                ids = await client.list_emails_ids(mailbox='INBOX')
+                await client.logout()
+                return ids
+
+            self.assertEqual(IdSet(range(1, 20001)), asyncio.run(session()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+import imap_benchmark
+import parser_benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run(self):
+        results = imap_benchmark.run(repeat=2, ids=1000, folders=50)
+        self.assertEqual(imap_benchmark.FORMAT_VERSION, results['version'])
+        self.assertEqual({'delay': 0.0, 'repeat': 2, 'ids': 1000, 'folders': 50}, results['parameters'])
+        scenarios = {s['name']: s for s in results['scenarios']}
+        self.assertIn('yandex.ru', scenarios)
+        self.assertEqual('fixture', scenarios['yandex.ru']['source'])
+        operations = scenarios['synthetic-ids']['operations']
+        self.assertEqual(imap_benchmark.OPERATIONS, list(operations.keys()))
+        self.assertEqual(1000, operations['list_emails_ids']['items'])
+        self.assertEqual(2, operations['login']['count'])
+        self.assertLessEqual(operations['login']['min'], operations['login']['max'])
+        self.assertEqual(50, scenarios['synthetic-folders']['operations']['list_mailboxes']['items'])
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            self.assertEqual(0, imap_benchmark.main(['--repeat', '1', '--delay', '0.001', '--scenario', 'mail.com',
+                                                     '--output', path]))
+            with open(path) as fd:
+                results = json.load(fd)
+        self.assertEqual(0.001, results['parameters']['delay'])
+        self.assertEqual(['mail.com'], [s['name'] for s in results['scenarios']])
+
+
+class TestParserBenchmark(unittest.TestCase):
+
+    def test_run(self):
+        results = parser_benchmark.run(ids=1000, folders=20, budget=0.01, repeat=1)
+        self.assertEqual({'ids': 1000, 'folders': 20}, results['parameters'])
+        self.assertIn('list_escaped', results['cases'])
+        self.assertEqual(1000, results['cases']['search_huge']['items'])
+        self.assertEqual(1000, results['cases']['search_split']['items'])
+        self.assertEqual(20, results['cases']['list_folders']['items'])
+        for measures in results['cases'].values():
+            self.assertGreater(measures['ns_per_op'], 0)
+            self.assertGreater(measures['alloc_bytes'], 0)
+
+    def test_compare(self):
+        baseline = {'parameters': {'ids': 10, 'folders': 10},
+                    'cases': {'a': {'ns_per_op': 100.0, 'alloc_bytes': 1000},
+                              'b': {'ns_per_op': 100.0, 'alloc_bytes': 1000}}}
+        results = {'parameters': {'ids': 10, 'folders': 10},
+                   'cases': {'a': {'ns_per_op': 120.0, 'alloc_bytes': 1000},
+                             'b': {'ns_per_op': 90.0, 'alloc_bytes': 1500},
+                             'c': {'ns_per_op': 500.0, 'alloc_bytes': 5000}}}
+        regressions = parser_benchmark.compare(results, baseline, 0.25)
+        self.assertEqual(1, len(regressions))
+        self.assertTrue(regressions[0].startswith('b: alloc_bytes 1500 > 1000'))
+        self.assertEqual(2, len(parser_benchmark.compare(results, baseline, 0.1)))
+        with self.assertRaises(Exception):
+            parser_benchmark.compare(dict(results, parameters={'ids': 1, 'folders': 10}), baseline, 0.25)
+
+    def test_portable_baseline(self):
+        results = parser_benchmark.run(ids=100, folders=10, budget=0.01, repeat=1, selected=['search_huge'])
+        baseline = parser_benchmark.portable(results)
+        self.assertEqual({'search_huge': {'items': 100, 'alloc_bytes': results['cases']['search_huge']['alloc_bytes']}},
+                         baseline['cases'])
+        self.assertNotIn('platform', baseline)
+        # The timings are not compared if the baseline does not contain them.
+        slower = dict(results, cases={'search_huge': dict(results['cases']['search_huge'], ns_per_op=1e12)})
+        self.assertEqual([], parser_benchmark.compare(slower, baseline, 0.25))
+        with open(parser_benchmark.baseline_path) as fd:
+            committed = json.load(fd)
+        for measures in committed['cases'].values():
+            self.assertEqual({'items', 'alloc_bytes'}, set(measures.keys()))
+
+
+if __name__ == '__main__':
+    unittest.main()
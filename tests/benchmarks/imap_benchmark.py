@@ -0,0 +1,235 @@
+"""End-to-end benchmarks of the IMAP client against a local fake IMAP server.
+
+The server replays the fixtures found in tests/data (the responses to LIST and SEARCH recorded from real ISPs), and
+synthetic mailboxes scaled up to large accounts (1M email IDs, 50k folders). For each scenario, the benchmark measures
+the latency and the throughput of connect(), login(), list_mailboxes() and list_emails_ids(). A delay can be injected
+before each response of the server, in order to simulate the network round trip.
+
+Usage:
+
+    python tests/benchmarks/imap_benchmark.py --delay 0.005 --repeat 5 --output results.json
+
+The results are written as JSON (see run()).
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import pickle
+import platform
+import sys
+import time
+from typing import List, Mapping, Union, Callable, Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir, os.path.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+
+from dbeurive.imap.client import Client
+from fake_server import FakeImapServer, FakeMailbox
+
+data_path: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir, 'data')
+
+# Version of the format of the results.
+FORMAT_VERSION: int = 1
+
+OPERATIONS: List[str] = ['connect', 'login', 'list_mailboxes', 'list_emails_ids']
+
+
+class Scenario:
+    """This class represents an account replayed by the fake server.
+    """
+
+    def __init__(self, name: str, source: str, raw_list: List[bytes], raw_search: List[bytes]):
+        """Create a scenario.
+
+        Args:
+            name (str): the name of the scenario.
+            source (str): the origin of the data ("fixture" or "synthetic").
+            raw_list (List[bytes]): the responses to LIST, without the prefix "* LIST ".
+            raw_search (List[bytes]): the responses to SEARCH, without the prefix "* SEARCH ".
+        """
+        self.name: str = name
+        self.source: str = source
+        self.raw_list: List[bytes] = raw_list
+        self.raw_search: List[bytes] = raw_search
+
+
+def fixture_scenarios() -> List[Scenario]:
+    """Load the scenarios recorded from real ISPs (tests/data/mailboxes and tests/data/emails-ids).
+
+    Returns:
+        List[Scenario]: one scenario per ISP.
+    """
+    scenarios: List[Scenario] = []
+    for path in sorted(glob.glob(os.path.join(data_path, 'mailboxes', '*-lst.raw'))):
+        name: str = os.path.basename(path)[:-len('-lst.raw')]
+        ids_path: str = os.path.join(data_path, 'emails-ids', f'{name}-ids.raw')
+        if not os.path.isfile(ids_path):
+            continue
+        with open(path, 'rb') as fd:
+            raw_list: List[bytes] = pickle.load(fd)
+        with open(ids_path, 'rb') as fd:
+            raw_search: List[bytes] = pickle.load(fd)
+        scenarios.append(Scenario(name, 'fixture', raw_list, raw_search))
+    return scenarios
+
+
+def synthetic_scenarios(ids: int, folders: int) -> List[Scenario]:
+    """Create scaled-up scenarios.
+
+    Args:
+        ids (int): the number of email IDs returned by SEARCH.
+        folders (int): the number of folders returned by LIST. The folders are organized into a two levels hierarchy.
+
+    Returns:
+        List[Scenario]: the scenarios "synthetic-ids" (a large mailbox) and "synthetic-folders" (many folders).
+    """
+    small_list: List[bytes] = [b'(\\HasNoChildren) "/" "INBOX"']
+    large_list: List[bytes] = [b'(\\HasNoChildren) "/" "INBOX"']
+    width: int = max(1, int(folders ** 0.5))
+    for i in range(folders - 1):
+        if i % width == 0:
+            large_list.append(b'(\\HasChildren) "/" "Folder%d"' % (i // width))
+        else:
+            large_list.append(b'(\\HasNoChildren) "/" "Folder%d/Sub %d"' % (i // width, i))
+    return [Scenario('synthetic-ids', 'synthetic', small_list, [' '.join(map(str, range(1, ids + 1))).encode()]),
+            Scenario('synthetic-folders', 'synthetic', large_list, [b'1 2 3'])]
+
+
+def summarize(samples: List[float], items: int) -> Mapping[str, Union[int, float]]:
+    """Compute the statistics of a series of measures.
+
+    Args:
+        samples (List[float]): the durations, in seconds.
+        items (int): the number of items (mailboxes, IDs...) processed by one operation.
+
+    Returns:
+        Mapping[str, Union[int, float]]: the statistics (durations in seconds, throughputs per second).
+    """
+    ordered: List[float] = sorted(samples)
+    mean: float = sum(ordered) / len(ordered)
+    return {'count': len(ordered),
+            'items': items,
+            'mean': mean,
+            'min': ordered[0],
+            'median': ordered[len(ordered) // 2],
+            'p95': ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+            'max': ordered[-1],
+            'ops_per_second': 1 / mean if mean > 0 else None,
+            'items_per_second': items / mean if mean > 0 else None}
+
+
+def measure(function: Callable[[], Any]) -> (float, Any):
+    """Measure the duration of a call.
+
+    Args:
+        function (Callable[[], Any]): the function to call.
+
+    Returns:
+        (float, Any): the duration, in seconds, and the value returned by the function.
+    """
+    start: float = time.perf_counter()
+    result: Any = function()
+    return time.perf_counter() - start, result
+
+
+def run_scenario(scenario: Scenario, delay: float, repeat: int) -> Mapping[str, Any]:
+    """Run a scenario.
+
+    Args:
+        scenario (Scenario): the scenario.
+        delay (float): the delay injected before each response of the server, in seconds.
+        repeat (int): the number of sessions.
+
+    Returns:
+        Mapping[str, Any]: the results of the scenario.
+
+    Raises:
+        Exception: if an operation fails.
+    """
+    samples: Mapping[str, List[float]] = {operation: [] for operation in OPERATIONS}
+    items: Mapping[str, int] = {operation: 1 for operation in OPERATIONS}
+    with FakeImapServer(mailboxes=[FakeMailbox('INBOX')], raw_list=scenario.raw_list,
+                        raw_search=scenario.raw_search, delay=delay) as server:
+        for _ in range(repeat):
+            client = Client(server.host, server.port, server.username, server.password, use_ssl=False)
+            duration, ok = measure(client.connect)
+            if not ok:
+                raise Exception(f'{scenario.name}: cannot connect: {client.get_last_error()}')
+            samples['connect'].append(duration)
+            duration, ok = measure(client.login)
+            if not ok:
+                raise Exception(f'{scenario.name}: cannot login: {client.get_last_error()}')
+            samples['login'].append(duration)
+            duration, mailboxes = measure(client.list_mailboxes)
+            if mailboxes is None:
+                raise Exception(f'{scenario.name}: cannot list the mailboxes')
+            samples['list_mailboxes'].append(duration)
+            items['list_mailboxes'] = len(mailboxes)
+            duration, ids = measure(lambda: client.list_emails_ids(mailbox='INBOX'))
+            samples['list_emails_ids'].append(duration)
+            items['list_emails_ids'] = len(ids)
+            client.logout()
+    return {'name': scenario.name,
+            'source': scenario.source,
+            'operations': {operation: summarize(samples[operation], items[operation]) for operation in OPERATIONS}}
+
+
+def run(delay: float = 0.0, repeat: int = 5, ids: int = 1000000, folders: int = 50000,
+        scenarios: Union[None, List[str]] = None) -> Mapping[str, Any]:
+    """Run the benchmarks.
+
+    Args:
+        delay (float): the delay injected before each response of the server, in seconds.
+        repeat (int): the number of sessions per scenario.
+        ids (int): the number of email IDs of the synthetic large mailbox.
+        folders (int): the number of folders of the synthetic large account.
+        scenarios (Union[None, List[str]]): the names of the scenarios to run. None means "all the scenarios".
+
+    Returns:
+        Mapping[str, Any]: the results. For example:
+
+            {"version": 1, "created": "...", "python": "3.11.7", "platform": "...",
+             "parameters": {"delay": 0.0, "repeat": 5, "ids": 1000000, "folders": 50000},
+             "scenarios": [{"name": "mail.com", "source": "fixture",
+                            "operations": {"login": {"count": 5, "items": 1, "mean": 0.0004, "min": ..., "median": ...,
+                                                     "p95": ..., "max": ..., "ops_per_second": ...,
+                                                     "items_per_second": ...}, ...}}, ...]}
+    """
+    selected: List[Scenario] = [s for s in fixture_scenarios() + synthetic_scenarios(ids, folders)
+                                if scenarios is None or s.name in scenarios]
+    return {'version': FORMAT_VERSION,
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {'delay': delay, 'repeat': repeat, 'ids': ids, 'folders': folders},
+            'scenarios': [run_scenario(s, delay, repeat) for s in selected]}
+
+
+def main(argv: Union[None, List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the IMAP client against a local fake server.')
+    parser.add_argument('--delay', type=float, default=0.0, help='delay injected before each response (seconds)')
+    parser.add_argument('--repeat', type=int, default=5, help='number of sessions per scenario')
+    parser.add_argument('--ids', type=int, default=1000000, help='number of IDs of the synthetic large mailbox')
+    parser.add_argument('--folders', type=int, default=50000, help='number of folders of the synthetic account')
+    parser.add_argument('--scenario', action='append', help='scenario to run (may be repeated); default: all')
+    parser.add_argument('--output', default='-', help='path to the JSON output file; default: standard output')
+    args = parser.parse_args(argv)
+
+    results: Mapping[str, Any] = run(args.delay, args.repeat, args.ids, args.folders, args.scenario)
+    text: str = json.dumps(results, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w') as fd:
+            fd.write(text + '\n')
+        for scenario in results['scenarios']:
+            print(scenario['name'] + ': ' + ', '.join(f'{name} {values["median"] * 1000:.2f} ms'
+                                                       for name, values in scenario['operations'].items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""Micro-benchmarks of the parsers of the responses to LIST (dbeurive.imap.parser) and SEARCH (IdSet.from_bytes(), used
+by Client._search()).
+
+The benchmark generates realistic lines (quoted names, escaped quotes, deep hierarchies, NIL delimiters, huge SEARCH
+responses, split or not) and measures, for each case:
+
+* the time per operation (ns_per_op), and per item (ns_per_item: per line or per ID).
+* the peak amount of memory allocated by one operation (alloc_bytes), measured with tracemalloc.
+
+The results are compared against a baseline file. If a case regresses by more than the threshold (25% by default), then
+the program exits with the status 1:
+
+    python tests/benchmarks/parser_benchmark.py                     # Compare against parser_baseline.json
+    python tests/benchmarks/parser_benchmark.py --update-baseline   # Record a new baseline
+    python tests/benchmarks/parser_benchmark.py --output results.json --threshold 0.10
+
+Timings depend on the machine: by default, the baseline only records the amounts of memory, which only depend on the
+version of Python. Thus, the baseline can be shared. Use --timings to record (and compare) the timings as well, in a
+baseline kept on the machine that runs the comparison:
+
+    python tests/benchmarks/parser_benchmark.py --update-baseline --timings --baseline local_baseline.json
+    python tests/benchmarks/parser_benchmark.py --baseline local_baseline.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import List, Mapping, Union, Callable, Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir, os.path.pardir))
+
+from dbeurive.imap.client import Client
+from dbeurive.imap.id_set import IdSet
+from dbeurive.imap.parser import ListMailbox
+
+baseline_path: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_baseline.json')
+
+# Version of the format of the results.
+FORMAT_VERSION: int = 1
+
+# The metrics compared against the baseline (if the baseline contains them).
+METRICS: List[str] = ['ns_per_op', 'alloc_bytes']
+
+# The metrics that do not depend on the machine. A baseline recorded without --timings only contains these metrics.
+PORTABLE_METRICS: List[str] = ['alloc_bytes']
+
+
+class Case:
+    """This class represents a benchmarked operation.
+    """
+
+    def __init__(self, name: str, function: Callable[[], Any], items: int = 1):
+        """Create a case.
+
+        Args:
+            name (str): the name of the case.
+            function (Callable[[], Any]): the operation.
+            items (int): the number of items (lines or IDs) processed by one operation.
+        """
+        self.name: str = name
+        self.function: Callable[[], Any] = function
+        self.items: int = items
+
+
+def list_lines(count: int) -> List[bytes]:
+    """Generate a realistic response to the "list" command.
+
+    Args:
+        count (int): the number of lines.
+
+    Returns:
+        List[bytes]: the lines, without the prefix "* LIST ".
+    """
+    lines: List[bytes] = [b'(\\HasNoChildren) "/" "INBOX"']
+    for i in range(1, count):
+        kind: int = i % 5
+        if kind == 0:
+            lines.append(b'(\\HasChildren) "/" "Archives/%d"' % i)
+        elif kind == 1:
+            lines.append(b'(\\HasNoChildren \\Sent) "/" "Archives/%d/Envoy&AOk-s"' % i)
+        elif kind == 2:
+            lines.append(b'(\\HasNoChildren) "/" "Projets/Client \\"%d\\"/Devis"' % i)
+        elif kind == 3:
+            lines.append(b'(\\HasNoChildren) "." "' + b'.'.join(b'Level%d' % j for j in range(i % 12 + 1)) + b'"')
+        else:
+            lines.append(b'(\\Noselect \\HasChildren) NIL Folder%d' % i)
+    return lines
+
+
+def parse_lines(lines: List[bytes]) -> None:
+    parser = ListMailbox()
+    for line in lines:
+        parser.parse(line)
+
+
+def cases(ids: int = 100000, folders: int = 1000) -> List[Case]:
+    """Create the benchmarked cases.
+
+    Args:
+        ids (int): the number of IDs of the SEARCH responses.
+        folders (int): the number of lines of the LIST response.
+
+    Returns:
+        List[Case]: the cases.
+    """
+    parser = ListMailbox()
+    simple: bytes = b'(\\HasNoChildren) "/" "INBOX"'
+    escaped: bytes = b'(\\HasNoChildren \\Marked) "/" "Projets/Tom \\"Jerry\\" \\\\ Co"'
+    deep: bytes = b'(\\HasNoChildren) "/" "' + b'/'.join(b'Dossier &AOk-t&AOk- %d' % i for i in range(20)) + b'"'
+    nil: bytes = b'(\\Noselect \\HasChildren) NIL Archives'
+    lines: List[bytes] = list_lines(folders)
+    small: bytes = b' '.join(b'%d' % i for i in range(1, 101))
+    huge: bytes = b' '.join(b'%d' % i for i in range(1, ids + 1))
+    # imaplib returns one element per SEARCH response: some servers split huge results.
+    split: List[bytes] = [b' '.join(b'%d' % i for i in range(start, min(start + 10000, ids + 1)))
+                          for start in range(1, ids + 1, 10000)]
+    return [Case('list_simple', lambda: parser.parse(simple)),
+            Case('list_escaped', lambda: parser.parse(escaped)),
+            Case('list_deep', lambda: parser.parse(deep)),
+            Case('list_nil', lambda: parser.parse(nil)),
+            Case('list_tokenize', lambda: ListMailbox.tokenize(simple)),
+            Case('list_folders', lambda: parse_lines(lines), len(lines)),
+            Case('search_small', lambda: IdSet.from_bytes(small), 100),
+            Case('search_huge', lambda: IdSet.from_bytes(huge), ids),
+            Case('search_client', lambda: Client._search([huge]), ids),
+            Case('search_split', lambda: Client._search(split), ids)]
+
+
+def measure(case: Case, budget: float, repeat: int) -> Mapping[str, Union[int, float]]:
+    """Measure a case.
+
+    The operation is run in batches that last about budget / repeat seconds. The fastest batch is kept, since the
+    slower ones are disturbed by the rest of the system.
+
+    Args:
+        case (Case): the case.
+        budget (float): the time allotted to the case, in seconds.
+        repeat (int): the number of batches.
+
+    Returns:
+        Mapping[str, Union[int, float]]: the measures.
+    """
+    function: Callable[[], Any] = case.function
+    start: float = time.perf_counter()
+    function()
+    number: int = max(1, int(budget / repeat / max(time.perf_counter() - start, 1e-9)))
+    best: Union[None, float] = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        duration: float = (time.perf_counter() - start) / number
+        best = duration if best is None else min(best, duration)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'items': case.items,
+            'ns_per_op': best * 1e9,
+            'ns_per_item': best * 1e9 / case.items,
+            'alloc_bytes': peak}
+
+
+def run(ids: int = 100000, folders: int = 1000, budget: float = 0.5, repeat: int = 5,
+        selected: Union[None, List[str]] = None) -> Mapping[str, Any]:
+    """Run the benchmarks.
+
+    Args:
+        ids (int): the number of IDs of the huge SEARCH response.
+        folders (int): the number of lines of the LIST response.
+        budget (float): the time allotted to each case, in seconds.
+        repeat (int): the number of batches per case.
+        selected (Union[None, List[str]]): the names of the cases to run. None means "all the cases".
+
+    Returns:
+        Mapping[str, Any]: the results. For example:
+
+            {"version": 1, "created": "...", "python": "3.11.7", "platform": "...",
+             "parameters": {"ids": 100000, "folders": 1000},
+             "cases": {"list_simple": {"items": 1, "ns_per_op": 1450.2, "ns_per_item": 1450.2, "alloc_bytes": 712},
+                       ...}}
+    """
+    return {'version': FORMAT_VERSION,
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {'ids': ids, 'folders': folders},
+            'cases': {case.name: measure(case, budget, repeat) for case in cases(ids, folders)
+                      if selected is None or case.name in selected}}
+
+
+def portable(results: Mapping[str, Any]) -> Mapping[str, Any]:
+    """Remove the timings, and the description of the machine, from results.
+
+    Args:
+        results (Mapping[str, Any]): the results (see run()).
+
+    Returns:
+        Mapping[str, Any]: the results, with the metrics PORTABLE_METRICS only.
+    """
+    baseline: Mapping[str, Any] = {k: v for k, v in results.items() if k not in ('created', 'platform', 'cases')}
+    baseline['cases'] = {name: {k: v for k, v in measures.items() if k == 'items' or k in PORTABLE_METRICS}
+                         for name, measures in results['cases'].items()}
+    return baseline
+
+
+def compare(results: Mapping[str, Any], baseline: Mapping[str, Any], threshold: float) -> List[str]:
+    """Compare results against a baseline.
+
+    Args:
+        results (Mapping[str, Any]): the results (see run()).
+        baseline (Mapping[str, Any]): the baseline (results of a previous run).
+        threshold (float): the tolerated increase (ex: 0.25 for 25%).
+
+    Returns:
+        List[str]: the descriptions of the regressions. An empty list means that there is no regression.
+
+    Raises:
+        Exception: if the results and the baseline were not produced with the same parameters.
+    """
+    if results['parameters'] != baseline['parameters']:
+        raise Exception(f'the baseline was recorded with other parameters: {baseline["parameters"]}')
+    regressions: List[str] = []
+    for name, measures in results['cases'].items():
+        reference: Union[None, Mapping[str, Any]] = baseline['cases'].get(name)
+        if reference is None:
+            continue
+        for metric in METRICS:
+            if metric in reference and reference[metric] > 0 and measures[metric] > reference[metric] * (1 + threshold):
+                regressions.append(f'{name}: {metric} {measures[metric]:.0f} > {reference[metric]:.0f} '
+                                   f'(+{(measures[metric] / reference[metric] - 1) * 100:.0f}%)')
+    return regressions
+
+
+def main(argv: Union[None, List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the parsers of dbeurive.imap.parser.')
+    parser.add_argument('--ids', type=int, default=100000, help='number of IDs of the huge SEARCH response')
+    parser.add_argument('--folders', type=int, default=1000, help='number of lines of the LIST response')
+    parser.add_argument('--budget', type=float, default=0.5, help='time allotted to each case (seconds)')
+    parser.add_argument('--repeat', type=int, default=5, help='number of batches per case')
+    parser.add_argument('--case', action='append', help='case to run (may be repeated); default: all')
+    parser.add_argument('--baseline', default=baseline_path, help='path to the baseline file')
+    parser.add_argument('--threshold', type=float, default=0.25, help='tolerated increase (0.25 means 25%%)')
+    parser.add_argument('--update-baseline', action='store_true', help='record the results as the new baseline')
+    parser.add_argument('--timings', action='store_true',
+                        help='record the timings in the baseline (only meaningful on the machine that records it)')
+    parser.add_argument('--output', help='path to the JSON output file')
+    args = parser.parse_args(argv)
+
+    results: Mapping[str, Any] = run(args.ids, args.folders, args.budget, args.repeat, args.case)
+    for name, measures in results['cases'].items():
+        print(f'{name:<16} {measures["ns_per_op"]:>14.0f} ns/op {measures["ns_per_item"]:>10.1f} ns/item '
+              f'{measures["alloc_bytes"]:>12} B')
+    if args.output is not None:
+        with open(args.output, 'w') as fd:
+            fd.write(json.dumps(results, indent=2) + '\n')
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as fd:
+            fd.write(json.dumps(results if args.timings else portable(results), indent=2) + '\n')
+        print(f'Baseline written to {args.baseline}')
+        return 0
+    if not os.path.isfile(args.baseline):
+        print(f'No baseline ({args.baseline}): run with --update-baseline first')
+        return 2
+    with open(args.baseline) as fd:
+        regressions: List[str] = compare(results, json.load(fd), args.threshold)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+from dbeurive.imap.parser import DataParser
+from dbeurive.imap.bodystructure import Envelope, BodyPart, decode_words
+
+
+def parse(text: bytes):
+    return DataParser([text]).read_value()
+
+
+# The examples of RFC 3501 (section 7.4.2), and a message sent by a common mail client.
+ENVELOPE = b'("Wed, 17 Jul 1996 02:23:25 -0700 (PDT)" "IMAP4rev1 WG mtg summary and minutes" ' \
+           b'(("Terry Gray" NIL "gray" "cac.washington.edu")) (("Terry Gray" NIL "gray" "cac.washington.edu")) ' \
+           b'(("Terry Gray" NIL "gray" "cac.washington.edu")) ((NIL NIL "imap" "cac.washington.edu")) ' \
+           b'((NIL NIL "minutes" "CNRI.Reston.VA.US")("John Klensin" NIL "KLENSIN" "MIT.EDU")) NIL NIL ' \
+           b'"<B27397-0100000@cac.washington.edu>")'
+
+SIMPLE = b'("TEXT" "PLAIN" ("CHARSET" "US-ASCII") NIL NIL "7BIT" 3028 92)'
+
+MIXED = b'((("text" "plain" ("charset" "utf-8") NIL NIL "quoted-printable" 120 4 NIL NIL NIL NIL)' \
+        b'("text" "html" ("charset" "utf-8") NIL NIL "quoted-printable" 800 20 NIL NIL NIL NIL) ' \
+        b'"alternative" ("boundary" "b2") NIL NIL NIL)' \
+        b'("application" "pdf" ("name" "=?UTF-8?Q?r=C3=A9sum=C3=A9.pdf?=") NIL NIL "base64" 4200000 NIL ' \
+        b'("attachment" ("filename" "=?UTF-8?Q?r=C3=A9sum=C3=A9.pdf?=")) NIL NIL)' \
+        b'("message" "rfc822" NIL NIL NIL "7bit" 3000 ' + ENVELOPE + \
+        b' ("text" "plain" ("charset" "us-ascii") NIL NIL "7bit" 2000 40 NIL NIL NIL NIL) 60 NIL NIL NIL NIL)' \
+        b'("image" "png" NIL "<logo>" NIL "base64" 5000 NIL ("inline" ("filename*" "utf-8\'\'logo%20bleu.png")) ' \
+        b'"fr" NIL) "mixed" ("boundary" "b1") NIL ("en" "fr") "http://example.com/")'
+
+
+class TestBodyStructure(unittest.TestCase):
+
+    def test_envelope(self):
+        envelope = Envelope.parse(parse(ENVELOPE))
+        self.assertEqual('IMAP4rev1 WG mtg summary and minutes', envelope.get_subject())
+        self.assertEqual('Wed, 17 Jul 1996 02:23:25 -0700 (PDT)', envelope.get_date())
+        self.assertEqual(['gray@cac.washington.edu'], [a.get_email() for a in envelope.get_from()])
+        self.assertEqual('Terry Gray', envelope.get_from()[0].get_name())
+        self.assertEqual(['minutes@CNRI.Reston.VA.US', 'John Klensin <KLENSIN@MIT.EDU>'],
+                         [str(a) for a in envelope.get_cc()])
+        self.assertEqual([], envelope.get_bcc())
+        self.assertIsNone(envelope.get_in_reply_to())
+        self.assertEqual('<B27397-0100000@cac.washington.edu>', envelope.get_message_id())
+        self.assertEqual(['imap@cac.washington.edu'], envelope.to_dict()['to'])
+
+        encoded = parse(b'(NIL "=?UTF-8?Q?R=C3=A9union?=" NIL NIL NIL NIL NIL NIL NIL NIL)')
+        self.assertEqual('Réunion', Envelope.parse(encoded).get_subject())
+        self.assertEqual('=?x-unknown?Q?abc?=', decode_words('=?x-unknown?Q?abc?='))
+        with self.assertRaises(ValueError):
+            Envelope.parse(parse(b'(NIL NIL)'))
+
+    def test_simple(self):
+        root = BodyPart.parse(parse(SIMPLE))
+        self.assertEqual('1', root.get_section())
+        self.assertEqual('text/plain', root.get_mime_type())
+        self.assertEqual('US-ASCII', root.get_charset())
+        self.assertEqual('7bit', root.get_encoding())
+        self.assertEqual((3028, 92), (root.get_size(), root.get_lines()))
+        self.assertIsNone(root.get_disposition())
+        self.assertEqual([], root.get_attachments())
+
+    def test_multipart(self):
+        root = BodyPart.parse(parse(MIXED))
+        self.assertTrue(root.is_multipart())
+        self.assertEqual(('', 'multipart/mixed', 'b1'), (root.get_section(), root.get_mime_type(),
+                                                           root.get_params()['boundary']))
+        self.assertEqual(['en', 'fr'], root.get_language())
+        self.assertEqual('http://example.com/', root.get_location())
+        self.assertEqual(['', '1', '1.1', '1.2', '2', '3', '3.1', '4'], [p.get_section() for p in root.walk()])
+        self.assertEqual('text/html', root.find('1.2').get_mime_type())
+        self.assertIsNone(root.find('5'))
+
+        pdf = root.find('2')
+        self.assertTrue(pdf.is_attachment())
+        self.assertEqual('résumé.pdf', pdf.get_filename())
+        self.assertEqual((4200000, 'base64'), (pdf.get_size(), pdf.get_encoding()))
+
+        message = root.find('3')
+        self.assertEqual('IMAP4rev1 WG mtg summary and minutes', message.get_envelope().get_subject())
+        self.assertEqual(('3.1', 40), (message.get_body().get_section(), message.get_body().get_lines()))
+        self.assertEqual(60, message.get_lines())
+
+        logo = root.find('4')
+        self.assertEqual(('inline', '<logo>', ['fr']), (logo.get_disposition(), logo.get_id(), logo.get_language()))
+        self.assertEqual('logo bleu.png', logo.get_filename())
+        self.assertFalse(logo.is_attachment())
+        self.assertEqual(['2'], [p.get_section() for p in root.get_attachments()])
+
+    def test_errors(self):
+        for text in (b'NIL', b'()', b'("text" "plain" NIL NIL NIL "7bit")', b'(("text" "plain" NIL NIL NIL "7bit" 1 1))',
+                     b'("text" "plain" NIL NIL NIL "7bit" "x" 1)', b'("text" "plain" ("a") NIL NIL "7bit" 1 1)'):
+            with self.assertRaises(ValueError):
+                BodyPart.parse(parse(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
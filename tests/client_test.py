@@ -6,8 +6,12 @@ from typing import Tuple, List, Mapping
 import pickle
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from dbeurive.imap.client import Client
+from dbeurive.imap.id_set import IdSet
+from dbeurive.imap.mailbox import Mailbox
+from fake_server import FakeImapServer, FakeMailbox, FakeMessage
 
 data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
 mailboxes_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'mailboxes')
@@ -103,18 +107,45 @@ class TestClient(unittest.TestCase):
             list_object: List[bytes] = pickle.loads(mailboxes_bin)
             mailboxes = Client._list(list_object)
             expected_list = expected[name]
-            self.assertEqual(expected_list, mailboxes)
+            self.assertEqual(expected_list, [[m.get_delimiter(), m.get_name()] for m in mailboxes])
 
     def test_list_mailboxes_empty(self):
         self.assertEqual([], Client._list([None]))
 
+    def test_list_mailboxes_filters(self):
+        mailboxes = [FakeMailbox('INBOX'),
+                     FakeMailbox('Archives', attributes=['\\Noselect', '\\HasChildren']),
+                     FakeMailbox('Archives/2023'),
+                     FakeMailbox('Envoy&AOk-s', attributes=['\\HasNoChildren', '\\Sent']),
+                     FakeMailbox('Corbeille', attributes=['\\Trash'])]
+        with FakeImapServer(mailboxes=mailboxes) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            self.assertEqual(5, len(client.list_mailboxes()))
+            self.assertEqual(['INBOX', 'Archives/2023', 'Envoyés', 'Corbeille'],
+                             [m.get_name() for m in client.list_mailboxes(selectable_only=True)])
+            self.assertEqual(['INBOX', 'Archives/2023'],
+                             [m.get_raw_name() for m in client.list_mailboxes(selectable_only=True, special_use=False)])
+            self.assertEqual(['\\Sent', '\\Trash'],
+                             [m.get_special_use() for m in client.list_mailboxes(special_use=True)])
+            self.assertEqual(1, server.commands.count('LOGIN'))
+            client.logout()
+
+    def test_list_mailboxes_literal(self):
+        raw = [b'(\\HasNoChildren) "/" INBOX', (b'(\\HasNoChildren) "/" {6}', b'A "b"c'), b'', b'() "/" Sent']
+        self.assertEqual([Mailbox('INBOX', '/', ('\\HasNoChildren',)),
+                          Mailbox('A "b"c', '/', ('\\HasNoChildren',)),
+                          Mailbox('Sent', '/')], Client._list(raw))
+        self.assertIsNone(Client._list([b'(\\HasNoChildren) "/" "INBOX']))
+
     def test_list_emails_ids(self):
         expected = {
-            'laposte.net': ['1'],
-            'mail.com': ['1', '2', '3', '4', '5', '6', '7', '8'],
-            'net-c.com': ['1', '2'],
-            'vivaldi.net': ['1'],
-            'yandex.ru': ['1', '2', '3']
+            'laposte.net': IdSet([1]),
+            'mail.com': IdSet([1, 2, 3, 4, 5, 6, 7, 8]),
+            'net-c.com': IdSet([1, 2]),
+            'vivaldi.net': IdSet([1]),
+            'yandex.ru': IdSet([1, 2, 3])
         }
 
         test_set = __class__.get_emails_ids_raw_files()
@@ -128,3 +159,186 @@ class TestClient(unittest.TestCase):
             emails = Client._search(list_object)
             self.assertEqual(expected[name], emails)
 
+    def test_list_emails_ids_split(self):
+        self.assertEqual(IdSet([1, 2, 3, 4]), Client._search([b'1 2', b'3 4']))
+        self.assertEqual(IdSet(), Client._search([b'']))
+        self.assertIsNone(Client._search([None]))
+        self.assertIsNone(Client._search([b'1 A']))
+        self.assertIsNone(Client._search([b'1 99999999999999999999']))
+
+    def test_expand_criteria(self):
+        self.assertEqual([['ALL']], Client._expand_criteria(('ALL',), 100))
+        self.assertEqual([['1:3,5', 'UNSEEN']], Client._expand_criteria(([5, 1, 2, 3], 'UNSEEN'), 100))
+        self.assertEqual([['UID', '1,3', 'SEEN'], ['UID', '5,7', 'SEEN']],
+                         Client._expand_criteria(('UID', IdSet([1, 3, 5, 7]), 'SEEN'), 3))
+        self.assertEqual([], Client._expand_criteria((IdSet(), 'SEEN'), 100))
+        with self.assertRaises(Exception):
+            Client._expand_criteria((IdSet([1, 3, 5]), IdSet([1, 3, 5])), 3)
+
+    def test_expand_criteria_nested(self):
+        # The operands of NOT and OR, and the sets within parentheses, are never split.
+        self.assertEqual([['NOT', 'UID', '1,3,5,7']], Client._expand_criteria(('NOT', 'UID', IdSet([1, 3, 5, 7])), 3))
+        self.assertEqual([['OR', '1,3,5,7', 'SEEN']], Client._expand_criteria(('OR', IdSet([1, 3, 5, 7]), 'SEEN'), 3))
+        self.assertEqual([['(UID', '1,3,5,7', 'SEEN)']],
+                         Client._expand_criteria(('(UID', IdSet([1, 3, 5, 7]), 'SEEN)'), 3))
+        self.assertEqual([['NOT', 'SEEN', 'UID', '1,3'], ['NOT', 'SEEN', 'UID', '5,7']],
+                         Client._expand_criteria(('NOT', 'SEEN', 'UID', IdSet([1, 3, 5, 7])), 3))
+        self.assertEqual([['HEADER', 'X-Id', '1', '1,3'], ['HEADER', 'X-Id', '1', '5,7']],
+                         Client._expand_criteria(('HEADER', 'X-Id', '1', IdSet([1, 3, 5, 7])), 3))
+        # An empty set under NOT matches all the messages.
+        self.assertEqual([['ALL']], Client._expand_criteria(('NOT', IdSet()), 100))
+        self.assertEqual([['ALL', 'SEEN']], Client._expand_criteria(('NOT', 'UID', [], 'SEEN'), 100))
+        with self.assertRaises(Exception):
+            Client._expand_criteria(('OR', IdSet(), 'SEEN'), 100)
+
+    def test_search_sequence_set(self):
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX', [FakeMessage(i) for i in range(1, 21)])]) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+            client.MAX_SEQUENCE_SET_LENGTH = 5
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            client.select_mailbox()
+            self.assertEqual(IdSet([2, 4, 6, 8, 10, 11, 12]),
+                             client.list_emails_ids(IdSet([2, 4, 6, 8, 10, 11, 12, 30])))
+            self.assertEqual(4, server.commands.count('SEARCH'))
+            self.assertEqual(IdSet(), client.list_emails_ids(IdSet()))
+            client.logout()
+
+    def test_uids(self):
+        messages = [FakeMessage(10, b'Subject: a\r\n\r\nbody a', ['\\Seen']),
+                    FakeMessage(20, b'Subject: b\r\n\r\nbody b'),
+                    FakeMessage(35, b'Subject: c\r\n\r\nbody c')]
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX', messages, uid_validity=777)]) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            self.assertEqual(3, client.select_mailbox())
+            self.assertEqual(777, client.get_uid_validity())
+            self.assertEqual(36, client.get_uid_next())
+            self.assertEqual(IdSet([10, 20, 35]), client.list_emails_uids())
+            self.assertEqual(IdSet([20, 35]), client.list_emails_uids('UID', '11:*'))
+
+            records = client.fetch_by_uid(IdSet([10, 35]), '(FLAGS RFC822.SIZE BODY.PEEK[HEADER])')
+            self.assertEqual([10, 35], [r.get_uid() for r in records])
+            self.assertEqual([1, 3], [r.get_number() for r in records])
+            self.assertEqual(['\\Seen'], records[0].get_flags())
+            self.assertEqual(len(messages[0].body), records[0].get_size())
+            self.assertEqual(b'Subject: a\r\n\r\n', records[0].get_body('HEADER'))
+
+            records = client.fetch([2], '(BODY[])')
+            self.assertEqual(messages[1].body, records[0].get_body())
+            self.assertIsNone(records[0].get_uid())
+            client.logout()
+
+    def test_iter_fetch(self):
+        body = b'From: "Joe" <joe@example.com>\r\nTo: ann@example.com\r\nSubject: hello\r\n' \
+               b'Date: Wed, 17 Jul 1996 02:23:25 -0700\r\n\r\nbody'
+        messages = [FakeMessage(i, body, ['\\Seen'] if i % 2 else []) for i in range(1, 26)]
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX', messages)]) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+            # One batch in flight at a time.
+            client.PIPELINE_DEPTH = 1
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            client.select_mailbox()
+            records = client.iter_fetch(client.list_emails_ids(), '(FLAGS RFC822.SIZE INTERNALDATE ENVELOPE BODY.PEEK[TEXT])',
+                                        batch_size=10)
+            # Nothing is sent until the iteration starts.
+            self.assertEqual(0, server.commands.count('FETCH'))
+            first = next(records)
+            self.assertEqual(1, server.commands.count('FETCH'))
+            self.assertEqual(1, first.get_number())
+            self.assertEqual(['\\Seen'], first.get_flags())
+            self.assertEqual(len(body), first.get_size())
+            self.assertEqual('17-Jul-1996 02:44:25 -0700', first.get_internal_date())
+            self.assertEqual('hello', first.get_envelope()[1])
+            self.assertEqual([['Joe', None, 'joe', 'example.com']], first.get_envelope()[2])
+            self.assertEqual(b'body', first.get_body('TEXT'))
+            self.assertEqual(list(range(2, 26)), [r.get_number() for r in records])
+            self.assertEqual(3, server.commands.count('FETCH'))
+
+            uids = [r.get_uid() for r in client.iter_fetch([3, 25, 4], '(FLAGS)', batch_size=2, uid=True)]
+            self.assertEqual([3, 4, 25], uids)
+            self.assertEqual(2, server.commands.count('UID FETCH'))
+
+            # The batches are pipelined.
+            client.PIPELINE_DEPTH = 4
+            server.delay = 0.02
+            before = server.pipelined
+            self.assertEqual(list(range(1, 26)), [r.get_number() for r in client.iter_fetch(IdSet(range(1, 26)),
+                                                                                           '(FLAGS)', batch_size=5)])
+            self.assertEqual(3 + 5, server.commands.count('FETCH'))
+            self.assertGreater(server.pipelined, before)
+            client.logout()
+
+    def test_status_all(self):
+        mailboxes = [FakeMailbox('INBOX', [FakeMessage(1, flags=['\\Seen']), FakeMessage(2), FakeMessage(7)]),
+                     FakeMailbox('Archives', attributes=['\\Noselect', '\\HasChildren']),
+                     FakeMailbox('Archives/Envoy&AOk-s', [FakeMessage(3, flags=['\\Seen'])]),
+                     FakeMailbox('Empty')]
+        expected = {'INBOX': {'MESSAGES': 3, 'UNSEEN': 2, 'UIDNEXT': 8},
+                    'Archives/Envoyés': {'MESSAGES': 1, 'UNSEEN': 0, 'UIDNEXT': 4},
+                    'Empty': {'MESSAGES': 0, 'UNSEEN': 0, 'UIDNEXT': 1}}
+        for capabilities in (('IMAP4rev1', 'LIST-STATUS'), ('IMAP4rev1',)):
+            with FakeImapServer(mailboxes=mailboxes, capabilities=capabilities) as server:
+                client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+                client.PIPELINE_DEPTH = 2
+                self.assertTrue(client.connect())
+                self.assertTrue(client.login())
+                client.select_mailbox('Empty')
+                self.assertEqual(expected, client.status_all())
+                self.assertEqual({'INBOX': {'MESSAGES': 3}}, client.status_all(('MESSAGES',), 'IN%'))
+                self.assertEqual('Empty', client.get_selected_mailbox())
+                self.assertEqual(0 if 'LIST-STATUS' in capabilities else 4, server.commands.count('STATUS'))
+                self.assertEqual(2, server.commands.count('LIST'))
+                self.assertEqual(0, len(client.list_emails_ids()))
+                client.logout()
+
+    def test_status_parse(self):
+        self.assertEqual({'INBOX': {'MESSAGES': 3, 'UNSEEN': 1}, 'A "b"': {'MESSAGES': 0}, 'Envoyés': {}},
+                         Client._status([b'"INBOX" (MESSAGES 3 unseen 1)', (b'{5}', b'A "b"'), b' (MESSAGES 0)',
+                                         b'Envoy&AOk-s ()']))
+        self.assertEqual({}, Client._status([None]))
+        self.assertIsNone(Client._status([b'INBOX (MESSAGES)']))
+        self.assertIsNone(Client._status([b'INBOX (MESSAGES x)']))
+
+    def test_search_stats(self):
+        messages = [FakeMessage(uid) for uid in (3, 4, 5, 9, 20, 21)]
+        for capabilities in (('IMAP4rev1', 'ESEARCH'), ('IMAP4rev1',)):
+            with FakeImapServer(mailboxes=[FakeMailbox('INBOX', messages)], capabilities=capabilities) as server:
+                client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+                client.MAX_SEQUENCE_SET_LENGTH = 4
+                self.assertTrue(client.connect())
+                self.assertTrue(client.login())
+                client.select_mailbox()
+                self.assertEqual({'MIN': 1, 'MAX': 6, 'COUNT': 6, 'ALL': IdSet(range(1, 7))}, client.search_stats())
+                self.assertEqual({'MIN': 4, 'MAX': 21, 'COUNT': 4, 'ALL': IdSet([4, 9, 20, 21])},
+                                 client.search_stats('UID', IdSet([1, 2, 4, 9, 20, 21]), uid=True))
+                self.assertEqual({'COUNT': 0, 'MAX': None},
+                                 client.search_stats('UID', '100:200', returns=('count', 'max'), uid=True))
+                self.assertEqual({'MIN': 3, 'MAX': 5, 'COUNT': 2, 'ALL': IdSet([3, 5])},
+                                 client.search_stats('NOT', 'UID', IdSet([4, 9, 10, 20, 21]), uid=True))
+                self.assertEqual({'MIN': 1, 'MAX': 6, 'COUNT': 6, 'ALL': IdSet(range(1, 7))},
+                                 client.search_stats('NOT', IdSet()))
+                client.logout()
+
+    def test_capabilities_after_login(self):
+        for capability_code in (True, False):
+            with FakeImapServer(mailboxes=[FakeMailbox('INBOX')], capabilities=('IMAP4rev1', 'LOGINDISABLED'),
+                                auth_capabilities=('IMAP4rev1', 'ESEARCH'), capability_code=capability_code) as server:
+                client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+                self.assertTrue(client.connect())
+                self.assertEqual(('IMAP4REV1', 'LOGINDISABLED'), client.get_capabilities())
+                commands = server.commands.count('CAPABILITY')
+                self.assertTrue(client.login())
+                self.assertEqual(('IMAP4REV1', 'ESEARCH'), client.get_capabilities())
+                self.assertTrue(client.has_capability('esearch'))
+                self.assertEqual(commands + (0 if capability_code else 1), server.commands.count('CAPABILITY'))
+                client.logout()
+
+    def test_esearch_parse(self):
+        self.assertEqual({'MIN': 2, 'COUNT': 3, 'ALL': IdSet([2, 10, 11])},
+                         Client._esearch([b'(TAG "A282") UID MIN 2 COUNT 3 ALL 2,10:11'], ('MIN', 'COUNT', 'ALL')))
+        self.assertEqual({'MIN': None, 'COUNT': 0}, Client._esearch([b'(TAG "A283")'], ('MIN', 'COUNT')))
+        self.assertIsNone(Client._esearch([b'(TAG "A284") COUNT'], ('COUNT',)))
+        self.assertIsNone(Client._esearch([b'(TAG "A285") ALL 1:x'], ('ALL',)))
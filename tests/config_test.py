@@ -1,6 +1,9 @@
 import unittest
 import os
 import sys
+import subprocess
+import tempfile
+import unittest.mock
 
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
@@ -83,5 +86,65 @@ class TestConfig(unittest.TestCase):
         self.assertTrue(Config.cmp_conf(clear_conf.get_conf(), decrypted_conf.get_conf()))
 
 
-
-
+class TestSnapshot(unittest.TestCase):
+
+    conf = 'isp0:\n' \
+           '  net:\n    hostname: imap.isp0.com\n    port: 993\n' \
+           '  imap:\n    path_sep: "/"\n' \
+           '  user:\n    login: user@isp0.com\n    password: "pass:word"\n' \
+           'isp1:\n' \
+           '  net:\n    hostname: imap.isp1.com\n    port: 143\n' \
+           '  imap:\n    path_sep: "."\n' \
+           '  user:\n    login: user@isp1.com\n    password: secret\n'
+
+    def test_snapshot(self):
+        conf = Config.get_conf_from_string(self.conf)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'isp.snapshot')
+            conf.write_snapshot(path)
+            self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+            snapshot = Config.get_conf_from_snapshot(path)
+        self.assertEqual(['isp0', 'isp1'], snapshot.get_isps())
+        self.assertEqual('imap.isp1.com', snapshot.get_hostname('isp1'))
+        self.assertEqual(143, snapshot.get_port('isp1'))
+        self.assertEqual('.', snapshot.get_path_set('isp1'))
+        self.assertEqual('pass:word', snapshot.get_user_password('isp0'))
+        self.assertTrue(Config.cmp_conf(conf.get_conf(), snapshot.get_conf()))
+        with self.assertRaises(Exception):
+            snapshot.get_hostname('isp2')
+
+    def test_cyphered_snapshot(self):
+        conf = Config.get_conf_from_string(self.conf.replace('secret', 'sécret'))
+        environ = {Config.CYPHER_KEY_NAME: '0123456789abcdef', Config.CYPHER_IV_NAME: 'fedcba9876543210'}
+        with tempfile.TemporaryDirectory() as directory, unittest.mock.patch.dict(os.environ, environ):
+            path = os.path.join(directory, 'isp.snapshot')
+            conf.write_snapshot(path, clear=False)
+            with open(path, 'rb') as fd:
+                self.assertNotIn(b'isp0', fd.read())
+            with self.assertRaises(Exception):
+                Config.get_conf_from_snapshot(path)
+            snapshot = Config.get_conf_from_snapshot(path, clear=False)
+        self.assertEqual('sécret', snapshot.get_user_password('isp1'))
+        self.assertTrue(Config.cmp_conf(conf.get_conf(), snapshot.get_conf()))
+
+    def test_invalid_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'isp.yaml')
+            with open(path, 'w') as fd:
+                fd.write(self.conf)
+            with self.assertRaises(Exception):
+                Config.get_conf_from_snapshot(path)
+            with open(path, 'w') as fd:
+                fd.write('{"format": "dbeurive.imap.config", "version": 999}')
+            with self.assertRaises(Exception):
+                Config.get_conf_from_snapshot(path)
+
+    def test_invalid_conf(self):
+        with self.assertRaises(Exception):
+            Config.get_conf_from_string('isp0:\n  net: imap.isp0.com\n')
+
+    def test_lazy_imports(self):
+        code = 'import sys; import dbeurive.imap.config; print("yaml" in sys.modules, "Crypto" in sys.modules)'
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+        self.assertEqual(b'False False', output.strip())
@@ -0,0 +1,185 @@
+import unittest
+import os
+import socket
+import ssl
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.client import Client
+from dbeurive.imap.connector import Connector, ConnectorSSL, get_default_context
+from dbeurive.imap.id_set import IdSet
+from fake_server import FakeImapServer, FakeMailbox, FakeMessage
+
+tls_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'tls')
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        messages = [FakeMessage(uid, b'Subject: %d\r\n\r\nbody' % uid, ['\\Seen'] if uid % 2 else [])
+                    for uid in range(1, 11)]
+        self.server = FakeImapServer(mailboxes=[FakeMailbox('INBOX', messages), FakeMailbox('Sent')],
+                                     delay=0.02).start()
+        self.connector = Connector(self.server.host, self.server.port)
+        self.connector.login('user', 'password')
+        self.connector.select('INBOX')
+
+    def tearDown(self):
+        self.connector.logout()
+        self.server.stop()
+
+    def test_pipeline(self):
+        commands = [('UID', 'SEARCH', f'{i}:{i + 1}') for i in range(1, 11, 2)] + [('SEARCH', 'UID', '20:30')]
+        results = list(self.connector.pipeline(commands, 'SEARCH', 3))
+        self.assertEqual([('OK', [b'1 2']), ('OK', [b'3 4']), ('OK', [b'5 6']), ('OK', [b'7 8']), ('OK', [b'9 10']),
+                          ('OK', [b''])], results)
+        self.assertGreater(self.server.pipelined, 0)
+
+        results = list(self.connector.pipeline([('STATUS', 'INBOX', '(MESSAGES)'), ('STATUS', 'Missing', '(MESSAGES)'),
+                                                ('STATUS', 'Sent', '(MESSAGES)')], 'STATUS', 8))
+        self.assertEqual(('OK', [b'"INBOX" (MESSAGES 10)']), results[0])
+        self.assertEqual('NO', results[1][0])
+        self.assertEqual(('OK', [b'"Sent" (MESSAGES 0)']), results[2])
+
+    def test_routing(self):
+        # The untagged responses of other types are kept, as imaplib does.
+        results = list(self.connector.pipeline([('FETCH', '1:2', '(FLAGS BODY.PEEK[TEXT])'), ('STATUS', 'Sent', '(MESSAGES)')],
+                                               'FETCH', 8))
+        self.assertEqual([('OK', [(b'1 (FLAGS (\\Seen) BODY[TEXT] {4}', b'body'), b')',
+                                  (b'2 (FLAGS () BODY[TEXT] {4}', b'body'), b')']),
+                          ('OK', [None])], results)
+        self.assertEqual(('STATUS', [b'"Sent" (MESSAGES 0)']), self.connector.response('STATUS'))
+
+    def test_interrupted(self):
+        results = self.connector.pipeline([('UID', 'SEARCH', str(i)) for i in range(1, 11)], 'SEARCH', 4)
+        self.assertEqual(('OK', [b'1']), next(results))
+        results.close()
+        self.assertEqual({}, self.connector.tagged_commands)
+        self.assertEqual('OK', self.connector.noop()[0])
+        self.assertEqual(('OK', [b'1 2 3 4 5 6 7 8 9 10']), self.connector.uid('SEARCH', '1:*'))
+        with self.assertRaises(ValueError):
+            list(self.connector.pipeline([('NOOP',)], 'SEARCH', 0))
+
+    def test_client(self):
+        client = Client(self.server.host, self.server.port, 'user', 'password', use_ssl=False)
+        client.MAX_SEQUENCE_SET_LENGTH = 4
+        self.assertTrue(client.connect())
+        self.assertTrue(client.login())
+        client.select_mailbox()
+        self.assertEqual(IdSet([1, 3, 5, 7, 9]), client.list_emails_uids('UID', IdSet([1, 3, 5, 7, 9])))
+        self.assertEqual(list(range(1, 11)), [r.get_uid() for r in client.iter_fetch(IdSet(range(1, 11)), '(UID)', 2)])
+        before = self.server.pipelined
+        client.PIPELINE_DEPTH = 1
+        self.assertEqual(list(range(1, 11)), [r.get_uid() for r in client.iter_fetch(IdSet(range(1, 11)), '(UID)', 2)])
+        self.assertEqual(before, self.server.pipelined)
+        client.logout()
+
+
+
+class TestCompression(unittest.TestCase):
+
+    def test_compression(self):
+        body = b'Subject: report\r\n\r\n' + b'The quick brown fox jumps over the lazy dog.\r\n' * 2000
+        messages = [FakeMessage(uid, body) for uid in range(1, 6)]
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX', messages)],
+                            capabilities=('IMAP4rev1', 'COMPRESS=DEFLATE')) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False, use_compression=True)
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            self.assertTrue(client.is_compressed())
+            self.assertEqual(1, server.commands.count('COMPRESS'))
+            self.assertTrue(client.get_connector().compress())
+            self.assertEqual(1, server.commands.count('COMPRESS'))
+            client.select_mailbox()
+            self.assertEqual(IdSet(range(1, 6)), client.list_emails_ids())
+            self.assertEqual([body] * 5, [r.get_body() for r in client.iter_fetch(IdSet(range(1, 6)), '(BODY[])', 2)])
+            self.assertGreater(client.get_compression_ratio(), 10)
+            stats = client.get_connector().get_transfer_stats()
+            self.assertGreater(stats['received'], 5 * len(body))
+            self.assertLess(stats['received_wire'], len(body))
+            self.assertTrue(client.noop())
+            client.logout()
+
+    def test_advertised_after_login(self):
+        for capability_code in (True, False):
+            with FakeImapServer(mailboxes=[FakeMailbox('INBOX', [FakeMessage(1)])], capabilities=('IMAP4rev1',),
+                                auth_capabilities=('IMAP4rev1', 'COMPRESS=DEFLATE'),
+                                capability_code=capability_code) as server:
+                client = Client(server.host, server.port, 'user', 'password', use_ssl=False, use_compression=True)
+                self.assertTrue(client.connect())
+                self.assertTrue(client.login())
+                self.assertTrue(client.is_compressed())
+                self.assertEqual(1, server.commands.count('COMPRESS'))
+                client.select_mailbox()
+                self.assertEqual(IdSet([1]), client.list_emails_ids())
+                client.logout()
+
+    def test_not_supported(self):
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX')]) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False, use_compression=True)
+            self.assertIsNone(client.get_compression_ratio())
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            self.assertFalse(client.is_compressed())
+            self.assertEqual(0, server.commands.count('COMPRESS'))
+            self.assertEqual(1.0, client.get_compression_ratio())
+            client.logout()
+
+
+
+class TestTls(unittest.TestCase):
+
+    def setUp(self):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(os.path.join(tls_path, 'cert.pem'), os.path.join(tls_path, 'key.pem'))
+        self.server = FakeImapServer(mailboxes=[FakeMailbox('INBOX', [FakeMessage(1)])], ssl_context=context).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_session_reuse(self):
+        context = ssl.create_default_context(cafile=os.path.join(tls_path, 'cert.pem'))
+        reused = []
+        for _ in range(3):
+            client = Client(self.server.host, self.server.port, 'user', 'password', ssl_context=context)
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            self.assertEqual(IdSet([1]), client.list_emails_ids(mailbox='INBOX'))
+            reused.append(client.get_connector().is_session_reused())
+            self.assertIs(context, client.get_connector().ssl_context)
+            client.logout()
+        self.assertEqual([False, True, True], reused)
+
+        # A session is only resumed with the context that created it.
+        connector = ConnectorSSL(self.server.host, self.server.port,
+                                 ssl_context=ssl.create_default_context(cafile=os.path.join(tls_path, 'cert.pem')))
+        self.assertFalse(connector.is_session_reused())
+        connector.logout()
+
+    def test_timeout(self):
+        # The server accepts the connection, but never answers.
+        with socket.socket() as listener:
+            listener.bind(('127.0.0.1', 0))
+            listener.listen(1)
+            start = time.monotonic()
+            with self.assertRaises(OSError):
+                ConnectorSSL('127.0.0.1', listener.getsockname()[1], timeout=0.2)
+            self.assertLess(time.monotonic() - start, 5)
+
+    def test_default_context(self):
+        self.assertIs(get_default_context(), get_default_context())
+        reused = []
+        for _ in range(2):
+            connector = ConnectorSSL(self.server.host, self.server.port)
+            self.assertIs(get_default_context(), connector.ssl_context)
+            connector.login('user', 'password')
+            reused.append(connector.is_session_reused())
+            connector.logout()
+        self.assertTrue(reused[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,682 @@
+"""This module implements a minimal IMAP server used by the unit tests.
+
+The server speaks plain text IMAP (no TLS) over a local TCP socket.
+It only implements the subset of the protocol used by the clients.
+"""
+
+import email
+import email.utils
+import queue
+import re
+import select
+import socketserver
+import ssl
+import threading
+import time
+import zlib
+from typing import List, Mapping, Set, Tuple, Union, Sequence
+
+
+class FakeMessage:
+    """This class represents a message stored within a mailbox of the fake server.
+    """
+
+    def __init__(self, uid: int, body: bytes = b'', flags: Sequence[str] = (), modseq: int = 1):
+        self.uid: int = uid
+        self.body: bytes = body
+        self.flags: List[str] = list(flags)
+        self.modseq: int = modseq
+
+    def section(self, section: str) -> bytes:
+        """Return a section of the message (RFC 3501, section 6.4.5). Only "", "HEADER", "TEXT" and part numbers
+        of (possibly nested) multipart messages are supported.
+        """
+        header, _, text = self.body.partition(b'\r\n\r\n')
+        if section == '':
+            return self.body
+        if section == 'HEADER':
+            return header + b'\r\n\r\n'
+        if section == 'TEXT':
+            return text
+        part = email.message_from_bytes(self.body)
+        for number in section.split('.'):
+            parts = part.get_payload() if part.is_multipart() else [part]
+            part = parts[int(number) - 1]
+        return part.get_payload(decode=False).encode()
+
+    def bodystructure(self) -> bytes:
+        """Return the structure of the message (RFC 3501, section 7.4.2). Encapsulated messages are not supported.
+        """
+        def string(value: Union[None, str]) -> str:
+            return 'NIL' if value is None else '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+        def params(values) -> str:
+            if not values:
+                return 'NIL'
+            return '(%s)' % ' '.join('%s %s' % (string(k), string(v)) for k, v in values)
+
+        def structure(part) -> str:
+            if part.is_multipart():
+                return '(%s %s %s NIL NIL NIL)' % (''.join(structure(p) for p in part.get_payload()),
+                                                    string(part.get_content_subtype()), params(part.get_params()[1:]))
+            payload = part.get_payload(decode=False)
+            fields = [string(part.get_content_maintype()), string(part.get_content_subtype()),
+                      params(part.get_params()[1:] if part.get('Content-Type') else [('charset', 'us-ascii')]),
+                      string(part.get('Content-ID')), string(part.get('Content-Description')),
+                      string(part.get('Content-Transfer-Encoding', '7bit')), str(len(payload.encode()))]
+            if part.get_content_maintype() == 'text':
+                fields.append(str(payload.count('\n')))
+            disposition = part.get_content_disposition()
+            fields.append('NIL')
+            fields.append('NIL' if disposition is None else '(%s %s)' % (
+                string(disposition), params(part.get_params(header='Content-Disposition')[1:])))
+            fields.extend(['NIL', 'NIL'])
+            return '(%s)' % ' '.join(fields)
+
+        return structure(email.message_from_bytes(self.body)).encode()
+
+
+    def envelope(self) -> bytes:
+        """Return the envelope of the message (RFC 3501, section 7.4.2).
+        """
+        message = email.message_from_bytes(self.body)
+
+        def string(value: Union[None, str]) -> str:
+            return 'NIL' if value is None else '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+        def addresses(value: Union[None, str]) -> str:
+            if value is None:
+                return 'NIL'
+            result = []
+            for name, address in email.utils.getaddresses([value]):
+                mailbox, _, host = address.partition('@')
+                result.append('(%s NIL %s %s)' % (string(name or None), string(mailbox), string(host)))
+            return '(%s)' % ''.join(result)
+
+        sender = message.get('From')
+        return ('(%s)' % ' '.join([string(message.get('Date')), string(message.get('Subject')),
+                                   addresses(sender), addresses(message.get('Sender', sender)),
+                                   addresses(message.get('Reply-To', sender)), addresses(message.get('To')),
+                                   addresses(message.get('Cc')), addresses(message.get('Bcc')),
+                                   string(message.get('In-Reply-To')), string(message.get('Message-ID'))])).encode()
+
+
+class FakeMailbox:
+    """This class represents a mailbox of the fake server.
+    """
+
+    def __init__(self, name: str, messages: Sequence[FakeMessage] = (), attributes: Sequence[str] = ('\\HasNoChildren',),
+                 uid_validity: int = 1):
+        self.name: str = name
+        self.messages: List[FakeMessage] = list(messages)
+        self.attributes: List[str] = list(attributes)
+        self.uid_validity: int = uid_validity
+        self.highest_modseq: int = max([m.modseq for m in self.messages], default=1)
+        # UIDs and mod-sequences of the expunged messages (for VANISHED).
+        self.expunged: List[Tuple[int, int]] = []
+        self._next_uid: int = max([m.uid for m in self.messages], default=0) + 1
+
+    def uid_next(self) -> int:
+        return self._next_uid
+
+    def append(self, message: FakeMessage) -> None:
+        self.highest_modseq += 1
+        message.modseq = self.highest_modseq
+        self.messages.append(message)
+        self._next_uid = max(self._next_uid, message.uid + 1)
+
+    def set_flags(self, uid: int, flags: Sequence[str]) -> None:
+        self.highest_modseq += 1
+        for message in self.messages:
+            if message.uid == uid:
+                message.flags = list(flags)
+                message.modseq = self.highest_modseq
+
+    def expunge(self, uid: int) -> None:
+        self.highest_modseq += 1
+        self.messages = [m for m in self.messages if m.uid != uid]
+        self.expunged.append((uid, self.highest_modseq))
+
+    def status(self, items: Sequence[str]) -> str:
+        """Return the response to the command STATUS (RFC 3501, section 6.3.10).
+        """
+        values = {'MESSAGES': len(self.messages),
+                  'RECENT': 0,
+                  'UIDNEXT': self.uid_next(),
+                  'UIDVALIDITY': self.uid_validity,
+                  'UNSEEN': len([m for m in self.messages if '\\Seen' not in m.flags]),
+                  'HIGHESTMODSEQ': self.highest_modseq}
+        return '* STATUS "%s" (%s)' % (self.name, ' '.join(f'{i} {values[i]}' for i in items))
+
+
+class FakeImapServer:
+    """This class implements a fake IMAP server that runs within a background thread.
+
+    Usage:
+
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX')]) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+    """
+
+    def __init__(self,
+                 username: str = 'user',
+                 password: str = 'password',
+                 mailboxes: Sequence[FakeMailbox] = (),
+                 delimiter: str = '/',
+                 capabilities: Sequence[str] = ('IMAP4rev1',),
+                 auth_capabilities: Union[None, Sequence[str]] = None,
+                 capability_code: bool = True,
+                 raw_list: Union[None, List[bytes]] = None,
+                 raw_search: Union[None, List[bytes]] = None,
+                 delay: float = 0.0,
+                 ssl_context: Union[None, ssl.SSLContext] = None):
+        """Create a fake server.
+
+        Args:
+            username (str): the login accepted by the server.
+            password (str): the password accepted by the server.
+            mailboxes (Sequence[FakeMailbox]): the mailboxes.
+            delimiter (str): the hierarchy delimiter.
+            capabilities (Sequence[str]): the capabilities advertised by the server.
+            auth_capabilities (Union[None, Sequence[str]]): if set, the capabilities advertised once the client is
+                authenticated. Otherwise, the server advertises the same capabilities before and after LOGIN.
+            capability_code (bool): flag that indicates whether the tagged response to LOGIN contains the response
+                code CAPABILITY or not.
+            raw_list (Union[None, List[bytes]]): if set, the server replays these lines as the response to LIST.
+            raw_search (Union[None, List[bytes]]): if set, the server replays these lines as the response to SEARCH.
+            delay (float): delay (in seconds) injected before each response.
+            ssl_context (Union[None, ssl.SSLContext]): if set, the connections are encrypted (TLS) with this context.
+        """
+        self.username: str = username
+        self.password: str = password
+        self.mailboxes: Mapping[str, FakeMailbox] = {m.name: m for m in mailboxes}
+        self.delimiter: str = delimiter
+        self.capabilities: List[str] = list(capabilities)
+        self.auth_capabilities: Union[None, List[str]] = None if auth_capabilities is None else list(auth_capabilities)
+        self.capability_code: bool = capability_code
+        self.raw_list: Union[None, List[bytes]] = raw_list
+        self.raw_search: Union[None, List[bytes]] = raw_search
+        self.delay: float = delay
+        self.ssl_context: Union[None, ssl.SSLContext] = ssl_context
+        self.commands: List[str] = []
+        self.connections: int = 0
+        # Number of commands received while the next command was already waiting (pipelining).
+        self.pipelined: int = 0
+        # Queues of the sessions that are currently running the command IDLE.
+        self.idlers: List[queue.Queue] = []
+        self.idle_condition = threading.Condition()
+        self.host: str = '127.0.0.1'
+        self.port: int = 0
+        self._server: Union[None, _Server] = None
+        self._thread: Union[None, threading.Thread] = None
+
+    def start(self) -> 'FakeImapServer':
+        server = self
+
+        class Handler(_Session):
+            fake = server
+
+        self._server = _Server((self.host, 0), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def push(self, line: str) -> None:
+        """Send an untagged response to all the clients that are currently running the command IDLE.
+
+        Args:
+            line (str): the response (ex: "* 4 EXISTS").
+        """
+        with self.idle_condition:
+            for events in self.idlers:
+                events.put(line)
+
+    def wait_idle(self, count: int = 1, timeout: float = 5.0) -> bool:
+        """Wait until a given number of clients are running the command IDLE.
+
+        Returns:
+            bool: True if the clients are idle, False if the timeout expired.
+        """
+        with self.idle_condition:
+            return self.idle_condition.wait_for(lambda: len(self.idlers) >= count, timeout)
+
+    def __enter__(self) -> 'FakeImapServer':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+_arg_re = re.compile(r'\s*("(?:\\.|[^"\\])*"|\([^()]*(?:\([^()]*\)[^()]*)*\)|[^\s()"]+(?:\[[^\]]*\](?:<[^>]*>)?)?)')
+
+
+def split_args(text: str) -> List[str]:
+    """Split the arguments of a command.
+
+    Args:
+        text (str): the arguments.
+
+    Returns:
+        List[str]: the list of arguments. Quoted strings are unquoted.
+    """
+    args: List[str] = []
+    pos = 0
+    while pos < len(text):
+        m = _arg_re.match(text, pos)
+        if m is None or m.end() == pos:
+            break
+        arg = m.group(1)
+        if arg.startswith('"'):
+            arg = re.sub(r'\\(.)', r'\1', arg[1:-1])
+        args.append(arg)
+        pos = m.end()
+    return args
+
+
+def parse_sequence_set(text: str, largest: int) -> List[int]:
+    """Expand an IMAP sequence set (ex: "1:3,5,7:*").
+
+    Args:
+        text (str): the sequence set.
+        largest (int): the value of "*".
+
+    Returns:
+        List[int]: the numbers.
+    """
+    numbers: List[int] = []
+    for part in text.split(','):
+        bounds = [largest if b == '*' else int(b) for b in part.split(':')]
+        low, high = min(bounds), max(bounds)
+        numbers.extend(range(low, high + 1))
+    return numbers
+
+
+def format_sequence_set(numbers: Sequence[int]) -> str:
+    """Compress a sorted list of numbers into an IMAP sequence set (ex: "1:3,5").
+    """
+    ranges: List[List[int]] = []
+    for n in numbers:
+        if len(ranges) > 0 and ranges[-1][1] + 1 == n:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+    return ','.join(str(a) if a == b else f'{a}:{b}' for a, b in ranges)
+
+
+class _Session(socketserver.StreamRequestHandler):
+    """This class handles one client connection.
+    """
+
+    fake: FakeImapServer = None
+    # Unbuffered reads: the command IDLE waits for the client with select().
+    rbufsize = 0
+
+    def setup(self) -> None:
+        if self.fake.ssl_context is not None:
+            self.request = self.fake.ssl_context.wrap_socket(self.request, server_side=True)
+        super().setup()
+        self.selected: Union[None, FakeMailbox] = None
+        self.authenticated: bool = False
+        self.enabled: List[str] = []
+        # COMPRESS=DEFLATE (RFC 4978).
+        self.deflater = None
+        self.inflater = None
+        self.pending: bytes = b''
+        self.output: List[bytes] = []
+
+    def capabilities(self) -> List[str]:
+        if self.authenticated and self.fake.auth_capabilities is not None:
+            return self.fake.auth_capabilities
+        return self.fake.capabilities
+
+    def send(self, line: Union[str, bytes]) -> None:
+        if isinstance(line, str):
+            line = line.encode()
+        self.write(line + b'\r\n')
+
+    def write(self, data: bytes) -> None:
+        # The response is sent at once by flush(): the delay precedes it, and the client does not receive it in pieces.
+        self.output.append(data if self.deflater is None else self.deflater.compress(data))
+
+    def flush(self) -> None:
+        if self.fake.delay > 0:
+            time.sleep(self.fake.delay)
+        if self.deflater is not None:
+            self.output.append(self.deflater.flush(zlib.Z_SYNC_FLUSH))
+        self.wfile.write(b''.join(self.output))
+        self.output = []
+        self.wfile.flush()
+
+    def readline(self) -> bytes:
+        if self.inflater is None:
+            return self.rfile.readline()
+        while b'\n' not in self.pending:
+            data = self.request.recv(65536)
+            if not data:
+                line, self.pending = self.pending, b''
+                return line
+            self.pending += self.inflater.decompress(data)
+        line, _, self.pending = self.pending.partition(b'\n')
+        return line + b'\n'
+
+    def handle(self) -> None:
+        self.fake.connections += 1
+        self.send('* OK [CAPABILITY %s] Fake IMAP server ready' % ' '.join(self.capabilities()))
+        self.flush()
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            line = line.decode().rstrip('\r\n')
+            if len(self.pending) > 0 or select.select([self.request], [], [], 0)[0]:
+                self.fake.pipelined += 1
+            parts = line.split(' ', 2)
+            if len(parts) < 2:
+                self.send('* BAD invalid command')
+                self.flush()
+                continue
+            tag, command = parts[0], parts[1].upper()
+            args = split_args(parts[2]) if len(parts) > 2 else []
+            self.fake.commands.append(command if command != 'UID' else f'UID {args[0].upper()}')
+            handler = getattr(self, f'do_{command.lower()}', None)
+            if handler is None:
+                self.send(f'{tag} BAD unknown command {command}')
+            elif not handler(tag, args):
+                self.flush()
+                return
+            self.flush()
+
+    def messages(self) -> List[FakeMessage]:
+        return self.selected.messages if self.selected is not None else []
+
+    # ------------------------------------------------------------------
+    # Commands. Each handler returns False to close the connection.
+    # ------------------------------------------------------------------
+
+    def do_capability(self, tag: str, args: List[str]) -> bool:
+        self.send('* CAPABILITY %s' % ' '.join(self.capabilities()))
+        self.send(f'{tag} OK CAPABILITY completed')
+        return True
+
+    def do_noop(self, tag: str, args: List[str]) -> bool:
+        self.send(f'{tag} OK NOOP completed')
+        return True
+
+    def do_logout(self, tag: str, args: List[str]) -> bool:
+        self.send('* BYE logging out')
+        self.send(f'{tag} OK LOGOUT completed')
+        return False
+
+    def do_login(self, tag: str, args: List[str]) -> bool:
+        if args == [self.fake.username, self.fake.password]:
+            self.authenticated = True
+            if self.fake.capability_code:
+                self.send(f'{tag} OK [CAPABILITY %s] LOGIN completed' % ' '.join(self.capabilities()))
+            else:
+                self.send(f'{tag} OK LOGIN completed')
+        else:
+            self.send(f'{tag} NO [AUTHENTICATIONFAILED] invalid credentials')
+        return True
+
+    def do_enable(self, tag: str, args: List[str]) -> bool:
+        if 'ENABLE' not in self.capabilities():
+            self.send(f'{tag} BAD unknown command ENABLE')
+            return True
+        enabled = [a.upper() for a in args if a.upper() in self.capabilities()]
+        self.enabled.extend(enabled)
+        self.send(' '.join(['* ENABLED'] + enabled))
+        self.send(f'{tag} OK ENABLE completed')
+        return True
+
+    def do_compress(self, tag: str, args: List[str]) -> bool:
+        if 'COMPRESS=DEFLATE' not in self.capabilities() or [a.upper() for a in args] != ['DEFLATE']:
+            self.send(f'{tag} BAD unsupported compression')
+            return True
+        if self.deflater is not None:
+            self.send(f'{tag} NO [COMPRESSIONACTIVE] compression already active')
+            return True
+        self.send(f'{tag} OK DEFLATE active')
+        self.flush()
+        self.deflater = zlib.compressobj(6, zlib.DEFLATED, -15)
+        self.inflater = zlib.decompressobj(-15)
+        return True
+
+    def do_idle(self, tag: str, args: List[str]) -> bool:
+        if 'IDLE' not in self.capabilities():
+            self.send(f'{tag} BAD unknown command IDLE')
+            return True
+        events: queue.Queue = queue.Queue()
+        self.send('+ idling')
+        self.flush()
+        with self.fake.idle_condition:
+            self.fake.idlers.append(events)
+            self.fake.idle_condition.notify_all()
+        try:
+            while True:
+                while not events.empty():
+                    self.send(events.get())
+                    self.flush()
+                readable, _, _ = select.select([self.request], [], [], 0.01)
+                if len(readable) > 0:
+                    line = self.readline()
+                    if not line:
+                        return False
+                    if line.strip().upper() == b'DONE':
+                        break
+        finally:
+            with self.fake.idle_condition:
+                self.fake.idlers.remove(events)
+        self.send(f'{tag} OK IDLE terminated')
+        return True
+
+    def do_list(self, tag: str, args: List[str]) -> bool:
+        if self.fake.raw_list is not None:
+            for line in self.fake.raw_list:
+                self.send(b'* LIST ' + line)
+        else:
+            pattern = args[1] if len(args) > 1 else '*'
+            regex = re.compile(''.join('.*' if c == '*' else '[^%s]*' % re.escape(self.fake.delimiter) if c == '%'
+                                       else re.escape(c) for c in re.split(r'([*%])', pattern)) + r'\Z')
+            # LIST-STATUS (RFC 5819): LIST "" * RETURN (STATUS (MESSAGES UNSEEN))
+            items = []
+            if len(args) > 3 and args[2].upper() == 'RETURN':
+                if 'LIST-STATUS' not in self.capabilities():
+                    self.send(f'{tag} BAD LIST-STATUS not supported')
+                    return True
+                items = re.sub(r'^\(STATUS \((.*)\)\)$', r'\1', args[3].upper()).split()
+            for mailbox in self.fake.mailboxes.values():
+                if regex.match(mailbox.name):
+                    self.send('* LIST (%s) "%s" "%s"' % (' '.join(mailbox.attributes), self.fake.delimiter, mailbox.name))
+                    if len(items) > 0 and '\\Noselect' not in mailbox.attributes:
+                        self.send(mailbox.status(items))
+        self.send(f'{tag} OK LIST completed')
+        return True
+
+    def do_status(self, tag: str, args: List[str]) -> bool:
+        mailbox = self.fake.mailboxes.get(args[0] if len(args) > 0 else '')
+        if mailbox is None or '\\Noselect' in mailbox.attributes:
+            self.send(f'{tag} NO [NONEXISTENT] unknown mailbox')
+            return True
+        self.send(mailbox.status(args[1].strip('()').upper().split()))
+        self.send(f'{tag} OK STATUS completed')
+        return True
+
+    def do_select(self, tag: str, args: List[str], command: str = 'SELECT') -> bool:
+        mailbox = self.fake.mailboxes.get(args[0] if len(args) > 0 else '')
+        if mailbox is None:
+            self.selected = None
+            self.send(f'{tag} NO [NONEXISTENT] unknown mailbox')
+            return True
+        self.selected = mailbox
+        self.send('* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)')
+        self.send(f'* {len(mailbox.messages)} EXISTS')
+        self.send('* 0 RECENT')
+        self.send(f'* OK [UIDVALIDITY {mailbox.uid_validity}] UIDs valid')
+        self.send(f'* OK [UIDNEXT {mailbox.uid_next()}] Predicted next UID')
+        if 'CONDSTORE' in self.capabilities():
+            self.send(f'* OK [HIGHESTMODSEQ {mailbox.highest_modseq}] Highest')
+        mode = 'READ-ONLY' if command == 'EXAMINE' else 'READ-WRITE'
+        self.send(f'{tag} OK [{mode}] {command} completed')
+        return True
+
+    def do_examine(self, tag: str, args: List[str]) -> bool:
+        return self.do_select(tag, args, 'EXAMINE')
+
+    def do_search(self, tag: str, args: List[str], uid: bool = False) -> bool:
+        if self.selected is None:
+            self.send(f'{tag} BAD no mailbox selected')
+            return True
+        if len(args) > 1 and args[0].upper() == 'RETURN':
+            # ESEARCH (RFC 4731): SEARCH RETURN (MIN MAX COUNT ALL) <criteria>
+            if 'ESEARCH' not in self.capabilities():
+                self.send(f'{tag} BAD ESEARCH not supported')
+                return True
+            ids = self._search(args[2:], uid)
+            response = [f'* ESEARCH (TAG "{tag}")'] + (['UID'] if uid else [])
+            for option in args[1].strip('()').upper().split() or ['ALL']:
+                if option == 'COUNT':
+                    response.append(f'COUNT {len(ids)}')
+                elif len(ids) > 0:
+                    value = {'MIN': ids[0], 'MAX': ids[-1], 'ALL': format_sequence_set(ids)}[option]
+                    response.append(f'{option} {value}')
+            self.send(' '.join(response))
+        elif self.fake.raw_search is not None:
+            for line in self.fake.raw_search:
+                self.send(b'* SEARCH ' + line)
+        else:
+            ids = self._search(args, uid)
+            self.send(' '.join(['* SEARCH'] + [str(i) for i in ids]))
+        self.send(f'{tag} OK SEARCH completed')
+        return True
+
+    def _search(self, args: List[str], uid: bool) -> List[int]:
+        """Evaluate a (very) limited subset of search criteria: ALL, SEEN, UNSEEN, UID <set>, <set>, NOT <key>,
+        OR <key> <key> and parenthesized lists of keys.
+        """
+        messages = self.messages()
+        tokens = [t for t in re.findall(r'[()]|[^\s()]+', ' '.join(args))
+                  if t.upper() not in ('CHARSET', 'US-ASCII', 'UTF-8')]
+        everything = set(range(1, len(messages) + 1))
+
+        def key(i: int) -> Tuple[Set[int], int]:
+            criterion = tokens[i].upper()
+            if criterion == '(':
+                selected, i = everything, i + 1
+                while tokens[i] != ')':
+                    numbers, i = key(i)
+                    selected = selected & numbers
+                return selected, i + 1
+            if criterion == 'NOT':
+                numbers, i = key(i + 1)
+                return everything - numbers, i
+            if criterion == 'OR':
+                left, i = key(i + 1)
+                right, i = key(i)
+                return left | right, i
+            if criterion == 'UID':
+                largest = messages[-1].uid if messages else 0
+                uids = set(parse_sequence_set(tokens[i + 1], largest))
+                return {n for n in everything if messages[n - 1].uid in uids}, i + 2
+            if criterion in ('SEEN', 'UNSEEN'):
+                seen = {n for n in everything if '\\Seen' in messages[n - 1].flags}
+                return (seen if criterion == 'SEEN' else everything - seen), i + 1
+            if re.match(r'^[0-9*:,]+$', criterion):
+                return set(parse_sequence_set(criterion, len(messages))) & everything, i + 1
+            return everything, i + 1
+
+        selected, i = everything, 0
+        while i < len(tokens):
+            numbers, i = key(i)
+            selected = selected & numbers
+        if uid:
+            return [messages[n - 1].uid for n in sorted(selected)]
+        return sorted(selected)
+
+    def do_uid(self, tag: str, args: List[str]) -> bool:
+        if len(args) == 0:
+            self.send(f'{tag} BAD missing UID command')
+            return True
+        command = args[0].upper()
+        if command == 'SEARCH':
+            return self.do_search(tag, args[1:], True)
+        if command == 'FETCH':
+            return self.do_fetch(tag, args[1:], True)
+        self.send(f'{tag} BAD unsupported UID command')
+        return True
+
+    def do_fetch(self, tag: str, args: List[str], uid: bool = False) -> bool:
+        if self.selected is None or len(args) < 2:
+            self.send(f'{tag} BAD no mailbox selected')
+            return True
+        messages = self.messages()
+        if uid:
+            largest = messages[-1].uid if messages else 0
+            uids = set(parse_sequence_set(args[0], largest))
+            numbers = [n for n in range(1, len(messages) + 1) if messages[n - 1].uid in uids]
+        else:
+            numbers = [n for n in parse_sequence_set(args[0], len(messages)) if n <= len(messages)]
+        items = args[1]
+        if items.startswith('('):
+            items = items[1:-1]
+        names = [n for n in _item_re.findall(items)]
+        if uid and 'UID' not in [n.upper() for n in names]:
+            names.insert(0, 'UID')
+        modifiers = args[2][1:-1].upper().split() if len(args) > 2 else []
+        if 'CHANGEDSINCE' in modifiers:
+            since = int(modifiers[modifiers.index('CHANGEDSINCE') + 1])
+            numbers = [n for n in numbers if messages[n - 1].modseq > since]
+            if 'MODSEQ' not in [n.upper() for n in names]:
+                names.append('MODSEQ')
+            if uid and 'VANISHED' in modifiers:
+                requested = set(parse_sequence_set(args[0], self.selected.uid_next() - 1))
+                vanished = [u for u, modseq in self.selected.expunged if modseq > since and u in requested]
+                if len(vanished) > 0:
+                    self.send('* VANISHED (EARLIER) ' + ','.join([str(u) for u in vanished]))
+        for n in numbers:
+            self.send_fetch(n, messages[n - 1], names)
+        self.send(f'{tag} OK FETCH completed')
+        return True
+
+    def send_fetch(self, number: int, message: FakeMessage, names: List[str]) -> None:
+        """Send the response to FETCH for one message. Bodies are always sent as literals.
+        """
+        chunks: List[bytes] = []
+        for name in names:
+            upper = name.upper()
+            if upper == 'UID':
+                chunks.append(b'UID %d' % message.uid)
+            elif upper == 'FLAGS':
+                chunks.append(('FLAGS (%s)' % ' '.join(message.flags)).encode())
+            elif upper == 'ENVELOPE':
+                chunks.append(b'ENVELOPE ' + message.envelope())
+            elif upper == 'BODYSTRUCTURE':
+                chunks.append(b'BODYSTRUCTURE ' + message.bodystructure())
+            elif upper == 'MODSEQ':
+                chunks.append(b'MODSEQ (%d)' % message.modseq)
+            elif upper == 'RFC822.SIZE':
+                chunks.append(b'RFC822.SIZE %d' % len(message.body))
+            elif upper == 'INTERNALDATE':
+                chunks.append(b'INTERNALDATE "17-Jul-1996 02:44:25 -0700"')
+            elif upper.startswith('BODY') and '[' in upper:
+                section = upper[upper.index('[') + 1:upper.index(']')]
+                content = message.section(section)
+                chunks.append(b'BODY[%s] {%d}\r\n' % (section.encode(), len(content)) + content)
+            elif upper == 'RFC822':
+                chunks.append(b'RFC822 {%d}\r\n' % len(message.body) + message.body)
+        self.write(b'* %d FETCH (' % number + b' '.join(chunks) + b')\r\n')
+
+
+_item_re = re.compile(r'BODY(?:\.PEEK)?\[[^\]]*\](?:<[^>]*>)?|[^\s()]+', re.I)
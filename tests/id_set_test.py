@@ -0,0 +1,75 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+from dbeurive.imap.id_set import IdSet
+import dbeurive.imap.id_set as id_set
+
+
+class TestIdSet(unittest.TestCase):
+
+    def test_from_bytes(self):
+        test_set = (
+            (b'1 2 3',      [1, 2, 3]),
+            (b' 1 2 3 ',    [1, 2, 3]),
+            (b'',           []),
+            (b'5 3 1 3',    [1, 3, 5]),
+            (b'4294967295', [4294967295]),
+        )
+        for data, expected in test_set:
+            self.assertEqual(expected, list(IdSet.from_bytes(data)))
+
+    def test_from_bytes_chunks(self):
+        chunk_size = id_set._CHUNK_SIZE
+        id_set._CHUNK_SIZE = 7
+        try:
+            ids = list(range(1, 1000))
+            data = ' '.join([str(i) for i in ids]).encode()
+            self.assertEqual(ids, list(IdSet.from_bytes(data)))
+        finally:
+            id_set._CHUNK_SIZE = chunk_size
+
+    def test_container(self):
+        s = IdSet([8, 1, 3, 3])
+        self.assertEqual(3, len(s))
+        self.assertEqual([1, 3, 8], list(s))
+        self.assertIn(3, s)
+        self.assertNotIn(2, s)
+        self.assertNotIn(9, s)
+        self.assertEqual(1, s.get_min())
+        self.assertEqual(8, s.get_max())
+        self.assertIsNone(IdSet().get_min())
+        self.assertFalse(IdSet())
+        self.assertEqual(IdSet([1, 3, 8]), s)
+
+    def test_algebra(self):
+        a = IdSet([1, 2, 3, 7, 9])
+        b = IdSet([2, 3, 4, 9, 10])
+        self.assertEqual(IdSet([1, 2, 3, 4, 7, 9, 10]), a | b)
+        self.assertEqual(IdSet([2, 3, 9]), a & b)
+        self.assertEqual(IdSet([1, 7]), a - b)
+        self.assertEqual(IdSet([4, 10]), b - a)
+        self.assertEqual(a, a | IdSet())
+        self.assertEqual(IdSet(), a & IdSet())
+
+    def test_iter_batches(self):
+        ids = IdSet(range(1, 8))
+        self.assertEqual([[1, 2, 3], [4, 5, 6], [7]], [list(b) for b in ids.iter_batches(3)])
+        self.assertEqual([], list(IdSet().iter_batches(3)))
+        with self.assertRaises(ValueError):
+            list(ids.iter_batches(0))
+
+    def test_to_sequence_set(self):
+        test_set = (
+            ([],                        ''),
+            ([1],                       '1'),
+            ([1, 2, 3, 5, 7, 8],        '1:3,5,7:8'),
+            (list(range(1, 501)) + [502] + list(range(510, 9001)), '1:500,502,510:9000'),
+        )
+        for ids, expected in test_set:
+            self.assertEqual(expected, IdSet(ids).to_sequence_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
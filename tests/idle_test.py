@@ -0,0 +1,131 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.client import Client
+from dbeurive.imap.async_client import AsyncClient
+from dbeurive.imap.idle import IdleEvent
+from dbeurive.imap.id_set import IdSet
+from fake_server import FakeImapServer, FakeMailbox, FakeMessage
+
+
+class TestIdleEvent(unittest.TestCase):
+
+    def test_parse(self):
+        event = IdleEvent.parse([b'* 23 EXISTS'])
+        self.assertEqual((IdleEvent.TYPE_EXISTS, 23), (event.get_type(), event.get_number()))
+        event = IdleEvent.parse([b'* 5 expunge'])
+        self.assertEqual((IdleEvent.TYPE_EXPUNGE, 5), (event.get_type(), event.get_number()))
+        event = IdleEvent.parse([b'* 4 FETCH (UID 9 FLAGS (\\Seen) BODY[] {2}', b'hi', b')'])
+        self.assertEqual(IdleEvent.TYPE_FETCH, event.get_type())
+        self.assertEqual(['\\Seen'], event.get_record().get_flags())
+        self.assertEqual(9, event.get_record().get_uid())
+        self.assertEqual(b'hi', event.get_record().get_body())
+        event = IdleEvent.parse([b'* VANISHED (EARLIER) 41,43:45'])
+        self.assertEqual(IdSet([41, 43, 44, 45]), event.get_uids())
+        self.assertEqual('OK', IdleEvent.parse([b'* OK Still here']).get_type())
+        self.assertIsNone(IdleEvent.parse([b'+ idling']))
+
+
+class TestIdle(unittest.TestCase):
+
+    def setUp(self):
+        self.inbox = FakeMailbox('INBOX', [FakeMessage(1), FakeMessage(2)])
+        self.server = FakeImapServer(mailboxes=[self.inbox], capabilities=('IMAP4rev1', 'IDLE')).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _client(self) -> Client:
+        client = Client(self.server.host, self.server.port, 'user', 'password', use_ssl=False)
+        self.assertTrue(client.connect())
+        self.assertTrue(client.login())
+        client.select_mailbox()
+        return client
+
+    def _push_when_idle(self, *lines: str) -> threading.Thread:
+        def push():
+            self.server.wait_idle()
+            for line in lines:
+                self.server.push(line)
+        thread = threading.Thread(target=push)
+        thread.start()
+        return thread
+
+    def test_iter_idle(self):
+        client = self._client()
+        thread = self._push_when_idle('* OK Still here', '* 3 EXISTS', '* 1 FETCH (FLAGS (\\Seen))', '* 2 EXPUNGE')
+        events = []
+        for event in client.iter_idle(timeout=10):
+            events.append(event)
+            if event.get_type() == IdleEvent.TYPE_EXPUNGE:
+                break
+        thread.join()
+        self.assertEqual([IdleEvent.TYPE_EXISTS, IdleEvent.TYPE_FETCH, IdleEvent.TYPE_EXPUNGE],
+                         [e.get_type() for e in events])
+        self.assertEqual(['\\Seen'], events[1].get_record().get_flags())
+        # IDLE has been terminated: the connection can be used again.
+        self.assertEqual(IdSet([1, 2]), client.list_emails_ids())
+        client.logout()
+
+    def test_callback_and_timeout(self):
+        client = self._client()
+        thread = self._push_when_idle('* 3 EXISTS', '* 4 EXISTS')
+        numbers = []
+        client.idle(lambda event: numbers.append(event.get_number()) or len(numbers) < 2, timeout=10)
+        thread.join()
+        self.assertEqual([3, 4], numbers)
+
+        # Without any change, the method returns once the timeout expired.
+        client.idle(lambda event: numbers.append(event.get_number()), timeout=0.2)
+        self.assertEqual([3, 4], numbers)
+        self.assertTrue(client.noop())
+        client.logout()
+
+    def test_renew(self):
+        client = self._client()
+        client.IDLE_RENEW_INTERVAL = 0.1
+        self.assertEqual([], list(client.iter_idle(timeout=0.45)))
+        self.assertGreaterEqual(self.server.commands.count('IDLE'), 4)
+        self.assertTrue(client.noop())
+        client.logout()
+
+    def test_not_supported(self):
+        self.server.capabilities = ['IMAP4rev1']
+        client = self._client()
+        with self.assertRaises(Exception):
+            list(client.iter_idle(timeout=1))
+        client.logout()
+
+    def test_async_idle(self):
+        async def session():
+            client = AsyncClient(self.server.host, self.server.port, 'user', 'password', use_ssl=False)
+            await client.connect()
+            await client.login()
+            await client.select_mailbox()
+            events = []
+
+            async def callback(event: IdleEvent) -> bool:
+                events.append(event)
+                return event.get_type() != IdleEvent.TYPE_EXPUNGE
+
+            thread = self._push_when_idle('* 3 EXISTS', '* 1 EXPUNGE')
+            await client.idle(callback, timeout=10)
+            thread.join()
+            self.assertEqual([IdleEvent.TYPE_EXISTS, IdleEvent.TYPE_EXPUNGE], [e.get_type() for e in events])
+            self.assertEqual(IdSet([1, 2]), await client.list_emails_ids())
+
+            await client.idle(callback, timeout=0.2)
+            self.assertEqual(2, len(events))
+            await client.logout()
+
+        asyncio.run(session())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+from dbeurive.imap.mailbox import Mailbox, decode_name, encode_name
+from dbeurive.imap.parser import ListMailbox
+
+
+class TestMailbox(unittest.TestCase):
+
+    def test_names(self):
+        test_set = (
+            ('INBOX',                   'INBOX'),
+            ('Envoy&AOk-s',             'Envoyés'),
+            ('Tom &- Jerry',            'Tom & Jerry'),
+            ('&ZeVnLIqe-',              '日本語'),
+            ('&AOk-t&AOk-',             'été'),
+            ('Test &JjrYPd+A-',         'Test ☺\U0001f780'),
+            ('&AP8A,wD,-',              'ÿÿÿ'),
+        )
+        for encoded, decoded in test_set:
+            self.assertEqual(decoded, decode_name(encoded))
+            self.assertEqual(encoded, encode_name(decoded))
+        # Invalid names are returned unchanged.
+        self.assertEqual('A&B', decode_name('A&B'))
+        self.assertEqual('A&*-', decode_name('A&*-'))
+
+    def test_from_tokens(self):
+        mailbox = Mailbox.from_tokens(ListMailbox.tokenize(b'(\\HasNoChildren \\Sent) "/" "Archives/Envoy&AOk-s"'))
+        self.assertEqual('Archives/Envoyés', mailbox.get_name())
+        self.assertEqual('Archives/Envoy&AOk-s', mailbox.get_raw_name())
+        self.assertEqual('/', mailbox.get_delimiter())
+        self.assertEqual(('\\HasNoChildren', '\\Sent'), mailbox.get_flags())
+        self.assertEqual(['Archives', 'Envoyés'], mailbox.get_path())
+        self.assertTrue(mailbox.is_selectable())
+        self.assertTrue(mailbox.is_special_use())
+        self.assertEqual('\\Sent', mailbox.get_special_use())
+        self.assertFalse(mailbox.has_children())
+
+        mailbox = Mailbox.from_tokens(ListMailbox.tokenize(b'(\\NOSELECT \\HasChildren) NIL Archives'))
+        self.assertIsNone(mailbox.get_delimiter())
+        self.assertEqual(['Archives'], mailbox.get_path())
+        self.assertFalse(mailbox.is_selectable())
+        self.assertFalse(mailbox.is_special_use())
+        self.assertTrue(mailbox.has_children())
+        self.assertIsNone(Mailbox('INBOX', '/').has_children())
+
+        self.assertIsNone(Mailbox.from_tokens(ListMailbox.tokenize(b'(\\HasNoChildren) "/"')))
+        with self.assertRaises(AttributeError):
+            mailbox.extra = 1
+
+    def test_filter(self):
+        mailboxes = [Mailbox('INBOX', '/'),
+                     Mailbox('Archives', '/', ('\\Noselect',)),
+                     Mailbox('Old', '/', ('\\NonExistent',)),
+                     Mailbox('Trash', '/', ('\\Trash',))]
+        self.assertEqual(mailboxes, Mailbox.filter(mailboxes))
+        self.assertEqual(['INBOX', 'Trash'], [m.get_name() for m in Mailbox.filter(mailboxes, selectable_only=True)])
+        self.assertEqual(['Trash'], [m.get_name() for m in Mailbox.filter(mailboxes, special_use=True)])
+        self.assertEqual(['INBOX'], [m.get_name() for m in Mailbox.filter(mailboxes, True, False)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import base64
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.client import Client
+from fake_server import FakeImapServer, FakeMailbox, FakeMessage
+
+
+ATTACHMENT = os.urandom(1500000)
+
+
+def get_message(subject: str) -> bytes:
+    encoded = base64.encodebytes(ATTACHMENT).replace(b'\n', b'\r\n')
+    return b'From: "John Doe" <john@example.com>\r\n' \
+           b'To: jane@example.com\r\n' \
+           b'Subject: ' + subject.encode() + b'\r\n' \
+           b'Message-ID: <' + subject.encode() + b'@example.com>\r\n' \
+           b'MIME-Version: 1.0\r\n' \
+           b'Content-Type: multipart/mixed; boundary="b1"\r\n' \
+           b'\r\n' \
+           b'--b1\r\n' \
+           b'Content-Type: multipart/alternative; boundary="b2"\r\n' \
+           b'\r\n' \
+           b'--b2\r\n' \
+           b'Content-Type: text/plain; charset="utf-8"\r\n' \
+           b'Content-Transfer-Encoding: quoted-printable\r\n' \
+           b'\r\n' \
+           b'R=C3=A9union demain.\r\n' \
+           b'--b2\r\n' \
+           b'Content-Type: text/html; charset="utf-8"\r\n' \
+           b'\r\n' \
+           b'<p>Reunion demain.</p>\r\n' \
+           b'--b2--\r\n' \
+           b'--b1\r\n' \
+           b'Content-Type: application/pdf; name="report.pdf"\r\n' \
+           b'Content-Disposition: attachment; filename="report.pdf"\r\n' \
+           b'Content-Transfer-Encoding: base64\r\n' \
+           b'\r\n' + encoded + \
+           b'--b1--\r\n'
+
+
+class TestMessage(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeImapServer(mailboxes=[
+            FakeMailbox('INBOX', [FakeMessage(uid, get_message(f'Message {uid}')) for uid in (3, 5, 8)]),
+            FakeMailbox('Sent')
+        ]).start()
+        self.client = Client(self.server.host, self.server.port, 'user', 'password', use_ssl=False)
+        self.assertTrue(self.client.connect())
+        self.assertTrue(self.client.login())
+
+    def tearDown(self):
+        self.client.logout()
+        self.server.stop()
+
+    def received(self) -> int:
+        return self.client.get_connector().get_transfer_stats()['received']
+
+    def test_metadata(self):
+        self.client.select_mailbox('INBOX')
+        start = self.received()
+        messages = list(self.client.iter_messages(self.client.list_emails_uids(), batch_size=2))
+        self.assertEqual([3, 5, 8], [m.get_uid() for m in messages])
+        # Kilobytes per message, not megabytes.
+        self.assertLess(self.received() - start, 3 * 4096)
+
+        message = messages[1]
+        self.assertEqual('Message 5', message.get_envelope().get_subject())
+        self.assertEqual(['John Doe <john@example.com>'], [str(a) for a in message.get_envelope().get_from()])
+        self.assertEqual('<Message 5@example.com>', message.get_envelope().get_message_id())
+        self.assertGreater(message.get_size(), len(ATTACHMENT))
+        self.assertEqual(['', '1', '1.1', '1.2', '2'], [p.get_section() for p in message.get_structure().walk()])
+        attachments = message.get_attachments()
+        self.assertEqual(['report.pdf'], [p.get_filename() for p in attachments])
+        self.assertGreater(attachments[0].get_size(), len(ATTACHMENT))
+        self.assertEqual([], message.get_loaded_sections())
+
+    def test_lazy_parts(self):
+        self.client.select_mailbox('INBOX')
+        messages = []
+        for message in self.client.iter_messages([3, 5, 8], batch_size=2):
+            # The parts can be loaded during the iteration.
+            start = self.received()
+            self.assertEqual('Réunion demain.', message.get_text())
+            self.assertLess(self.received() - start, 1024)
+            messages.append(message)
+        self.assertEqual(3, len(messages))
+
+        message = messages[0]
+        self.assertEqual(['1.1'], message.get_loaded_sections())
+        commands = len(self.server.commands)
+        self.assertEqual('Réunion demain.', message.get_text())
+        self.assertEqual(commands, len(self.server.commands))
+        self.assertIn(b'<p>Reunion demain.</p>', message.get_part('1.2'))
+        self.assertIn(b'Subject: Message 3', message.get_header())
+        self.assertEqual(ATTACHMENT, message.get_decoded_part('2'))
+        with self.assertRaises(Exception):
+            message.get_decoded_part('1')
+
+        message.release()
+        self.client.select_mailbox('Sent')
+        with self.assertRaises(Exception):
+            message.get_part('1.1')
+
+
+if __name__ == '__main__':
+    unittest.main()
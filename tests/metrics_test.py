@@ -0,0 +1,139 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.client import Client
+from dbeurive.imap.metrics import CommandEvent, Histogram, Registry
+from dbeurive.imap.pool import Pool
+from fake_server import FakeImapServer, FakeMailbox, FakeMessage
+from pool_test import get_config
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.get_percentile(50))
+        for value in range(1, 1001):
+            histogram.record(value)
+        self.assertEqual(1000, histogram.get_count())
+        self.assertEqual(500500, histogram.get_sum())
+        for percentile in (50, 90, 99):
+            self.assertAlmostEqual(percentile * 10, histogram.get_percentile(percentile),
+                                   delta=percentile * 10 * (Histogram.GROWTH - 1))
+        self.assertEqual(1000, histogram.get_percentile(100))
+        summary = histogram.summarize()
+        self.assertEqual((1, 1000, 500.5), (summary['min'], summary['max'], summary['mean']))
+
+    def test_zeros(self):
+        histogram = Histogram()
+        for value in (0, 0, 0, 0.5):
+            histogram.record(value)
+        self.assertEqual(0, histogram.get_percentile(75))
+        self.assertEqual(0.5, histogram.get_percentile(99))
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_dump(self):
+        registry = Registry()
+        registry(CommandEvent('SELECT', 'isp0', 'OK', 0.01, 0.002, 0.001, 20, 200, 200))
+        registry(CommandEvent('SELECT', 'isp0', 'NO', 0.03, 0.0, 0.0, 20, 40, 40))
+        registry(CommandEvent('LOGIN', 'isp1', 'OK', 0.02, 0.0, 0.0, 30, 50, 50))
+        self.assertEqual(['isp0', 'isp1'], registry.get_sources())
+        dump = registry.dump('isp0')
+        self.assertEqual(['SELECT'], list(dump.keys()))
+        self.assertEqual({'OK': 1, 'NO': 1}, dump['SELECT']['statuses'])
+        self.assertEqual(2, dump['SELECT']['wait']['count'])
+        self.assertEqual(240, dump['SELECT']['received']['sum'])
+        self.assertAlmostEqual(0.013, dump['SELECT']['duration']['min'])
+        self.assertEqual(['isp0', 'isp1'], list(registry.dump().keys()))
+        self.assertEqual(1, registry.get_histogram('isp1', 'LOGIN', 'sent').get_count())
+        self.assertIsNone(registry.get_histogram('isp1', 'SELECT', 'sent'))
+        registry.reset()
+        self.assertEqual({}, registry.dump())
+
+
+class TestClientInstrumentation(unittest.TestCase):
+
+    def test_events(self):
+        events = []
+        mailboxes = [FakeMailbox('INBOX', [FakeMessage(1, b'Subject: a\r\n\r\nA'), FakeMessage(2)]),
+                     FakeMailbox('Sent')]
+        with FakeImapServer(mailboxes=mailboxes, delay=0.02) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False, name='isp0',
+                            callbacks=[events.append])
+            self.assertEqual('isp0', client.get_name())
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            self.assertEqual(2, len(client.list_mailboxes()))
+            self.assertEqual([1, 2], list(client.list_emails_ids(mailbox='INBOX')))
+            self.assertEqual(2, len(client.fetch([1, 2], '(RFC822.SIZE)')))
+            with self.assertRaises(Exception):
+                client.select_mailbox('Unknown')
+            client.logout()
+
+        self.assertEqual(['CONNECT', 'LOGIN', 'LIST', 'SELECT', 'SEARCH', 'FETCH', 'SELECT', 'LOGOUT'],
+                         [e.get_command() for e in events])
+        self.assertEqual({'isp0'}, {e.get_source() for e in events})
+        self.assertEqual('NO', events[6].get_status())
+        for event in events[:6]:
+            self.assertEqual('OK', event.get_status())
+            # The server waits 20 ms before each response.
+            self.assertGreaterEqual(event.get_wait(), 0.015)
+            self.assertGreater(event.get_received(), 0)
+            self.assertGreaterEqual(event.get_duration(), event.get_wait())
+        for event in events:
+            self.assertGreater(event.get_sent(), 0)
+        self.assertEqual(events[2].get_received(), events[2].get_response_size())
+        self.assertGreater(events[5].get_parse(), 0)
+
+    def test_abandoned_iteration(self):
+        events = []
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX', [FakeMessage(1), FakeMessage(2)])]) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False, callbacks=[events.append])
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            client.select_mailbox()
+            # The consumer stops after the first record, but keeps the generator.
+            records = client.iter_fetch([1, 2], '(FLAGS)')
+            self.assertEqual(1, next(records).get_number())
+            self.assertTrue(client.noop())
+            self.assertEqual([1, 2], list(client.list_emails_ids()))
+            records.close()
+            self.assertTrue(client.noop())
+            client.logout()
+        self.assertEqual(['CONNECT', 'LOGIN', 'SELECT', 'NOOP', 'SEARCH', 'FETCH', 'NOOP', 'LOGOUT'],
+                         [e.get_command() for e in events])
+
+    def test_callbacks(self):
+        events = []
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX')]) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+            self.assertTrue(client.connect())
+            client.add_callback(events.append)
+            self.assertTrue(client.login())
+            client.remove_callback(events.append)
+            self.assertTrue(client.noop())
+            client.logout()
+        self.assertEqual(['LOGIN'], [e.get_command() for e in events])
+        self.assertEqual(server.host, events[0].get_source())
+
+    def test_pool(self):
+        registry = Registry()
+        with FakeImapServer(mailboxes=[FakeMailbox('INBOX', [FakeMessage(1)])]) as server:
+            pool = Pool(get_config(server), use_ssl=False, callbacks=[registry])
+            with pool.connection('isp0', 'INBOX') as client:
+                client.list_emails_ids()
+            pool.close()
+        self.assertEqual(['isp0'], registry.get_sources())
+        dump = registry.dump('isp0')
+        for command in ('CONNECT', 'LOGIN', 'SELECT', 'SEARCH'):
+            self.assertEqual({'OK': 1}, dump[command]['statuses'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -32,3 +32,7 @@ class TestParser(unittest.TestCase):
             self.assertEqual(ListEmailIds.get_tokens(), expected['raw'])
             self.assertEqual(ListEmailIds.get_tokens_values(), expected['txt'])
 
+    def test_parse_invalid(self):
+        self.assertFalse(ListEmailIds.parse('1 A'))
+        self.assertEqual([], ListEmailIds.get_tokens())
+
@@ -0,0 +1,55 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+from dbeurive.imap.parser import DataParser, FetchResponse
+
+
+class TestParser(unittest.TestCase):
+
+    def test_data_parser(self):
+        test_set = (
+            ([b'NIL'],                                  None),
+            ([b'ABC'],                                  'ABC'),
+            ([b'"A \\"B\\" \\\\C"'],                    'A "B" \\C'),
+            ([b'()'],                                   []),
+            ([b'(A (B NIL) "C")'],                      ['A', ['B', None], 'C']),
+            ([b'(\\Seen \\Answered)'],                  ['\\Seen', '\\Answered']),
+            ([b'BODY[HEADER.FIELDS (FROM TO)]<0>'],     'BODY[HEADER.FIELDS (FROM TO)]<0>'),
+            ([b'(A {5}', b'hello', b' B)'],             ['A', b'hello', 'B']),
+            ([b'({3}', b'abc', b' {0}', b'', b')'],     [b'abc', b'']),
+        )
+        for parts, expected in test_set:
+            parser = DataParser(parts)
+            self.assertEqual(expected, parser.read_value())
+            self.assertTrue(parser.at_end())
+
+    def test_data_parser_errors(self):
+        test_set = (
+            [b'(A'],
+            [b'"abc'],
+            [b'(A {5}', b'hel', b')'],
+            [b'(A {5}'],
+            [b')'],
+        )
+        for parts in test_set:
+            with self.assertRaises(ValueError):
+                DataParser(parts).read_value()
+
+    def test_fetch_response(self):
+        number, items = FetchResponse.parse([b'12 (UID 5 FLAGS (\\Seen) RFC822.SIZE 1024 body[] {5}', b'hello', b')'])
+        self.assertEqual(12, number)
+        self.assertEqual({'UID': '5', 'FLAGS': ['\\Seen'], 'RFC822.SIZE': '1024', 'BODY[]': b'hello'}, items)
+        for parts in ([b'A (UID 5)'], [b'1 (UID)'], [b'1 UID']):
+            with self.assertRaises(ValueError):
+                FetchResponse.parse(parts)
+
+    def test_fetch_group(self):
+        data = [(b'1 (BODY[1] {3}', b'abc'), (b' BODY[2] {3}', b'def'), b')', b'2 (FLAGS ())', None]
+        self.assertEqual([[b'1 (BODY[1] {3}', b'abc', b' BODY[2] {3}', b'def', b')'], [b'2 (FLAGS ())']],
+                         FetchResponse.group(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import os
 import sys
+import threading
 from typing import Tuple, List, Union
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
@@ -8,90 +9,14 @@ from dbeurive.imap.parser import ListMailbox
 
 class TestParser(unittest.TestCase):
 
-    # ------------------------------------------------------------------
-    # Testing the low level methods that extracts tokens from the
-    # beginning of a text.
-    # ------------------------------------------------------------------
-
-    def test_empty_cme(self):
-        test_set = (
-            ('() ...',    ('', len('()'))),
-            ('"/" ...',   None),
-        )
-        for test in test_set:
-            r = ListMailbox._get_empty_cme(test[0])
-            self.assertEqual(test[1], r)
-
-    def test_get_cme_list(self):
-        test_set = (
-            ('(\\A \\B \\C) ...',       ('\\A \\B \\C', len('(\\A \\B \\C)'))),
-            ('(\\HasNoChildren) ...',   ('\\HasNoChildren', len('(\\HasNoChildren)'))),
-            ('(\\NoInferiors) ...',     ('\\NoInferiors', len('(\\NoInferiors)'))),
-            ('\\NoInferiors ...',       None),
-            ('"/" ...',                 None),
-        )
-        for test in test_set:
-            r = ListMailbox._get_cme_list(test[0])
-            self.assertEqual(test[1], r)
-
-    def test_get_path1(self):
-        test_set = (
-            ('"/" ...',                 ('/', len('"/"'))),
-            ('"|" ...',                 ('|', len('"|"'))),
-            ('"INBOX" ...',             ('INBOX', len('"INBOX"'))),
-            ('"My Mailbox" ...',        ('My Mailbox', len('"My Mailbox"'))),
-            ('"My \\"Mailbox\\"" ...',  ('My \\"Mailbox\\"', len('"My \\"Mailbox\\""'))),
-            ('(\\NoInferiors) ...',     None),
-        )
-        for test in test_set:
-            r = ListMailbox._get_path1(test[0])
-            self.assertEqual(test[1], r)
-
-    def test_get_path2(self):
-        test_set = (
-            ('/ ...',                 ('/', len('/'))),
-            ('| ...',                 ('|', len('|'))),
-            ('INBOX ...',             ('INBOX', len('INBOX'))),
-            ('(\\NoInferiors) ...',   None),
-        )
-        for test in test_set:
-            r = ListMailbox._get_path2(test[0])
-            self.assertEqual(test[1], r)
-
-    # ------------------------------------------------------------------
-    # Testing the (high level) method that extracts tokens from the
-    # beginning of a text.
-    # ------------------------------------------------------------------
-
-    def test_get_token(self):
-        test_set = [
-            ('"/" ...',                 (ListMailbox.TYPE_PATH, ('/', len('"/"')))),
-            ('/ ...',                   (ListMailbox.TYPE_PATH, ('/', len('/')))),
-            ('"|" ...',                 (ListMailbox.TYPE_PATH, ('|', len('"|"')))),
-            ('| ...',                   (ListMailbox.TYPE_PATH, ('|', len('|')))),
-            ('"INBOX" ...',             (ListMailbox.TYPE_PATH, ('INBOX', len('"INBOX"')))),
-            ('INBOX ...',               (ListMailbox.TYPE_PATH, ('INBOX', len('INBOX')))),
-            ('"My Mailbox" ...',        (ListMailbox.TYPE_PATH, ('My Mailbox', len('"My Mailbox"')))),
-            ('"My \\"Mailbox\\"" ...',  (ListMailbox.TYPE_PATH, ('My \\"Mailbox\\"', len('"My \\"Mailbox\\""')))),
-            ('(\\NoInferiors) ...',     (ListMailbox._TYPE_CME_LIST, ('\\NoInferiors', len('(\\NoInferiors)')))),
-            ('\\NoInferiors ...',       (ListMailbox._TYPE_UNKNOWN, None)),
-            ('NoInferiors ...',         (ListMailbox.TYPE_PATH, ('NoInferiors', len('NoInferiors')))),
-            ('"NoInferiors ...',        (ListMailbox._TYPE_UNKNOWN, None)),
-            ('(\\A \\B \\C) ...',       (ListMailbox._TYPE_CME_LIST, ('\\A \\B \\C', len('(\\A \\B \\C)')))),
-            ('() ...',                  (ListMailbox._TYPE_EMPTY_CME, ('', len('()'))))
-        ]
-        for test in test_set:
-            r = ListMailbox._get_token(test[0])
-            self.assertEqual(test[1], r)
-
     # ------------------------------------------------------------------
     # Test the parsing
     # ------------------------------------------------------------------
 
     def test_parse(self):
-        test_set: List[Tuple[str, Union[List[Tuple[int, str]], List[str]]]] =\
+        test_set: List[Tuple[bytes, List[Tuple[int, Union[None, str]]], List[Union[None, str]]]] =\
             [
-                ('(\\HasNoChildren) "/" "Chats"',
+                (b'(\\HasNoChildren) "/" "Chats"',
                     [
                         (ListMailbox.TYPE_CME,  '\\HasNoChildren'),
                         (ListMailbox.TYPE_PATH, '/'),
@@ -100,7 +25,7 @@ class TestParser(unittest.TestCase):
                     ['\\HasNoChildren', '/', 'Chats']
                 ),
 
-                ('"/" "Chats"',
+                (b'"/" "Chats"',
                      [
                          (ListMailbox.TYPE_PATH, '/'),
                          (ListMailbox.TYPE_PATH, 'Chats')
@@ -108,7 +33,7 @@ class TestParser(unittest.TestCase):
                      ['/', 'Chats']
                 ),
 
-                ('/ "Chats"',
+                (b'/ "Chats"',
                      [
                          (ListMailbox.TYPE_PATH, '/'),
                          (ListMailbox.TYPE_PATH, 'Chats')
@@ -116,7 +41,7 @@ class TestParser(unittest.TestCase):
                      ['/', 'Chats']
                 ),
 
-                ('() / "Chats"',
+                (b'() / "Chats"',
                      [
                          (ListMailbox.TYPE_PATH, '/'),
                          (ListMailbox.TYPE_PATH, 'Chats')
@@ -124,7 +49,7 @@ class TestParser(unittest.TestCase):
                      ['/', 'Chats']
                 ),
 
-                ('(\\A \\B \\C) / "Chats"',
+                (b'(\\A \\B \\C) / "Chats"',
                      [
                          (ListMailbox.TYPE_CME, '\\A'),
                          (ListMailbox.TYPE_CME, '\\B'),
@@ -133,25 +58,94 @@ class TestParser(unittest.TestCase):
                          (ListMailbox.TYPE_PATH, 'Chats')
                      ],
                      ['\\A', '\\B', '\\C', '/', 'Chats']
+                ),
+
+                (b'(\\Sent \\NoInferiors) "/" Sent',
+                     [
+                         (ListMailbox.TYPE_CME, '\\Sent'),
+                         (ListMailbox.TYPE_CME, '\\NoInferiors'),
+                         (ListMailbox.TYPE_PATH, '/'),
+                         (ListMailbox.TYPE_PATH, 'Sent')
+                     ],
+                     ['\\Sent', '\\NoInferiors', '/', 'Sent']
+                ),
+
+                (b'(\\Noselect) NIL "Archive"',
+                     [
+                         (ListMailbox.TYPE_CME, '\\Noselect'),
+                         (ListMailbox.TYPE_NIL, None),
+                         (ListMailbox.TYPE_PATH, 'Archive')
+                     ],
+                     ['\\Noselect', None, 'Archive']
+                ),
+
+                (b'() "/" "My \\"Mailbox\\" \\\\ 2"',
+                     [
+                         (ListMailbox.TYPE_PATH, '/'),
+                         (ListMailbox.TYPE_PATH, 'My "Mailbox" \\ 2')
+                     ],
+                     ['/', 'My "Mailbox" \\ 2']
+                ),
+
+                (b'(\\HasNoChildren) "/" "Dossier &AOk-t&AOk-"',
+                     [
+                         (ListMailbox.TYPE_CME, '\\HasNoChildren'),
+                         (ListMailbox.TYPE_PATH, '/'),
+                         (ListMailbox.TYPE_PATH, 'Dossier &AOk-t&AOk-')
+                     ],
+                     ['\\HasNoChildren', '/', 'Dossier &AOk-t&AOk-']
                 )
             ]
 
+        parser = ListMailbox()
         for test in test_set:
-            ListMailbox.reset()
-            self.assertTrue(ListMailbox.parse(test[0]))
-            self.assertEqual(ListMailbox.get_tokens(), test[1])
-            self.assertEqual(ListMailbox.get_tokens_values(), test[2])
+            self.assertTrue(parser.parse(test[0]))
+            self.assertEqual(parser.get_tokens(), test[1])
+            self.assertEqual(parser.get_tokens_values(), test[2])
+            self.assertEqual(ListMailbox.tokenize(test[0]), test[1])
 
-        test_set: List[str] =\
+        test_set: List[bytes] =\
             [
-                '(\\HasNoChildren) "/" Chats'
-                '\\HasNoChildren "/" "Chats"'
+                b'(\\HasNoChildren) "/" Chats\\HasNoChildren "/" "Chats"',
+                b'\\HasNoChildren "/" "Chats"',
+                b'(HasNoChildren) "/" "Chats"',
+                b'(\\HasNoChildren) "/" "Chats',
+                b'(\\HasNoChildren) "/" {5}',
             ]
 
         for test in test_set:
-            ListMailbox.reset()
-            self.assertFalse(ListMailbox.parse(test))
+            self.assertFalse(parser.parse(test))
+            self.assertIsNone(ListMailbox.tokenize(test))
+
+    def test_parse_literal(self):
+        self.assertEqual([(ListMailbox.TYPE_CME, '\\HasNoChildren'),
+                          (ListMailbox.TYPE_PATH, '/'),
+                          (ListMailbox.TYPE_PATH, 'Chats "2"')],
+                         ListMailbox.tokenize(b'(\\HasNoChildren) "/" {9}', b'Chats "2"'))
+        self.assertIsNone(ListMailbox.tokenize(b'(\\HasNoChildren) "/" {9}', b'Chats'))
+
+    def test_long_line(self):
+        name = 'a' * 100000
+        parser = ListMailbox()
+        self.assertTrue(parser.parse(b'() "/" "%s"' % name.encode()))
+        self.assertEqual(['/', name], parser.get_tokens_values())
+
+    def test_concurrency(self):
+        errors = []
+
+        def parse(name: str):
+            parser = ListMailbox()
+            for _ in range(200):
+                if not parser.parse(b'(\\HasNoChildren) "/" "%s"' % name.encode()) or \
+                        parser.get_tokens_values() != ['\\HasNoChildren', '/', name]:
+                    errors.append(name)
+
+        threads = [threading.Thread(target=parse, args=(f'box{i}',)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
 
 if __name__ == '__main__':
     unittest.main()
-
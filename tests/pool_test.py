@@ -0,0 +1,201 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.config import Config
+from dbeurive.imap.pool import Pool
+from dbeurive.imap.id_set import IdSet
+from fake_server import FakeImapServer, FakeMailbox, FakeMessage
+
+
+def get_config(*servers: FakeImapServer) -> Config:
+    conf = ''
+    for i, server in enumerate(servers):
+        conf += f'isp{i}:\n' \
+                f'  net:\n    hostname: {server.host}\n    port: {server.port}\n' \
+                f'  imap:\n    path_sep: "/"\n' \
+                f'  user:\n    login: {server.username}\n    password: {server.password}\n'
+    return Config(conf)
+
+
+class TestPool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeImapServer(mailboxes=[
+            FakeMailbox('INBOX', [FakeMessage(1), FakeMessage(2)]),
+            FakeMailbox('Sent', [FakeMessage(3)])
+        ]).start()
+        self.pool = Pool(get_config(self.server), max_connections=2, use_ssl=False)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+
+    def test_reuse(self):
+        with self.pool.connection('isp0', 'INBOX') as client:
+            self.assertTrue(client.is_authenticated())
+            self.assertEqual(IdSet([1, 2]), client.list_emails_ids())
+        with self.pool.connection('isp0', 'INBOX') as client:
+            self.assertEqual(IdSet([1, 2]), client.list_emails_ids())
+        self.assertEqual(1, self.server.connections)
+        self.assertEqual(1, self.server.commands.count('LOGIN'))
+        # The mailbox is selected only once.
+        self.assertEqual(1, self.server.commands.count('SELECT'))
+        with self.pool.connection('isp0', 'Sent') as client:
+            self.assertEqual(IdSet([1]), client.list_emails_ids())
+        self.assertEqual(2, self.server.commands.count('SELECT'))
+        self.assertEqual(1, self.pool.count_connections('isp0'))
+
+    def test_max_connections(self):
+        c1 = self.pool.acquire('isp0')
+        c2 = self.pool.acquire('isp0')
+        self.assertEqual(2, self.pool.count_connections('isp0'))
+        with self.assertRaises(Exception):
+            self.pool.acquire('isp0', timeout=0.1)
+
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(self.pool.acquire('isp0', timeout=5)))
+        thread.start()
+        self.pool.release(c1)
+        thread.join()
+        self.assertIs(c1, acquired[0])
+        self.pool.release(c2)
+        self.pool.release(acquired[0])
+        self.assertEqual(2, self.pool.count_idle('isp0'))
+
+    def test_dead_connection(self):
+        client = self.pool.acquire('isp0')
+        self.pool.release(client)
+        client.get_connector().shutdown()
+        other = self.pool.acquire('isp0')
+        self.assertTrue(other.noop())
+        self.assertEqual(2, self.server.connections)
+        self.pool.release(other)
+        self.assertEqual(1, self.pool.count_connections())
+
+    def test_evict_idle(self):
+        self.pool = Pool(get_config(self.server), idle_timeout=0, use_ssl=False)
+        client = self.pool.acquire('isp0')
+        self.pool.release(client)
+        self.assertEqual(1, self.pool.evict_idle())
+        self.assertFalse(client.is_connected())
+        self.assertEqual(0, self.pool.count_connections())
+
+    def test_evict_outside_lock(self):
+        slow = FakeImapServer(mailboxes=[FakeMailbox('INBOX')]).start()
+        pool = Pool(get_config(self.server, slow), idle_timeout=0, use_ssl=False)
+        try:
+            pool.release(pool.acquire('isp1'))
+            # The server of "isp1" answers LOGOUT after 0.5 seconds.
+            slow.delay = 0.5
+            thread = threading.Thread(target=pool.evict_idle)
+            thread.start()
+            time.sleep(0.1)
+            start = time.monotonic()
+            with pool.connection('isp0', timeout=5) as client:
+                self.assertTrue(client.is_authenticated())
+            self.assertLess(time.monotonic() - start, 0.3)
+            thread.join()
+        finally:
+            pool.close()
+            slow.stop()
+
+    def test_discard_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.pool.connection('isp0'):
+                raise ValueError()
+        self.assertEqual(0, self.pool.count_connections())
+
+    def test_login_failure(self):
+        self.server.password = 'changed'
+        with self.assertRaises(Exception):
+            self.pool.acquire('isp0')
+        self.assertEqual(0, self.pool.count_connections())
+
+    def test_warm_up(self):
+        server = FakeImapServer(mailboxes=[FakeMailbox('INBOX')], delay=0.05).start()
+        pool = Pool(get_config(self.server, server), max_connections=2, use_ssl=False)
+        try:
+            self.assertEqual({'isp0': 2, 'isp1': 2}, pool.warm_up(3))
+            self.assertEqual(2, self.server.connections)
+            self.assertEqual(2, server.connections)
+            self.assertEqual({'isp1': 2}, pool.warm_up(1, ['isp1']))
+            self.assertEqual(2, server.connections)
+            with pool.connection('isp1', 'INBOX') as client:
+                self.assertTrue(client.is_authenticated())
+            self.assertEqual(2, server.connections)
+            self.assertEqual(2, server.commands.count('LOGIN'))
+        finally:
+            pool.close()
+            server.stop()
+
+    def test_warm_up_errors(self):
+        self.server.password = 'other'
+        self.assertEqual({'isp0': 0}, self.pool.warm_up(2))
+        self.assertEqual(0, self.pool.count_connections('isp0'))
+        self.pool.close()
+        with self.assertRaises(Exception):
+            self.pool.warm_up()
+
+    def test_reload(self):
+        server = FakeImapServer(mailboxes=[FakeMailbox('INBOX')]).start()
+        pool = Pool(get_config(self.server, server), use_ssl=False)
+        try:
+            pool.warm_up(1)
+            in_use = pool.acquire('isp1')
+            server.password = 'rotated'
+            config = get_config(self.server, server, self.server)
+            added, removed, changed = pool.reload(config)
+            self.assertEqual((['isp2'], [], ['isp1']), (added, removed, changed))
+            # The client of the unchanged ISP is still connected.
+            self.assertEqual(1, pool.count_idle('isp0'))
+            with pool.connection('isp0', 'INBOX'):
+                pass
+            self.assertEqual(1, self.server.connections)
+            # The client of the rotated ISP is disconnected once it is returned.
+            pool.release(in_use)
+            self.assertEqual(0, pool.count_idle('isp1'))
+            self.assertEqual(0, pool.count_connections('isp1'))
+            with pool.connection('isp1', 'INBOX') as client:
+                self.assertTrue(client.is_authenticated())
+            self.assertEqual(2, server.connections)
+
+            self.assertEqual(([], ['isp1', 'isp2'], []), pool.reload(get_config(self.server)))
+            self.assertEqual(1, pool.count_connections())
+            with self.assertRaises(Exception):
+                pool.acquire('isp1')
+        finally:
+            pool.close()
+            server.stop()
+
+
+    def test_reload_during_warm_up(self):
+        server = FakeImapServer(mailboxes=[FakeMailbox('INBOX')], delay=0.1).start()
+        other = FakeImapServer(mailboxes=[FakeMailbox('INBOX')]).start()
+        pool = Pool(get_config(self.server, server), use_ssl=False)
+        try:
+            warm_up = threading.Thread(target=pool.warm_up, args=(2, ['isp1']))
+            warm_up.start()
+            time.sleep(0.05)
+            # The ISP moves to another server while its clients are being opened.
+            self.assertEqual(([], [], ['isp1']), pool.reload(get_config(self.server, other)))
+            warm_up.join()
+            self.assertEqual(0, pool.count_idle('isp1'))
+            self.assertEqual(0, pool.count_connections())
+            with pool.connection('isp1', 'INBOX') as client:
+                self.assertTrue(client.is_authenticated())
+            self.assertEqual(1, other.connections)
+            self.assertEqual(1, pool.count_connections('isp1'))
+        finally:
+            pool.close()
+            server.stop()
+            other.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
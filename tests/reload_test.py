@@ -0,0 +1,102 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.accounts import AccountRegistry
+from dbeurive.imap.config import Config
+from dbeurive.imap.pool import Pool
+from dbeurive.imap.reload import ConfigWatcher
+from fake_server import FakeImapServer, FakeMailbox
+
+
+def get_yaml(server: FakeImapServer, passwords: dict) -> str:
+    conf = ''
+    for isp_name, password in passwords.items():
+        conf += f'{isp_name}:\n' \
+                f'  net:\n    hostname: {server.host}\n    port: {server.port}\n' \
+                f'  imap:\n    path_sep: "/"\n' \
+                f'  user:\n    login: {server.username}\n    password: {password}\n'
+    return conf
+
+
+def write(path: str, text: str) -> None:
+    with open(path, 'w') as fd:
+        fd.write(text)
+    # Make sure that the modification is visible, whatever the resolution of the file system.
+    mtime = os.stat(path).st_mtime_ns + 1000000
+    os.utime(path, ns=(mtime, mtime))
+
+
+class TestConfigWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeImapServer(mailboxes=[FakeMailbox('INBOX')]).start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'isp.yaml')
+
+    def tearDown(self):
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_diff_conf(self):
+        conf1 = Config(get_yaml(self.server, {'a': 'p', 'b': 'p', 'c': 'p'})).get_conf()
+        conf2 = Config(get_yaml(self.server, {'b': 'p', 'c': 'q', 'd': 'p'})).get_conf()
+        self.assertEqual((['d'], ['a'], ['c']), Config.diff_conf(conf1, conf2))
+        self.assertEqual(([], [], []), Config.diff_conf(conf1, conf1))
+
+    def test_check(self):
+        passwords = {'isp0': self.server.password, 'isp1': self.server.password}
+        write(self.path, get_yaml(self.server, passwords))
+        changes = []
+        pool = Pool(Config.get_conf_from_file(self.path), use_ssl=False)
+        watcher = ConfigWatcher(self.path, pool, callback=lambda *c: changes.append(c))
+        try:
+            pool.warm_up(1)
+            self.assertFalse(watcher.check())
+
+            # Invalid file: the pool keeps its configuration.
+            write(self.path, 'isp0: [')
+            self.assertFalse(watcher.check())
+            self.assertIsNotNone(watcher.get_last_error())
+            self.assertEqual(2, pool.count_idle())
+
+            write(self.path, get_yaml(self.server, dict(passwords, isp1='rotated', isp2=self.server.password)))
+            self.assertTrue(watcher.check())
+            self.assertIsNone(watcher.get_last_error())
+            self.assertEqual([(['isp2'], [], ['isp1'])], changes)
+            self.assertEqual(1, pool.count_idle('isp0'))
+            self.assertEqual(0, pool.count_idle('isp1'))
+            with pool.connection('isp0', 'INBOX'):
+                pass
+            self.assertEqual(2, self.server.connections)
+            with pool.connection('isp2', 'INBOX'):
+                pass
+            self.assertEqual(1, watcher.get_reloads())
+        finally:
+            pool.close()
+
+    def test_background(self):
+        write(self.path, get_yaml(self.server, {'isp0': self.server.password}))
+        pool = Pool(AccountRegistry.from_file(self.path), use_ssl=False)
+        watcher = ConfigWatcher(self.path, pool, loader=AccountRegistry.from_file, interval=0.01)
+        watcher.start()
+        try:
+            write(self.path, get_yaml(self.server, {'isp0': self.server.password, 'isp1': self.server.password}))
+            deadline = time.monotonic() + 5
+            while watcher.get_reloads() == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(1, watcher.get_reloads())
+            with pool.connection('isp1', 'INBOX') as client:
+                self.assertTrue(client.is_authenticated())
+        finally:
+            watcher.stop()
+            pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
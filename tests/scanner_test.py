@@ -0,0 +1,72 @@
+import unittest
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.scanner import Scanner, ScanResult, main
+from dbeurive.imap.id_set import IdSet
+from fake_server import FakeImapServer, FakeMailbox, FakeMessage
+from pool_test import get_config
+
+
+class TestScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = [
+            FakeImapServer(mailboxes=[FakeMailbox('INBOX', [FakeMessage(1), FakeMessage(2)]),
+                                      FakeMailbox('Sent', [FakeMessage(3)]),
+                                      FakeMailbox('Archives', attributes=['\\Noselect', '\\HasChildren'])],
+                           delay=0.1).start(),
+            FakeImapServer(mailboxes=[FakeMailbox('INBOX', [FakeMessage(1)])], delay=0.1).start(),
+            FakeImapServer(mailboxes=[FakeMailbox('INBOX', [])], delay=0.1).start()
+        ]
+        self.config = get_config(*self.servers)
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def test_scan_inbox(self):
+        start = time.monotonic()
+        results = list(Scanner(self.config, workers=4, use_ssl=False).scan())
+        duration = time.monotonic() - start
+        self.assertEqual(3, len(results))
+        ids = {r.get_isp_name(): r.get_emails_ids() for r in results}
+        self.assertEqual({'isp0': IdSet([1, 2]), 'isp1': IdSet([1]), 'isp2': IdSet()}, ids)
+        # Each session costs 4 round trips (greeting, LOGIN, SELECT, SEARCH): the ISPs are processed concurrently.
+        self.assertLess(duration, 3 * 4 * 0.1)
+
+    def test_scan_all_mailboxes(self):
+        results = list(Scanner(self.config, workers=4, max_per_isp=2, mailboxes=None, isp_names=['isp0'],
+                               use_ssl=False).scan())
+        self.assertEqual(ScanResult.TYPE_LIST, results[0].get_type())
+        searches = {r.get_mailbox(): r.get_emails_ids() for r in results[1:]}
+        # The mailbox "Archives" cannot be selected: it is not searched.
+        self.assertEqual({'INBOX': IdSet([1, 2]), 'Sent': IdSet([1])}, searches)
+
+    def test_scan_error(self):
+        results = list(Scanner(self.config, mailboxes=['Unknown'], isp_names=['isp1'], use_ssl=False).scan())
+        self.assertEqual(1, len(results))
+        self.assertFalse(results[0].is_success())
+
+    def test_main(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False) as fd:
+            fd.write(self.config.dump())
+        try:
+            out = io.StringIO()
+            with redirect_stdout(out):
+                status = main(['--no-ssl', '--isp', 'isp0', '--mailbox', 'INBOX', fd.name])
+        finally:
+            os.unlink(fd.name)
+        self.assertEqual(0, status)
+        self.assertTrue(out.getvalue().startswith('isp0\tINBOX\tSEARCH\t2\t'))
+
+
+if __name__ == '__main__':
+    unittest.main()
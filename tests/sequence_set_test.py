@@ -0,0 +1,60 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+from dbeurive.imap.id_set import IdSet
+from dbeurive.imap import sequence_set
+
+
+class TestSequenceSet(unittest.TestCase):
+
+    def test_encode(self):
+        test_set = (
+            ([],                        ''),
+            ([3],                       '3'),
+            ([3, 1, 2, 2],              '1:3'),
+            (IdSet([1, 2, 3, 5, 7, 8]), '1:3,5,7:8'),
+        )
+        for ids, expected in test_set:
+            self.assertEqual(expected, sequence_set.encode(ids))
+
+    def test_decode(self):
+        test_set = (
+            ('',                    []),
+            ('3',                   [3]),
+            ('1:3,5,7:8',           [1, 2, 3, 5, 7, 8]),
+            (b'8:7,1,1:2',          [1, 2, 7, 8]),
+            ('1:500,502,510:9000',  list(range(1, 501)) + [502] + list(range(510, 9001))),
+        )
+        for text, expected in test_set:
+            self.assertEqual(IdSet(expected), sequence_set.decode(text))
+        self.assertEqual(IdSet([4, 5, 6]), sequence_set.decode('4:*', 6))
+        for text in ('1:', 'a', '1,,2', '1:2:3'):
+            with self.assertRaises(Exception):
+                sequence_set.decode(text)
+        with self.assertRaises(Exception):
+            sequence_set.decode('1:*')
+
+    def test_chunks(self):
+        ids = IdSet(range(1, 2000, 2))
+        chunks = list(sequence_set.chunks(ids, 100))
+        self.assertGreater(len(chunks), 1)
+        decoded = IdSet()
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 100)
+            decoded = decoded | sequence_set.decode(chunk)
+        self.assertEqual(ids, decoded)
+        self.assertEqual(['1:100000'], list(sequence_set.chunks(range(1, 100001), 100)))
+        self.assertEqual([], list(sequence_set.chunks([], 100)))
+
+    def test_is_sequence_set(self):
+        self.assertTrue(sequence_set.is_sequence_set(IdSet([1])))
+        self.assertTrue(sequence_set.is_sequence_set([1, 2]))
+        self.assertTrue(sequence_set.is_sequence_set(range(1, 3)))
+        self.assertFalse(sequence_set.is_sequence_set('1:2'))
+        self.assertFalse(sequence_set.is_sequence_set(b'1:2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.client import Client
+from dbeurive.imap.id_set import IdSet
+from dbeurive.imap.sync import StateStore, Synchronizer, SyncResult, MailboxState
+from fake_server import FakeImapServer, FakeMailbox, FakeMessage
+
+
+class TestSync(unittest.TestCase):
+
+    def _start(self, capabilities):
+        self.inbox = FakeMailbox('INBOX', [FakeMessage(1), FakeMessage(2), FakeMessage(3)])
+        self.server = FakeImapServer(mailboxes=[self.inbox], capabilities=capabilities).start()
+        self.store = StateStore()
+
+    def tearDown(self):
+        self.store.close()
+        self.server.stop()
+
+    def _sync(self) -> SyncResult:
+        client = Client(self.server.host, self.server.port, 'user', 'password', use_ssl=False)
+        client.connect()
+        client.login()
+        try:
+            return Synchronizer(client, self.store, 'isp').sync('INBOX')
+        finally:
+            client.logout()
+
+    def test_qresync(self):
+        self._start(('IMAP4rev1', 'ENABLE', 'CONDSTORE', 'QRESYNC'))
+        result = self._sync()
+        self.assertTrue(result.is_full())
+        self.assertEqual(IdSet([1, 2, 3]), result.get_new_uids())
+
+        # Nothing changed: no message is fetched.
+        del self.server.commands[:]
+        result = self._sync()
+        self.assertEqual(SyncResult.METHOD_QRESYNC, result.get_method())
+        self.assertEqual(0, len(result.get_new_uids()) + len(result.get_changed_uids()) + len(result.get_vanished_uids()))
+        self.assertNotIn('UID FETCH', self.server.commands)
+        self.assertNotIn('UID SEARCH', self.server.commands)
+
+        self.inbox.append(FakeMessage(4))
+        self.inbox.set_flags(2, ['\\Seen'])
+        self.inbox.expunge(1)
+        del self.server.commands[:]
+        result = self._sync()
+        self.assertEqual(IdSet([4]), result.get_new_uids())
+        self.assertEqual(IdSet([2]), result.get_changed_uids())
+        self.assertEqual(IdSet([1]), result.get_vanished_uids())
+        self.assertEqual(IdSet([2, 3, 4]), result.get_uids())
+        self.assertEqual(['ENABLE', 'EXAMINE', 'UID FETCH'], [c for c in self.server.commands if c not in ('LOGIN', 'CAPABILITY', 'LOGOUT')])
+
+    def test_condstore(self):
+        self._start(('IMAP4rev1', 'ENABLE', 'CONDSTORE'))
+        self._sync()
+        self.inbox.set_flags(3, ['\\Flagged'])
+        result = self._sync()
+        self.assertEqual(SyncResult.METHOD_CONDSTORE, result.get_method())
+        self.assertEqual(IdSet([3]), result.get_changed_uids())
+        self.assertEqual(0, len(result.get_vanished_uids()))
+        self.assertNotIn('UID SEARCH', self.server.commands[-3:])
+
+        self.inbox.expunge(2)
+        self.inbox.append(FakeMessage(7))
+        result = self._sync()
+        self.assertEqual(IdSet([7]), result.get_new_uids())
+        self.assertEqual(IdSet([2]), result.get_vanished_uids())
+        self.assertEqual(IdSet([1, 3, 7]), self.store.load('isp', 'INBOX').get_uids())
+
+    def test_uid_search_fallback(self):
+        self._start(('IMAP4rev1',))
+        self._sync()
+
+        del self.server.commands[:]
+        result = self._sync()
+        self.assertEqual(SyncResult.METHOD_UID_SEARCH, result.get_method())
+        self.assertEqual(0, len(result.get_new_uids()))
+        self.assertNotIn('UID SEARCH', self.server.commands)
+
+        self.inbox.append(FakeMessage(4))
+        self.inbox.append(FakeMessage(5))
+        result = self._sync()
+        self.assertEqual(IdSet([4, 5]), result.get_new_uids())
+        self.assertEqual(0, len(result.get_vanished_uids()))
+        self.assertEqual(1, self.server.commands.count('UID SEARCH'))
+
+        self.inbox.expunge(5)
+        self.inbox.expunge(1)
+        result = self._sync()
+        self.assertEqual(0, len(result.get_new_uids()))
+        self.assertEqual(IdSet([1, 5]), result.get_vanished_uids())
+        self.assertEqual(IdSet([2, 3, 4]), result.get_uids())
+
+    def test_uid_validity_change(self):
+        self._start(('IMAP4rev1', 'ENABLE', 'CONDSTORE', 'QRESYNC'))
+        self._sync()
+        self.inbox.uid_validity = 2
+        self.inbox.messages = [FakeMessage(10)]
+        result = self._sync()
+        self.assertTrue(result.is_full())
+        self.assertEqual(IdSet([10]), result.get_uids())
+        self.assertEqual(2, self.store.load('isp', 'INBOX').get_uid_validity())
+
+
+class TestStateStore(unittest.TestCase):
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'state.sqlite')
+            with StateStore(path) as store:
+                self.assertIsNone(store.load('isp', 'INBOX'))
+                store.save('isp', 'INBOX', MailboxState(7, 101, 2 ** 62, IdSet(range(1, 101))))
+                store.save('isp', 'Sent', MailboxState(8, 1, None, IdSet()))
+            with StateStore(path) as store:
+                state = store.load('isp', 'INBOX')
+                self.assertEqual(7, state.get_uid_validity())
+                self.assertEqual(101, state.get_uid_next())
+                self.assertEqual(2 ** 62, state.get_highest_modseq())
+                self.assertEqual(IdSet(range(1, 101)), state.get_uids())
+                self.assertIsNone(store.load('isp', 'Sent').get_highest_modseq())
+                store.delete('isp', 'INBOX')
+                self.assertIsNone(store.load('isp', 'INBOX'))
+                store.delete('isp')
+                self.assertIsNone(store.load('isp', 'Sent'))
+
+
+if __name__ == '__main__':
+    unittest.main()
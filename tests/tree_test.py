@@ -0,0 +1,130 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbeurive.imap.client import Client
+from dbeurive.imap.mailbox import Mailbox
+from dbeurive.imap.tree import MailboxTree
+from fake_server import FakeImapServer, FakeMailbox
+
+
+def names(mailboxes):
+    return [m.get_name() for m in mailboxes]
+
+
+class TestMailboxTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = MailboxTree([Mailbox('INBOX', '/'),
+                                 Mailbox('Archives', '/', ('\\Noselect', '\\HasChildren')),
+                                 Mailbox('Archives/2022', '/'),
+                                 Mailbox('Archives/2023', '/'),
+                                 Mailbox('Archives/2023/Envoy&AOk-s', '/', ('\\Sent',)),
+                                 Mailbox('Projets/A/B', '/')])
+
+    def test_lookup(self):
+        self.assertEqual(6, len(self.tree))
+        self.assertEqual('/', self.tree.get_delimiter())
+        self.assertEqual('Archives/2023/Envoy&AOk-s', self.tree.get('Archives/2023/Envoyés').get_raw_name())
+        self.assertIn('Archives/2022', self.tree)
+        self.assertNotIn('Archives/2024', self.tree)
+        # The missing parents are implied.
+        self.assertIsNone(self.tree.get('Projets/A'))
+        self.assertNotIn('Projets', self.tree)
+        self.assertFalse(self.tree.get_parent('Projets/A/B').is_selectable())
+        self.assertEqual('Archives', self.tree.get_parent('Archives/2022').get_name())
+        self.assertIsNone(self.tree.get_parent('INBOX'))
+
+    def test_children(self):
+        self.assertEqual(['INBOX', 'Archives', 'Projets'], names(self.tree.get_children()))
+        self.assertEqual(['Archives/2022', 'Archives/2023'], names(self.tree.get_children('Archives')))
+        self.assertEqual([], self.tree.get_children('Unknown'))
+        self.assertEqual(['Archives', 'Archives/2022', 'Archives/2023', 'Archives/2023/Envoyés'],
+                         names(self.tree.iter_subtree('Archives')))
+        self.assertEqual(['INBOX', 'Archives', 'Archives/2022', 'Archives/2023', 'Archives/2023/Envoyés',
+                          'Projets/A/B'], names(self.tree))
+        self.assertEqual(['Projets', 'Projets/A', 'Projets/A/B'],
+                         names(self.tree.iter_subtree('Projets', include_implied=True)))
+
+    def test_match(self):
+        self.assertEqual(['Archives/2022', 'Archives/2023'], names(self.tree.match('Archives/%')))
+        self.assertEqual(['Archives/2022', 'Archives/2023', 'Archives/2023/Envoyés'],
+                         names(self.tree.match('Archives/*')))
+        self.assertEqual(['INBOX', 'Archives'], names(self.tree.match('%')))
+        self.assertEqual(['Archives/2023/Envoyés'], names(self.tree.match('*Envoy*')))
+        self.assertEqual(['Archives/2023'], names(self.tree.match('Archives/2023')))
+        self.assertEqual(['Archives/2022'], names(self.tree.match('Archives/20%2')))
+        self.assertEqual([], names(self.tree.match('Unknown/*')))
+        self.assertEqual(['Projets/A/B'], names(self.tree.match('Projets/%/%')))
+
+    def test_update(self):
+        self.tree.add(Mailbox('Projets/A', '/'))
+        self.assertEqual(7, len(self.tree))
+        self.assertTrue(self.tree.get('Projets/A').is_selectable())
+        self.assertTrue(self.tree.remove('Projets/A'))
+        self.assertFalse(self.tree.remove('Projets/A'))
+        self.assertEqual(['Projets/A'], names(self.tree.get_children('Projets')))
+        # The implied parents left without any child are removed.
+        self.assertTrue(self.tree.remove('Projets/A/B'))
+        self.assertEqual(['INBOX', 'Archives'], names(self.tree.get_children()))
+        # A removed mailbox that has children becomes implied.
+        self.assertTrue(self.tree.remove('Archives'))
+        self.assertEqual(4, len(self.tree))
+        self.assertEqual(['Archives/2022', 'Archives/2023'], names(self.tree.get_children('Archives')))
+
+    def test_refresh(self):
+        changed, removed = self.tree.refresh([Mailbox('Archives/2023', '/', ('\\HasChildren',)),
+                                              Mailbox('Archives/2024', '/')], 'Archives/*')
+        self.assertEqual(['Archives/2023', 'Archives/2024'], names(changed))
+        self.assertEqual(['Archives/2022', 'Archives/2023/Envoyés'], names(removed))
+        self.assertEqual(['INBOX', 'Archives', 'Archives/2023', 'Archives/2024', 'Projets/A/B'], names(self.tree))
+        self.assertEqual(([], []), self.tree.refresh(list(self.tree)))
+
+    def test_no_delimiter(self):
+        tree = MailboxTree([Mailbox('INBOX'), Mailbox('a.b'), Mailbox('a.b.c')], '.')
+        self.assertEqual('.', tree.get_delimiter())
+        self.assertEqual(['a.b.c'], names(tree.get_children('a.b')))
+        self.assertEqual(['INBOX', 'a.b', 'a.b.c'], names(MailboxTree([Mailbox('INBOX'), Mailbox('a.b'), Mailbox('a.b.c')], '')))
+
+    def test_client(self):
+        mailboxes = [FakeMailbox('INBOX'), FakeMailbox('Archives/2022'), FakeMailbox('Archives/2023')]
+        with FakeImapServer(mailboxes=mailboxes) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            tree = client.get_mailbox_tree()
+            self.assertEqual(['INBOX', 'Archives/2022', 'Archives/2023'], names(tree))
+            self.assertIs(tree, client.get_mailbox_tree())
+            self.assertEqual(1, server.commands.count('LIST'))
+
+            del server.mailboxes['Archives/2022']
+            server.mailboxes['Archives/2024'] = FakeMailbox('Archives/2024')
+            server.mailboxes['Notes'] = FakeMailbox('Notes')
+            self.assertIs(tree, client.get_mailbox_tree(refresh=True, pattern='Archives/%'))
+            self.assertEqual(['INBOX', 'Archives/2023', 'Archives/2024'], names(tree))
+            self.assertEqual(2, server.commands.count('LIST'))
+            client.get_mailbox_tree(refresh=True)
+            self.assertEqual(['INBOX', 'Archives/2023', 'Archives/2024', 'Notes'], names(tree))
+            client.logout()
+
+
+    def test_client_encoded_names(self):
+        mailboxes = [FakeMailbox('INBOX'), FakeMailbox('Envoy&AOk-s/2022'), FakeMailbox('Envoy&AOk-s/2023')]
+        with FakeImapServer(mailboxes=mailboxes) as server:
+            client = Client(server.host, server.port, 'user', 'password', use_ssl=False)
+            self.assertTrue(client.connect())
+            self.assertTrue(client.login())
+            tree = client.get_mailbox_tree()
+            self.assertEqual(['INBOX', 'Envoyés/2022', 'Envoyés/2023'], names(tree))
+
+            del server.mailboxes['Envoy&AOk-s/2022']
+            self.assertIs(tree, client.get_mailbox_tree(refresh=True, pattern='Envoyés/%'))
+            self.assertEqual(['INBOX', 'Envoyés/2023'], names(tree))
+            client.logout()
+
+
+if __name__ == '__main__':
+    unittest.main()